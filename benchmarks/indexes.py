@@ -0,0 +1,63 @@
+import os
+
+import faiss
+import numpy as np
+from faiss import Index
+
+INDEX_TYPES = ('flat', 'ivfflat', 'ivfpq', 'hnsw')
+HNSW_M = 32
+
+
+def database_vectors(ntotal: int, d: int, seed: int = 1234) -> np.ndarray:
+    # same distribution as BaseTestCase.create_index of tests, which follows
+    # getting started of faiss wiki
+    xb = np.random.default_rng(seed).random((ntotal, d), dtype=np.float32)
+    xb[:, 0] += np.arange(ntotal) / 1000.0
+    return xb
+
+
+def query_vectors(n: int, d: int, seed: int = 4321) -> np.ndarray:
+    return np.random.default_rng(seed).random((n, d), dtype=np.float32)
+
+
+def build_index(
+    index_type: str, d: int, ntotal: int, seed: int = 1234
+) -> Index:
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f'unknown index type {index_type}')
+    xb = database_vectors(ntotal, d, seed)
+
+    if index_type == 'flat':
+        index = faiss.IndexFlatL2(d)
+    elif index_type == 'hnsw':
+        index = faiss.IndexHNSWFlat(d, HNSW_M)
+    else:
+        # faiss wants at least 39 training vectors per list
+        nlist = max(1, min(int(4 * np.sqrt(ntotal)), ntotal // 39))
+        quantizer = faiss.IndexFlatL2(d)
+        if index_type == 'ivfflat':
+            index = faiss.IndexIVFFlat(quantizer, d, nlist)
+        else:
+            index = faiss.IndexIVFPQ(quantizer, d, nlist, pq_size(d), 8)
+        index.train(xb)
+
+    index.add(xb)
+    return index
+
+
+def pq_size(d: int) -> int:
+    # number of sub-quantizers must divide d, 4 dimensions per code byte
+    return max(m for m in range(1, max(1, d // 4) + 1) if d % m == 0)
+
+
+def cached_index_path(
+    directory: str, index_type: str, d: int, ntotal: int
+) -> str:
+    # building large indexes takes longer than benchmarks, so they are
+    # reused between runs
+    path = os.path.join(directory, f'{index_type}_d{d}_n{ntotal}.faiss')
+    if not os.path.exists(path):
+        os.makedirs(directory, exist_ok=True)
+        faiss.write_index(build_index(index_type, d, ntotal), path + '.tmp')
+        os.replace(path + '.tmp', path)
+    return path
@@ -0,0 +1,342 @@
+import argparse
+import functools
+import json
+import logging
+import multiprocessing
+import os
+import platform
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence
+
+import faiss
+import grpc
+import numpy as np
+from google.protobuf.empty_pb2 import Empty
+
+from benchmarks.indexes import INDEX_TYPES, cached_index_path, query_vectors
+from faiss_grpc.aio_server import AsyncServer
+from faiss_grpc.codec import encode_vector
+from faiss_grpc.faiss_server import FaissServiceConfig, Server, ServerConfig
+from faiss_grpc.proto.faiss_pb2 import (
+    COLUMNAR,
+    BatchSearchRequest,
+    SearchByIdRequest,
+    SearchRequest,
+)
+from faiss_grpc.proto.faiss_pb2_grpc import FaissServiceStub
+
+logger = logging.getLogger(__name__)
+
+RPCS = ('search', 'search_by_id', 'batch_search')
+PERCENTILES = {'p50': 50, 'p90': 90, 'p99': 99, 'p999': 99.9}
+REQUEST_POOL_SIZE = 1024
+SERVER_START_TIMEOUT = 600
+
+
+@dataclass
+class LoadResult:
+    latencies: List[float] = field(default_factory=list)
+    errors: int = 0
+    duration: float = 0.0
+    # how late the open loop sent requests behind schedule, large value
+    # means the client could not generate the target rate
+    max_send_lag: float = 0.0
+
+    def summary(self) -> Dict[str, float]:
+        latencies = np.array(self.latencies) * 1000
+        result = {
+            'requests': len(self.latencies),
+            'errors': self.errors,
+            'duration': self.duration,
+            'qps': len(self.latencies) / self.duration,
+            'max_send_lag_ms': self.max_send_lag * 1000,
+        }
+        if latencies.size:
+            result['mean_ms'] = float(latencies.mean())
+            result['max_ms'] = float(latencies.max())
+            for name, q in PERCENTILES.items():
+                result[f'{name}_ms'] = float(np.percentile(latencies, q))
+        return result
+
+
+def make_requests(
+    rpc: str, d: int, ntotal: int, k: int, batch_size: int, columnar: bool
+) -> List[Any]:
+    response_format = COLUMNAR if columnar else 0
+    if rpc == 'search_by_id':
+        ids = np.random.default_rng(0).integers(0, ntotal, REQUEST_POOL_SIZE)
+        return [
+            SearchByIdRequest(id=i, k=k, response_format=response_format)
+            for i in ids.tolist()
+        ]
+    queries = query_vectors(REQUEST_POOL_SIZE * batch_size, d)
+    if rpc == 'batch_search':
+        return [
+            BatchSearchRequest(
+                queries=[encode_vector(q) for q in batch],
+                k=k,
+                response_format=response_format,
+            )
+            for batch in queries.reshape(REQUEST_POOL_SIZE, batch_size, d)
+        ]
+    return [
+        SearchRequest(
+            query=encode_vector(q), k=k, response_format=response_format
+        )
+        for q in queries
+    ]
+
+
+def closed_loop(
+    method: grpc.UnaryUnaryMultiCallable,
+    requests: Sequence[Any],
+    concurrency: int,
+    duration: float,
+) -> LoadResult:
+    # each client sends next request as soon as previous one returns
+    results = [LoadResult() for _ in range(concurrency)]
+    deadline = time.perf_counter() + duration
+
+    def run(worker: int) -> None:
+        result = results[worker]
+        i = worker
+        while True:
+            start = time.perf_counter()
+            if start >= deadline:
+                return
+            try:
+                method(requests[i % len(requests)])
+            except grpc.RpcError:
+                result.errors += 1
+            result.latencies.append(time.perf_counter() - start)
+            i += concurrency
+
+    start = time.perf_counter()
+    threads = [
+        threading.Thread(target=run, args=(i,)) for i in range(concurrency)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    merged = LoadResult(duration=time.perf_counter() - start)
+    for result in results:
+        merged.latencies.extend(result.latencies)
+        merged.errors += result.errors
+    return merged
+
+
+def open_loop(
+    method: grpc.UnaryUnaryMultiCallable,
+    requests: Sequence[Any],
+    rate: float,
+    duration: float,
+) -> LoadResult:
+    # requests are sent on schedule regardless of responses, and latency is
+    # measured from scheduled time, so that queueing in a slow server is
+    # not hidden by clients waiting for it (coordinated omission)
+    result = LoadResult()
+    total = int(rate * duration)
+    lock = threading.Lock()
+    finished = threading.Semaphore(0)
+
+    def record(scheduled: float, future: grpc.Future) -> None:
+        latency = time.perf_counter() - scheduled
+        with lock:
+            result.latencies.append(latency)
+            if future.exception() is not None:
+                result.errors += 1
+        finished.release()
+
+    start = time.perf_counter()
+    for i in range(total):
+        scheduled = start + i / rate
+        lag = time.perf_counter() - scheduled
+        if lag < 0:
+            time.sleep(-lag)
+        result.max_send_lag = max(result.max_send_lag, lag)
+        future = method.future(requests[i % len(requests)])
+        future.add_done_callback(functools.partial(record, scheduled))
+    for _ in range(total):
+        finished.acquire()
+
+    result.duration = time.perf_counter() - start
+    return result
+
+
+def server_cpu_seconds(stub: FaissServiceStub) -> Optional[float]:
+    # cpu time of the server process, which is not available from servers
+    # older than Stats RPC
+    try:
+        values = stub.Stats(Empty()).values
+    except grpc.RpcError:
+        return None
+    return values.get('process_cpu_seconds')
+
+
+def serve(
+    index_path: str,
+    server_config: ServerConfig,
+    service_config: FaissServiceConfig,
+    async_server: bool,
+) -> None:
+    logging.basicConfig(level=logging.WARNING)
+    server_class = AsyncServer if async_server else Server
+    server_class(index_path, server_config, service_config).serve()
+
+
+def start_server(args: argparse.Namespace) -> multiprocessing.Process:
+    index_path = cached_index_path(
+        args.index_dir, args.index_type, args.dim, args.ntotal
+    )
+    server_config = ServerConfig(
+        host='127.0.0.1', port=args.port, max_workers=args.max_workers
+    )
+    service_config = FaissServiceConfig(
+        nprobe=args.nprobe,
+        max_batch_size=args.max_batch_size,
+        search_threads=args.search_threads,
+        batch_search_threads=args.batch_search_threads,
+    )
+    # server runs in its own process, so that its cpu time and GIL are
+    # separated from load generation
+    process = multiprocessing.get_context('spawn').Process(
+        target=serve,
+        args=(index_path, server_config, service_config, args.use_async),
+        daemon=True,
+    )
+    process.start()
+    return process
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    process = None
+    if args.target is None:
+        process = start_server(args)
+        target = f'127.0.0.1:{args.port}'
+    else:
+        target = args.target
+
+    try:
+        with grpc.insecure_channel(target) as channel:
+            grpc.channel_ready_future(channel).result(SERVER_START_TIMEOUT)
+            stub = FaissServiceStub(channel)
+            result = drive(args, stub)
+    finally:
+        if process is not None:
+            process.terminate()
+            process.join()
+
+    return {
+        'config': vars(args),
+        'environment': {
+            'faiss': faiss.__version__,
+            'grpc': grpc.__version__,
+            'python': platform.python_version(),
+            'cpu_count': os.cpu_count(),
+        },
+        'result': result,
+    }
+
+
+def drive(args: argparse.Namespace, stub: FaissServiceStub) -> Dict[str, Any]:
+    requests = make_requests(
+        args.rpc, args.dim, args.ntotal, args.k, args.batch_size, args.columnar
+    )
+    method = {
+        'search': stub.Search,
+        'search_by_id': stub.SearchById,
+        'batch_search': stub.BatchSearch,
+    }[args.rpc]
+
+    if args.warmup > 0:
+        closed_loop(method, requests, args.concurrency, args.warmup)
+
+    cpu_before = server_cpu_seconds(stub)
+    if args.mode == 'open':
+        load = open_loop(method, requests, args.rate, args.duration)
+    else:
+        load = closed_loop(method, requests, args.concurrency, args.duration)
+    cpu_after = server_cpu_seconds(stub)
+
+    result: Dict[str, Any] = load.summary()
+    if cpu_before is not None and cpu_after is not None:
+        result['server_cpu_seconds'] = cpu_after - cpu_before
+        # 1.0 is one core fully used
+        result['server_cpu_utilization'] = (
+            cpu_after - cpu_before
+        ) / load.duration
+    return result
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description=(
+            'measure throughput and latency of faiss gRPC server, which is '
+            'started locally with a synthetic index unless --target is given'
+        )
+    )
+    parser.add_argument('--target', help='address of running server')
+    parser.add_argument('--index-type', choices=INDEX_TYPES, default='flat')
+    parser.add_argument('--dim', type=int, default=64)
+    parser.add_argument('--ntotal', type=int, default=100000)
+    parser.add_argument(
+        '--index-dir',
+        default=os.path.join('benchmarks', '.indexes'),
+        help='directory to cache synthetic indexes',
+    )
+    parser.add_argument('--port', type=int, default=50061)
+    parser.add_argument('--max-workers', type=int, default=10)
+    parser.add_argument('--nprobe', type=int, default=None)
+    parser.add_argument('--max-batch-size', type=int, default=None)
+    parser.add_argument('--search-threads', type=int, default=None)
+    parser.add_argument('--batch-search-threads', type=int, default=None)
+    parser.add_argument('--async', dest='use_async', action='store_true')
+
+    parser.add_argument('--rpc', choices=RPCS, default='search')
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument(
+        '--batch-size', type=int, default=16, help='queries of batch_search'
+    )
+    parser.add_argument('--columnar', action='store_true')
+    parser.add_argument('--mode', choices=('closed', 'open'), default='closed')
+    parser.add_argument(
+        '--concurrency', type=int, default=8, help='clients of closed loop'
+    )
+    parser.add_argument(
+        '--rate', type=float, default=1000, help='requests/s of open loop'
+    )
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--warmup', type=float, default=2)
+    parser.add_argument('--output', help='file to write result as json')
+    args = parser.parse_args(argv)
+    if args.concurrency < 1 or args.rate <= 0 or args.duration <= 0:
+        parser.error('concurrency, rate and duration must be positive')
+    return args
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    logging.basicConfig(level=logging.INFO)
+    args = parse_args(argv)
+    report = run(args)
+
+    logger.info(
+        'qps %.1f, p50 %.3f ms, p99 %.3f ms, errors %d',
+        report['result']['qps'],
+        report['result'].get('p50_ms', float('nan')),
+        report['result'].get('p99_ms', float('nan')),
+        report['result']['errors'],
+    )
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
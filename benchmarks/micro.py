@@ -0,0 +1,251 @@
+import argparse
+import functools
+import json
+import logging
+import os
+import platform
+import statistics
+import timeit
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import faiss
+import grpc
+import grpc_testing
+import numpy as np
+
+from benchmarks.indexes import INDEX_TYPES, cached_index_path, query_vectors
+from faiss_grpc.codec import encode_vector
+from faiss_grpc.faiss_server import FaissServiceConfig, FaissServiceServicer
+from faiss_grpc.proto import faiss_pb2
+from faiss_grpc.proto.faiss_pb2 import COLUMNAR, SearchRequest, Vector
+from faiss_grpc.results import to_search_response
+
+logger = logging.getLogger(__name__)
+
+RESPONSE_KS = (10, 100, 1000, 10000)
+SEARCH_K = 10
+BATCH_SIZES = (1, 16)
+DEFAULT_THRESHOLD = 0.2
+DEFAULT_REPEAT = 5
+
+
+@dataclass(frozen=True)
+class Case:
+    name: str
+    run: Callable[[], Any]
+
+
+def decode_cases(servicer: FaissServiceServicer, d: int) -> List[Case]:
+    cases = []
+    for batch_size in BATCH_SIZES:
+        queries = query_vectors(batch_size, d)
+        # vectors are parsed from bytes like gRPC does before servicer
+        for kind, vectors in [
+            ('val', [Vector(val=q) for q in queries]),
+            ('packed', [encode_vector(q) for q in queries]),
+        ]:
+            parsed = [
+                Vector.FromString(v.SerializeToString()) for v in vectors
+            ]
+            cases.append(
+                Case(
+                    f'decode/{kind}/batch={batch_size}',
+                    functools.partial(servicer.to_queries, parsed),
+                )
+            )
+        cases.append(
+            Case(
+                f'normalize/batch={batch_size}',
+                functools.partial(servicer.normalize, queries),
+            )
+        )
+    return cases
+
+
+def search_cases(
+    index_types: Sequence[str], index_dir: str, d: int, ntotal: int
+) -> List[Case]:
+    cases = []
+    for index_type in index_types:
+        index = faiss.read_index(
+            cached_index_path(index_dir, index_type, d, ntotal)
+        )
+        for batch_size in BATCH_SIZES:
+            queries = query_vectors(batch_size, d)
+            cases.append(
+                Case(
+                    f'search/{index_type}/batch={batch_size}',
+                    functools.partial(index.search, queries, SEARCH_K),
+                )
+            )
+    return cases
+
+
+def response_cases() -> List[Case]:
+    cases = []
+    for k in RESPONSE_KS:
+        distances = np.sort(
+            np.random.default_rng(k).random(k, dtype=np.float32)
+        )
+        ids = np.arange(k, dtype=np.int64)
+        for name, response_format in [
+            ('neighbors', 0),
+            ('columnar', COLUMNAR),
+        ]:
+            build = functools.partial(
+                to_search_response, distances, ids, response_format
+            )
+            cases.append(Case(f'response/{name}/k={k}', build))
+            cases.append(
+                Case(f'serialize/{name}/k={k}', build().SerializeToString)
+            )
+    return cases
+
+
+def rpc_cases(servicer: FaissServiceServicer, d: int) -> List[Case]:
+    # whole Search through grpc_testing, which calls servicer in process
+    # without network like tests of servicer
+    service = faiss_pb2.DESCRIPTOR.services_by_name['FaissService']
+    server = grpc_testing.server_from_dictionary(
+        {service: servicer}, grpc_testing.strict_real_time()
+    )
+    request = SearchRequest(
+        query=encode_vector(query_vectors(1, d)[0]), k=SEARCH_K
+    )
+
+    def search() -> None:
+        rpc = server.invoke_unary_unary(
+            service.methods_by_name['Search'], (), request, None
+        )
+        _, _, code, _ = rpc.termination()
+        assert code is grpc.StatusCode.OK
+
+    return [Case(f'rpc/Search/k={SEARCH_K}', search)]
+
+
+def build_cases(
+    index_types: Sequence[str], index_dir: str, d: int, ntotal: int
+) -> List[Case]:
+    index = faiss.read_index(cached_index_path(index_dir, 'flat', d, ntotal))
+    servicer = FaissServiceServicer(index, FaissServiceConfig())
+    return (
+        decode_cases(servicer, d)
+        + search_cases(index_types, index_dir, d, ntotal)
+        + response_cases()
+        + rpc_cases(servicer, d)
+    )
+
+
+def measure(run: Callable[[], Any], repeat: int) -> Dict[str, float]:
+    timer = timeit.Timer(run)
+    # number of calls is chosen so that a round takes at least 0.2 seconds
+    number, _ = timer.autorange()
+    rounds = [t / number for t in timer.repeat(repeat, number)]
+    return {
+        'median_us': statistics.median(rounds) * 1e6,
+        'min_us': min(rounds) * 1e6,
+        'number': number,
+    }
+
+
+def compare(
+    results: Dict[str, Dict[str, float]],
+    baseline: Dict[str, Dict[str, float]],
+    threshold: float,
+) -> List[str]:
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        before = baseline[name]['median_us']
+        after = result['median_us']
+        if after > before * (1 + threshold):
+            regressions.append(
+                f'{name}: {before:.2f} us -> {after:.2f} us '
+                f'({after / before:.2f}x)'
+            )
+    return regressions
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description=(
+            'measure stages of serving a search in process, and compare them '
+            'with a baseline'
+        )
+    )
+    parser.add_argument(
+        '--index-types', nargs='+', choices=INDEX_TYPES, default=INDEX_TYPES
+    )
+    parser.add_argument('--dim', type=int, default=64)
+    parser.add_argument('--ntotal', type=int, default=20000)
+    parser.add_argument(
+        '--index-dir', default=os.path.join('benchmarks', '.indexes')
+    )
+    parser.add_argument(
+        '--filter', default='', help='run cases whose name contains this'
+    )
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT)
+    parser.add_argument('--output', help='file to write results as json')
+    parser.add_argument(
+        '--save-baseline', help='file to write results as new baseline'
+    )
+    parser.add_argument(
+        '--compare', help='baseline file, exits with 1 on regression'
+    )
+    parser.add_argument(
+        '--threshold',
+        type=float,
+        default=DEFAULT_THRESHOLD,
+        help='allowed slowdown of median, 0.2 is 20%%',
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    args = parse_args(argv)
+
+    cases = build_cases(
+        args.index_types, args.index_dir, args.dim, args.ntotal
+    )
+    results = {}
+    for case in cases:
+        if args.filter not in case.name:
+            continue
+        results[case.name] = measure(case.run, args.repeat)
+        logger.info(
+            '%-32s %12.2f us', case.name, results[case.name]['median_us']
+        )
+
+    report = {
+        'config': vars(args),
+        'environment': {
+            'faiss': faiss.__version__,
+            'numpy': np.__version__,
+            'python': platform.python_version(),
+            'cpu_count': os.cpu_count(),
+        },
+        'results': results,
+    }
+    for path in filter(None, [args.output, args.save_baseline]):
+        with open(path, 'w') as f:
+            json.dump(report, f, indent=2)
+            f.write('\n')
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)['results']
+        regressions = compare(results, baseline, args.threshold)
+        for regression in regressions:
+            logger.error('regression %s', regression)
+        if regressions:
+            raise SystemExit(1)
+        logger.info(
+            'no stage regressed more than %.0f%%', args.threshold * 100
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -21,8 +21,15 @@ class GrpcClient:
     def stub(self) -> faiss_pb2_grpc.FaissServiceStub:
         return self._stub
 
+    @staticmethod
+    def to_vector(query: VectorLike) -> faiss_pb2.Vector:
+        # packing as little-endian float32 bytes lets server decode the query
+        # without copying
+        data = np.asarray(query, dtype='<f4').tobytes()
+        return faiss_pb2.Vector(data=data, dtype=faiss_pb2.FLOAT32)
+
     def search(self, query: VectorLike, k: int) -> None:
-        vec = faiss_pb2.Vector(val=query)
+        vec = self.to_vector(query)
         req = faiss_pb2.SearchRequest(query=vec, k=k)
         res = self.stub.Search(req)
 
@@ -37,6 +44,61 @@ class GrpcClient:
         for i, n in enumerate(res.neighbors):
             print(f'#{i}, id: {n.id}, score: {n.score}')
 
+    def search_by_ids(self, request_ids: List[int], k: int) -> None:
+        req = faiss_pb2.SearchByIdsRequest(ids=request_ids, k=k)
+        res = self.stub.SearchByIds(req)
+
+        for r in res.results:
+            print(f'requested id {r.request_id}')
+            if r.error:
+                print(f'error: {r.error}')
+            for i, n in enumerate(r.neighbors):
+                print(f'#{i}, id: {n.id}, score: {n.score}')
+
+    def batch_search(self, queries: List[VectorLike], k: int) -> None:
+        vecs = [self.to_vector(query) for query in queries]
+        req = faiss_pb2.BatchSearchRequest(queries=vecs, k=k)
+        res = self.stub.BatchSearch(req)
+
+        for q, r in enumerate(res.results):
+            print(f'query #{q}')
+            for i, n in enumerate(r.neighbors):
+                print(f'#{i}, id: {n.id}, score: {n.score}')
+
+    def range_search(
+        self, queries: List[VectorLike], radius: float, max_results: int
+    ) -> None:
+        vecs = [self.to_vector(query) for query in queries]
+        req = faiss_pb2.RangeSearchRequest(
+            queries=vecs, radius=radius, max_results=max_results
+        )
+        res = self.stub.RangeSearch(req)
+
+        for q, r in enumerate(res.results):
+            print(f'query #{q}')
+            for i, n in enumerate(r.neighbors):
+                print(f'#{i}, id: {n.id}, score: {n.score}')
+
+    def add(self, vectors: List[VectorLike]) -> None:
+        vecs = [self.to_vector(vector) for vector in vectors]
+        req = faiss_pb2.AddRequest(vectors=vecs)
+        res = self.stub.Add(req)
+
+        print(f'added ids {list(res.ids)}, ntotal {res.ntotal}')
+
+    def add_with_ids(self, vectors: List[VectorLike], ids: List[int]) -> None:
+        vecs = [self.to_vector(vector) for vector in vectors]
+        req = faiss_pb2.AddWithIdsRequest(vectors=vecs, ids=ids)
+        res = self.stub.AddWithIds(req)
+
+        print(f'added ids {list(res.ids)}, ntotal {res.ntotal}')
+
+    def remove(self, ids: List[int]) -> None:
+        req = faiss_pb2.RemoveRequest(ids=ids)
+        res = self.stub.Remove(req)
+
+        print(f'removed {res.removed} ids')
+
     def heatbeat(self) -> None:
         res = self.stub.Heatbeat(Empty())
         print(f'message {res.message}')
@@ -58,6 +120,40 @@ def search_by_id(args: Namespace) -> None:
     client.search_by_id(args.id, args.k)
 
 
+def search_by_ids(args: Namespace) -> None:
+    client = GrpcClient()
+    client.search_by_ids(args.ids, args.k)
+
+
+def batch_search(args: Namespace) -> None:
+    client = GrpcClient()
+    queries = list(np.eye(args.n, 300, dtype=np.float32))
+    client.batch_search(queries, args.k)
+
+
+def range_search(args: Namespace) -> None:
+    client = GrpcClient()
+    queries = list(np.eye(args.n, 300, dtype=np.float32))
+    client.range_search(queries, args.radius, args.max_results)
+
+
+def add(args: Namespace) -> None:
+    client = GrpcClient()
+    vectors = list(np.random.random((args.n, 300)).astype(np.float32))
+    client.add(vectors)
+
+
+def add_with_ids(args: Namespace) -> None:
+    client = GrpcClient()
+    vectors = list(np.random.random((len(args.ids), 300)).astype(np.float32))
+    client.add_with_ids(vectors, args.ids)
+
+
+def remove(args: Namespace) -> None:
+    client = GrpcClient()
+    client.remove(args.ids)
+
+
 def run() -> None:
     parser = argparse.ArgumentParser(description='gRPC client example')
     sub_parser = parser.add_subparsers(title='subcommands')
@@ -82,12 +178,80 @@ def run() -> None:
     parser_seach_by_id.add_argument('k', type=int)
     parser_seach_by_id.set_defaults(handler=search_by_id)
 
+    parser_search_by_ids = sub_parser.add_parser(
+        'search-by-ids',
+        description='search nearest neighbors of multiple ids in one request',
+    )
+    parser_search_by_ids.add_argument('k', type=int)
+    parser_search_by_ids.add_argument('ids', type=int, nargs='+')
+    parser_search_by_ids.set_defaults(handler=search_by_ids)
+
+    parser_batch_search = sub_parser.add_parser(
+        'batch-search',
+        description=(
+            'search nearest neighbors of multiple queries in one request. '
+            'in this example queries are prepared as unit vectors.'
+        ),
+    )
+    parser_batch_search.add_argument('n', type=int)
+    parser_batch_search.add_argument('k', type=int)
+    parser_batch_search.set_defaults(handler=batch_search)
+
+    parser_range_search = sub_parser.add_parser(
+        'range-search',
+        description=(
+            'search all neighbors within radius of multiple queries in one '
+            'request. in this example queries are prepared as unit vectors.'
+        ),
+    )
+    parser_range_search.add_argument('n', type=int)
+    parser_range_search.add_argument('radius', type=float)
+    parser_range_search.add_argument(
+        '--max-results', type=int, default=0, help='0 returns all neighbors'
+    )
+    parser_range_search.set_defaults(handler=range_search)
+
+    parser_add = sub_parser.add_parser(
+        'add',
+        description=(
+            'add vectors to index of server started with write-ahead log. '
+            'in this example vectors are prepared as random vectors.'
+        ),
+    )
+    parser_add.add_argument('n', type=int)
+    parser_add.set_defaults(handler=add)
+
+    parser_add_with_ids = sub_parser.add_parser(
+        'add-with-ids',
+        description=(
+            'add vectors with given ids to index of server started with '
+            'write-ahead log. in this example vectors are prepared as random '
+            'vectors.'
+        ),
+    )
+    parser_add_with_ids.add_argument('ids', type=int, nargs='+')
+    parser_add_with_ids.set_defaults(handler=add_with_ids)
+
+    parser_remove = sub_parser.add_parser(
+        'remove',
+        description=(
+            'remove vectors from index of server started with write-ahead '
+            'log.'
+        ),
+    )
+    parser_remove.add_argument('ids', type=int, nargs='+')
+    parser_remove.set_defaults(handler=remove)
+
     args = parser.parse_args()
 
     if hasattr(args, 'handler'):
         args.handler(args)
     else:
-        print('subcommand is required one of {heatbeat, search, search-by-id}')
+        print(
+            'subcommand is required one of '
+            '{heatbeat, search, search-by-id, search-by-ids, batch-search, '
+            'range-search, add, remove}'
+        )
 
 
 if __name__ == "__main__":
@@ -1,9 +1,10 @@
 # -*- coding: utf-8 -*-
 # Generated by the protocol buffer compiler.  DO NOT EDIT!
 # source: faiss.proto
-
+"""Generated protocol buffer code."""
+from google.protobuf.internal import enum_type_wrapper
 from google.protobuf import descriptor as _descriptor
-from google.protobuf import empty_pb2 as google_dot_protobuf_dot_empty__pb2
+from google.protobuf import descriptor_pool as _descriptor_pool
 from google.protobuf import message as _message
 from google.protobuf import reflection as _reflection
 from google.protobuf import symbol_database as _symbol_database
@@ -13,397 +14,55 @@ from google.protobuf import symbol_database as _symbol_database
 _sym_db = _symbol_database.Default()
 
 
-DESCRIPTOR = _descriptor.FileDescriptor(
-    name='faiss.proto',
-    package='faiss',
-    syntax='proto3',
-    serialized_options=None,
-    create_key=_descriptor._internal_create_key,
-    serialized_pb=b'\n\x0b\x66\x61iss.proto\x12\x05\x66\x61iss\x1a\x1bgoogle/protobuf/empty.proto\"%\n\x08Neighbor\x12\n\n\x02id\x18\x01 \x01(\x04\x12\r\n\x05score\x18\x02 \x01(\x02\"\x15\n\x06Vector\x12\x0b\n\x03val\x18\x01 \x03(\x02\"8\n\rSearchRequest\x12\x1c\n\x05query\x18\x01 \x01(\x0b\x32\r.faiss.Vector\x12\t\n\x01k\x18\x02 \x01(\x04\"4\n\x0eSearchResponse\x12\"\n\tneighbors\x18\x01 \x03(\x0b\x32\x0f.faiss.Neighbor\"*\n\x11SearchByIdRequest\x12\n\n\x02id\x18\x01 \x01(\x04\x12\t\n\x01k\x18\x02 \x01(\x04\"L\n\x12SearchByIdResponse\x12\x12\n\nrequest_id\x18\x01 \x01(\x04\x12\"\n\tneighbors\x18\x02 \x03(\x0b\x32\x0f.faiss.Neighbor\"#\n\x10HeatbeatResponse\x12\x0f\n\x07message\x18\x01 \x01(\t2\xc5\x01\n\x0c\x46\x61issService\x12;\n\x08Heatbeat\x12\x16.google.protobuf.Empty\x1a\x17.faiss.HeatbeatResponse\x12\x35\n\x06Search\x12\x14.faiss.SearchRequest\x1a\x15.faiss.SearchResponse\x12\x41\n\nSearchById\x12\x18.faiss.SearchByIdRequest\x1a\x19.faiss.SearchByIdResponseb\x06proto3',
-    dependencies=[google_dot_protobuf_dot_empty__pb2.DESCRIPTOR,],
-)
-
-
-_NEIGHBOR = _descriptor.Descriptor(
-    name='Neighbor',
-    full_name='faiss.Neighbor',
-    filename=None,
-    file=DESCRIPTOR,
-    containing_type=None,
-    create_key=_descriptor._internal_create_key,
-    fields=[
-        _descriptor.FieldDescriptor(
-            name='id',
-            full_name='faiss.Neighbor.id',
-            index=0,
-            number=1,
-            type=4,
-            cpp_type=4,
-            label=1,
-            has_default_value=False,
-            default_value=0,
-            message_type=None,
-            enum_type=None,
-            containing_type=None,
-            is_extension=False,
-            extension_scope=None,
-            serialized_options=None,
-            file=DESCRIPTOR,
-            create_key=_descriptor._internal_create_key,
-        ),
-        _descriptor.FieldDescriptor(
-            name='score',
-            full_name='faiss.Neighbor.score',
-            index=1,
-            number=2,
-            type=2,
-            cpp_type=6,
-            label=1,
-            has_default_value=False,
-            default_value=float(0),
-            message_type=None,
-            enum_type=None,
-            containing_type=None,
-            is_extension=False,
-            extension_scope=None,
-            serialized_options=None,
-            file=DESCRIPTOR,
-            create_key=_descriptor._internal_create_key,
-        ),
-    ],
-    extensions=[],
-    nested_types=[],
-    enum_types=[],
-    serialized_options=None,
-    is_extendable=False,
-    syntax='proto3',
-    extension_ranges=[],
-    oneofs=[],
-    serialized_start=51,
-    serialized_end=88,
-)
-
-
-_VECTOR = _descriptor.Descriptor(
-    name='Vector',
-    full_name='faiss.Vector',
-    filename=None,
-    file=DESCRIPTOR,
-    containing_type=None,
-    create_key=_descriptor._internal_create_key,
-    fields=[
-        _descriptor.FieldDescriptor(
-            name='val',
-            full_name='faiss.Vector.val',
-            index=0,
-            number=1,
-            type=2,
-            cpp_type=6,
-            label=3,
-            has_default_value=False,
-            default_value=[],
-            message_type=None,
-            enum_type=None,
-            containing_type=None,
-            is_extension=False,
-            extension_scope=None,
-            serialized_options=None,
-            file=DESCRIPTOR,
-            create_key=_descriptor._internal_create_key,
-        ),
-    ],
-    extensions=[],
-    nested_types=[],
-    enum_types=[],
-    serialized_options=None,
-    is_extendable=False,
-    syntax='proto3',
-    extension_ranges=[],
-    oneofs=[],
-    serialized_start=90,
-    serialized_end=111,
-)
-
-
-_SEARCHREQUEST = _descriptor.Descriptor(
-    name='SearchRequest',
-    full_name='faiss.SearchRequest',
-    filename=None,
-    file=DESCRIPTOR,
-    containing_type=None,
-    create_key=_descriptor._internal_create_key,
-    fields=[
-        _descriptor.FieldDescriptor(
-            name='query',
-            full_name='faiss.SearchRequest.query',
-            index=0,
-            number=1,
-            type=11,
-            cpp_type=10,
-            label=1,
-            has_default_value=False,
-            default_value=None,
-            message_type=None,
-            enum_type=None,
-            containing_type=None,
-            is_extension=False,
-            extension_scope=None,
-            serialized_options=None,
-            file=DESCRIPTOR,
-            create_key=_descriptor._internal_create_key,
-        ),
-        _descriptor.FieldDescriptor(
-            name='k',
-            full_name='faiss.SearchRequest.k',
-            index=1,
-            number=2,
-            type=4,
-            cpp_type=4,
-            label=1,
-            has_default_value=False,
-            default_value=0,
-            message_type=None,
-            enum_type=None,
-            containing_type=None,
-            is_extension=False,
-            extension_scope=None,
-            serialized_options=None,
-            file=DESCRIPTOR,
-            create_key=_descriptor._internal_create_key,
-        ),
-    ],
-    extensions=[],
-    nested_types=[],
-    enum_types=[],
-    serialized_options=None,
-    is_extendable=False,
-    syntax='proto3',
-    extension_ranges=[],
-    oneofs=[],
-    serialized_start=113,
-    serialized_end=169,
-)
-
-
-_SEARCHRESPONSE = _descriptor.Descriptor(
-    name='SearchResponse',
-    full_name='faiss.SearchResponse',
-    filename=None,
-    file=DESCRIPTOR,
-    containing_type=None,
-    create_key=_descriptor._internal_create_key,
-    fields=[
-        _descriptor.FieldDescriptor(
-            name='neighbors',
-            full_name='faiss.SearchResponse.neighbors',
-            index=0,
-            number=1,
-            type=11,
-            cpp_type=10,
-            label=3,
-            has_default_value=False,
-            default_value=[],
-            message_type=None,
-            enum_type=None,
-            containing_type=None,
-            is_extension=False,
-            extension_scope=None,
-            serialized_options=None,
-            file=DESCRIPTOR,
-            create_key=_descriptor._internal_create_key,
-        ),
-    ],
-    extensions=[],
-    nested_types=[],
-    enum_types=[],
-    serialized_options=None,
-    is_extendable=False,
-    syntax='proto3',
-    extension_ranges=[],
-    oneofs=[],
-    serialized_start=171,
-    serialized_end=223,
-)
-
-
-_SEARCHBYIDREQUEST = _descriptor.Descriptor(
-    name='SearchByIdRequest',
-    full_name='faiss.SearchByIdRequest',
-    filename=None,
-    file=DESCRIPTOR,
-    containing_type=None,
-    create_key=_descriptor._internal_create_key,
-    fields=[
-        _descriptor.FieldDescriptor(
-            name='id',
-            full_name='faiss.SearchByIdRequest.id',
-            index=0,
-            number=1,
-            type=4,
-            cpp_type=4,
-            label=1,
-            has_default_value=False,
-            default_value=0,
-            message_type=None,
-            enum_type=None,
-            containing_type=None,
-            is_extension=False,
-            extension_scope=None,
-            serialized_options=None,
-            file=DESCRIPTOR,
-            create_key=_descriptor._internal_create_key,
-        ),
-        _descriptor.FieldDescriptor(
-            name='k',
-            full_name='faiss.SearchByIdRequest.k',
-            index=1,
-            number=2,
-            type=4,
-            cpp_type=4,
-            label=1,
-            has_default_value=False,
-            default_value=0,
-            message_type=None,
-            enum_type=None,
-            containing_type=None,
-            is_extension=False,
-            extension_scope=None,
-            serialized_options=None,
-            file=DESCRIPTOR,
-            create_key=_descriptor._internal_create_key,
-        ),
-    ],
-    extensions=[],
-    nested_types=[],
-    enum_types=[],
-    serialized_options=None,
-    is_extendable=False,
-    syntax='proto3',
-    extension_ranges=[],
-    oneofs=[],
-    serialized_start=225,
-    serialized_end=267,
-)
+from google.protobuf import empty_pb2 as google_dot_protobuf_dot_empty__pb2
 
 
-_SEARCHBYIDRESPONSE = _descriptor.Descriptor(
-    name='SearchByIdResponse',
-    full_name='faiss.SearchByIdResponse',
-    filename=None,
-    file=DESCRIPTOR,
-    containing_type=None,
-    create_key=_descriptor._internal_create_key,
-    fields=[
-        _descriptor.FieldDescriptor(
-            name='request_id',
-            full_name='faiss.SearchByIdResponse.request_id',
-            index=0,
-            number=1,
-            type=4,
-            cpp_type=4,
-            label=1,
-            has_default_value=False,
-            default_value=0,
-            message_type=None,
-            enum_type=None,
-            containing_type=None,
-            is_extension=False,
-            extension_scope=None,
-            serialized_options=None,
-            file=DESCRIPTOR,
-            create_key=_descriptor._internal_create_key,
-        ),
-        _descriptor.FieldDescriptor(
-            name='neighbors',
-            full_name='faiss.SearchByIdResponse.neighbors',
-            index=1,
-            number=2,
-            type=11,
-            cpp_type=10,
-            label=3,
-            has_default_value=False,
-            default_value=[],
-            message_type=None,
-            enum_type=None,
-            containing_type=None,
-            is_extension=False,
-            extension_scope=None,
-            serialized_options=None,
-            file=DESCRIPTOR,
-            create_key=_descriptor._internal_create_key,
-        ),
-    ],
-    extensions=[],
-    nested_types=[],
-    enum_types=[],
-    serialized_options=None,
-    is_extendable=False,
-    syntax='proto3',
-    extension_ranges=[],
-    oneofs=[],
-    serialized_start=269,
-    serialized_end=345,
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(
+    b'\n\x0b\x66\x61iss.proto\x12\x05\x66\x61iss\x1a\x1bgoogle/protobuf/empty.proto\"%\n\x08Neighbor\x12\n\n\x02id\x18\x01 \x01(\x04\x12\r\n\x05score\x18\x02 \x01(\x02\"@\n\x06Vector\x12\x0b\n\x03val\x18\x01 \x03(\x02\x12\x0c\n\x04\x64\x61ta\x18\x02 \x01(\x0c\x12\x1b\n\x05\x64type\x18\x03 \x01(\x0e\x32\x0c.faiss.DType\"I\n\x10SearchParameters\x12\x0e\n\x06nprobe\x18\x01 \x01(\x04\x12\x11\n\tef_search\x18\x02 \x01(\x04\x12\x12\n\nparameters\x18\x03 \x01(\t\"\xa0\x01\n\rSearchRequest\x12\x1c\n\x05query\x18\x01 \x01(\x0b\x32\r.faiss.Vector\x12\t\n\x01k\x18\x02 \x01(\x04\x12.\n\x0fresponse_format\x18\x03 \x01(\x0e\x32\x15.faiss.ResponseFormat\x12\'\n\x06params\x18\x04 \x01(\x0b\x32\x17.faiss.SearchParameters\x12\r\n\x05index\x18\x05 \x01(\t\"Q\n\x0eSearchResponse\x12\"\n\tneighbors\x18\x01 \x03(\x0b\x32\x0f.faiss.Neighbor\x12\x0b\n\x03ids\x18\x02 \x03(\x03\x12\x0e\n\x06scores\x18\x03 \x03(\x02\"\xa9\x01\n\x11SearchByIdRequest\x12\n\n\x02id\x18\x01 \x01(\x04\x12\t\n\x01k\x18\x02 \x01(\x04\x12.\n\x0fresponse_format\x18\x03 \x01(\x0e\x32\x15.faiss.ResponseFormat\x12\'\n\x06params\x18\x04 \x01(\x0b\x32\x17.faiss.SearchParameters\x12\r\n\x05index\x18\x05 \x01(\t\x12\x15\n\rinclude_query\x18\x06 \x01(\x08\"\x96\x01\n\x12SearchByIdResponse\x12\x12\n\nrequest_id\x18\x01 \x01(\x04\x12\"\n\tneighbors\x18\x02 \x03(\x0b\x32\x0f.faiss.Neighbor\x12\x0b\n\x03ids\x18\x03 \x03(\x03\x12\x0e\n\x06scores\x18\x04 \x03(\x02\x12\r\n\x05\x65rror\x18\x05 \x01(\t\x12\x1c\n\x05query\x18\x06 \x01(\x0b\x32\r.faiss.Vector\"\xab\x01\n\x12SearchByIdsRequest\x12\x0b\n\x03ids\x18\x01 \x03(\x04\x12\t\n\x01k\x18\x02 \x01(\x04\x12.\n\x0fresponse_format\x18\x03 \x01(\x0e\x32\x15.faiss.ResponseFormat\x12\'\n\x06params\x18\x04 \x01(\x0b\x32\x17.faiss.SearchParameters\x12\r\n\x05index\x18\x05 \x01(\t\x12\x15\n\rinclude_query\x18\x06 \x01(\x08\"A\n\x13SearchByIdsResponse\x12*\n\x07results\x18\x01 \x03(\x0b\x32\x19.faiss.SearchByIdResponse\"\xa7\x01\n\x12\x42\x61tchSearchRequest\x12\x1e\n\x07queries\x18\x01 \x03(\x0b\x32\r.faiss.Vector\x12\t\n\x01k\x18\x02 \x01(\x04\x12.\n\x0fresponse_format\x18\x03 \x01(\x0e\x32\x15.faiss.ResponseFormat\x12\'\n\x06params\x18\x04 \x01(\x0b\x32\x17.faiss.SearchParameters\x12\r\n\x05index\x18\x05 \x01(\t\"=\n\x13\x42\x61tchSearchResponse\x12&\n\x07results\x18\x01 \x03(\x0b\x32\x15.faiss.SearchResponse\"\xc1\x01\n\x12RangeSearchRequest\x12\x1e\n\x07queries\x18\x01 \x03(\x0b\x32\r.faiss.Vector\x12\x0e\n\x06radius\x18\x02 \x01(\x02\x12\x13\n\x0bmax_results\x18\x03 \x01(\x04\x12.\n\x0fresponse_format\x18\x04 \x01(\x0e\x32\x15.faiss.ResponseFormat\x12\'\n\x06params\x18\x05 \x01(\x0b\x32\x17.faiss.SearchParameters\x12\r\n\x05index\x18\x06 \x01(\t\"=\n\x13RangeSearchResponse\x12&\n\x07results\x18\x01 \x03(\x0b\x32\x15.faiss.SearchResponse\"Q\n\x13SearchStreamRequest\x12\x13\n\x0bsequence_id\x18\x01 \x01(\x04\x12%\n\x07request\x18\x02 \x01(\x0b\x32\x14.faiss.SearchRequest\"c\n\x14SearchStreamResponse\x12\x13\n\x0bsequence_id\x18\x01 \x01(\x04\x12\'\n\x08response\x18\x02 \x01(\x0b\x32\x15.faiss.SearchResponse\x12\r\n\x05\x65rror\x18\x03 \x01(\t\",\n\nAddRequest\x12\x1e\n\x07vectors\x18\x01 \x03(\x0b\x32\r.faiss.Vector\"@\n\x11\x41\x64\x64WithIdsRequest\x12\x1e\n\x07vectors\x18\x01 \x03(\x0b\x32\r.faiss.Vector\x12\x0b\n\x03ids\x18\x02 \x03(\x04\"*\n\x0b\x41\x64\x64Response\x12\x0b\n\x03ids\x18\x01 \x03(\x04\x12\x0e\n\x06ntotal\x18\x02 \x01(\x04\"\x1c\n\rRemoveRequest\x12\x0b\n\x03ids\x18\x01 \x03(\x04\"!\n\x0eRemoveResponse\x12\x0f\n\x07removed\x18\x01 \x01(\x04\" \n\x0eReloadResponse\x12\x0e\n\x06ntotal\x18\x01 \x01(\x04\"p\n\rStatsResponse\x12\x30\n\x06values\x18\x01 \x03(\x0b\x32 .faiss.StatsResponse.ValuesEntry\x1a-\n\x0bValuesEntry\x12\x0b\n\x03key\x18\x01 \x01(\t\x12\r\n\x05value\x18\x02 \x01(\x01:\x02\x38\x01\"#\n\x10HeatbeatResponse\x12\x0f\n\x07message\x18\x01 \x01(\t*!\n\x05\x44Type\x12\x0b\n\x07\x46LOAT32\x10\x00\x12\x0b\n\x07\x46LOAT16\x10\x01*-\n\x0eResponseFormat\x12\r\n\tNEIGHBORS\x10\x00\x12\x0c\n\x08\x43OLUMNAR\x10\x01\x32\xf5\x05\n\x0c\x46\x61issService\x12;\n\x08Heatbeat\x12\x16.google.protobuf.Empty\x1a\x17.faiss.HeatbeatResponse\x12\x35\n\x06Search\x12\x14.faiss.SearchRequest\x1a\x15.faiss.SearchResponse\x12\x41\n\nSearchById\x12\x18.faiss.SearchByIdRequest\x1a\x19.faiss.SearchByIdResponse\x12\x44\n\x0bSearchByIds\x12\x19.faiss.SearchByIdsRequest\x1a\x1a.faiss.SearchByIdsResponse\x12\x44\n\x0b\x42\x61tchSearch\x12\x19.faiss.BatchSearchRequest\x1a\x1a.faiss.BatchSearchResponse\x12\x44\n\x0bRangeSearch\x12\x19.faiss.RangeSearchRequest\x1a\x1a.faiss.RangeSearchResponse\x12K\n\x0cSearchStream\x12\x1a.faiss.SearchStreamRequest\x1a\x1b.faiss.SearchStreamResponse(\x01\x30\x01\x12,\n\x03\x41\x64\x64\x12\x11.faiss.AddRequest\x1a\x12.faiss.AddResponse\x12:\n\nAddWithIds\x12\x18.faiss.AddWithIdsRequest\x1a\x12.faiss.AddResponse\x12\x35\n\x06Remove\x12\x14.faiss.RemoveRequest\x1a\x15.faiss.RemoveResponse\x12\x37\n\x06Reload\x12\x16.google.protobuf.Empty\x1a\x15.faiss.ReloadResponse\x12\x35\n\x05Stats\x12\x16.google.protobuf.Empty\x1a\x14.faiss.StatsResponseb\x06proto3'
 )
 
+_DTYPE = DESCRIPTOR.enum_types_by_name['DType']
+DType = enum_type_wrapper.EnumTypeWrapper(_DTYPE)
+_RESPONSEFORMAT = DESCRIPTOR.enum_types_by_name['ResponseFormat']
+ResponseFormat = enum_type_wrapper.EnumTypeWrapper(_RESPONSEFORMAT)
+FLOAT32 = 0
+FLOAT16 = 1
+NEIGHBORS = 0
+COLUMNAR = 1
 
-_HEATBEATRESPONSE = _descriptor.Descriptor(
-    name='HeatbeatResponse',
-    full_name='faiss.HeatbeatResponse',
-    filename=None,
-    file=DESCRIPTOR,
-    containing_type=None,
-    create_key=_descriptor._internal_create_key,
-    fields=[
-        _descriptor.FieldDescriptor(
-            name='message',
-            full_name='faiss.HeatbeatResponse.message',
-            index=0,
-            number=1,
-            type=9,
-            cpp_type=9,
-            label=1,
-            has_default_value=False,
-            default_value=b"".decode('utf-8'),
-            message_type=None,
-            enum_type=None,
-            containing_type=None,
-            is_extension=False,
-            extension_scope=None,
-            serialized_options=None,
-            file=DESCRIPTOR,
-            create_key=_descriptor._internal_create_key,
-        ),
-    ],
-    extensions=[],
-    nested_types=[],
-    enum_types=[],
-    serialized_options=None,
-    is_extendable=False,
-    syntax='proto3',
-    extension_ranges=[],
-    oneofs=[],
-    serialized_start=347,
-    serialized_end=382,
-)
-
-_SEARCHREQUEST.fields_by_name['query'].message_type = _VECTOR
-_SEARCHRESPONSE.fields_by_name['neighbors'].message_type = _NEIGHBOR
-_SEARCHBYIDRESPONSE.fields_by_name['neighbors'].message_type = _NEIGHBOR
-DESCRIPTOR.message_types_by_name['Neighbor'] = _NEIGHBOR
-DESCRIPTOR.message_types_by_name['Vector'] = _VECTOR
-DESCRIPTOR.message_types_by_name['SearchRequest'] = _SEARCHREQUEST
-DESCRIPTOR.message_types_by_name['SearchResponse'] = _SEARCHRESPONSE
-DESCRIPTOR.message_types_by_name['SearchByIdRequest'] = _SEARCHBYIDREQUEST
-DESCRIPTOR.message_types_by_name['SearchByIdResponse'] = _SEARCHBYIDRESPONSE
-DESCRIPTOR.message_types_by_name['HeatbeatResponse'] = _HEATBEATRESPONSE
-_sym_db.RegisterFileDescriptor(DESCRIPTOR)
 
+_NEIGHBOR = DESCRIPTOR.message_types_by_name['Neighbor']
+_VECTOR = DESCRIPTOR.message_types_by_name['Vector']
+_SEARCHPARAMETERS = DESCRIPTOR.message_types_by_name['SearchParameters']
+_SEARCHREQUEST = DESCRIPTOR.message_types_by_name['SearchRequest']
+_SEARCHRESPONSE = DESCRIPTOR.message_types_by_name['SearchResponse']
+_SEARCHBYIDREQUEST = DESCRIPTOR.message_types_by_name['SearchByIdRequest']
+_SEARCHBYIDRESPONSE = DESCRIPTOR.message_types_by_name['SearchByIdResponse']
+_SEARCHBYIDSREQUEST = DESCRIPTOR.message_types_by_name['SearchByIdsRequest']
+_SEARCHBYIDSRESPONSE = DESCRIPTOR.message_types_by_name['SearchByIdsResponse']
+_BATCHSEARCHREQUEST = DESCRIPTOR.message_types_by_name['BatchSearchRequest']
+_BATCHSEARCHRESPONSE = DESCRIPTOR.message_types_by_name['BatchSearchResponse']
+_RANGESEARCHREQUEST = DESCRIPTOR.message_types_by_name['RangeSearchRequest']
+_RANGESEARCHRESPONSE = DESCRIPTOR.message_types_by_name['RangeSearchResponse']
+_SEARCHSTREAMREQUEST = DESCRIPTOR.message_types_by_name['SearchStreamRequest']
+_SEARCHSTREAMRESPONSE = DESCRIPTOR.message_types_by_name[
+    'SearchStreamResponse'
+]
+_ADDREQUEST = DESCRIPTOR.message_types_by_name['AddRequest']
+_ADDWITHIDSREQUEST = DESCRIPTOR.message_types_by_name['AddWithIdsRequest']
+_ADDRESPONSE = DESCRIPTOR.message_types_by_name['AddResponse']
+_REMOVEREQUEST = DESCRIPTOR.message_types_by_name['RemoveRequest']
+_REMOVERESPONSE = DESCRIPTOR.message_types_by_name['RemoveResponse']
+_RELOADRESPONSE = DESCRIPTOR.message_types_by_name['ReloadResponse']
+_STATSRESPONSE = DESCRIPTOR.message_types_by_name['StatsResponse']
+_STATSRESPONSE_VALUESENTRY = _STATSRESPONSE.nested_types_by_name['ValuesEntry']
+_HEATBEATRESPONSE = DESCRIPTOR.message_types_by_name['HeatbeatResponse']
 Neighbor = _reflection.GeneratedProtocolMessageType(
     'Neighbor',
     (_message.Message,),
     {
         'DESCRIPTOR': _NEIGHBOR,
-        '__module__': 'faiss_pb2'
+        '__module__': 'faiss_pb2',
         # @@protoc_insertion_point(class_scope:faiss.Neighbor)
     },
 )
@@ -414,18 +73,29 @@ Vector = _reflection.GeneratedProtocolMessageType(
     (_message.Message,),
     {
         'DESCRIPTOR': _VECTOR,
-        '__module__': 'faiss_pb2'
+        '__module__': 'faiss_pb2',
         # @@protoc_insertion_point(class_scope:faiss.Vector)
     },
 )
 _sym_db.RegisterMessage(Vector)
 
+SearchParameters = _reflection.GeneratedProtocolMessageType(
+    'SearchParameters',
+    (_message.Message,),
+    {
+        'DESCRIPTOR': _SEARCHPARAMETERS,
+        '__module__': 'faiss_pb2',
+        # @@protoc_insertion_point(class_scope:faiss.SearchParameters)
+    },
+)
+_sym_db.RegisterMessage(SearchParameters)
+
 SearchRequest = _reflection.GeneratedProtocolMessageType(
     'SearchRequest',
     (_message.Message,),
     {
         'DESCRIPTOR': _SEARCHREQUEST,
-        '__module__': 'faiss_pb2'
+        '__module__': 'faiss_pb2',
         # @@protoc_insertion_point(class_scope:faiss.SearchRequest)
     },
 )
@@ -436,7 +106,7 @@ SearchResponse = _reflection.GeneratedProtocolMessageType(
     (_message.Message,),
     {
         'DESCRIPTOR': _SEARCHRESPONSE,
-        '__module__': 'faiss_pb2'
+        '__module__': 'faiss_pb2',
         # @@protoc_insertion_point(class_scope:faiss.SearchResponse)
     },
 )
@@ -447,7 +117,7 @@ SearchByIdRequest = _reflection.GeneratedProtocolMessageType(
     (_message.Message,),
     {
         'DESCRIPTOR': _SEARCHBYIDREQUEST,
-        '__module__': 'faiss_pb2'
+        '__module__': 'faiss_pb2',
         # @@protoc_insertion_point(class_scope:faiss.SearchByIdRequest)
     },
 )
@@ -458,68 +128,256 @@ SearchByIdResponse = _reflection.GeneratedProtocolMessageType(
     (_message.Message,),
     {
         'DESCRIPTOR': _SEARCHBYIDRESPONSE,
-        '__module__': 'faiss_pb2'
+        '__module__': 'faiss_pb2',
         # @@protoc_insertion_point(class_scope:faiss.SearchByIdResponse)
     },
 )
 _sym_db.RegisterMessage(SearchByIdResponse)
 
+SearchByIdsRequest = _reflection.GeneratedProtocolMessageType(
+    'SearchByIdsRequest',
+    (_message.Message,),
+    {
+        'DESCRIPTOR': _SEARCHBYIDSREQUEST,
+        '__module__': 'faiss_pb2',
+        # @@protoc_insertion_point(class_scope:faiss.SearchByIdsRequest)
+    },
+)
+_sym_db.RegisterMessage(SearchByIdsRequest)
+
+SearchByIdsResponse = _reflection.GeneratedProtocolMessageType(
+    'SearchByIdsResponse',
+    (_message.Message,),
+    {
+        'DESCRIPTOR': _SEARCHBYIDSRESPONSE,
+        '__module__': 'faiss_pb2',
+        # @@protoc_insertion_point(class_scope:faiss.SearchByIdsResponse)
+    },
+)
+_sym_db.RegisterMessage(SearchByIdsResponse)
+
+BatchSearchRequest = _reflection.GeneratedProtocolMessageType(
+    'BatchSearchRequest',
+    (_message.Message,),
+    {
+        'DESCRIPTOR': _BATCHSEARCHREQUEST,
+        '__module__': 'faiss_pb2',
+        # @@protoc_insertion_point(class_scope:faiss.BatchSearchRequest)
+    },
+)
+_sym_db.RegisterMessage(BatchSearchRequest)
+
+BatchSearchResponse = _reflection.GeneratedProtocolMessageType(
+    'BatchSearchResponse',
+    (_message.Message,),
+    {
+        'DESCRIPTOR': _BATCHSEARCHRESPONSE,
+        '__module__': 'faiss_pb2',
+        # @@protoc_insertion_point(class_scope:faiss.BatchSearchResponse)
+    },
+)
+_sym_db.RegisterMessage(BatchSearchResponse)
+
+RangeSearchRequest = _reflection.GeneratedProtocolMessageType(
+    'RangeSearchRequest',
+    (_message.Message,),
+    {
+        'DESCRIPTOR': _RANGESEARCHREQUEST,
+        '__module__': 'faiss_pb2',
+        # @@protoc_insertion_point(class_scope:faiss.RangeSearchRequest)
+    },
+)
+_sym_db.RegisterMessage(RangeSearchRequest)
+
+RangeSearchResponse = _reflection.GeneratedProtocolMessageType(
+    'RangeSearchResponse',
+    (_message.Message,),
+    {
+        'DESCRIPTOR': _RANGESEARCHRESPONSE,
+        '__module__': 'faiss_pb2',
+        # @@protoc_insertion_point(class_scope:faiss.RangeSearchResponse)
+    },
+)
+_sym_db.RegisterMessage(RangeSearchResponse)
+
+SearchStreamRequest = _reflection.GeneratedProtocolMessageType(
+    'SearchStreamRequest',
+    (_message.Message,),
+    {
+        'DESCRIPTOR': _SEARCHSTREAMREQUEST,
+        '__module__': 'faiss_pb2',
+        # @@protoc_insertion_point(class_scope:faiss.SearchStreamRequest)
+    },
+)
+_sym_db.RegisterMessage(SearchStreamRequest)
+
+SearchStreamResponse = _reflection.GeneratedProtocolMessageType(
+    'SearchStreamResponse',
+    (_message.Message,),
+    {
+        'DESCRIPTOR': _SEARCHSTREAMRESPONSE,
+        '__module__': 'faiss_pb2',
+        # @@protoc_insertion_point(class_scope:faiss.SearchStreamResponse)
+    },
+)
+_sym_db.RegisterMessage(SearchStreamResponse)
+
+AddRequest = _reflection.GeneratedProtocolMessageType(
+    'AddRequest',
+    (_message.Message,),
+    {
+        'DESCRIPTOR': _ADDREQUEST,
+        '__module__': 'faiss_pb2',
+        # @@protoc_insertion_point(class_scope:faiss.AddRequest)
+    },
+)
+_sym_db.RegisterMessage(AddRequest)
+
+AddWithIdsRequest = _reflection.GeneratedProtocolMessageType(
+    'AddWithIdsRequest',
+    (_message.Message,),
+    {
+        'DESCRIPTOR': _ADDWITHIDSREQUEST,
+        '__module__': 'faiss_pb2',
+        # @@protoc_insertion_point(class_scope:faiss.AddWithIdsRequest)
+    },
+)
+_sym_db.RegisterMessage(AddWithIdsRequest)
+
+AddResponse = _reflection.GeneratedProtocolMessageType(
+    'AddResponse',
+    (_message.Message,),
+    {
+        'DESCRIPTOR': _ADDRESPONSE,
+        '__module__': 'faiss_pb2',
+        # @@protoc_insertion_point(class_scope:faiss.AddResponse)
+    },
+)
+_sym_db.RegisterMessage(AddResponse)
+
+RemoveRequest = _reflection.GeneratedProtocolMessageType(
+    'RemoveRequest',
+    (_message.Message,),
+    {
+        'DESCRIPTOR': _REMOVEREQUEST,
+        '__module__': 'faiss_pb2',
+        # @@protoc_insertion_point(class_scope:faiss.RemoveRequest)
+    },
+)
+_sym_db.RegisterMessage(RemoveRequest)
+
+RemoveResponse = _reflection.GeneratedProtocolMessageType(
+    'RemoveResponse',
+    (_message.Message,),
+    {
+        'DESCRIPTOR': _REMOVERESPONSE,
+        '__module__': 'faiss_pb2',
+        # @@protoc_insertion_point(class_scope:faiss.RemoveResponse)
+    },
+)
+_sym_db.RegisterMessage(RemoveResponse)
+
+ReloadResponse = _reflection.GeneratedProtocolMessageType(
+    'ReloadResponse',
+    (_message.Message,),
+    {
+        'DESCRIPTOR': _RELOADRESPONSE,
+        '__module__': 'faiss_pb2',
+        # @@protoc_insertion_point(class_scope:faiss.ReloadResponse)
+    },
+)
+_sym_db.RegisterMessage(ReloadResponse)
+
+StatsResponse = _reflection.GeneratedProtocolMessageType(
+    'StatsResponse',
+    (_message.Message,),
+    {
+        'ValuesEntry': _reflection.GeneratedProtocolMessageType(
+            'ValuesEntry',
+            (_message.Message,),
+            {
+                'DESCRIPTOR': _STATSRESPONSE_VALUESENTRY,
+                '__module__': 'faiss_pb2',
+                # @@protoc_insertion_point(class_scope:faiss.StatsResponse.ValuesEntry)
+            },
+        ),
+        'DESCRIPTOR': _STATSRESPONSE,
+        '__module__': 'faiss_pb2',
+        # @@protoc_insertion_point(class_scope:faiss.StatsResponse)
+    },
+)
+_sym_db.RegisterMessage(StatsResponse)
+_sym_db.RegisterMessage(StatsResponse.ValuesEntry)
+
 HeatbeatResponse = _reflection.GeneratedProtocolMessageType(
     'HeatbeatResponse',
     (_message.Message,),
     {
         'DESCRIPTOR': _HEATBEATRESPONSE,
-        '__module__': 'faiss_pb2'
+        '__module__': 'faiss_pb2',
         # @@protoc_insertion_point(class_scope:faiss.HeatbeatResponse)
     },
 )
 _sym_db.RegisterMessage(HeatbeatResponse)
 
+_FAISSSERVICE = DESCRIPTOR.services_by_name['FaissService']
+if _descriptor._USE_C_DESCRIPTORS == False:
 
-_FAISSSERVICE = _descriptor.ServiceDescriptor(
-    name='FaissService',
-    full_name='faiss.FaissService',
-    file=DESCRIPTOR,
-    index=0,
-    serialized_options=None,
-    create_key=_descriptor._internal_create_key,
-    serialized_start=385,
-    serialized_end=582,
-    methods=[
-        _descriptor.MethodDescriptor(
-            name='Heatbeat',
-            full_name='faiss.FaissService.Heatbeat',
-            index=0,
-            containing_service=None,
-            input_type=google_dot_protobuf_dot_empty__pb2._EMPTY,
-            output_type=_HEATBEATRESPONSE,
-            serialized_options=None,
-            create_key=_descriptor._internal_create_key,
-        ),
-        _descriptor.MethodDescriptor(
-            name='Search',
-            full_name='faiss.FaissService.Search',
-            index=1,
-            containing_service=None,
-            input_type=_SEARCHREQUEST,
-            output_type=_SEARCHRESPONSE,
-            serialized_options=None,
-            create_key=_descriptor._internal_create_key,
-        ),
-        _descriptor.MethodDescriptor(
-            name='SearchById',
-            full_name='faiss.FaissService.SearchById',
-            index=2,
-            containing_service=None,
-            input_type=_SEARCHBYIDREQUEST,
-            output_type=_SEARCHBYIDRESPONSE,
-            serialized_options=None,
-            create_key=_descriptor._internal_create_key,
-        ),
-    ],
-)
-_sym_db.RegisterServiceDescriptor(_FAISSSERVICE)
-
-DESCRIPTOR.services_by_name['FaissService'] = _FAISSSERVICE
-
+    DESCRIPTOR._options = None
+    _STATSRESPONSE_VALUESENTRY._options = None
+    _STATSRESPONSE_VALUESENTRY._serialized_options = b'8\001'
+    _DTYPE._serialized_start = 2125
+    _DTYPE._serialized_end = 2158
+    _RESPONSEFORMAT._serialized_start = 2160
+    _RESPONSEFORMAT._serialized_end = 2205
+    _NEIGHBOR._serialized_start = 51
+    _NEIGHBOR._serialized_end = 88
+    _VECTOR._serialized_start = 90
+    _VECTOR._serialized_end = 154
+    _SEARCHPARAMETERS._serialized_start = 156
+    _SEARCHPARAMETERS._serialized_end = 229
+    _SEARCHREQUEST._serialized_start = 232
+    _SEARCHREQUEST._serialized_end = 392
+    _SEARCHRESPONSE._serialized_start = 394
+    _SEARCHRESPONSE._serialized_end = 475
+    _SEARCHBYIDREQUEST._serialized_start = 478
+    _SEARCHBYIDREQUEST._serialized_end = 647
+    _SEARCHBYIDRESPONSE._serialized_start = 650
+    _SEARCHBYIDRESPONSE._serialized_end = 800
+    _SEARCHBYIDSREQUEST._serialized_start = 803
+    _SEARCHBYIDSREQUEST._serialized_end = 974
+    _SEARCHBYIDSRESPONSE._serialized_start = 976
+    _SEARCHBYIDSRESPONSE._serialized_end = 1041
+    _BATCHSEARCHREQUEST._serialized_start = 1044
+    _BATCHSEARCHREQUEST._serialized_end = 1211
+    _BATCHSEARCHRESPONSE._serialized_start = 1213
+    _BATCHSEARCHRESPONSE._serialized_end = 1274
+    _RANGESEARCHREQUEST._serialized_start = 1277
+    _RANGESEARCHREQUEST._serialized_end = 1470
+    _RANGESEARCHRESPONSE._serialized_start = 1472
+    _RANGESEARCHRESPONSE._serialized_end = 1533
+    _SEARCHSTREAMREQUEST._serialized_start = 1535
+    _SEARCHSTREAMREQUEST._serialized_end = 1616
+    _SEARCHSTREAMRESPONSE._serialized_start = 1618
+    _SEARCHSTREAMRESPONSE._serialized_end = 1717
+    _ADDREQUEST._serialized_start = 1719
+    _ADDREQUEST._serialized_end = 1763
+    _ADDWITHIDSREQUEST._serialized_start = 1765
+    _ADDWITHIDSREQUEST._serialized_end = 1829
+    _ADDRESPONSE._serialized_start = 1831
+    _ADDRESPONSE._serialized_end = 1873
+    _REMOVEREQUEST._serialized_start = 1875
+    _REMOVEREQUEST._serialized_end = 1903
+    _REMOVERESPONSE._serialized_start = 1905
+    _REMOVERESPONSE._serialized_end = 1938
+    _RELOADRESPONSE._serialized_start = 1940
+    _RELOADRESPONSE._serialized_end = 1972
+    _STATSRESPONSE._serialized_start = 1974
+    _STATSRESPONSE._serialized_end = 2086
+    _STATSRESPONSE_VALUESENTRY._serialized_start = 2041
+    _STATSRESPONSE_VALUESENTRY._serialized_end = 2086
+    _HEATBEATRESPONSE._serialized_start = 2088
+    _HEATBEATRESPONSE._serialized_end = 2123
+    _FAISSSERVICE._serialized_start = 2208
+    _FAISSSERVICE._serialized_end = 2965
 # @@protoc_insertion_point(module_scope)
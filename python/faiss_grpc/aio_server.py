@@ -0,0 +1,289 @@
+import asyncio
+import logging
+import time
+from concurrent import futures
+from typing import Any, AsyncIterator, Callable, Optional, Tuple, TypeVar
+
+import grpc
+
+from faiss_grpc.faiss_server import (
+    FaissServiceConfig,
+    ServerConfig,
+    Servicer,
+    create_servicer,
+    servicer_writer,
+)
+from faiss_grpc.metrics import (
+    AsyncMetricsInterceptor,
+    Metrics,
+    MetricsServer,
+    MonitoredThreadPoolExecutor,
+)
+from faiss_grpc.proto import faiss_pb2_grpc
+from faiss_grpc.proto.faiss_pb2 import (
+    AddResponse,
+    BatchSearchResponse,
+    HeatbeatResponse,
+    RangeSearchResponse,
+    ReloadResponse,
+    RemoveResponse,
+    SearchByIdResponse,
+    SearchByIdsResponse,
+    SearchResponse,
+    SearchStreamRequest,
+    SearchStreamResponse,
+    StatsResponse,
+)
+from faiss_grpc.reloading import (
+    RELOAD_SIGNAL,
+    IndexFileWatcher,
+    reload_in_background,
+)
+from faiss_grpc.streaming import StreamEnd, StreamSearcher
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+
+class ExecutorContext:
+    # grpc.aio context is not thread safe, so servicer methods run on
+    # executor get this one, and its status is set to the RPC on event loop
+    def __init__(self, time_remaining: Optional[float]) -> None:
+        self.deadline: Optional[float] = None
+        if time_remaining is not None:
+            self.deadline = time.monotonic() + time_remaining
+        self._code: Optional[grpc.StatusCode] = None
+        self._details: Optional[str] = None
+        self._trailing_metadata: Optional[Tuple[Tuple[str, str], ...]] = None
+
+    def set_code(self, code: grpc.StatusCode) -> None:
+        self._code = code
+
+    def set_details(self, details: str) -> None:
+        self._details = details
+
+    def set_trailing_metadata(
+        self, trailing_metadata: Tuple[Tuple[str, str], ...]
+    ) -> None:
+        self._trailing_metadata = trailing_metadata
+
+    def code(self) -> Optional[grpc.StatusCode]:
+        return self._code
+
+    def details(self) -> Optional[str]:
+        return self._details
+
+    def time_remaining(self) -> Optional[float]:
+        if self.deadline is None:
+            return None
+        return max(self.deadline - time.monotonic(), 0.0)
+
+    def apply(self, context: Any) -> None:
+        if self._code is not None:
+            context.set_code(self._code)
+        if self._details is not None:
+            context.set_details(self._details)
+        if self._trailing_metadata is not None:
+            context.set_trailing_metadata(self._trailing_metadata)
+
+
+class AsyncFaissServiceServicer(faiss_pb2_grpc.FaissServiceServicer):
+    def __init__(self, servicer: Servicer, executor: futures.Executor) -> None:
+        self.servicer = servicer
+        self.executor = executor
+
+    async def Search(self, request, context) -> SearchResponse:
+        return await self.run(self.servicer.Search, request, context)
+
+    async def SearchById(self, request, context) -> SearchByIdResponse:
+        return await self.run(self.servicer.SearchById, request, context)
+
+    async def SearchByIds(self, request, context) -> SearchByIdsResponse:
+        return await self.run(self.servicer.SearchByIds, request, context)
+
+    async def BatchSearch(self, request, context) -> BatchSearchResponse:
+        return await self.run(self.servicer.BatchSearch, request, context)
+
+    async def RangeSearch(self, request, context) -> RangeSearchResponse:
+        return await self.run(self.servicer.RangeSearch, request, context)
+
+    async def SearchStream(
+        self, request_iterator, context
+    ) -> AsyncIterator[SearchStreamResponse]:
+        if not hasattr(self.servicer, 'stream_searcher'):
+            # e.g. coordinator does not forward streams to backends
+            await context.abort(
+                grpc.StatusCode.UNIMPLEMENTED, 'Method not implemented!'
+            )
+        loop = asyncio.get_running_loop()
+        searcher = self.servicer.stream_searcher()
+        results: 'asyncio.Queue[Any]' = asyncio.Queue()
+        reader = asyncio.ensure_future(
+            self._read_search_stream(
+                request_iterator,
+                searcher,
+                lambda r: loop.call_soon_threadsafe(results.put_nowait, r),
+            )
+        )
+
+        try:
+            sent = 0
+            total: Optional[int] = None
+            while total is None or sent < total:
+                result = await results.get()
+                if isinstance(result, StreamEnd):
+                    total = result.total
+                    continue
+                yield await loop.run_in_executor(
+                    self.executor, searcher.to_response, *result
+                )
+                sent += 1
+        finally:
+            reader.cancel()
+            await loop.run_in_executor(self.executor, searcher.close)
+
+    async def _read_search_stream(
+        self,
+        request_iterator: AsyncIterator[SearchStreamRequest],
+        searcher: StreamSearcher,
+        put: Callable[[Any], None],
+    ) -> None:
+        # resolving index of a request may load it, so requests are
+        # submitted on executor one by one to keep their order
+        loop = asyncio.get_running_loop()
+        total = 0
+        try:
+            async for stream_request in request_iterator:
+                await loop.run_in_executor(
+                    self.executor,
+                    searcher.submit,
+                    stream_request.sequence_id,
+                    stream_request.request,
+                    put,
+                )
+                total += 1
+        finally:
+            put(StreamEnd(total))
+
+    async def Add(self, request, context) -> AddResponse:
+        return await self.run(self.servicer.Add, request, context)
+
+    async def AddWithIds(self, request, context) -> AddResponse:
+        return await self.run(self.servicer.AddWithIds, request, context)
+
+    async def Remove(self, request, context) -> RemoveResponse:
+        return await self.run(self.servicer.Remove, request, context)
+
+    async def Reload(self, request, context) -> ReloadResponse:
+        return await self.run(self.servicer.Reload, request, context)
+
+    async def Stats(self, request, context) -> StatsResponse:
+        return StatsResponse(values=self.servicer.stats())
+
+    async def Heatbeat(self, request, context) -> HeatbeatResponse:
+        return HeatbeatResponse(message='OK')
+
+    async def run(
+        self, method: Callable[[Any, Any], T], request: Any, context: Any
+    ) -> T:
+        # faiss and protobuf work is offloaded to executor, so event loop
+        # only handles I/O
+        loop = asyncio.get_running_loop()
+        executor_context = ExecutorContext(context.time_remaining())
+        try:
+            return await loop.run_in_executor(
+                self.executor, method, request, executor_context
+            )
+        finally:
+            executor_context.apply(context)
+
+
+class AsyncServer:
+    def __init__(
+        self,
+        index_path: str,
+        server_config: ServerConfig,
+        service_config: FaissServiceConfig,
+    ) -> None:
+        self.metrics: Optional[Metrics] = None
+        if server_config.metrics_port is not None:
+            self.metrics = Metrics()
+        servicer = create_servicer(
+            index_path, server_config, service_config, self.metrics
+        )
+        self.watcher: Optional[IndexFileWatcher] = None
+        if server_config.reload_interval:
+            self.watcher = IndexFileWatcher(
+                index_path, server_config.reload_interval, servicer.reload
+            )
+        self.writer = servicer_writer(servicer)
+        self.server_config = server_config
+        # max_workers is the number of threads running faiss searches, not
+        # the number of concurrent RPCs on async server
+        self.executor = MonitoredThreadPoolExecutor(
+            max_workers=server_config.max_workers,
+            thread_name_prefix='faiss-grpc-search',
+        )
+        self.servicer = AsyncFaissServiceServicer(servicer, self.executor)
+        self.server: Optional[grpc.aio.Server] = None
+        self.metrics_server: Optional[MetricsServer] = None
+        if self.metrics:
+            self.metrics.add_collector(servicer.stats)
+            self.metrics.add_collector(self.executor.stats)
+            assert server_config.metrics_port is not None
+            self.metrics_server = MetricsServer(
+                self.metrics, server_config.metrics_port
+            )
+
+    async def start(self) -> None:
+        # grpc.aio server must be created on the running event loop
+        interceptors = []
+        if self.metrics:
+            interceptors.append(AsyncMetricsInterceptor(self.metrics))
+        self.server = grpc.aio.server(
+            interceptors=interceptors, options=[('grpc.so_reuseport', 1)]
+        )
+        faiss_pb2_grpc.add_FaissServiceServicer_to_server(
+            self.servicer, self.server
+        )
+        address = f'{self.server_config.host}:{self.server_config.port}'
+        self.server.add_insecure_port(address)
+        await self.server.start()
+        if self.watcher:
+            self.watcher.start()
+        if self.writer:
+            self.writer.start()
+        if self.metrics_server:
+            self.metrics_server.start()
+        logger.info('async server started on %s', address)
+
+    async def stop(self, grace: Optional[float] = None) -> None:
+        if self.server:
+            await self.server.stop(grace)
+        if self.watcher:
+            self.watcher.close()
+        if self.writer:
+            self.writer.close()
+        if self.metrics_server:
+            self.metrics_server.close()
+        self.executor.shutdown(wait=False)
+
+    def serve(self) -> None:
+        asyncio.run(self._serve())
+
+    async def _serve(self) -> None:
+        asyncio.get_running_loop().add_signal_handler(
+            RELOAD_SIGNAL, reload_in_background, self.servicer.servicer.reload
+        )
+        await self.start()
+        assert self.server
+        try:
+            await self.server.wait_for_termination()
+        finally:
+            if self.watcher:
+                self.watcher.close()
+            if self.writer:
+                self.writer.close()
+            if self.metrics_server:
+                self.metrics_server.close()
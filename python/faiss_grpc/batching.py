@@ -0,0 +1,116 @@
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from faiss_grpc.search_options import SearchOptions
+
+SearchResult = Tuple[np.ndarray, np.ndarray]
+SearchFunction = Callable[
+    [np.ndarray, int, Optional[SearchOptions]], SearchResult
+]
+
+
+@dataclass(frozen=True)
+class _PendingQuery:
+    query: np.ndarray
+    k: int
+    options: Optional[SearchOptions]
+    future: 'Future[SearchResult]'
+
+
+class SearchBatcher:
+    def __init__(
+        self, search: SearchFunction, max_batch_size: int, max_wait_us: int
+    ) -> None:
+        if max_batch_size < 1:
+            raise ValueError('max_batch_size must be positive')
+        if max_wait_us < 0:
+            raise ValueError('max_wait_us must not be negative')
+        self._search = search
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_us / 1e6
+        self._queue: List[_PendingQuery] = []
+        self._condition = threading.Condition()
+        self._closed = False
+        self._thread = threading.Thread(
+            target=self._run, name='faiss-grpc-batcher', daemon=True
+        )
+        self._thread.start()
+
+    def submit(
+        self,
+        query: np.ndarray,
+        k: int,
+        options: Optional[SearchOptions] = None,
+    ) -> 'Future[SearchResult]':
+        future: 'Future[SearchResult]' = Future()
+        with self._condition:
+            if self._closed:
+                raise RuntimeError('batcher is already closed')
+            self._queue.append(_PendingQuery(query, k, options, future))
+            self._condition.notify()
+        return future
+
+    def search(
+        self,
+        query: np.ndarray,
+        k: int,
+        options: Optional[SearchOptions] = None,
+    ) -> SearchResult:
+        return self.submit(query, k, options).result()
+
+    def close(self) -> None:
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+        self._thread.join()
+
+    def _run(self) -> None:
+        while True:
+            batch = self._next_batch()
+            if not batch:
+                return
+            self._execute(batch)
+
+    def _next_batch(self) -> List[_PendingQuery]:
+        with self._condition:
+            while not self._queue and not self._closed:
+                self._condition.wait()
+            # give concurrent callers a chance to join the batch, but never
+            # wait longer than max_wait after the first query arrived
+            deadline = time.monotonic() + self.max_wait
+            while len(self._queue) < self.max_batch_size and not self._closed:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+            batch = self._queue[: self.max_batch_size]
+            del self._queue[: self.max_batch_size]
+            return batch
+
+    def _execute(self, batch: List[_PendingQuery]) -> None:
+        # faiss returns k results for every row and takes one parameters for
+        # all rows, so queries are grouped by them
+        groups: Dict[
+            Tuple[int, Optional[SearchOptions]], List[_PendingQuery]
+        ] = {}
+        for pending in batch:
+            key = (pending.k, pending.options)
+            groups.setdefault(key, []).append(pending)
+
+        for (k, options), group in groups.items():
+            queries = np.vstack([p.query for p in group])
+            try:
+                distances, ids = self._search(queries, k, options)
+            except Exception as e:
+                for p in group:
+                    p.future.set_exception(e)
+                continue
+            for row, p in enumerate(group):
+                p.future.set_result(
+                    (distances[row : row + 1], ids[row : row + 1])
+                )
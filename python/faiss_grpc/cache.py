@@ -0,0 +1,98 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Generic, Hashable, Optional, Tuple, TypeVar
+
+import numpy as np
+
+V = TypeVar('V')
+
+
+class LRUCache(Generic[V]):
+    def __init__(
+        self,
+        max_entries: int,
+        ttl: Optional[float] = None,
+        max_bytes: Optional[int] = None,
+        weigh: Callable[[V], int] = lambda value: 0,
+    ) -> None:
+        if max_entries < 1:
+            raise ValueError('max_entries must be positive')
+        if ttl is not None and ttl <= 0:
+            raise ValueError('ttl must be positive')
+        if max_bytes is not None and max_bytes < 1:
+            raise ValueError('max_bytes must be positive')
+        self.max_entries = max_entries
+        self.ttl = ttl
+        # entries are evicted until their bytes given by weigh fit in
+        # max_bytes too, because results of large k take more memory
+        self.max_bytes = max_bytes
+        self.weigh = weigh
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        # key -> (value, monotonic time the entry expires at, bytes)
+        self._entries: 'OrderedDict[Hashable, Tuple[V, float, int]]' = (
+            OrderedDict()
+        )
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def query_key(query: np.ndarray) -> bytes:
+        return hashlib.blake2b(query.tobytes(), digest_size=16).digest()
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], V]) -> V:
+        now = time.monotonic()
+        with self._lock:
+            generation = self._generation
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+
+        value = compute()
+
+        expires = now + self.ttl if self.ttl else float('inf')
+        size = self.weigh(value)
+        with self._lock:
+            # value computed from an index which was swapped meanwhile must
+            # not be cached, and value over max_bytes alone is not cached
+            if generation == self._generation and (
+                self.max_bytes is None or size <= self.max_bytes
+            ):
+                self._discard(key)
+                self._entries[key] = (value, expires, size)
+                self.bytes += size
+                self._evict()
+        return value
+
+    def _discard(self, key: Hashable) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.bytes -= entry[2]
+
+    def _evict(self) -> None:
+        while len(self._entries) > self.max_entries or (
+            self.max_bytes is not None and self.bytes > self.max_bytes
+        ):
+            _, (_, _, size) = self._entries.popitem(last=False)
+            self.bytes -= size
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+            self._generation += 1
+
+    @property
+    def size(self) -> int:
+        return len(self._entries)
+
+
+def result_bytes(result: Tuple[np.ndarray, ...]) -> int:
+    # memory of arrays in a cached result, e.g. distances and ids
+    return sum(array.nbytes for array in result)
@@ -0,0 +1,792 @@
+import asyncio
+import itertools
+import queue
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from enum import Enum, unique
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Deque,
+    Dict,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
+import grpc
+import numpy as np
+from google.protobuf.empty_pb2 import Empty
+
+from faiss_grpc.batching import SearchBatcher
+from faiss_grpc.codec import encode_vector
+from faiss_grpc.proto import faiss_pb2_grpc
+from faiss_grpc.proto.faiss_pb2 import (
+    COLUMNAR,
+    FLOAT32,
+    AddRequest,
+    AddWithIdsRequest,
+    BatchSearchRequest,
+    RangeSearchRequest,
+    RemoveRequest,
+    SearchByIdRequest,
+    SearchByIdsRequest,
+    SearchParameters,
+    SearchRequest,
+    SearchResponse,
+)
+from faiss_grpc.search_options import SearchOptions
+
+# scores and ids of neighbors, like distances and ids of faiss search
+Result = Tuple[np.ndarray, np.ndarray]
+# offsets of each query in scores and ids, like lims of faiss range search
+RangeResult = Tuple[np.ndarray, np.ndarray, np.ndarray]
+
+# searches do not change server state, so they can be sent twice
+HEDGED_METHODS = frozenset(
+    {'Search', 'SearchById', 'SearchByIds', 'BatchSearch', 'RangeSearch'}
+)
+# writes change server state, so they are sent only to a single server
+WRITE_METHODS = frozenset({'Add', 'AddWithIds', 'Remove'})
+# latencies kept to estimate delay of hedged request, and needed before
+# hedging starts
+LATENCY_WINDOW = 1000
+MIN_LATENCY_SAMPLES = 20
+
+
+@unique
+class Balancing(Enum):
+    round_robin = 'round_robin'
+    least_outstanding = 'least_outstanding'
+
+
+@dataclass(eq=True, frozen=True)
+class ClientConfig:
+    # replicas serving the same index
+    addresses: Tuple[str, ...] = ('localhost:50051',)
+    # channels (connections) to each address
+    channels_per_address: int = 1
+    balancing: Balancing = Balancing.round_robin
+    # seconds until a call is given up, no deadline if unset
+    timeout: Optional[float] = None
+    # searches not responded in this percentile of recent latencies are
+    # sent again to another replica, and the first response is used
+    hedge_percentile: Optional[float] = None
+    hedge_min_delay: float = 0.001
+    # concurrent search calls are sent as one BatchSearch up to this size
+    max_batch_size: Optional[int] = None
+    max_batch_wait_us: int = 500
+    # element type of queries sent to server
+    dtype: int = FLOAT32
+
+
+class ChannelPool:
+    def __init__(
+        self,
+        addresses: Sequence[str],
+        channels_per_address: int = 1,
+        balancing: Balancing = Balancing.round_robin,
+        create_channel: Callable[..., Any] = grpc.insecure_channel,
+    ) -> None:
+        if not addresses:
+            raise ValueError('channel pool needs at least one address')
+        if channels_per_address < 1:
+            raise ValueError('channels_per_address must be positive')
+        self.balancing = balancing
+        # addresses are interleaved, so that next channel in round robin is
+        # another replica. channels with the same arguments share a
+        # connection, unless each of them has its own subchannel pool.
+        self.addresses = [
+            address
+            for _ in range(channels_per_address)
+            for address in addresses
+        ]
+        self.channels = [
+            create_channel(
+                address, options=[('grpc.use_local_subchannel_pool', 1)]
+            )
+            for address in self.addresses
+        ]
+        self.stubs = [
+            faiss_pb2_grpc.FaissServiceStub(channel)
+            for channel in self.channels
+        ]
+        self.outstanding = [0] * len(self.channels)
+        self._next = itertools.count()
+        self._lock = threading.Lock()
+
+    def acquire(self, exclude: Optional[str] = None) -> int:
+        # slot of channel for a call, which must be released when the call
+        # has finished. channels to excluded address are used only if there
+        # is no other address.
+        with self._lock:
+            start = next(self._next)
+            slots = [
+                (start + i) % len(self.channels)
+                for i in range(len(self.channels))
+            ]
+            others = [s for s in slots if self.addresses[s] != exclude]
+            slots = others or slots
+            if self.balancing is Balancing.least_outstanding:
+                slot = min(slots, key=self.outstanding.__getitem__)
+            else:
+                slot = slots[0]
+            self.outstanding[slot] += 1
+            return slot
+
+    def release(self, slot: int) -> None:
+        with self._lock:
+            self.outstanding[slot] -= 1
+
+    def future(
+        self,
+        method: str,
+        request: Any,
+        timeout: Optional[float] = None,
+        exclude: Optional[str] = None,
+    ) -> Tuple[int, Any]:
+        slot = self.acquire(exclude)
+        call = getattr(self.stubs[slot], method).future(
+            request, timeout=timeout
+        )
+        call.add_done_callback(lambda _: self.release(slot))
+        return slot, call
+
+    def close(self) -> None:
+        for channel in self.channels:
+            channel.close()
+
+
+class LatencyTracker:
+    def __init__(self, window: int = LATENCY_WINDOW) -> None:
+        self._latencies: Deque[float] = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float) -> None:
+        with self._lock:
+            self._latencies.append(seconds)
+
+    def percentile(self, q: float) -> Optional[float]:
+        with self._lock:
+            if len(self._latencies) < MIN_LATENCY_SAMPLES:
+                return None
+            latencies = list(self._latencies)
+        return float(np.percentile(latencies, q))
+
+
+class BaseClient:
+    # requests and results shared by sync and async clients. neighbors are
+    # always requested as packed columns, which are read into arrays.
+    def __init__(self, config: ClientConfig) -> None:
+        if config.hedge_percentile is not None and not (
+            0 < config.hedge_percentile < 100
+        ):
+            raise ValueError('hedge_percentile must be 0 < percentile < 100')
+        self.config = config
+        # latencies of each method, because a cheap method would make the
+        # delay of hedging an expensive one too short, and vice versa
+        self.latencies = {
+            method: LatencyTracker() for method in HEDGED_METHODS
+        }
+        self.hedged = 0
+        self._hedged_lock = threading.Lock()
+
+    def count_hedged(self) -> None:
+        with self._hedged_lock:
+            self.hedged += 1
+
+    def check_write(self, method: str) -> None:
+        # a write sent through the pool reaches one of replicas, which would
+        # serve different vectors from the others
+        if method in WRITE_METHODS and len(set(self.config.addresses)) > 1:
+            raise RuntimeError(
+                f'{method} is not supported by client of replicas, '
+                'writable index must be served by one address'
+            )
+
+    def hedge_delay(self, method: str) -> Optional[float]:
+        if self.config.hedge_percentile is None:
+            return None
+        if method not in self.latencies:
+            return None
+        delay = self.latencies[method].percentile(self.config.hedge_percentile)
+        if delay is None:
+            return None
+        return max(delay, self.config.hedge_min_delay)
+
+    def observe(self, method: str, seconds: float) -> None:
+        if method in self.latencies:
+            self.latencies[method].observe(seconds)
+
+    def to_vector(self, query: np.ndarray) -> Any:
+        return encode_vector(
+            np.asarray(query, dtype=np.float32), self.config.dtype
+        )
+
+    def search_request(
+        self,
+        query: np.ndarray,
+        k: int,
+        params: Optional[SearchOptions],
+        index: str,
+    ) -> SearchRequest:
+        return SearchRequest(
+            query=self.to_vector(query),
+            k=k,
+            response_format=COLUMNAR,
+            params=to_parameters(params),
+            index=index,
+        )
+
+    def batch_search_request(
+        self,
+        queries: np.ndarray,
+        k: int,
+        params: Optional[SearchOptions],
+        index: str,
+    ) -> BatchSearchRequest:
+        return BatchSearchRequest(
+            queries=[self.to_vector(q) for q in np.atleast_2d(queries)],
+            k=k,
+            response_format=COLUMNAR,
+            params=to_parameters(params),
+            index=index,
+        )
+
+    @staticmethod
+    def search_by_id_request(
+        request_id: int,
+        k: int,
+        params: Optional[SearchOptions],
+        index: str,
+    ) -> SearchByIdRequest:
+        return SearchByIdRequest(
+            id=request_id,
+            k=k,
+            response_format=COLUMNAR,
+            params=to_parameters(params),
+            index=index,
+        )
+
+    @staticmethod
+    def search_by_ids_request(
+        request_ids: Sequence[int],
+        k: int,
+        params: Optional[SearchOptions],
+        index: str,
+    ) -> SearchByIdsRequest:
+        return SearchByIdsRequest(
+            ids=np.asarray(request_ids, dtype=np.uint64).tolist(),
+            k=k,
+            response_format=COLUMNAR,
+            params=to_parameters(params),
+            index=index,
+        )
+
+    def add_request(self, vectors: np.ndarray) -> AddRequest:
+        return AddRequest(
+            vectors=[self.to_vector(v) for v in np.atleast_2d(vectors)]
+        )
+
+    def add_with_ids_request(
+        self, vectors: np.ndarray, ids: Sequence[int]
+    ) -> AddWithIdsRequest:
+        return AddWithIdsRequest(
+            vectors=[self.to_vector(v) for v in np.atleast_2d(vectors)],
+            ids=np.asarray(ids, dtype=np.uint64).tolist(),
+        )
+
+    @staticmethod
+    def remove_request(ids: Sequence[int]) -> RemoveRequest:
+        return RemoveRequest(ids=np.asarray(ids, dtype=np.uint64).tolist())
+
+    def range_search_request(
+        self,
+        queries: np.ndarray,
+        radius: float,
+        max_results: int,
+        params: Optional[SearchOptions],
+        index: str,
+    ) -> RangeSearchRequest:
+        return RangeSearchRequest(
+            queries=[self.to_vector(q) for q in np.atleast_2d(queries)],
+            radius=radius,
+            max_results=max_results,
+            response_format=COLUMNAR,
+            params=to_parameters(params),
+            index=index,
+        )
+
+
+class FaissClient(BaseClient):
+    def __init__(self, config: ClientConfig = ClientConfig()) -> None:
+        super().__init__(config)
+        self.pool = ChannelPool(
+            config.addresses, config.channels_per_address, config.balancing
+        )
+        # concurrent searches of each index are batched
+        self.batchers: Dict[str, SearchBatcher] = {}
+        self._batchers_lock = threading.Lock()
+
+    def __enter__(self) -> 'FaissClient':
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
+
+    def search(
+        self,
+        query: np.ndarray,
+        k: int,
+        params: Optional[SearchOptions] = None,
+        index: str = '',
+    ) -> Result:
+        if self.config.max_batch_size:
+            query = np.asarray(query, dtype=np.float32).reshape(1, -1)
+            scores, ids = self.batcher_for(index).search(query, k, params)
+            return trim(scores[0], ids[0])
+        response = self.call(
+            'Search', self.search_request(query, k, params, index)
+        )
+        return to_result(response)
+
+    def batch_search(
+        self,
+        queries: np.ndarray,
+        k: int,
+        params: Optional[SearchOptions] = None,
+        index: str = '',
+    ) -> Result:
+        response = self.call(
+            'BatchSearch', self.batch_search_request(queries, k, params, index)
+        )
+        return pad(response.results, k)
+
+    def search_by_id(
+        self,
+        request_id: int,
+        k: int,
+        params: Optional[SearchOptions] = None,
+        index: str = '',
+    ) -> Result:
+        response = self.call(
+            'SearchById',
+            self.search_by_id_request(request_id, k, params, index),
+        )
+        return to_result(response)
+
+    def search_by_ids(
+        self,
+        request_ids: Sequence[int],
+        k: int,
+        params: Optional[SearchOptions] = None,
+        index: str = '',
+    ) -> Result:
+        # rows of invalid ids are empty (-1)
+        response = self.call(
+            'SearchByIds',
+            self.search_by_ids_request(request_ids, k, params, index),
+        )
+        return pad(response.results, k)
+
+    def range_search(
+        self,
+        queries: np.ndarray,
+        radius: float,
+        max_results: int = 0,
+        params: Optional[SearchOptions] = None,
+        index: str = '',
+    ) -> RangeResult:
+        response = self.call(
+            'RangeSearch',
+            self.range_search_request(
+                queries, radius, max_results, params, index
+            ),
+        )
+        return to_range_result(response.results)
+
+    def add(self, vectors: np.ndarray) -> np.ndarray:
+        # ids assigned to vectors
+        response = self.call('Add', self.add_request(vectors))
+        return np.array(response.ids, dtype=np.int64)
+
+    def add_with_ids(
+        self, vectors: np.ndarray, ids: Sequence[int]
+    ) -> np.ndarray:
+        # ids of added vectors like add
+        response = self.call(
+            'AddWithIds', self.add_with_ids_request(vectors, ids)
+        )
+        return np.array(response.ids, dtype=np.int64)
+
+    def remove(self, ids: Sequence[int]) -> int:
+        # number of ids which were not removed yet
+        return self.call('Remove', self.remove_request(ids)).removed
+
+    def reload(self) -> int:
+        return self.call('Reload', Empty()).ntotal
+
+    def stats(self) -> Dict[str, float]:
+        return dict(self.call('Stats', Empty()).values)
+
+    def heatbeat(self) -> str:
+        return self.call('Heatbeat', Empty()).message
+
+    def call(self, method: str, request: Any) -> Any:
+        self.check_write(method)
+        start = time.monotonic()
+        finished: 'queue.Queue[Any]' = queue.Queue()
+        address, call = self.invoke(method, request, finished)
+        calls = [call]
+        try:
+            call = finished.get(timeout=self.hedge_delay(method))
+        except queue.Empty:
+            # the first call is slow, so the same request is sent to
+            # another replica and the first successful one is used
+            self.count_hedged()
+            calls.append(self.invoke(method, request, finished, address)[1])
+            call = first_success(finished, len(calls))
+        for other in calls:
+            if other is not call:
+                other.cancel()
+        response = call.result()
+        self.observe(method, time.monotonic() - start)
+        return response
+
+    def invoke(
+        self,
+        method: str,
+        request: Any,
+        finished: 'queue.Queue[Any]',
+        exclude: Optional[str] = None,
+    ) -> Tuple[str, Any]:
+        slot, call = self.pool.future(
+            method, request, self.config.timeout, exclude
+        )
+        call.add_done_callback(finished.put)
+        return self.pool.addresses[slot], call
+
+    def batcher_for(self, index: str) -> SearchBatcher:
+        with self._batchers_lock:
+            if index not in self.batchers:
+                assert self.config.max_batch_size is not None
+                self.batchers[index] = SearchBatcher(
+                    lambda queries, k, params: self.batch_search(
+                        queries, k, params, index
+                    ),
+                    self.config.max_batch_size,
+                    self.config.max_batch_wait_us,
+                )
+            return self.batchers[index]
+
+    def close(self) -> None:
+        with self._batchers_lock:
+            for batcher in self.batchers.values():
+                batcher.close()
+            self.batchers.clear()
+        self.pool.close()
+
+
+class AsyncSearchBatcher:
+    # concurrent searches on event loop are batched like SearchBatcher, but
+    # batch is sent by the loop without a thread
+    def __init__(
+        self,
+        search: Callable[
+            [np.ndarray, int, Optional[SearchOptions]], Awaitable[Result]
+        ],
+        max_batch_size: int,
+        max_wait_us: int,
+    ) -> None:
+        if max_batch_size < 1:
+            raise ValueError('max_batch_size must be positive')
+        if max_wait_us < 0:
+            raise ValueError('max_wait_us must not be negative')
+        self._search = search
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_us / 1e6
+        self._queue: List[
+            Tuple[np.ndarray, int, Optional[SearchOptions], Any]
+        ] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+    async def search(
+        self,
+        query: np.ndarray,
+        k: int,
+        options: Optional[SearchOptions] = None,
+    ) -> Result:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._queue.append((query, k, options, future))
+        if len(self._queue) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+        return await future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._queue = self._queue, []
+        # server returns k results for every query and takes one
+        # parameters for all queries, so queries are grouped by them
+        groups: Dict[Tuple[int, Optional[SearchOptions]], List[Any]] = {}
+        for pending in batch:
+            groups.setdefault(pending[1:3], []).append(pending)
+        for (k, options), group in groups.items():
+            asyncio.ensure_future(self._execute(group, k, options))
+
+    async def _execute(
+        self, group: List[Any], k: int, options: Optional[SearchOptions]
+    ) -> None:
+        queries = np.vstack([query for query, _, _, _ in group])
+        try:
+            scores, ids = await self._search(queries, k, options)
+        except Exception as e:
+            for _, _, _, future in group:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for row, (_, _, _, future) in enumerate(group):
+            if not future.done():
+                future.set_result((scores[row : row + 1], ids[row : row + 1]))
+
+
+class AsyncFaissClient(BaseClient):
+    def __init__(self, config: ClientConfig = ClientConfig()) -> None:
+        super().__init__(config)
+        self.pool = ChannelPool(
+            config.addresses,
+            config.channels_per_address,
+            config.balancing,
+            grpc.aio.insecure_channel,
+        )
+        self.batchers: Dict[str, AsyncSearchBatcher] = {}
+
+    async def __aenter__(self) -> 'AsyncFaissClient':
+        return self
+
+    async def __aexit__(self, *args: Any) -> None:
+        await self.close()
+
+    async def search(
+        self,
+        query: np.ndarray,
+        k: int,
+        params: Optional[SearchOptions] = None,
+        index: str = '',
+    ) -> Result:
+        if self.config.max_batch_size:
+            query = np.asarray(query, dtype=np.float32).reshape(1, -1)
+            scores, ids = await self.batcher_for(index).search(
+                query, k, params
+            )
+            return trim(scores[0], ids[0])
+        response = await self.call(
+            'Search', self.search_request(query, k, params, index)
+        )
+        return to_result(response)
+
+    async def batch_search(
+        self,
+        queries: np.ndarray,
+        k: int,
+        params: Optional[SearchOptions] = None,
+        index: str = '',
+    ) -> Result:
+        response = await self.call(
+            'BatchSearch', self.batch_search_request(queries, k, params, index)
+        )
+        return pad(response.results, k)
+
+    async def search_by_id(
+        self,
+        request_id: int,
+        k: int,
+        params: Optional[SearchOptions] = None,
+        index: str = '',
+    ) -> Result:
+        response = await self.call(
+            'SearchById',
+            self.search_by_id_request(request_id, k, params, index),
+        )
+        return to_result(response)
+
+    async def search_by_ids(
+        self,
+        request_ids: Sequence[int],
+        k: int,
+        params: Optional[SearchOptions] = None,
+        index: str = '',
+    ) -> Result:
+        response = await self.call(
+            'SearchByIds',
+            self.search_by_ids_request(request_ids, k, params, index),
+        )
+        return pad(response.results, k)
+
+    async def range_search(
+        self,
+        queries: np.ndarray,
+        radius: float,
+        max_results: int = 0,
+        params: Optional[SearchOptions] = None,
+        index: str = '',
+    ) -> RangeResult:
+        response = await self.call(
+            'RangeSearch',
+            self.range_search_request(
+                queries, radius, max_results, params, index
+            ),
+        )
+        return to_range_result(response.results)
+
+    async def add(self, vectors: np.ndarray) -> np.ndarray:
+        response = await self.call('Add', self.add_request(vectors))
+        return np.array(response.ids, dtype=np.int64)
+
+    async def add_with_ids(
+        self, vectors: np.ndarray, ids: Sequence[int]
+    ) -> np.ndarray:
+        response = await self.call(
+            'AddWithIds', self.add_with_ids_request(vectors, ids)
+        )
+        return np.array(response.ids, dtype=np.int64)
+
+    async def remove(self, ids: Sequence[int]) -> int:
+        return (await self.call('Remove', self.remove_request(ids))).removed
+
+    async def reload(self) -> int:
+        return (await self.call('Reload', Empty())).ntotal
+
+    async def stats(self) -> Dict[str, float]:
+        return dict((await self.call('Stats', Empty())).values)
+
+    async def heatbeat(self) -> str:
+        return (await self.call('Heatbeat', Empty())).message
+
+    async def call(self, method: str, request: Any) -> Any:
+        self.check_write(method)
+        start = time.monotonic()
+        address, first = self.invoke(method, request)
+        calls = {first}
+        delay = self.hedge_delay(method)
+        done, _ = await asyncio.wait(calls, timeout=delay)
+        if not done:
+            # the first call is slow, so the same request is sent to
+            # another replica and the first successful one is used
+            self.count_hedged()
+            calls.add(self.invoke(method, request, address)[1])
+            done = await self.first_success(calls)
+        call = done.pop()
+        for other in calls:
+            if other is not call:
+                other.cancel()
+        response = call.result()
+        self.observe(method, time.monotonic() - start)
+        return response
+
+    def invoke(
+        self, method: str, request: Any, exclude: Optional[str] = None
+    ) -> Tuple[str, 'asyncio.Task[Any]']:
+        slot = self.pool.acquire(exclude)
+
+        async def invoke() -> Any:
+            try:
+                return await getattr(self.pool.stubs[slot], method)(
+                    request, timeout=self.config.timeout
+                )
+            finally:
+                self.pool.release(slot)
+
+        return self.pool.addresses[slot], asyncio.ensure_future(invoke())
+
+    @staticmethod
+    async def first_success(calls: Any) -> Any:
+        # failed call is waited for the other one if it is still running
+        pending = set(calls)
+        while True:
+            done, pending = await asyncio.wait(
+                pending, return_when=asyncio.FIRST_COMPLETED
+            )
+            succeeded = {call for call in done if call.exception() is None}
+            if succeeded or not pending:
+                return succeeded or done
+
+    def batcher_for(self, index: str) -> AsyncSearchBatcher:
+        if index not in self.batchers:
+            assert self.config.max_batch_size is not None
+            self.batchers[index] = AsyncSearchBatcher(
+                lambda queries, k, params: self.batch_search(
+                    queries, k, params, index
+                ),
+                self.config.max_batch_size,
+                self.config.max_batch_wait_us,
+            )
+        return self.batchers[index]
+
+    async def close(self) -> None:
+        await asyncio.gather(
+            *(channel.close() for channel in self.pool.channels)
+        )
+
+
+def first_success(finished: 'queue.Queue[Any]', count: int) -> Any:
+    # the first successful call of count calls, or the last failed one
+    for remaining in range(count, 0, -1):
+        call = finished.get()
+        if remaining == 1 or call.code() is grpc.StatusCode.OK:
+            return call
+
+
+def to_parameters(params: Optional[SearchOptions]) -> SearchParameters:
+    if params is None:
+        return SearchParameters()
+    return SearchParameters(
+        nprobe=params.nprobe or 0, ef_search=params.ef_search or 0
+    )
+
+
+def to_result(response: Any) -> Result:
+    return (
+        np.array(response.scores, dtype=np.float32),
+        np.array(response.ids, dtype=np.int64),
+    )
+
+
+def trim(scores: np.ndarray, ids: np.ndarray) -> Result:
+    found = ids != -1
+    return scores[found], ids[found]
+
+
+def pad(responses: Sequence[SearchResponse], k: int) -> Result:
+    # results of queries are padded to k like faiss, missing neighbors have
+    # id -1 and score nan
+    scores = np.full((len(responses), k), np.nan, dtype=np.float32)
+    ids = np.full((len(responses), k), -1, dtype=np.int64)
+    for row, response in enumerate(responses):
+        found = min(len(response.ids), k)
+        scores[row, :found] = response.scores[:found]
+        ids[row, :found] = response.ids[:found]
+    return scores, ids
+
+
+def to_range_result(responses: Sequence[SearchResponse]) -> RangeResult:
+    # packed columns of each query are copied at once, not by element
+    counts = [len(response.ids) for response in responses]
+    lims = np.concatenate(([0], np.cumsum(counts))).astype(np.int64)
+    if not responses:
+        return lims, np.empty(0, dtype=np.float32), np.empty(0, dtype=np.int64)
+    scores = np.concatenate(
+        [np.asarray(r.scores, dtype=np.float32) for r in responses]
+    )
+    ids = np.concatenate(
+        [np.asarray(r.ids, dtype=np.int64) for r in responses]
+    )
+    return lims, scores, ids
@@ -0,0 +1,36 @@
+from typing import Dict
+
+import numpy as np
+
+from faiss_grpc.proto.faiss_pb2 import FLOAT16, FLOAT32, Vector
+
+DTYPES: Dict[int, np.dtype] = {
+    FLOAT32: np.dtype('<f4'),
+    FLOAT16: np.dtype('<f2'),
+}
+
+
+def decode_vector(vector: Vector) -> np.ndarray:
+    if not vector.data:
+        return np.array(vector.val, dtype=np.float32)
+
+    if vector.dtype not in DTYPES:
+        raise ValueError(f'unsupported vector dtype {vector.dtype}')
+    dtype = DTYPES[vector.dtype]
+    if len(vector.data) % dtype.itemsize != 0:
+        raise ValueError(
+            f'vector data size {len(vector.data)} is not a multiple of '
+            f'{dtype.itemsize} bytes'
+        )
+    # np.frombuffer shares memory with the request, so little-endian float32
+    # data is not copied until it is filled into the array of queries
+    return np.frombuffer(vector.data, dtype=dtype).astype(
+        np.float32, copy=False
+    )
+
+
+def encode_vector(vec: np.ndarray, dtype: int = FLOAT32) -> Vector:
+    if dtype not in DTYPES:
+        raise ValueError(f'unsupported vector dtype {dtype}')
+    data = np.ascontiguousarray(vec, dtype=DTYPES[dtype]).tobytes()
+    return Vector(data=data, dtype=dtype)
@@ -0,0 +1,530 @@
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from enum import Enum, unique
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import grpc
+import numpy as np
+from google.protobuf.empty_pb2 import Empty
+
+from faiss_grpc.client import ChannelPool
+from faiss_grpc.proto import faiss_pb2_grpc
+from faiss_grpc.proto.faiss_pb2 import (
+    COLUMNAR,
+    BatchSearchRequest,
+    BatchSearchResponse,
+    HeatbeatResponse,
+    RangeSearchResponse,
+    ReloadResponse,
+    SearchByIdResponse,
+    SearchByIdsResponse,
+    SearchRequest,
+    SearchResponse,
+    StatsResponse,
+)
+from faiss_grpc.results import (
+    merge_range_results,
+    merge_topk,
+    sort_range_result,
+    split_range_result,
+    to_range_result,
+    to_search_by_id_response,
+    to_search_response,
+)
+
+logger = logging.getLogger(__name__)
+
+# trailing metadata listing backends missing from a degraded response
+FAILED_BACKENDS_KEY = 'faiss-grpc-failed-backends'
+
+
+@unique
+class BackendMetric(Enum):
+    l2 = 'l2'
+    inner_product = 'inner_product'
+
+
+@dataclass(eq=True, frozen=True)
+class CoordinatorConfig:
+    # addresses of backend servers, each serving a part of vectors with
+    # global ids
+    backends: Tuple[str, ...]
+    # seconds until a backend is given up, shortened by deadline of request
+    backend_timeout: float = 1.0
+    # channels (connections) to each backend, used in round robin
+    backend_channels: int = 1
+    # fewer successful backends than this fails request, otherwise results
+    # of the others are returned
+    min_backends: int = 1
+    # metric of backend indexes, which decides order of merged results
+    metric: BackendMetric = BackendMetric.l2
+
+
+BackendResult = Tuple['Backend', Any]
+BackendError = Tuple['Backend', grpc.RpcError]
+
+
+class Backend:
+    def __init__(self, address: str, channels: int = 1) -> None:
+        self.address = address
+        self.pool = ChannelPool((address,), channels)
+
+    def future(
+        self, method: str, request: Any, timeout: Optional[float]
+    ) -> Any:
+        return self.pool.future(method, request, timeout)[1]
+
+    def close(self) -> None:
+        self.pool.close()
+
+
+class CoordinatorServicer(faiss_pb2_grpc.FaissServiceServicer):
+    def __init__(self, config: CoordinatorConfig) -> None:
+        if not config.backends:
+            raise ValueError('coordinator needs at least one backend')
+        if not (1 <= config.min_backends <= len(config.backends)):
+            raise ValueError(
+                'min_backends must be 1 <= min_backends <= '
+                f'{len(config.backends)}'
+            )
+        self.config = config
+        self.backends = [
+            Backend(address, config.backend_channels)
+            for address in config.backends
+        ]
+        self.descending = config.metric is BackendMetric.inner_product
+        self.requests = 0
+        self.failures = 0
+        self.degraded = 0
+        self._lock = threading.Lock()
+
+    def Search(self, request, context) -> SearchResponse:
+        results = self.search(
+            [(backend, request) for backend in self.backends], context
+        )
+        if results is None:
+            return SearchResponse()
+        distances, ids = self.merge(
+            [response for _, response in results], request.k
+        )
+        return to_search_response(
+            distances[0], ids[0], request.response_format
+        )
+
+    def BatchSearch(self, request, context) -> BatchSearchResponse:
+        if len(request.queries) == 0:
+            return BatchSearchResponse()
+        results = self.call(
+            'BatchSearch',
+            [(backend, self.columnar(request)) for backend in self.backends],
+            context,
+        )
+        if results is None:
+            return BatchSearchResponse()
+        # results of each query are merged from all backends
+        distances, ids = self.merge(
+            [r for _, response in results for r in response.results],
+            request.k,
+            len(request.queries),
+        )
+        return BatchSearchResponse(
+            results=[
+                to_search_response(d, i, request.response_format)
+                for d, i in zip(distances, ids)
+            ]
+        )
+
+    def SearchById(self, request, context) -> SearchByIdResponse:
+        # the ID is found by the backend having it, whose neighbors come with
+        # the vector of the ID. others are searched by the vector.
+        # both fan-outs share one deadline, so the request does not wait
+        # for backends longer than backend_timeout
+        deadline = time.monotonic() + self.timeout(context)
+        by_id = self.columnar(request)
+        by_id.include_query = True
+        owners, errors = self.fan_out(
+            'SearchById',
+            [(backend, by_id) for backend in self.backends],
+            deadline - time.monotonic(),
+        )
+        rejected = [
+            (backend, e)
+            for backend, e in errors
+            if e.code() is grpc.StatusCode.INVALID_ARGUMENT
+        ]
+        others = [backend for backend, _ in rejected]
+        errors = [
+            (backend, e) for backend, e in errors if backend not in others
+        ]
+        if not owners:
+            if errors:
+                self.fail(errors, context)
+            else:
+                self.reject(request.id, rejected, context)
+            return SearchByIdResponse()
+
+        search = SearchRequest(
+            query=owners[0][1].query,
+            k=request.k,
+            params=request.params,
+            index=request.index,
+        )
+        results = self.search(
+            [(backend, search) for backend in others],
+            context,
+            owners,
+            errors,
+            max(deadline - time.monotonic(), 0),
+        )
+        if results is None:
+            return SearchByIdResponse()
+        distances, ids = self.merge(
+            [response for _, response in results], request.k
+        )
+        return to_search_by_id_response(
+            request.id, distances[0], ids[0], request.response_format
+        )
+
+    def SearchByIds(self, request, context) -> SearchByIdsResponse:
+        # like SearchById, each ID is found by the backend having it, then
+        # every backend searches the vectors of IDs it does not have in one
+        # batch. both fan-outs share one deadline.
+        if len(request.ids) == 0:
+            return SearchByIdsResponse()
+        deadline = time.monotonic() + self.timeout(context)
+        by_ids = self.columnar(request)
+        by_ids.include_query = True
+        answered, errors = self.fan_out(
+            'SearchByIds',
+            [(backend, by_ids) for backend in self.backends],
+            deadline - time.monotonic(),
+        )
+        owned = self.owned_ids(answered)
+        searches = self.search_others(request, answered, owned)
+        searched, failed = self.fan_out(
+            'BatchSearch',
+            [(backend, search) for backend, _, search in searches],
+            max(deadline - time.monotonic(), 0),
+        )
+        failed_backends = {backend for backend, _ in failed}
+        if not self.check(
+            [r for r in answered if r[0] not in failed_backends],
+            list(errors) + failed,
+            context,
+        ):
+            return SearchByIdsResponse()
+
+        rows = {i: row for row, i in enumerate(sorted(owned))}
+        distances, ids = self.merge_by_ids(
+            owned, searches, searched, request.k
+        )
+        results = []
+        for i, request_id in enumerate(request.ids):
+            if i not in owned:
+                results.append(
+                    SearchByIdResponse(
+                        request_id=request_id,
+                        error=f'request id {request_id} is not found in '
+                        'backends',
+                    )
+                )
+                continue
+            response = to_search_by_id_response(
+                request_id,
+                distances[rows[i]],
+                ids[rows[i]],
+                request.response_format,
+            )
+            if request.include_query:
+                response.query.CopyFrom(owned[i][1].query)
+            results.append(response)
+        return SearchByIdsResponse(results=results)
+
+    def RangeSearch(self, request, context) -> RangeSearchResponse:
+        if len(request.queries) == 0:
+            return RangeSearchResponse()
+        results = self.call(
+            'RangeSearch',
+            [(backend, self.columnar(request)) for backend in self.backends],
+            context,
+        )
+        if results is None:
+            return RangeSearchResponse()
+        # neighbors of each query are gathered from all backends, then
+        # sorted nearest first and capped by max_results again
+        lims, distances, ids = sort_range_result(
+            *merge_range_results(
+                [to_range_result(response.results) for _, response in results]
+            ),
+            self.descending,
+            request.max_results or None,
+        )
+        return RangeSearchResponse(
+            results=[
+                to_search_response(d, i, request.response_format)
+                for d, i in split_range_result(lims, distances, ids)
+            ]
+        )
+
+    def Reload(self, request, context) -> ReloadResponse:
+        try:
+            ntotal = self.reload()
+        except RuntimeError as e:
+            context.set_code(grpc.StatusCode.FAILED_PRECONDITION)
+            context.set_details(str(e))
+            return ReloadResponse()
+
+        return ReloadResponse(ntotal=ntotal)
+
+    def Stats(self, request, context) -> StatsResponse:
+        return StatsResponse(values=self.stats())
+
+    def Heatbeat(self, request, context) -> HeatbeatResponse:
+        return HeatbeatResponse(message='OK')
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            return {
+                'backends_total': len(self.backends),
+                'backend_requests': self.requests,
+                'backend_failures': self.failures,
+                'degraded_responses': self.degraded,
+                'process_cpu_seconds': time.process_time(),
+            }
+
+    def reload(self) -> int:
+        # loading index takes long, so backends are waited without timeout
+        results, errors = self.fan_out(
+            'Reload', [(backend, Empty()) for backend in self.backends], None
+        )
+        self.record(errors)
+        if len(results) < self.config.min_backends:
+            raise RuntimeError(
+                'failed to reload backends '
+                + ', '.join(backend.address for backend, _ in errors)
+            )
+        return sum(response.ntotal for _, response in results)
+
+    def close(self) -> None:
+        for backend in self.backends:
+            backend.close()
+
+    def search(
+        self,
+        requests: Sequence[Tuple[Backend, Any]],
+        context: Any,
+        results: Sequence[BackendResult] = (),
+        errors: Sequence[BackendError] = (),
+        timeout: Optional[float] = None,
+    ) -> Optional[List[BackendResult]]:
+        return self.call(
+            'Search',
+            [(backend, self.columnar(r)) for backend, r in requests],
+            context,
+            results,
+            errors,
+            timeout,
+        )
+
+    def call(
+        self,
+        method: str,
+        requests: Sequence[Tuple[Backend, Any]],
+        context: Any,
+        results: Sequence[BackendResult] = (),
+        errors: Sequence[BackendError] = (),
+        timeout: Optional[float] = None,
+    ) -> Optional[List[BackendResult]]:
+        # results and errors of an earlier call to other backends are
+        # counted together, and timeout is what is left of its deadline
+        if timeout is None:
+            timeout = self.timeout(context)
+        called, failed = self.fan_out(method, requests, timeout)
+        called = list(results) + called
+        if not self.check(called, list(errors) + failed, context):
+            return None
+        return called
+
+    def fan_out(
+        self,
+        method: str,
+        requests: Sequence[Tuple[Backend, Any]],
+        timeout: Optional[float],
+    ) -> Tuple[List[BackendResult], List[BackendError]]:
+        # requests are sent to all backends at once, then waited in turn
+        calls = [
+            (backend, backend.future(method, r, timeout))
+            for backend, r in requests
+        ]
+        results, errors = [], []
+        for backend, call in calls:
+            try:
+                results.append((backend, call.result()))
+            except grpc.RpcError as e:
+                errors.append((backend, e))
+        with self._lock:
+            self.requests += len(calls)
+        return results, errors
+
+    def check(
+        self,
+        results: Sequence[BackendResult],
+        errors: Sequence[BackendError],
+        context: Any,
+    ) -> bool:
+        # invalid request is rejected by every backend, so it is returned
+        # to client instead of being treated as failure of backends
+        for _, e in errors:
+            if e.code() is grpc.StatusCode.INVALID_ARGUMENT:
+                context.set_code(e.code())
+                context.set_details(e.details())
+                return False
+        if len(results) < self.config.min_backends:
+            self.fail(errors, context)
+            return False
+        if errors:
+            self.degrade(errors, context)
+        return True
+
+    def fail(self, errors: Sequence[BackendError], context: Any) -> None:
+        self.record(errors)
+        codes = {e.code() for _, e in errors}
+        if len(codes) == 1:
+            # e.g. unknown index is not found on any backend
+            context.set_code(codes.pop())
+            context.set_details(errors[0][1].details())
+            return
+        context.set_code(grpc.StatusCode.UNAVAILABLE)
+        context.set_details(
+            'not enough backends responded, failed '
+            + ', '.join(backend.address for backend, _ in errors)
+        )
+
+    @staticmethod
+    def reject(
+        request_id: int, rejected: Sequence[BackendError], context: Any
+    ) -> None:
+        # invalid request (e.g. parameters) is rejected with the same reason
+        # by all backends, otherwise no backend has the ID
+        details = {e.details() for _, e in rejected}
+        context.set_code(grpc.StatusCode.INVALID_ARGUMENT)
+        if len(rejected) > 1 and len(details) == 1:
+            context.set_details(details.pop())
+        else:
+            context.set_details(
+                f'request id {request_id} is not found in backends'
+            )
+
+    def degrade(self, errors: Sequence[BackendError], context: Any) -> None:
+        # results of the other backends are returned, and client can tell
+        # they are partial by trailing metadata
+        self.record(errors)
+        with self._lock:
+            self.degraded += 1
+        context.set_trailing_metadata(
+            (
+                (
+                    FAILED_BACKENDS_KEY,
+                    ','.join(backend.address for backend, _ in errors),
+                ),
+            )
+        )
+
+    def record(self, errors: Sequence[BackendError]) -> None:
+        for backend, e in errors:
+            logger.warning(
+                'backend %s failed: %s %s',
+                backend.address,
+                e.code(),
+                e.details(),
+            )
+        with self._lock:
+            self.failures += len(errors)
+
+    def timeout(self, context: Any) -> float:
+        remaining = context.time_remaining()
+        if remaining is None:
+            return self.config.backend_timeout
+        return min(self.config.backend_timeout, remaining)
+
+    @staticmethod
+    def owned_ids(
+        answered: Sequence[BackendResult],
+    ) -> Dict[int, Tuple[Backend, SearchByIdResponse]]:
+        # position of each found ID -> backend having it and its result
+        owned: Dict[int, Tuple[Backend, SearchByIdResponse]] = {}
+        for backend, response in answered:
+            for i, result in enumerate(response.results):
+                if not result.error:
+                    owned.setdefault(i, (backend, result))
+        return owned
+
+    @staticmethod
+    def search_others(
+        request: Any,
+        answered: Sequence[BackendResult],
+        owned: Dict[int, Tuple[Backend, SearchByIdResponse]],
+    ) -> List[Tuple[Backend, List[int], BatchSearchRequest]]:
+        # each backend searches vectors of the found IDs it does not have
+        searches = []
+        for backend, _ in answered:
+            others = [i for i in sorted(owned) if owned[i][0] is not backend]
+            if others:
+                search = BatchSearchRequest(
+                    queries=[owned[i][1].query for i in others],
+                    k=request.k,
+                    response_format=COLUMNAR,
+                    params=request.params,
+                    index=request.index,
+                )
+                searches.append((backend, others, search))
+        return searches
+
+    def merge_by_ids(
+        self,
+        owned: Dict[int, Tuple[Backend, SearchByIdResponse]],
+        searches: Sequence[Tuple[Backend, List[int], BatchSearchRequest]],
+        searched: Sequence[BackendResult],
+        k: int,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        # neighbors of each found ID are merged from the backend having it
+        # and the backends which searched its vector, one row per found ID
+        found = sorted(owned)
+        if not found:
+            return np.empty((0, 0)), np.empty((0, 0))
+        rows = {i: row for row, i in enumerate(found)}
+        parts = [[owned[i][1] for i in found]]
+        others_of = {backend: others for backend, others, _ in searches}
+        for backend, response in searched:
+            part = [SearchResponse() for _ in found]
+            for i, result in zip(others_of[backend], response.results):
+                part[rows[i]] = result
+            parts.append(part)
+        return self.merge([r for part in parts for r in part], k, len(found))
+
+    def merge(
+        self, responses: Sequence[SearchResponse], k: int, n: int = 1
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        # responses are columnar results of n queries from each backend, and
+        # are padded to k like results of faiss
+        distances, ids = [], []
+        for begin in range(0, len(responses), n):
+            part_distances = np.zeros((n, k), dtype=np.float32)
+            part_ids = np.full((n, k), -1, dtype=np.int64)
+            for i, response in enumerate(responses[begin : begin + n]):
+                found = min(len(response.ids), k)
+                part_distances[i, :found] = response.scores[:found]
+                part_ids[i, :found] = response.ids[:found]
+            distances.append(part_distances)
+            ids.append(part_ids)
+        return merge_topk(distances, ids, k, self.descending)
+
+    @staticmethod
+    def columnar(request: Any) -> Any:
+        # backends return packed columns, which are cheap to merge
+        forwarded = type(request)()
+        forwarded.CopyFrom(request)
+        forwarded.response_format = COLUMNAR
+        return forwarded
@@ -1,22 +1,100 @@
-from concurrent import futures
+import functools
+import logging
+import signal
+import threading
+import time
+import weakref
+from contextlib import nullcontext
 from dataclasses import dataclass
-from typing import List, Optional
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    ContextManager,
+    Dict,
+    Iterator,
+    Optional,
+    Sequence,
+    Union,
+)
 
 import faiss
 import grpc
 import numpy as np
 from faiss import Index
 
+from faiss_grpc.batching import SearchBatcher, SearchResult
+from faiss_grpc.cache import LRUCache, result_bytes
+from faiss_grpc.codec import decode_vector, encode_vector
+from faiss_grpc.coordinator import CoordinatorConfig, CoordinatorServicer
+from faiss_grpc.index_io import (
+    IndexLoadMode,
+    close_index,
+    has_sequential_ids,
+    index_loader,
+    is_sharded,
+    make_direct_map,
+    warm_up,
+)
+from faiss_grpc.knn_table import KnnTable, exclude_self
+from faiss_grpc.metrics import (
+    BATCH_SIZE_BUCKETS,
+    SEARCH_BATCH_SIZE,
+    Metrics,
+    MetricsInterceptor,
+    MetricsServer,
+    MonitoredThreadPoolExecutor,
+    time_stage,
+)
 from faiss_grpc.proto.faiss_pb2 import (
+    AddResponse,
+    BatchSearchResponse,
     HeatbeatResponse,
-    Neighbor,
+    RangeSearchResponse,
+    ReloadResponse,
+    RemoveResponse,
     SearchByIdResponse,
+    SearchByIdsRequest,
+    SearchByIdsResponse,
     SearchResponse,
+    SearchStreamResponse,
+    StatsResponse,
+    Vector,
 )
 from faiss_grpc.proto.faiss_pb2_grpc import (
     FaissServiceServicer,
     add_FaissServiceServicer_to_server,
 )
+from faiss_grpc.registry import is_index_catalog
+from faiss_grpc.reloading import (
+    RELOAD_SIGNAL,
+    IndexFileWatcher,
+    reload_in_background,
+)
+from faiss_grpc.results import (
+    RangeResult,
+    is_similarity,
+    sort_range_result,
+    split_range_result,
+    to_search_by_id_response,
+    to_search_response,
+)
+from faiss_grpc.search_params import (
+    SearchOptions,
+    parse_search_options,
+    set_nprobe,
+    to_search_parameters,
+)
+from faiss_grpc.streaming import StreamSearcher, serve_search_stream
+from faiss_grpc.threads import ThreadPolicy
+from faiss_grpc.tombstones import Tombstones
+from faiss_grpc.wal import IndexWriter
+
+if TYPE_CHECKING:
+    # multi_index imports this module for FaissServiceServicer
+    from faiss_grpc.multi_index import MultiIndexServicer
+
+logger = logging.getLogger(__name__)
 
 
 @dataclass(eq=True, frozen=True)
@@ -24,72 +102,818 @@ class ServerConfig:
     host: str = '[::]'
     port: int = 50051
     max_workers: int = 10
+    processes: int = 1
+    index_load_mode: IndexLoadMode = IndexLoadMode.auto
+    reload_interval: Optional[float] = None
+    # port of http endpoint serving prometheus metrics, disabled if unset
+    metrics_port: Optional[int] = None
+    # bytes of indexes kept loaded when serving a directory or manifest of
+    # indexes, least recently used ones are evicted over it
+    index_memory_budget: Optional[int] = None
+    # fan out searches to backend servers instead of serving an index
+    coordinator: Optional[CoordinatorConfig] = None
+    # directory of write-ahead log and snapshots, which makes index
+    # writable by Add, AddWithIds and Remove. index is written to a snapshot
+    # every snapshot_interval seconds, and the log is synced on every write
+    # if wal_sync is true. removed ids are deleted from index with ids given
+    # by add_with_ids before a snapshot, once compaction_threshold of them
+    # are waiting.
+    wal_dir: Optional[str] = None
+    snapshot_interval: float = 60.0
+    wal_sync: bool = True
+    compaction_threshold: int = 1000
+
+    def resolve_index_load_mode(self) -> IndexLoadMode:
+        # worker processes map the same index file, so that memory is shared
+        if self.index_load_mode is IndexLoadMode.auto:
+            if self.processes > 1:
+                return IndexLoadMode.mmap
+            return IndexLoadMode.read
+        return self.index_load_mode
 
 
 @dataclass(eq=True, frozen=True)
 class FaissServiceConfig:
     nprobe: Optional[int] = None
     normalize_query: bool = False
+    max_batch_size: Optional[int] = None
+    max_batch_wait_us: int = 500
+    cache_size: int = 0
+    cache_ttl: Optional[float] = None
+    # memory of cached results, which are larger for larger k
+    cache_max_bytes: Optional[int] = None
+    reconstruct_cache_size: int = 0
+    max_nprobe: Optional[int] = None
+    max_ef_search: Optional[int] = None
+    knn_table_path: Optional[str] = None
+    # OpenMP threads of a single query search, and total of all batch
+    # searches running concurrently. faiss default is used if unset.
+    search_threads: Optional[int] = None
+    batch_search_threads: Optional[int] = None
+    # upper limit of neighbors returned for each query of range search
+    max_range_results: Optional[int] = None
 
 
 class FaissServiceServicer(FaissServiceServicer):
-    def __init__(self, index: Index, config: FaissServiceConfig) -> None:
-        self.index = index
+    def __init__(
+        self,
+        index: Index,
+        config: FaissServiceConfig,
+        index_loader: Optional[Callable[[], Index]] = None,
+        metrics: Optional[Metrics] = None,
+        thread_policy: Optional[ThreadPolicy] = None,
+        writer: Optional[IndexWriter] = None,
+    ) -> None:
         self.config = config
-        if self.config.nprobe:
-            self.index.nprobe = self.config.nprobe
+        self.metrics = metrics
+        self.index = self.prepare_index(index)
+        # vectors added after the last snapshot are added again, before the
+        # knn table is checked against number of vectors
+        self.writer = writer
+        if self.writer:
+            self.writer.recover(self.index, self.swap_index)
+        self.knn_table = self.load_knn_table(self.index)
+        self.index_loader = index_loader
+        self._reload_lock = threading.Lock()
+        self.thread_policy = thread_policy or ThreadPolicy(
+            self.config.search_threads, self.config.batch_search_threads
+        )
+        self.batcher: Optional[SearchBatcher] = None
+        if self.config.max_batch_size:
+            self.batcher = SearchBatcher(
+                self.search_index,
+                self.config.max_batch_size,
+                self.config.max_batch_wait_us,
+            )
+        # results depend on normalize_query and nprobe too, but they are
+        # fixed for a servicer, so only query and k are used as cache key
+        self.cache: Optional[LRUCache[SearchResult]] = None
+        if self.config.cache_size:
+            self.cache = LRUCache(
+                self.config.cache_size,
+                self.config.cache_ttl,
+                self.config.cache_max_bytes,
+                result_bytes,
+            )
+        self.vector_cache: Optional[LRUCache[np.ndarray]] = None
+        if self.config.reconstruct_cache_size:
+            self.vector_cache = LRUCache(self.config.reconstruct_cache_size)
 
     def Search(self, request, context) -> SearchResponse:
-        query = np.atleast_2d(np.array(request.query.val, dtype=np.float32))
-        if query.shape[1] != self.index.d:
+        try:
+            query = self.to_queries([request.query])
+            options = self.to_search_options(request)
+        except ValueError as e:
             context.set_code(grpc.StatusCode.INVALID_ARGUMENT)
-            msg = (
-                'query vector dimension mismatch '
-                f'expected {self.index.d} but passed {query.shape[1]}'
-            )
-            context.set_details(msg)
+            context.set_details(str(e))
             return SearchResponse()
 
-        if self.config.normalize_query:
-            query = self.normalize(query)
-
-        distances, ids = self.index.search(query, request.k)
-
-        neighbors: List[Neighbor] = []
-        for d, i in zip(distances[0], ids[0]):
-            if i != -1:
-                neighbors.append(Neighbor(id=i, score=d))
+        search = functools.partial(
+            self.search_query, query, request.k, options
+        )
+        if self.cache:
+            key = ('query', LRUCache.query_key(query), request.k, options)
+            distances, ids = self.cache.get_or_compute(key, search)
+        else:
+            distances, ids = search()
 
-        return SearchResponse(neighbors=neighbors)
+        with self.stage('response'):
+            return to_search_response(
+                distances[0], ids[0], request.response_format
+            )
 
     def SearchById(self, request, context) -> SearchByIdResponse:
+        # same index must be used from id check to search, even if index is
+        # reloaded meanwhile
+        index = self.index
         request_id = request.id
-        maximum_id = self.index.ntotal - 1
-        if not (0 <= request_id <= maximum_id):
+        try:
+            self.check_id(index, request_id)
+            options = self.to_search_options(request)
+        except ValueError as e:
             context.set_code(grpc.StatusCode.INVALID_ARGUMENT)
-            msg = f'request id must be 0 <= id <= {maximum_id}'
-            context.set_details(msg)
+            context.set_details(str(e))
             return SearchByIdResponse()
 
-        query = self.index.reconstruct_n(request_id, 1)
+        search = functools.partial(
+            self.search_by_id, index, request_id, request.k, options
+        )
+        knn_table = self.knn_table_for(request.k, options)
+        if knn_table is not None:
+            distances, ids = knn_table.lookup(request_id, request.k)
+        elif self.cache:
+            key = ('id', request_id, request.k, options)
+            distances, ids = self.cache.get_or_compute(key, search)
+        else:
+            distances, ids = search()
+
+        with self.stage('response'):
+            response = to_search_by_id_response(
+                request_id, distances, ids, request.response_format
+            )
+        if request.include_query:
+            response.query.CopyFrom(
+                encode_vector(self.reconstruct(index, request_id))
+            )
+        return response
+
+    def SearchByIds(self, request, context) -> SearchByIdsResponse:
+        if len(request.ids) == 0:
+            return SearchByIdsResponse()
+        try:
+            options = self.to_search_options(request)
+        except ValueError as e:
+            context.set_code(grpc.StatusCode.INVALID_ARGUMENT)
+            context.set_details(str(e))
+            return SearchByIdsResponse()
+        index = self.index
+        request_ids = np.array(request.ids, dtype=np.uint64)
+        # invalid ids are reported in their own results, and others are
+        # searched at once
+        found = self.find_ids(index, request_ids)
+        ids = request_ids[found].astype(np.int64)
 
-        distances, ids = self.index.search(query, request.k + 1)
+        knn_table = self.knn_table_for(request.k, options)
+        # vectors of found ids are searched, and returned if requested
+        queries = np.empty((0, index.d), dtype=np.float32)
+        if ids.size and (request.include_query or knn_table is None):
+            queries = self.reconstruct_batch(index, ids)
+        if ids.size == 0:
+            distances, neighbors = np.empty((0, 0)), np.empty((0, 0))
+        elif knn_table is not None:
+            distances, neighbors = knn_table.lookup_rows(ids, request.k)
+        else:
+            distances, neighbors = self.search_by_ids(
+                index, ids, queries, request.k, options
+            )
 
-        neighbors: List[Neighbor] = []
-        for d, i in zip(distances[0], ids[0]):
-            if i not in [request_id, -1]:
-                neighbors.append(Neighbor(id=i, score=d))
+        with self.stage('response'):
+            response = self.to_search_by_ids_response(
+                index, request, found, distances, neighbors
+            )
+        if request.include_query:
+            for position, query in zip(np.flatnonzero(found), queries):
+                response.results[position].query.CopyFrom(encode_vector(query))
+        return response
 
-        return SearchByIdResponse(request_id=request_id, neighbors=neighbors)
+    def BatchSearch(self, request, context) -> BatchSearchResponse:
+        if len(request.queries) == 0:
+            return BatchSearchResponse()
+        try:
+            queries = self.to_queries(request.queries)
+            options = self.to_search_options(request)
+        except ValueError as e:
+            context.set_code(grpc.StatusCode.INVALID_ARGUMENT)
+            context.set_details(str(e))
+            return BatchSearchResponse()
+
+        distances, ids = self.search_index(queries, request.k, options)
+
+        with self.stage('response'):
+            results = [
+                to_search_response(d, i, request.response_format)
+                for d, i in zip(distances, ids)
+            ]
+
+        return BatchSearchResponse(results=results)
+
+    def RangeSearch(self, request, context) -> RangeSearchResponse:
+        if len(request.queries) == 0:
+            return RangeSearchResponse()
+        try:
+            queries = self.to_queries(request.queries)
+            options = self.to_search_options(request)
+        except ValueError as e:
+            context.set_code(grpc.StatusCode.INVALID_ARGUMENT)
+            context.set_details(str(e))
+            return RangeSearchResponse()
+
+        try:
+            lims, distances, ids = self.range_search_index(
+                queries,
+                request.radius,
+                self.range_results_limit(request.max_results),
+                options,
+            )
+        except RuntimeError as e:
+            # e.g. HNSW index does not implement range search
+            context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+            context.set_details(str(e))
+            return RangeSearchResponse()
+
+        with self.stage('response'):
+            results = [
+                to_search_response(d, i, request.response_format)
+                for d, i in split_range_result(lims, distances, ids)
+            ]
+
+        return RangeSearchResponse(results=results)
+
+    def SearchStream(
+        self, request_iterator, context
+    ) -> Iterator[SearchStreamResponse]:
+        return serve_search_stream(
+            self.stream_searcher(), request_iterator, context
+        )
+
+    def Add(self, request, context) -> AddResponse:
+        if len(request.vectors) == 0:
+            return AddResponse(ntotal=self.index.ntotal)
+        try:
+            vectors = self.to_vectors(request.vectors)
+        except ValueError as e:
+            context.set_code(grpc.StatusCode.INVALID_ARGUMENT)
+            context.set_details(str(e))
+            return AddResponse()
+
+        try:
+            ids = self.add(vectors)
+        except RuntimeError as e:
+            context.set_code(grpc.StatusCode.FAILED_PRECONDITION)
+            context.set_details(str(e))
+            return AddResponse()
+
+        return AddResponse(ids=ids.tolist(), ntotal=self.index.ntotal)
+
+    def AddWithIds(self, request, context) -> AddResponse:
+        if len(request.vectors) == 0 and len(request.ids) == 0:
+            return AddResponse(ntotal=self.index.ntotal)
+        try:
+            vectors = self.to_vectors(request.vectors)
+            ids = self.to_ids(request.ids, len(vectors))
+        except ValueError as e:
+            context.set_code(grpc.StatusCode.INVALID_ARGUMENT)
+            context.set_details(str(e))
+            return AddResponse()
+
+        try:
+            ids = self.add(vectors, ids)
+        except RuntimeError as e:
+            # e.g. index without ids or IVF index with sequential ids
+            context.set_code(grpc.StatusCode.FAILED_PRECONDITION)
+            context.set_details(str(e))
+            return AddResponse()
+
+        return AddResponse(ids=ids.tolist(), ntotal=self.index.ntotal)
+
+    def Remove(self, request, context) -> RemoveResponse:
+        if len(request.ids) == 0:
+            return RemoveResponse()
+        ids = np.array(request.ids, dtype=np.uint64).astype(np.int64)
+        try:
+            removed = self.remove(ids)
+        except ValueError as e:
+            context.set_code(grpc.StatusCode.INVALID_ARGUMENT)
+            context.set_details(str(e))
+            return RemoveResponse()
+        except RuntimeError as e:
+            context.set_code(grpc.StatusCode.FAILED_PRECONDITION)
+            context.set_details(str(e))
+            return RemoveResponse()
+
+        return RemoveResponse(removed=removed)
+
+    def stream_searcher(self) -> StreamSearcher:
+        return StreamSearcher(lambda request: self, self.metrics)
+
+    def Reload(self, request, context) -> ReloadResponse:
+        try:
+            index = self.reload()
+        except (AttributeError, RuntimeError, ValueError) as e:
+            context.set_code(grpc.StatusCode.FAILED_PRECONDITION)
+            context.set_details(str(e))
+            return ReloadResponse()
+
+        return ReloadResponse(ntotal=index.ntotal)
+
+    def Stats(self, request, context) -> StatsResponse:
+        return StatsResponse(values=self.stats())
 
     def Heatbeat(self, request, context) -> HeatbeatResponse:
         return HeatbeatResponse(message='OK')
 
+    def stats(self) -> Dict[str, float]:
+        values = self.thread_policy.stats()
+        values['index_ntotal'] = self.index.ntotal
+        values['process_cpu_seconds'] = time.process_time()
+        if self.writer:
+            values.update(self.writer.stats())
+        for name, cache in (
+            ('cache', self.cache),
+            ('reconstruct_cache', self.vector_cache),
+        ):
+            if cache:
+                values[f'{name}_hits'] = cache.hits
+                values[f'{name}_misses'] = cache.misses
+                values[f'{name}_size'] = cache.size
+                values[f'{name}_bytes'] = cache.bytes
+        return values
+
+    def prepare_index(self, index: Index) -> Index:
+        if self.config.nprobe and not set_nprobe(index, self.config.nprobe):
+            logger.warning(
+                'nprobe is not used for %s without inverted lists',
+                type(index).__name__,
+            )
+        make_direct_map(index)
+        return index
+
+    def load_knn_table(self, index: Index) -> Optional[KnnTable]:
+        if not self.config.knn_table_path:
+            return None
+        if not has_sequential_ids(index):
+            logger.warning('knn table is not used for non sequential ids')
+            return None
+        if self.removed_ids() is not None:
+            logger.warning('knn table is not used for index with removed ids')
+            return None
+        knn_table = KnnTable.load(self.config.knn_table_path)
+        if knn_table.ntotal != index.ntotal:
+            # table was built for another index, searching is safer than
+            # returning wrong neighbors
+            logger.warning(
+                'knn table has %d rows but index has %d vectors, '
+                'table is not used',
+                knn_table.ntotal,
+                index.ntotal,
+            )
+            return None
+        logger.info('loaded knn table of k=%d', knn_table.k)
+        return knn_table
+
+    def knn_table_for(
+        self, k: int, options: Optional[SearchOptions]
+    ) -> Optional[KnnTable]:
+        # table is read once, because it is swapped with index on reloading.
+        # it was built with parameters of index, so searches with other
+        # parameters can not use it.
+        knn_table = self.knn_table
+        if knn_table is None or k > knn_table.k or options is not None:
+            return None
+        return knn_table
+
+    def search_index(
+        self,
+        queries: np.ndarray,
+        k: int,
+        options: Optional[SearchOptions] = None,
+    ) -> SearchResult:
+        # index is read once per search, so running searches are finished on
+        # the index they started with while another one is swapped in
+        return self.search_on(self.index, queries, k, options)
+
+    def search_on(
+        self,
+        index: Index,
+        queries: np.ndarray,
+        k: int,
+        options: Optional[SearchOptions],
+    ) -> SearchResult:
+        removed = self.removed_ids()
+        if removed is not None and not removed.selectable:
+            # index can not skip removed ids while searching, so they are
+            # masked from results of more neighbors
+            distances, ids = self.search_with(
+                index, queries, k + len(removed), options
+            )
+            return removed.mask(distances, ids, k, is_similarity(index))
+        return self.search_with(index, queries, k, options, removed)
+
+    def search_with(
+        self,
+        index: Index,
+        queries: np.ndarray,
+        k: int,
+        options: Optional[SearchOptions],
+        removed: Optional[Tombstones] = None,
+    ) -> SearchResult:
+        params = self.search_parameters(index, options, removed)
+        if self.metrics:
+            self.metrics.observe(
+                SEARCH_BATCH_SIZE, queries.shape[0], (), BATCH_SIZE_BUCKETS
+            )
+        with self.reading(), self.thread_policy.limit(
+            queries.shape[0]
+        ), self.stage('search'):
+            return index.search(queries, k, params=params)
+
+    def range_search_index(
+        self,
+        queries: np.ndarray,
+        radius: float,
+        max_results: Optional[int],
+        options: Optional[SearchOptions],
+    ) -> RangeResult:
+        index = self.index
+        removed = self.removed_ids()
+        params = self.search_parameters(index, options, removed)
+        with self.reading(), self.thread_policy.limit(
+            queries.shape[0]
+        ), self.stage('search'):
+            lims, distances, ids = index.range_search(
+                queries, radius, params=params
+            )
+        if removed is not None and not removed.selectable:
+            lims, distances, ids = removed.mask_range(lims, distances, ids)
+        # neighbors are sorted nearest first, so that capped results keep
+        # the nearest ones
+        return sort_range_result(
+            lims, distances, ids, is_similarity(index), max_results
+        )
+
+    @staticmethod
+    def search_parameters(
+        index: Index,
+        options: Optional[SearchOptions],
+        removed: Optional[Tombstones],
+    ) -> Optional[faiss.SearchParameters]:
+        if removed is not None and removed.selectable:
+            # faiss skips removed ids while searching
+            return to_search_parameters(
+                index, options or SearchOptions(), removed.selector
+            )
+        if options is None:
+            return None
+        return to_search_parameters(index, options)
+
+    def removed_ids(self) -> Optional[Tombstones]:
+        # removed ids are read once per search, like index
+        if self.writer is None:
+            return None
+        removed = self.writer.tombstones
+        return removed if len(removed) else None
+
+    def range_results_limit(self, max_results: int) -> Optional[int]:
+        limits = [
+            limit
+            for limit in (max_results, self.config.max_range_results)
+            if limit
+        ]
+        return min(limits) if limits else None
+
+    def stage(self, name: str) -> ContextManager[Any]:
+        return time_stage(self.metrics, name)
+
+    def reading(self) -> ContextManager[Any]:
+        # searches wait while vectors are added to writable index
+        if self.writer is None:
+            return nullcontext()
+        return self.writer.reading()
+
+    def search_query(
+        self, query: np.ndarray, k: int, options: Optional[SearchOptions]
+    ) -> SearchResult:
+        batcher = self.batcher
+        if batcher:
+            try:
+                future = batcher.submit(query, k, options)
+            except RuntimeError:
+                # batcher was closed by evicting the index meanwhile
+                return self.search_index(query, k, options)
+            return future.result()
+        return self.search_index(query, k, options)
+
+    def to_search_options(self, request: Any) -> Optional[SearchOptions]:
+        if not request.HasField('params'):
+            return None
+        options = parse_search_options(
+            request.params, self.config.max_nprobe, self.config.max_ef_search
+        )
+        if options is not None:
+            # fails before searching if index does not support them
+            to_search_parameters(self.index, options)
+        return options
+
+    def check_id(self, index: Index, request_id: int) -> None:
+        removed = self.removed_ids()
+        if removed is not None and request_id in removed:
+            raise ValueError(f'request id {request_id} is removed from index')
+        if has_sequential_ids(index):
+            maximum_id = index.ntotal - 1
+            if not (0 <= request_id <= maximum_id):
+                raise ValueError(f'request id must be 0 <= id <= {maximum_id}')
+            return
+        try:
+            self.reconstruct(index, request_id)
+        except (RuntimeError, OverflowError):
+            raise ValueError(f'request id {request_id} is not found in index')
+
+    def id_error(self, index: Index, request_id: int) -> str:
+        try:
+            self.check_id(index, request_id)
+        except ValueError as e:
+            return str(e)
+        return ''
+
+    def find_ids(self, index: Index, request_ids: np.ndarray) -> np.ndarray:
+        if has_sequential_ids(index):
+            found = request_ids < index.ntotal
+            removed = self.removed_ids()
+            if removed is not None:
+                found &= ~removed.contains(request_ids.astype(np.int64))
+            return found
+        # hashtable direct map can only be looked up one by one
+        return np.array(
+            [not self.id_error(index, i) for i in request_ids.tolist()],
+            dtype=bool,
+        )
+
+    def reconstruct(self, index: Index, request_id: int) -> np.ndarray:
+        with self.reading(), self.stage('reconstruct'):
+            return self._reconstruct(index, request_id)
+
+    def _reconstruct(self, index: Index, request_id: int) -> np.ndarray:
+        if self.vector_cache:
+            return self.vector_cache.get_or_compute(
+                request_id, lambda: index.reconstruct(request_id)
+            )
+        return index.reconstruct(request_id)
+
+    def search_by_id(
+        self,
+        index: Index,
+        request_id: int,
+        k: int,
+        options: Optional[SearchOptions],
+    ) -> SearchResult:
+        query = self.reconstruct(index, request_id)[np.newaxis]
+
+        distances, ids = self.search_on(index, query, k + 1, options)
+
+        distances, ids = distances[0], ids[0]
+        found = (ids != -1) & (ids != request_id)
+        return distances[found], ids[found]
+
+    def reconstruct_batch(self, index: Index, ids: np.ndarray) -> np.ndarray:
+        with self.reading(), self.stage('reconstruct'):
+            return index.reconstruct_batch(ids)
+
+    def search_by_ids(
+        self,
+        index: Index,
+        ids: np.ndarray,
+        queries: np.ndarray,
+        k: int,
+        options: Optional[SearchOptions],
+    ) -> SearchResult:
+        distances, neighbors = self.search_on(index, queries, k + 1, options)
+
+        return exclude_self(distances, neighbors, ids, k)
+
+    def close(self) -> None:
+        # stops batching thread of an index which is no longer served
+        batcher, self.batcher = self.batcher, None
+        if batcher:
+            batcher.close()
+        close_index(self.index)
+
+    def add(
+        self, vectors: np.ndarray, ids: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        if self.writer is None:
+            raise RuntimeError(
+                'index is not writable, server must be started with '
+                'write-ahead log'
+            )
+        ids = self.writer.add(vectors, ids)
+        # cached results and knn table do not have added vectors
+        self.knn_table = None
+        if self.cache:
+            self.cache.clear()
+        return ids
+
+    def remove(self, ids: np.ndarray) -> int:
+        if self.writer is None:
+            raise RuntimeError(
+                'index is not writable, server must be started with '
+                'write-ahead log'
+            )
+        removed = self.writer.remove(ids)
+        # removed ids can be added again after compaction, with another
+        # vector
+        self.knn_table = None
+        if self.cache:
+            self.cache.clear()
+        if self.vector_cache:
+            self.vector_cache.clear()
+        return removed
+
+    def swap_index(self, index: Index) -> None:
+        # index compacted by writer has the same vectors except removed ones,
+        # so cached results are still valid
+        self.index = index
+        logger.info('swapped compacted index, ntotal=%d', index.ntotal)
+
+    def reload(self) -> Index:
+        if self.index_loader is None:
+            raise RuntimeError('index reloading is not supported')
+        if self.writer is not None:
+            # index file does not have vectors added after it was written
+            raise RuntimeError(
+                'index reloading is not supported with write-ahead log'
+            )
+
+        with self._reload_lock:
+            index = self.prepare_index(self.index_loader())
+            if index.d != self.index.d:
+                raise ValueError(
+                    'reloaded index dimension mismatch expected '
+                    f'{self.index.d} but loaded {index.d}'
+                )
+            knn_table = self.load_knn_table(index)
+            warm_up(index)
+            previous, self.index = self.index, index
+            self.knn_table = knn_table
+            if self.cache:
+                self.cache.clear()
+            if self.vector_cache:
+                self.vector_cache.clear()
+
+        logger.info('swapped index, ntotal=%d', index.ntotal)
+        close_index(previous)
+        # previous index is freed when the last search on it has finished
+        weakref.finalize(previous, logger.info, 'released previous index')
+        return index
+
+    def to_queries(self, vectors: Sequence[Vector]) -> np.ndarray:
+        with self.stage('decode'):
+            queries = self.decode_queries(vectors)
+        if self.config.normalize_query:
+            with self.stage('normalize'):
+                queries = self.normalize(queries)
+        return queries
+
+    def to_vectors(self, vectors: Sequence[Vector]) -> np.ndarray:
+        # added vectors are normalized like queries, so that inner product
+        # index has unit vectors for cosine similarity
+        with self.stage('decode'):
+            decoded = self.decode_queries(vectors, 'added', 'vectors')
+        if self.config.normalize_query:
+            with self.stage('normalize'):
+                decoded = self.normalize(decoded)
+        return decoded
+
+    @staticmethod
+    def to_ids(ids: Sequence[int], count: int) -> np.ndarray:
+        if len(ids) != count:
+            raise ValueError(
+                f'number of ids {len(ids)} does not match number of vectors '
+                f'{count}'
+            )
+        return np.array(ids, dtype=np.uint64).astype(np.int64)
+
+    def decode_queries(
+        self,
+        vectors: Sequence[Vector],
+        name: str = 'query',
+        field: str = 'queries',
+    ) -> np.ndarray:
+        decoded = [decode_vector(v) for v in vectors]
+        dimensions = np.array([v.shape[0] for v in decoded])
+        mismatched = np.flatnonzero(dimensions != self.index.d)
+        if mismatched.size > 0:
+            msg = (
+                f'{name} vector dimension mismatch expected '
+                f'{self.index.d} but passed {dimensions[mismatched[0]]}'
+            )
+            if dimensions.size > 1:
+                msg += f' at {field}[{mismatched[0]}]'
+            raise ValueError(msg)
+
+        # decoded vectors are copied once into rows of queries
+        queries = np.empty((len(decoded), self.index.d), dtype=np.float32)
+        for row, vector in enumerate(decoded):
+            queries[row] = vector
+        return queries
+
+    def to_search_by_ids_response(
+        self,
+        index: Index,
+        request: SearchByIdsRequest,
+        found: np.ndarray,
+        distances: np.ndarray,
+        neighbors: np.ndarray,
+    ) -> SearchByIdsResponse:
+        results = []
+        rows = zip(distances, neighbors)
+        for request_id, is_found in zip(request.ids, found):
+            if is_found:
+                result = to_search_by_id_response(
+                    request_id, *next(rows), request.response_format
+                )
+            else:
+                error = self.id_error(index, request_id)
+                result = SearchByIdResponse(request_id=request_id, error=error)
+            results.append(result)
+        return SearchByIdsResponse(results=results)
+
     @staticmethod
     def normalize(vec: np.ndarray) -> np.ndarray:
         return vec / np.linalg.norm(vec, axis=1, keepdims=True)
 
 
+Servicer = Union[
+    FaissServiceServicer, 'MultiIndexServicer', CoordinatorServicer
+]
+
+
+def create_servicer(
+    index_path: str,
+    server_config: ServerConfig,
+    service_config: FaissServiceConfig,
+    metrics: Optional[Metrics] = None,
+) -> Servicer:
+    if server_config.coordinator is not None:
+        return CoordinatorServicer(server_config.coordinator)
+    load_mode = server_config.resolve_index_load_mode()
+    writer = create_writer(index_path, server_config)
+    if not is_sharded(index_path) and is_index_catalog(index_path):
+        from faiss_grpc.multi_index import MultiIndexServicer
+
+        return MultiIndexServicer(
+            index_path,
+            service_config,
+            load_mode,
+            server_config.index_memory_budget,
+            metrics,
+        )
+    # searches on shards are bounded by gRPC workers
+    loader = index_loader(index_path, load_mode, server_config.max_workers)
+    if writer:
+        loader = writer.loader(loader)
+    return FaissServiceServicer(
+        loader(), service_config, loader, metrics, writer=writer
+    )
+
+
+def servicer_writer(servicer: Servicer) -> Optional[IndexWriter]:
+    if isinstance(servicer, FaissServiceServicer):
+        return servicer.writer
+    return None
+
+
+def create_writer(
+    index_path: str, server_config: ServerConfig
+) -> Optional[IndexWriter]:
+    if server_config.wal_dir is None:
+        return None
+    if is_sharded(index_path) or is_index_catalog(index_path):
+        raise ValueError('only single index file can be written')
+    if server_config.resolve_index_load_mode() is IndexLoadMode.mmap:
+        raise ValueError('index loaded with mmap mode can not be written')
+    if server_config.reload_interval:
+        raise ValueError(
+            'index can not be reloaded on change with write-ahead log, '
+            'because snapshots are written by server'
+        )
+    return IndexWriter(
+        server_config.wal_dir,
+        server_config.snapshot_interval,
+        server_config.wal_sync,
+        server_config.compaction_threshold,
+    )
+
+
 class Server:
     def __init__(
         self,
@@ -97,17 +921,59 @@ class Server:
         server_config: ServerConfig,
         service_config: FaissServiceConfig,
     ) -> None:
-        index = faiss.read_index(index_path)
-        self.server = grpc.server(
-            futures.ThreadPoolExecutor(max_workers=server_config.max_workers)
+        self.metrics: Optional[Metrics] = None
+        if server_config.metrics_port is not None:
+            self.metrics = Metrics()
+        self.servicer = create_servicer(
+            index_path, server_config, service_config, self.metrics
         )
-        add_FaissServiceServicer_to_server(
-            FaissServiceServicer(index, service_config), self.server
+        self.writer = servicer_writer(self.servicer)
+        self.watcher: Optional[IndexFileWatcher] = None
+        if server_config.reload_interval:
+            self.watcher = IndexFileWatcher(
+                index_path, server_config.reload_interval, self.servicer.reload
+            )
+        executor = MonitoredThreadPoolExecutor(
+            max_workers=server_config.max_workers
         )
-        self.server.add_insecure_port(
-            f'{server_config.host}:{server_config.port}'
+        self.metrics_server: Optional[MetricsServer] = None
+        interceptors = []
+        if self.metrics:
+            interceptors.append(MetricsInterceptor(self.metrics))
+            self.metrics.add_collector(self.servicer.stats)
+            self.metrics.add_collector(executor.stats)
+            assert server_config.metrics_port is not None
+            self.metrics_server = MetricsServer(
+                self.metrics, server_config.metrics_port
+            )
+        self.server = grpc.server(
+            executor,
+            interceptors=interceptors,
+            options=[('grpc.so_reuseport', 1)],
         )
+        add_FaissServiceServicer_to_server(self.servicer, self.server)
+        self.address = f'{server_config.host}:{server_config.port}'
+        self.server.add_insecure_port(self.address)
 
     def serve(self) -> None:
+        signal.signal(
+            RELOAD_SIGNAL,
+            lambda signum, frame: reload_in_background(self.servicer.reload),
+        )
+        if self.watcher:
+            self.watcher.start()
+        if self.writer:
+            self.writer.start()
+        if self.metrics_server:
+            self.metrics_server.start()
         self.server.start()
-        self.server.wait_for_termination()
+        logger.info('server started on %s', self.address)
+        try:
+            self.server.wait_for_termination()
+        finally:
+            if self.watcher:
+                self.watcher.close()
+            if self.writer:
+                self.writer.close()
+            if self.metrics_server:
+                self.metrics_server.close()
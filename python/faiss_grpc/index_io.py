@@ -0,0 +1,264 @@
+import functools
+import json
+import logging
+import os
+import time
+from concurrent import futures
+from enum import Enum, unique
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+import faiss
+import numpy as np
+from faiss import Index
+
+from faiss_grpc.sharding import DEFAULT_MAX_SEARCHES, ShardedIndex
+
+logger = logging.getLogger(__name__)
+
+WARMUP_QUERIES = 64
+SHARD_SEPARATOR = ','
+
+FileState = Tuple[int, int, int]
+
+
+@unique
+class IndexLoadMode(Enum):
+    # mmap if server runs multiple processes, otherwise read
+    auto = 'auto'
+    # read whole index into heap
+    read = 'read'
+    # map the index file read-only where the index type supports it
+    mmap = 'mmap'
+
+
+def read_index(
+    index_path: str, mode: IndexLoadMode = IndexLoadMode.read
+) -> Index:
+    if mode is IndexLoadMode.auto:
+        raise ValueError('auto load mode must be resolved before loading')
+
+    # IO_FLAG_MMAP maps inverted lists of IVF indexes from the file instead of
+    # reading them into heap. other index types are read as usual.
+    io_flags = 0
+    if mode is IndexLoadMode.mmap:
+        io_flags = faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY
+
+    start = time.monotonic()
+    index = faiss.read_index(index_path, io_flags)
+    elapsed = time.monotonic() - start
+
+    mapped = mapped_bytes(index)
+    logger.info(
+        'loaded %s (%s, ntotal=%d) in %.3f seconds with %s mode',
+        index_path,
+        type(index).__name__,
+        index.ntotal,
+        elapsed,
+        mode.value,
+    )
+    if mapped:
+        logger.info(
+            '%d bytes of inverted lists are mapped from %s '
+            'and shared through page cache',
+            mapped,
+            index_path,
+        )
+    elif mode is IndexLoadMode.mmap:
+        logger.warning(
+            '%s does not support mmap, index was read into memory',
+            type(index).__name__,
+        )
+    return index
+
+
+def is_sharded(path: str) -> bool:
+    # comma separated shard files, or manifest of shards
+    return SHARD_SEPARATOR in path or is_shard_manifest(path)
+
+
+def is_shard_manifest(path: str) -> bool:
+    if not path.endswith('.json') or not os.path.isfile(path):
+        return False
+    with open(path) as f:
+        manifest = json.load(f)
+    return isinstance(manifest, dict) and 'shards' in manifest
+
+
+def read_shard_manifest(path: str) -> Tuple[List[str], bool]:
+    # {"shards": ["path", ...], "successive_ids": true}, and relative paths
+    # are resolved from directory of the manifest
+    with open(path) as f:
+        manifest = json.load(f)
+    shards = manifest['shards']
+    if not isinstance(shards, list) or not shards:
+        raise ValueError(f'shards of manifest {path} must be a list of paths')
+    successive_ids = manifest.get('successive_ids', True)
+    base = os.path.dirname(path)
+    return [os.path.join(base, shard) for shard in shards], successive_ids
+
+
+def shard_paths(path: str) -> Tuple[List[str], bool]:
+    if is_shard_manifest(path):
+        return read_shard_manifest(path)
+    return [p for p in path.split(SHARD_SEPARATOR) if p], True
+
+
+def index_files(path: str) -> List[str]:
+    # files which index is read from
+    if not is_sharded(path):
+        return [path]
+    shards, _ = shard_paths(path)
+    if is_shard_manifest(path):
+        return [path] + shards
+    return shards
+
+
+def file_state(path: str) -> Optional[FileState]:
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+
+class ShardedIndexLoader:
+    def __init__(
+        self,
+        path: str,
+        mode: IndexLoadMode = IndexLoadMode.read,
+        max_searches: int = DEFAULT_MAX_SEARCHES,
+    ) -> None:
+        self.path = path
+        self.mode = mode
+        self.max_searches = max_searches
+        # path -> (state of file, shard) of the last load
+        self._loaded: Dict[str, Tuple[Optional[FileState], Index]] = {}
+
+    def __call__(self) -> ShardedIndex:
+        paths, successive_ids = shard_paths(self.path)
+        start = time.monotonic()
+        # shards are read in parallel, and shards whose files are not
+        # changed since the last load are reused, so that a shard can be
+        # rebuilt and reloaded without reading the others
+        with futures.ThreadPoolExecutor(max_workers=len(paths)) as executor:
+            loaded = list(executor.map(self._load_shard, paths))
+        self._loaded = dict(zip(paths, loaded))
+        index = ShardedIndex(
+            [shard for _, shard in loaded], successive_ids, self.max_searches
+        )
+        logger.info(
+            'loaded %d shards (ntotal=%d) in %.3f seconds',
+            len(paths),
+            index.ntotal,
+            time.monotonic() - start,
+        )
+        return index
+
+    def _load_shard(self, path: str) -> Tuple[Optional[FileState], Index]:
+        state = file_state(path)
+        previous = self._loaded.get(path)
+        if previous is not None and state is not None and previous[0] == state:
+            return previous
+        return state, read_index(path, self.mode)
+
+
+def index_loader(
+    path: str,
+    mode: IndexLoadMode = IndexLoadMode.read,
+    max_searches: int = DEFAULT_MAX_SEARCHES,
+) -> Callable[[], Union[Index, ShardedIndex]]:
+    if is_sharded(path):
+        return ShardedIndexLoader(path, mode, max_searches)
+    return functools.partial(read_index, path, mode)
+
+
+def make_direct_map(index: Index) -> None:
+    # IVF index finds the list of an id by scanning all inverted lists,
+    # unless it has a direct map from id to its location
+    if isinstance(index, ShardedIndex):
+        for shard in index.shards:
+            make_direct_map(shard)
+        return
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is None or ivf.direct_map.type != faiss.DirectMap.NoMap:
+        return
+    start = time.monotonic()
+    try:
+        ivf.set_direct_map_type(faiss.DirectMap.Array)
+    except RuntimeError:
+        # array is only for sequential ids, ids given by add_with_ids are
+        # mapped by hashtable
+        ivf.set_direct_map_type(faiss.DirectMap.Hashtable)
+    logger.info(
+        'made %s direct map in %.3f seconds',
+        'array' if ivf.direct_map.type == faiss.DirectMap.Array else 'hash',
+        time.monotonic() - start,
+    )
+
+
+def has_sequential_ids(index: Index) -> bool:
+    # ids are 0 to ntotal - 1, unless they were given to IVF or IndexIDMap
+    # by add_with_ids
+    if isinstance(index, ShardedIndex):
+        return index.successive_ids and all(
+            has_sequential_ids(shard) for shard in index.shards
+        )
+    if isinstance(faiss.downcast_index(index), faiss.IndexIDMap):
+        return False
+    ivf = faiss.try_extract_index_ivf(index)
+    return ivf is None or ivf.direct_map.type != faiss.DirectMap.Hashtable
+
+
+def contains_ids(index: Index, ids: np.ndarray) -> np.ndarray:
+    # ids given by add_with_ids are looked up by id map of IndexIDMap, or
+    # direct map of IVF
+    index = faiss.downcast_index(index)
+    if isinstance(index, faiss.IndexPreTransform):
+        return contains_ids(index.index, ids)
+    if isinstance(index, faiss.IndexIDMap):
+        return np.isin(ids, faiss.vector_to_array(index.id_map))
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None and ivf.direct_map.type == faiss.DirectMap.Hashtable:
+        return np.array(
+            [in_direct_map(ivf.direct_map, i) for i in ids], dtype=bool
+        )
+    return (ids >= 0) & (ids < index.ntotal)
+
+
+def in_direct_map(direct_map: Any, id_: int) -> bool:
+    try:
+        direct_map.get(int(id_))
+    except RuntimeError:
+        return False
+    return True
+
+
+def close_index(index: Index) -> None:
+    # sharded index has threads searching its shards
+    if isinstance(index, ShardedIndex):
+        index.close()
+
+
+def mapped_bytes(index: Index) -> int:
+    if isinstance(index, ShardedIndex):
+        return sum(mapped_bytes(shard) for shard in index.shards)
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is None:
+        return 0
+    invlists = faiss.downcast_InvertedLists(ivf.invlists)
+    if isinstance(invlists, faiss.OnDiskInvertedLists):
+        return int(invlists.totsize)
+    return 0
+
+
+def warm_up(index: Index, queries: int = WARMUP_QUERIES) -> None:
+    # first searches pay for page faults and allocations, so they are made
+    # before the index receives traffic
+    start = time.monotonic()
+    xq = np.random.default_rng(0).random((queries, index.d), dtype=np.float32)
+    index.search(xq, 1)
+    logger.info(
+        'warmed up index with %d queries in %.3f seconds',
+        queries,
+        time.monotonic() - start,
+    )
@@ -0,0 +1,152 @@
+import argparse
+import logging
+import os
+import time
+from typing import List, Optional
+
+import faiss
+import numpy as np
+from faiss import Index
+
+from faiss_grpc.batching import SearchResult
+from faiss_grpc.index_io import (
+    IndexLoadMode,
+    has_sequential_ids,
+    make_direct_map,
+    read_index,
+)
+from faiss_grpc.search_params import set_nprobe
+
+logger = logging.getLogger(__name__)
+
+IDS_FILE = 'ids.npy'
+SCORES_FILE = 'scores.npy'
+DEFAULT_BATCH_SIZE = 4096
+
+
+class KnnTable:
+    def __init__(self, ids: np.ndarray, scores: np.ndarray) -> None:
+        if ids.shape != scores.shape:
+            raise ValueError(
+                f'shape of ids {ids.shape} and scores {scores.shape} differ'
+            )
+        self.ids = ids
+        self.scores = scores
+
+    @property
+    def ntotal(self) -> int:
+        return self.ids.shape[0]
+
+    @property
+    def k(self) -> int:
+        return self.ids.shape[1]
+
+    @classmethod
+    def load(cls, path: str) -> 'KnnTable':
+        # table is mapped, so rows are paged in on lookup and shared between
+        # worker processes
+        return cls(
+            np.load(os.path.join(path, IDS_FILE), mmap_mode='r'),
+            np.load(os.path.join(path, SCORES_FILE), mmap_mode='r'),
+        )
+
+    def lookup(self, request_id: int, k: int) -> SearchResult:
+        ids = self.ids[request_id, :k]
+        found = ids != -1
+        return self.scores[request_id, :k][found], ids[found]
+
+    def lookup_rows(self, request_ids: np.ndarray, k: int) -> SearchResult:
+        # missing neighbors are kept as -1, because rows must have same size
+        return self.scores[request_ids, :k], self.ids[request_ids, :k]
+
+
+def build_knn_table(
+    index: Index,
+    path: str,
+    k: int,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+) -> KnnTable:
+    if k < 1:
+        raise ValueError('k must be positive')
+    if batch_size < 1:
+        raise ValueError('batch_size must be positive')
+    # rows of table are looked up by id
+    make_direct_map(index)
+    if not has_sequential_ids(index):
+        raise ValueError('index ids must be sequential to build knn table')
+
+    os.makedirs(path, exist_ok=True)
+    shape = (index.ntotal, k)
+    ids = np.lib.format.open_memmap(
+        os.path.join(path, IDS_FILE), mode='w+', dtype=np.int64, shape=shape
+    )
+    scores = np.lib.format.open_memmap(
+        os.path.join(path, SCORES_FILE),
+        mode='w+',
+        dtype=np.float32,
+        shape=shape,
+    )
+
+    start = time.monotonic()
+    for begin in range(0, index.ntotal, batch_size):
+        n = min(batch_size, index.ntotal - begin)
+        # faiss searches rows of a chunk in parallel with its own threads
+        queries = index.reconstruct_n(begin, n)
+        distances, neighbors = index.search(queries, k + 1)
+        scores[begin : begin + n], ids[begin : begin + n] = exclude_self(
+            distances, neighbors, np.arange(begin, begin + n), k
+        )
+        logger.info('built %d/%d rows', begin + n, index.ntotal)
+
+    ids.flush()
+    scores.flush()
+    logger.info(
+        'built knn table of %d rows and k=%d in %.3f seconds',
+        index.ntotal,
+        k,
+        time.monotonic() - start,
+    )
+    return KnnTable(ids, scores)
+
+
+def exclude_self(
+    distances: np.ndarray, ids: np.ndarray, self_ids: np.ndarray, k: int
+) -> SearchResult:
+    # stable sort moves kept neighbors to the front of each row in their
+    # original order, then removed ones are marked as missing (-1)
+    keep = ids != self_ids[:, np.newaxis]
+    order = np.argsort(~keep, axis=1, kind='stable')[:, :k]
+    kept = np.take_along_axis(keep, order, axis=1)
+    distances = np.take_along_axis(distances, order, axis=1)
+    ids = np.where(kept, np.take_along_axis(ids, order, axis=1), -1)
+    return distances, ids
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(
+        description=(
+            'precompute k nearest neighbors of every vector in index, '
+            'which are served by SearchById without searching'
+        )
+    )
+    parser.add_argument('index_path')
+    parser.add_argument('output_path', help='directory to write table')
+    parser.add_argument('k', type=int)
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument('--nprobe', type=int, default=None)
+    parser.add_argument(
+        '--threads', type=int, default=None, help='number of faiss threads'
+    )
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    if args.threads:
+        faiss.omp_set_num_threads(args.threads)
+    index = read_index(args.index_path, IndexLoadMode.read)
+    if args.nprobe and not set_nprobe(index, args.nprobe):
+        logger.warning('nprobe is not used for index without inverted lists')
+    build_knn_table(index, args.output_path, args.k, args.batch_size)
+
+
+if __name__ == "__main__":
+    main()
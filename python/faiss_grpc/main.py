@@ -1,26 +1,87 @@
+import logging
+from typing import Optional
+
 from environs import Env
 
+from faiss_grpc.aio_server import AsyncServer
+from faiss_grpc.coordinator import BackendMetric, CoordinatorConfig
 from faiss_grpc.faiss_server import FaissServiceConfig, Server, ServerConfig
+from faiss_grpc.index_io import IndexLoadMode
+from faiss_grpc.prefork import PreforkServer
 
 env = Env()
 env.read_env()
 
 
 def main() -> None:
+    logging.basicConfig(
+        level=env.log_level("FAISS_GRPC_LOG_LEVEL", logging.INFO),
+        format='%(asctime)s %(process)d %(levelname)s %(name)s %(message)s',
+    )
     server_config = ServerConfig(
         host=env.str('FAISS_GRPC_HOST', '[::]'),
         port=env.int("FAISS_GRPC_PORT", 50051),
         max_workers=env.int("FAISS_GRPC_MAX_WORKERS", 10),
+        processes=env.int("FAISS_GRPC_PROCESSES", 1),
+        index_load_mode=IndexLoadMode(
+            env.str("FAISS_GRPC_INDEX_LOAD_MODE", IndexLoadMode.auto.value)
+        ),
+        reload_interval=env.float("FAISS_GRPC_RELOAD_INTERVAL", None),
+        metrics_port=env.int("FAISS_GRPC_METRICS_PORT", None),
+        index_memory_budget=env.int("FAISS_GRPC_INDEX_MEMORY_BUDGET", None),
+        coordinator=coordinator_config(),
+        wal_dir=env.str("FAISS_GRPC_WAL_DIR", None),
+        snapshot_interval=env.float("FAISS_GRPC_SNAPSHOT_INTERVAL", 60.0),
+        wal_sync=env.bool("FAISS_GRPC_WAL_SYNC", True),
+        compaction_threshold=env.int("FAISS_GRPC_COMPACTION_THRESHOLD", 1000),
     )
     service_config = FaissServiceConfig(
         nprobe=env.int("FAISS_GRPC_NPROBE", None),
+        max_nprobe=env.int("FAISS_GRPC_MAX_NPROBE", None),
+        max_ef_search=env.int("FAISS_GRPC_MAX_EF_SEARCH", None),
         normalize_query=env.bool("FAISS_GRPC_NORMALIZE_QUERY", False),
+        max_batch_size=env.int("FAISS_GRPC_MAX_BATCH_SIZE", None),
+        max_batch_wait_us=env.int("FAISS_GRPC_MAX_BATCH_WAIT_US", 500),
+        cache_size=env.int("FAISS_GRPC_CACHE_SIZE", 0),
+        cache_ttl=env.float("FAISS_GRPC_CACHE_TTL", None),
+        cache_max_bytes=env.int("FAISS_GRPC_CACHE_MAX_BYTES", None),
+        reconstruct_cache_size=env.int("FAISS_GRPC_RECONSTRUCT_CACHE_SIZE", 0),
+        knn_table_path=env.str("FAISS_GRPC_KNN_TABLE_PATH", None),
+        search_threads=env.int("FAISS_GRPC_SEARCH_THREADS", None),
+        batch_search_threads=env.int("FAISS_GRPC_BATCH_SEARCH_THREADS", None),
+        max_range_results=env.int("FAISS_GRPC_MAX_RANGE_RESULTS", None),
+    )
+
+    server_class = (
+        AsyncServer if env.bool("FAISS_GRPC_ASYNC", False) else Server
+    )
+    # coordinator does not serve an index
+    index_path = (
+        env.str("FAISS_GRPC_INDEX_PATH", '')
+        if server_config.coordinator
+        else env.str("FAISS_GRPC_INDEX_PATH")
     )
+    if server_config.processes > 1:
+        PreforkServer(
+            index_path, server_config, service_config, server_class
+        ).serve()
+    else:
+        server_class(index_path, server_config, service_config).serve()
+
 
-    server = Server(
-        env.str("FAISS_GRPC_INDEX_PATH"), server_config, service_config
+def coordinator_config() -> Optional[CoordinatorConfig]:
+    backends = env.list("FAISS_GRPC_BACKENDS", [])
+    if not backends:
+        return None
+    return CoordinatorConfig(
+        backends=tuple(backends),
+        backend_timeout=env.float("FAISS_GRPC_BACKEND_TIMEOUT", 1.0),
+        backend_channels=env.int("FAISS_GRPC_BACKEND_CHANNELS", 1),
+        min_backends=env.int("FAISS_GRPC_MIN_BACKENDS", 1),
+        metric=BackendMetric(
+            env.str("FAISS_GRPC_BACKEND_METRIC", BackendMetric.l2.value)
+        ),
     )
-    server.serve()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,391 @@
+import bisect
+import logging
+import threading
+import time
+from concurrent import futures
+from contextlib import contextmanager, nullcontext
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import (
+    Any,
+    Callable,
+    ContextManager,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
+import grpc
+
+logger = logging.getLogger(__name__)
+
+Labels = Tuple[Tuple[str, str], ...]
+Collector = Callable[[], Dict[str, float]]
+
+PREFIX = 'faiss_grpc_'
+RPC_SECONDS = PREFIX + 'rpc_seconds'
+REQUESTS_TOTAL = PREFIX + 'requests_total'
+STAGE_SECONDS = PREFIX + 'stage_seconds'
+REQUEST_K = PREFIX + 'request_k'
+SEARCH_BATCH_SIZE = PREFIX + 'search_batch_size'
+
+LATENCY_BUCKETS = (
+    0.0001,
+    0.00025,
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+K_BUCKETS = (1, 5, 10, 20, 50, 100, 200, 500, 1000)
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024)
+
+# context of async server returns status code as integer
+STATUS_CODES = {code.value[0]: code for code in grpc.StatusCode}
+
+
+class Histogram:
+    def __init__(self, buckets: Sequence[float]) -> None:
+        self.buckets = tuple(buckets)
+        # last count is for values above every bucket
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+
+class Metrics:
+    def __init__(self) -> None:
+        self._counters: Dict[str, Dict[Labels, float]] = {}
+        self._histograms: Dict[str, Dict[Labels, Histogram]] = {}
+        self._collectors: List[Collector] = []
+        self._lock = threading.Lock()
+
+    def inc(self, name: str, labels: Labels = (), value: float = 1) -> None:
+        with self._lock:
+            counter = self._counters.setdefault(name, {})
+            counter[labels] = counter.get(labels, 0) + value
+
+    def observe(
+        self,
+        name: str,
+        value: float,
+        labels: Labels = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ) -> None:
+        with self._lock:
+            histograms = self._histograms.setdefault(name, {})
+            histogram = histograms.get(labels)
+            if histogram is None:
+                histogram = histograms[labels] = Histogram(buckets)
+            histogram.observe(value)
+
+    @contextmanager
+    def time(self, name: str, labels: Labels = ()) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, labels)
+
+    def add_collector(self, collect: Collector) -> None:
+        # collectors return current values (e.g. running searches), which
+        # are exported as gauges prefixed by faiss_grpc_
+        self._collectors.append(collect)
+
+    def render(self) -> str:
+        gauges: Dict[str, float] = {}
+        for collect in self._collectors:
+            gauges.update(collect())
+
+        lines: List[str] = []
+        with self._lock:
+            for name, counter in sorted(self._counters.items()):
+                lines.append(f'# TYPE {name} counter')
+                for labels, value in sorted(counter.items()):
+                    lines.append(sample(name, labels, value))
+            for name, histograms in sorted(self._histograms.items()):
+                lines.append(f'# TYPE {name} histogram')
+                for labels, histogram in sorted(histograms.items()):
+                    lines.extend(render_histogram(name, labels, histogram))
+        for key, value in sorted(gauges.items()):
+            lines.append(f'# TYPE {PREFIX}{key} gauge')
+            lines.append(sample(PREFIX + key, (), value))
+        return '\n'.join(lines) + '\n'
+
+
+def time_stage(metrics: Optional[Metrics], name: str) -> ContextManager[Any]:
+    if metrics is None:
+        return nullcontext()
+    return metrics.time(STAGE_SECONDS, (('stage', name),))
+
+
+def render_histogram(
+    name: str, labels: Labels, histogram: Histogram
+) -> List[str]:
+    lines = []
+    cumulative = 0
+    bounds = [repr(float(b)) for b in histogram.buckets] + ['+Inf']
+    for bound, count in zip(bounds, histogram.counts):
+        cumulative += count
+        lines.append(
+            sample(f'{name}_bucket', labels + (('le', bound),), cumulative)
+        )
+    lines.append(sample(f'{name}_sum', labels, histogram.sum))
+    lines.append(sample(f'{name}_count', labels, cumulative))
+    return lines
+
+
+def sample(name: str, labels: Labels, value: float) -> str:
+    if not labels:
+        return f'{name} {value}'
+    pairs = ','.join(f'{k}="{escape(v)}"' for k, v in labels)
+    return f'{name}{{{pairs}}} {value}'
+
+
+def escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: '_MetricsHTTPServer'
+
+    def do_GET(self) -> None:
+        if self.path.split('?', 1)[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = self.server.metrics.render().encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        logger.debug(format, *args)
+
+
+class _MetricsHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, port: int, metrics: Metrics) -> None:
+        super().__init__(('', port), _Handler)
+        self.metrics = metrics
+
+
+class MetricsServer:
+    def __init__(self, metrics: Metrics, port: int) -> None:
+        self.httpd = _MetricsHTTPServer(port, metrics)
+        self._thread = threading.Thread(
+            target=self.httpd.serve_forever,
+            name='faiss-grpc-metrics',
+            daemon=True,
+        )
+
+    @property
+    def port(self) -> int:
+        return self.httpd.server_address[1]
+
+    def start(self) -> None:
+        self._thread.start()
+        logger.info('metrics are served on port %d', self.port)
+
+    def close(self) -> None:
+        if self._thread.is_alive():
+            self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class MonitoredThreadPoolExecutor(futures.ThreadPoolExecutor):
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self.queued = 0
+        self.running = 0
+        self._count_lock = threading.Lock()
+
+    def submit(self, fn, *args, **kwargs):  # type: ignore[override]
+        with self._count_lock:
+            self.queued += 1
+        return super().submit(self._run, fn, *args, **kwargs)
+
+    def _run(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        with self._count_lock:
+            self.queued -= 1
+            self.running += 1
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            with self._count_lock:
+                self.running -= 1
+
+    def stats(self) -> Dict[str, float]:
+        # tasks are RPCs on sync server, and searches on async server
+        return {
+            'worker_tasks_queued': self.queued,
+            'worker_tasks_running': self.running,
+        }
+
+
+def method_name(handler_call_details: grpc.HandlerCallDetails) -> str:
+    # /faiss.FaissService/Search -> Search
+    return handler_call_details.method.rsplit('/', 1)[-1]
+
+
+def behavior_name(handler: grpc.RpcMethodHandler) -> str:
+    return '{}_{}'.format(
+        'stream' if handler.request_streaming else 'unary',
+        'stream' if handler.response_streaming else 'unary',
+    )
+
+
+class _Recorder:
+    def __init__(self, metrics: Metrics, method: str) -> None:
+        self.metrics = metrics
+        self.method = method
+        self.labels: Labels = (('method', method),)
+
+    def deserializer(
+        self, deserialize: Optional[Callable[[bytes], Any]]
+    ) -> Optional[Callable[[bytes], Any]]:
+        if deserialize is None:
+            return None
+
+        def timed(data: bytes) -> Any:
+            with self.metrics.time(STAGE_SECONDS, (('stage', 'deserialize'),)):
+                request = deserialize(data)
+            # k of search requests, stream messages and Empty do not have it
+            k = getattr(request, 'k', None)
+            if k is not None:
+                self.metrics.observe(REQUEST_K, k, self.labels, K_BUCKETS)
+            return request
+
+        return timed
+
+    def serializer(
+        self, serialize: Optional[Callable[[Any], bytes]]
+    ) -> Optional[Callable[[Any], bytes]]:
+        if serialize is None:
+            return None
+
+        def timed(response: Any) -> bytes:
+            with self.metrics.time(STAGE_SECONDS, (('stage', 'serialize'),)):
+                return serialize(response)
+
+        return timed
+
+    def finish(self, context: Any, start: float, ok: bool) -> None:
+        self.metrics.observe(
+            RPC_SECONDS, time.perf_counter() - start, self.labels
+        )
+        # servicer reports errors by set_code, exceptions are UNKNOWN
+        code = STATUS_CODES.get(context.code(), context.code())
+        if code is None or (code is grpc.StatusCode.OK and not ok):
+            code = grpc.StatusCode.OK if ok else grpc.StatusCode.UNKNOWN
+        self.metrics.inc(REQUESTS_TOTAL, self.labels + (('code', code.name),))
+
+    def instrument(
+        self, handler: grpc.RpcMethodHandler, behavior: Callable
+    ) -> grpc.RpcMethodHandler:
+        return handler._replace(
+            **{behavior_name(handler): behavior},
+            request_deserializer=self.deserializer(
+                handler.request_deserializer
+            ),
+            response_serializer=self.serializer(handler.response_serializer),
+        )
+
+
+class MetricsInterceptor(grpc.ServerInterceptor):
+    def __init__(self, metrics: Metrics) -> None:
+        self.metrics = metrics
+
+    def intercept_service(
+        self,
+        continuation: Callable[
+            [grpc.HandlerCallDetails], Optional[grpc.RpcMethodHandler]
+        ],
+        handler_call_details: grpc.HandlerCallDetails,
+    ) -> Optional[grpc.RpcMethodHandler]:
+        handler = continuation(handler_call_details)
+        if handler is None:
+            return None
+        recorder = _Recorder(self.metrics, method_name(handler_call_details))
+        behavior = getattr(handler, behavior_name(handler))
+
+        def unary(request: Any, context: Any) -> Any:
+            start = time.perf_counter()
+            ok = False
+            try:
+                response = behavior(request, context)
+                ok = True
+                return response
+            finally:
+                recorder.finish(context, start, ok)
+
+        def stream(request: Any, context: Any) -> Iterator[Any]:
+            # latency of stream is until the last response is sent
+            start = time.perf_counter()
+            ok = False
+            try:
+                yield from behavior(request, context)
+                ok = True
+            finally:
+                recorder.finish(context, start, ok)
+
+        return recorder.instrument(
+            handler, stream if handler.response_streaming else unary
+        )
+
+
+class AsyncMetricsInterceptor(grpc.aio.ServerInterceptor):
+    def __init__(self, metrics: Metrics) -> None:
+        self.metrics = metrics
+
+    async def intercept_service(
+        self,
+        continuation: Callable[[grpc.HandlerCallDetails], Any],
+        handler_call_details: grpc.HandlerCallDetails,
+    ) -> Optional[grpc.RpcMethodHandler]:
+        handler = await continuation(handler_call_details)
+        if handler is None:
+            return None
+        recorder = _Recorder(self.metrics, method_name(handler_call_details))
+        behavior = getattr(handler, behavior_name(handler))
+
+        async def unary(request: Any, context: Any) -> Any:
+            start = time.perf_counter()
+            ok = False
+            try:
+                response = await behavior(request, context)
+                ok = True
+                return response
+            finally:
+                recorder.finish(context, start, ok)
+
+        async def stream(request: Any, context: Any) -> Any:
+            start = time.perf_counter()
+            ok = False
+            try:
+                async for response in behavior(request, context):
+                    yield response
+                ok = True
+            finally:
+                recorder.finish(context, start, ok)
+
+        return recorder.instrument(
+            handler, stream if handler.response_streaming else unary
+        )
@@ -0,0 +1,225 @@
+import dataclasses
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, Iterator, Optional
+
+import grpc
+
+from faiss_grpc.faiss_server import FaissServiceConfig, FaissServiceServicer
+from faiss_grpc.index_io import (
+    IndexLoadMode,
+    index_files,
+    index_loader,
+    mapped_bytes,
+)
+from faiss_grpc.metrics import Metrics
+from faiss_grpc.proto import faiss_pb2_grpc
+from faiss_grpc.proto.faiss_pb2 import (
+    BatchSearchResponse,
+    HeatbeatResponse,
+    RangeSearchResponse,
+    ReloadResponse,
+    SearchByIdResponse,
+    SearchByIdsResponse,
+    SearchRequest,
+    SearchResponse,
+    SearchStreamResponse,
+    StatsResponse,
+)
+from faiss_grpc.registry import IndexEntry, IndexRegistry, discover_indexes
+from faiss_grpc.streaming import StreamSearcher, serve_search_stream
+from faiss_grpc.threads import ThreadPolicy
+
+logger = logging.getLogger(__name__)
+
+# OpenMP threads are limited for the whole process, so these can not be
+# overridden for each index
+SHARED_CONFIG_FIELDS = frozenset({'search_threads', 'batch_search_threads'})
+
+
+class MultiIndexServicer(faiss_pb2_grpc.FaissServiceServicer):
+    def __init__(
+        self,
+        catalog_path: str,
+        config: FaissServiceConfig,
+        load_mode: IndexLoadMode = IndexLoadMode.read,
+        memory_budget: Optional[int] = None,
+        metrics: Optional[Metrics] = None,
+    ) -> None:
+        self.catalog_path = catalog_path
+        self.config = config
+        self.load_mode = load_mode
+        self.metrics = metrics
+        self.thread_policy = ThreadPolicy(
+            config.search_threads, config.batch_search_threads
+        )
+        self._reload_lock = threading.Lock()
+        # servicer of each index is created on its first request
+        self.registry: IndexRegistry[FaissServiceServicer] = IndexRegistry(
+            self.discover(),
+            self.load,
+            self.index_bytes,
+            memory_budget,
+            FaissServiceServicer.close,
+            self.file_bytes,
+        )
+
+    def Search(self, request, context) -> SearchResponse:
+        servicer = self.servicer_for(request.index, context)
+        if servicer is None:
+            return SearchResponse()
+        return servicer.Search(request, context)
+
+    def SearchById(self, request, context) -> SearchByIdResponse:
+        servicer = self.servicer_for(request.index, context)
+        if servicer is None:
+            return SearchByIdResponse()
+        return servicer.SearchById(request, context)
+
+    def SearchByIds(self, request, context) -> SearchByIdsResponse:
+        servicer = self.servicer_for(request.index, context)
+        if servicer is None:
+            return SearchByIdsResponse()
+        return servicer.SearchByIds(request, context)
+
+    def BatchSearch(self, request, context) -> BatchSearchResponse:
+        servicer = self.servicer_for(request.index, context)
+        if servicer is None:
+            return BatchSearchResponse()
+        return servicer.BatchSearch(request, context)
+
+    def RangeSearch(self, request, context) -> RangeSearchResponse:
+        servicer = self.servicer_for(request.index, context)
+        if servicer is None:
+            return RangeSearchResponse()
+        return servicer.RangeSearch(request, context)
+
+    def SearchStream(
+        self, request_iterator, context
+    ) -> Iterator[SearchStreamResponse]:
+        return serve_search_stream(
+            self.stream_searcher(), request_iterator, context
+        )
+
+    def Reload(self, request, context) -> ReloadResponse:
+        try:
+            ntotal = self.reload()
+        except (AttributeError, OSError, RuntimeError, ValueError) as e:
+            context.set_code(grpc.StatusCode.FAILED_PRECONDITION)
+            context.set_details(str(e))
+            return ReloadResponse()
+
+        return ReloadResponse(ntotal=ntotal)
+
+    def Stats(self, request, context) -> StatsResponse:
+        return StatsResponse(values=self.stats())
+
+    def Heatbeat(self, request, context) -> HeatbeatResponse:
+        return HeatbeatResponse(message='OK')
+
+    def stats(self) -> Dict[str, float]:
+        values = self.thread_policy.stats()
+        values.update(self.registry.stats())
+        values['index_ntotal'] = sum(
+            servicer.index.ntotal for _, servicer in self.registry.items()
+        )
+        values['process_cpu_seconds'] = time.process_time()
+        return values
+
+    def stream_searcher(self) -> StreamSearcher:
+        return StreamSearcher(self.resolve_stream_request, self.metrics)
+
+    def resolve_stream_request(
+        self, request: SearchRequest
+    ) -> FaissServiceServicer:
+        try:
+            return self.servicer(request.index)
+        except (LookupError, RuntimeError) as e:
+            raise ValueError(str(e))
+
+    def servicer_for(
+        self, name: str, context: Any
+    ) -> Optional[FaissServiceServicer]:
+        try:
+            return self.servicer(name)
+        except ValueError as e:
+            context.set_code(grpc.StatusCode.INVALID_ARGUMENT)
+            context.set_details(str(e))
+        except LookupError as e:
+            context.set_code(grpc.StatusCode.NOT_FOUND)
+            context.set_details(str(e))
+        except RuntimeError as e:
+            context.set_code(grpc.StatusCode.FAILED_PRECONDITION)
+            context.set_details(str(e))
+        return None
+
+    def servicer(self, name: str) -> FaissServiceServicer:
+        if not name:
+            raise ValueError('index name is required')
+        try:
+            return self.registry.get(name)
+        except KeyError:
+            raise LookupError(f'index {name} is not found')
+        except RuntimeError as e:
+            raise RuntimeError(f'failed to load index {name}: {e}')
+
+    def discover(self) -> Dict[str, IndexEntry]:
+        entries = discover_indexes(self.catalog_path)
+        for entry in entries.values():
+            # invalid overrides fail before serving, not on first request
+            self.index_config(entry)
+        logger.info('found %d indexes in %s', len(entries), self.catalog_path)
+        return entries
+
+    def index_config(self, entry: IndexEntry) -> FaissServiceConfig:
+        overrides = dict(entry.overrides)
+        shared = SHARED_CONFIG_FIELDS.intersection(overrides)
+        if shared:
+            raise ValueError(
+                f'{", ".join(sorted(shared))} of index {entry.name} can not '
+                'be overridden, because threads are shared by all indexes'
+            )
+        try:
+            return dataclasses.replace(self.config, **overrides)
+        except TypeError as e:
+            raise ValueError(f'invalid config of index {entry.name}: {e}')
+
+    def load(self, entry: IndexEntry) -> FaissServiceServicer:
+        loader = index_loader(entry.path, self.load_mode)
+        return FaissServiceServicer(
+            loader(),
+            self.index_config(entry),
+            loader,
+            self.metrics,
+            self.thread_policy,
+        )
+
+    @staticmethod
+    def file_bytes(entry: IndexEntry) -> int:
+        return sum(os.path.getsize(path) for path in index_files(entry.path))
+
+    @classmethod
+    def index_bytes(
+        cls, entry: IndexEntry, servicer: FaissServiceServicer
+    ) -> int:
+        # memory of index is estimated by size of its files, except inverted
+        # lists mapped from the files, which are shared through page cache
+        size = cls.file_bytes(entry)
+        return max(size - mapped_bytes(servicer.index), 0)
+
+    def reload(self) -> int:
+        # indexes are discovered again, and loaded ones are swapped with
+        # their files on the same way as single index
+        with self._reload_lock:
+            self.registry.update(self.discover())
+            for name, servicer in self.registry.items():
+                servicer.reload()
+                self.registry.resize(
+                    name,
+                    self.index_bytes(self.registry.entries[name], servicer),
+                )
+        return sum(
+            servicer.index.ntotal for _, servicer in self.registry.items()
+        )
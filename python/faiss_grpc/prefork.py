@@ -0,0 +1,142 @@
+import ctypes
+import dataclasses
+import logging
+import os
+import signal
+import time
+import traceback
+from types import FrameType
+from typing import Dict, Optional, Type, Union
+
+from faiss_grpc.aio_server import AsyncServer
+from faiss_grpc.faiss_server import FaissServiceConfig, Server, ServerConfig
+from faiss_grpc.reloading import RELOAD_SIGNAL
+
+logger = logging.getLogger(__name__)
+
+# workers exiting sooner than this after start are restarted with a delay,
+# so that a broken index or config does not make a fork loop
+MIN_WORKER_LIFETIME = 1.0
+RESTART_DELAY = 1.0
+PR_SET_PDEATHSIG = 1
+STOP_SIGNALS = {signal.SIGTERM, signal.SIGINT}
+FORWARDED_SIGNALS = STOP_SIGNALS | {RELOAD_SIGNAL}
+
+
+class PreforkServer:
+    def __init__(
+        self,
+        index_path: str,
+        server_config: ServerConfig,
+        service_config: FaissServiceConfig,
+        server_class: Type[Union[Server, AsyncServer]] = Server,
+    ) -> None:
+        if server_config.processes < 1:
+            raise ValueError('processes must be positive')
+        if server_config.processes > 1 and server_config.wal_dir:
+            # each process would add vectors to its own copy of index
+            raise ValueError('write-ahead log can not be used by processes')
+        self.index_path = index_path
+        self.server_config = server_config
+        self.service_config = service_config
+        self.server_class = server_class
+        # pid -> monotonic time the worker started
+        self.workers: Dict[int, float] = {}
+        # pid -> number of the worker, which is kept by restarted worker
+        self.slots: Dict[int, int] = {}
+        self.stopping = False
+
+    def serve(self) -> None:
+        for signum in STOP_SIGNALS:
+            signal.signal(signum, self._stop)
+        signal.signal(RELOAD_SIGNAL, self._reload)
+        for slot in range(self.server_config.processes):
+            self._spawn(slot)
+
+        while self.workers:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            started = self.workers.pop(pid, None)
+            slot = self.slots.pop(pid, 0)
+            if started is None or self.stopping:
+                continue
+
+            logger.warning(
+                'worker %d exited with status %d, restarting', pid, status
+            )
+            if time.monotonic() - started < MIN_WORKER_LIFETIME:
+                time.sleep(RESTART_DELAY)
+            if not self.stopping:
+                self._spawn(slot)
+
+    def worker_config(self, slot: int) -> ServerConfig:
+        # gRPC port is shared by SO_REUSEPORT, but metrics of each worker
+        # are scraped from its own port
+        if self.server_config.metrics_port:
+            return dataclasses.replace(
+                self.server_config,
+                metrics_port=self.server_config.metrics_port + slot,
+            )
+        return self.server_config
+
+    def _spawn(self, slot: int) -> None:
+        # gRPC server and faiss index must be created after fork, because
+        # neither of them survives fork
+        parent = os.getpid()
+        # signals are blocked until the worker is registered, otherwise
+        # a worker forked just before stopping would never be terminated
+        signal.pthread_sigmask(signal.SIG_BLOCK, FORWARDED_SIGNALS)
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            # server installs its own handler after loading index
+            signal.signal(RELOAD_SIGNAL, signal.SIG_IGN)
+            signal.pthread_sigmask(signal.SIG_UNBLOCK, FORWARDED_SIGNALS)
+            code = 0
+            try:
+                self._exit_with_parent(parent)
+                server = self.server_class(
+                    self.index_path,
+                    self.worker_config(slot),
+                    self.service_config,
+                )
+                server.serve()
+            except BaseException:
+                traceback.print_exc()
+                code = 1
+            finally:
+                os._exit(code)
+
+        self.workers[pid] = time.monotonic()
+        self.slots[pid] = slot
+        signal.pthread_sigmask(signal.SIG_UNBLOCK, FORWARDED_SIGNALS)
+        logger.info('started worker %d', pid)
+
+    @staticmethod
+    def _exit_with_parent(parent: int) -> None:
+        # workers must not keep the port after supervisor was killed, but
+        # this is only supported on linux
+        try:
+            ctypes.CDLL(None).prctl(PR_SET_PDEATHSIG, signal.SIGTERM)
+        except (OSError, AttributeError):
+            return
+        if os.getppid() != parent:
+            os.kill(os.getpid(), signal.SIGTERM)
+
+    def _stop(self, signum: int, frame: Optional[FrameType]) -> None:
+        self.stopping = True
+        self._signal_workers(signal.SIGTERM)
+
+    def _reload(self, signum: int, frame: Optional[FrameType]) -> None:
+        # each worker reloads and swaps its own index
+        self._signal_workers(RELOAD_SIGNAL)
+
+    def _signal_workers(self, signum: int) -> None:
+        for pid in list(self.workers):
+            try:
+                os.kill(pid, signum)
+            except ProcessLookupError:
+                pass
@@ -1,9 +1,9 @@
 # Generated by the gRPC Python protocol compiler plugin. DO NOT EDIT!
 """Client and server classes corresponding to protobuf-defined services."""
 import grpc
-from google.protobuf import empty_pb2 as google_dot_protobuf_dot_empty__pb2
 
 import faiss_grpc.proto.faiss_pb2 as faiss__pb2
+from google.protobuf import empty_pb2 as google_dot_protobuf_dot_empty__pb2
 
 
 class FaissServiceStub(object):
@@ -30,25 +30,124 @@ class FaissServiceStub(object):
             request_serializer=faiss__pb2.SearchByIdRequest.SerializeToString,
             response_deserializer=faiss__pb2.SearchByIdResponse.FromString,
         )
+        self.SearchByIds = channel.unary_unary(
+            '/faiss.FaissService/SearchByIds',
+            request_serializer=faiss__pb2.SearchByIdsRequest.SerializeToString,
+            response_deserializer=faiss__pb2.SearchByIdsResponse.FromString,
+        )
+        self.BatchSearch = channel.unary_unary(
+            '/faiss.FaissService/BatchSearch',
+            request_serializer=faiss__pb2.BatchSearchRequest.SerializeToString,
+            response_deserializer=faiss__pb2.BatchSearchResponse.FromString,
+        )
+        self.RangeSearch = channel.unary_unary(
+            '/faiss.FaissService/RangeSearch',
+            request_serializer=faiss__pb2.RangeSearchRequest.SerializeToString,
+            response_deserializer=faiss__pb2.RangeSearchResponse.FromString,
+        )
+        self.SearchStream = channel.stream_stream(
+            '/faiss.FaissService/SearchStream',
+            request_serializer=faiss__pb2.SearchStreamRequest.SerializeToString,
+            response_deserializer=faiss__pb2.SearchStreamResponse.FromString,
+        )
+        self.Add = channel.unary_unary(
+            '/faiss.FaissService/Add',
+            request_serializer=faiss__pb2.AddRequest.SerializeToString,
+            response_deserializer=faiss__pb2.AddResponse.FromString,
+        )
+        self.AddWithIds = channel.unary_unary(
+            '/faiss.FaissService/AddWithIds',
+            request_serializer=faiss__pb2.AddWithIdsRequest.SerializeToString,
+            response_deserializer=faiss__pb2.AddResponse.FromString,
+        )
+        self.Remove = channel.unary_unary(
+            '/faiss.FaissService/Remove',
+            request_serializer=faiss__pb2.RemoveRequest.SerializeToString,
+            response_deserializer=faiss__pb2.RemoveResponse.FromString,
+        )
+        self.Reload = channel.unary_unary(
+            '/faiss.FaissService/Reload',
+            request_serializer=google_dot_protobuf_dot_empty__pb2.Empty.SerializeToString,
+            response_deserializer=faiss__pb2.ReloadResponse.FromString,
+        )
+        self.Stats = channel.unary_unary(
+            '/faiss.FaissService/Stats',
+            request_serializer=google_dot_protobuf_dot_empty__pb2.Empty.SerializeToString,
+            response_deserializer=faiss__pb2.StatsResponse.FromString,
+        )
 
 
 class FaissServiceServicer(object):
     """Missing associated documentation comment in .proto file."""
 
     def Heatbeat(self, request, context):
-        """Missing associated documentation comment in .proto file."""
+        """Check server is working."""
         context.set_code(grpc.StatusCode.UNIMPLEMENTED)
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
     def Search(self, request, context):
-        """Missing associated documentation comment in .proto file."""
+        """Search neighbors from query vector."""
         context.set_code(grpc.StatusCode.UNIMPLEMENTED)
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
     def SearchById(self, request, context):
-        """Missing associated documentation comment in .proto file."""
+        """Search neighbors from ID."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def SearchByIds(self, request, context):
+        """Search neighbors from multiple IDs in one request."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def BatchSearch(self, request, context):
+        """Search neighbors from multiple query vectors in one request."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def RangeSearch(self, request, context):
+        """Search all neighbors within a radius from multiple query vectors."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def SearchStream(self, request_iterator, context):
+        """Search neighbors from query vectors sent continuously on a stream. Results are returned as soon as they are ready."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def Add(self, request, context):
+        """Add vectors to index with IDs following the last one. Vectors are written to write-ahead log, and can be searched when this returns."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def AddWithIds(self, request, context):
+        """Add vectors with given IDs to index, e.g. IVF index built by add_with_ids."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def Remove(self, request, context):
+        """Remove vectors by IDs. Removed vectors are not returned by searches when this returns, and are deleted from index by compaction in background."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def Reload(self, request, context):
+        """Reload index from the index path. Searches running while reloading are finished on the previous index. Server serving multiple indexes discovers indexes again and reloads loaded ones."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def Stats(self, request, context):
+        """Get statistics of server process, such as number of running searches and their threads."""
         context.set_code(grpc.StatusCode.UNIMPLEMENTED)
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
@@ -71,6 +170,51 @@ def add_FaissServiceServicer_to_server(servicer, server):
             request_deserializer=faiss__pb2.SearchByIdRequest.FromString,
             response_serializer=faiss__pb2.SearchByIdResponse.SerializeToString,
         ),
+        'SearchByIds': grpc.unary_unary_rpc_method_handler(
+            servicer.SearchByIds,
+            request_deserializer=faiss__pb2.SearchByIdsRequest.FromString,
+            response_serializer=faiss__pb2.SearchByIdsResponse.SerializeToString,
+        ),
+        'BatchSearch': grpc.unary_unary_rpc_method_handler(
+            servicer.BatchSearch,
+            request_deserializer=faiss__pb2.BatchSearchRequest.FromString,
+            response_serializer=faiss__pb2.BatchSearchResponse.SerializeToString,
+        ),
+        'RangeSearch': grpc.unary_unary_rpc_method_handler(
+            servicer.RangeSearch,
+            request_deserializer=faiss__pb2.RangeSearchRequest.FromString,
+            response_serializer=faiss__pb2.RangeSearchResponse.SerializeToString,
+        ),
+        'SearchStream': grpc.stream_stream_rpc_method_handler(
+            servicer.SearchStream,
+            request_deserializer=faiss__pb2.SearchStreamRequest.FromString,
+            response_serializer=faiss__pb2.SearchStreamResponse.SerializeToString,
+        ),
+        'Add': grpc.unary_unary_rpc_method_handler(
+            servicer.Add,
+            request_deserializer=faiss__pb2.AddRequest.FromString,
+            response_serializer=faiss__pb2.AddResponse.SerializeToString,
+        ),
+        'AddWithIds': grpc.unary_unary_rpc_method_handler(
+            servicer.AddWithIds,
+            request_deserializer=faiss__pb2.AddWithIdsRequest.FromString,
+            response_serializer=faiss__pb2.AddResponse.SerializeToString,
+        ),
+        'Remove': grpc.unary_unary_rpc_method_handler(
+            servicer.Remove,
+            request_deserializer=faiss__pb2.RemoveRequest.FromString,
+            response_serializer=faiss__pb2.RemoveResponse.SerializeToString,
+        ),
+        'Reload': grpc.unary_unary_rpc_method_handler(
+            servicer.Reload,
+            request_deserializer=google_dot_protobuf_dot_empty__pb2.Empty.FromString,
+            response_serializer=faiss__pb2.ReloadResponse.SerializeToString,
+        ),
+        'Stats': grpc.unary_unary_rpc_method_handler(
+            servicer.Stats,
+            request_deserializer=google_dot_protobuf_dot_empty__pb2.Empty.FromString,
+            response_serializer=faiss__pb2.StatsResponse.SerializeToString,
+        ),
     }
     generic_handler = grpc.method_handlers_generic_handler(
         'faiss.FaissService', rpc_method_handlers
@@ -168,3 +312,264 @@ class FaissService(object):
             timeout,
             metadata,
         )
+
+    @staticmethod
+    def SearchByIds(
+        request,
+        target,
+        options=(),
+        channel_credentials=None,
+        call_credentials=None,
+        insecure=False,
+        compression=None,
+        wait_for_ready=None,
+        timeout=None,
+        metadata=None,
+    ):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/faiss.FaissService/SearchByIds',
+            faiss__pb2.SearchByIdsRequest.SerializeToString,
+            faiss__pb2.SearchByIdsResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+        )
+
+    @staticmethod
+    def BatchSearch(
+        request,
+        target,
+        options=(),
+        channel_credentials=None,
+        call_credentials=None,
+        insecure=False,
+        compression=None,
+        wait_for_ready=None,
+        timeout=None,
+        metadata=None,
+    ):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/faiss.FaissService/BatchSearch',
+            faiss__pb2.BatchSearchRequest.SerializeToString,
+            faiss__pb2.BatchSearchResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+        )
+
+    @staticmethod
+    def RangeSearch(
+        request,
+        target,
+        options=(),
+        channel_credentials=None,
+        call_credentials=None,
+        insecure=False,
+        compression=None,
+        wait_for_ready=None,
+        timeout=None,
+        metadata=None,
+    ):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/faiss.FaissService/RangeSearch',
+            faiss__pb2.RangeSearchRequest.SerializeToString,
+            faiss__pb2.RangeSearchResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+        )
+
+    @staticmethod
+    def SearchStream(
+        request_iterator,
+        target,
+        options=(),
+        channel_credentials=None,
+        call_credentials=None,
+        insecure=False,
+        compression=None,
+        wait_for_ready=None,
+        timeout=None,
+        metadata=None,
+    ):
+        return grpc.experimental.stream_stream(
+            request_iterator,
+            target,
+            '/faiss.FaissService/SearchStream',
+            faiss__pb2.SearchStreamRequest.SerializeToString,
+            faiss__pb2.SearchStreamResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+        )
+
+    @staticmethod
+    def Add(
+        request,
+        target,
+        options=(),
+        channel_credentials=None,
+        call_credentials=None,
+        insecure=False,
+        compression=None,
+        wait_for_ready=None,
+        timeout=None,
+        metadata=None,
+    ):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/faiss.FaissService/Add',
+            faiss__pb2.AddRequest.SerializeToString,
+            faiss__pb2.AddResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+        )
+
+    @staticmethod
+    def AddWithIds(
+        request,
+        target,
+        options=(),
+        channel_credentials=None,
+        call_credentials=None,
+        insecure=False,
+        compression=None,
+        wait_for_ready=None,
+        timeout=None,
+        metadata=None,
+    ):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/faiss.FaissService/AddWithIds',
+            faiss__pb2.AddWithIdsRequest.SerializeToString,
+            faiss__pb2.AddResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+        )
+
+    @staticmethod
+    def Remove(
+        request,
+        target,
+        options=(),
+        channel_credentials=None,
+        call_credentials=None,
+        insecure=False,
+        compression=None,
+        wait_for_ready=None,
+        timeout=None,
+        metadata=None,
+    ):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/faiss.FaissService/Remove',
+            faiss__pb2.RemoveRequest.SerializeToString,
+            faiss__pb2.RemoveResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+        )
+
+    @staticmethod
+    def Reload(
+        request,
+        target,
+        options=(),
+        channel_credentials=None,
+        call_credentials=None,
+        insecure=False,
+        compression=None,
+        wait_for_ready=None,
+        timeout=None,
+        metadata=None,
+    ):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/faiss.FaissService/Reload',
+            google_dot_protobuf_dot_empty__pb2.Empty.SerializeToString,
+            faiss__pb2.ReloadResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+        )
+
+    @staticmethod
+    def Stats(
+        request,
+        target,
+        options=(),
+        channel_credentials=None,
+        call_credentials=None,
+        insecure=False,
+        compression=None,
+        wait_for_ready=None,
+        timeout=None,
+        metadata=None,
+    ):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/faiss.FaissService/Stats',
+            google_dot_protobuf_dot_empty__pb2.Empty.SerializeToString,
+            faiss__pb2.StatsResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+        )
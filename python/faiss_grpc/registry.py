@@ -0,0 +1,223 @@
+import contextlib
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Generic, List, Optional, Tuple, TypeVar
+
+logger = logging.getLogger(__name__)
+
+INDEX_EXTENSIONS = ('.faiss', '.index')
+
+T = TypeVar('T')
+
+
+@dataclass(frozen=True)
+class IndexEntry:
+    name: str
+    path: str
+    # fields of FaissServiceConfig overridden for this index
+    overrides: Tuple[Tuple[str, Any], ...] = ()
+
+
+def is_index_catalog(path: str) -> bool:
+    # directory or manifest of indexes is served as multiple indexes,
+    # otherwise path is a single index file
+    return os.path.isdir(path) or path.endswith('.json')
+
+
+def discover_indexes(path: str) -> Dict[str, IndexEntry]:
+    if os.path.isdir(path):
+        return scan_directory(path)
+    return read_manifest(path)
+
+
+def scan_directory(directory: str) -> Dict[str, IndexEntry]:
+    # index files are named by their file name without extension
+    entries = {}
+    for filename in sorted(os.listdir(directory)):
+        name, extension = os.path.splitext(filename)
+        if extension in INDEX_EXTENSIONS:
+            entries[name] = IndexEntry(name, os.path.join(directory, filename))
+    return entries
+
+
+def read_manifest(path: str) -> Dict[str, IndexEntry]:
+    # {"name": "path"} or {"name": {"path": "path", "config": {...}}}, and
+    # relative paths are resolved from directory of the manifest
+    with open(path) as f:
+        manifest = json.load(f)
+    if not isinstance(manifest, dict):
+        raise ValueError(f'manifest {path} must be an object of indexes')
+
+    entries = {}
+    for name, spec in manifest.items():
+        if isinstance(spec, str):
+            spec = {'path': spec}
+        if not isinstance(spec, dict) or 'path' not in spec:
+            raise ValueError(f'index {name} of manifest {path} has no path')
+        overrides = spec.get('config', {})
+        if not isinstance(overrides, dict):
+            raise ValueError(f'config of index {name} must be an object')
+        entries[name] = IndexEntry(
+            name,
+            os.path.join(os.path.dirname(path), spec['path']),
+            tuple(sorted(overrides.items())),
+        )
+    return entries
+
+
+class IndexRegistry(Generic[T]):
+    def __init__(
+        self,
+        entries: Dict[str, IndexEntry],
+        load: Callable[[IndexEntry], T],
+        size: Callable[[IndexEntry, T], int],
+        memory_budget: Optional[int] = None,
+        unload: Optional[Callable[[T], None]] = None,
+        estimate: Optional[Callable[[IndexEntry], int]] = None,
+    ) -> None:
+        if memory_budget is not None and memory_budget < 1:
+            raise ValueError('memory_budget must be positive')
+        self.entries = entries
+        self.memory_budget = memory_budget
+        self.loads = 0
+        self.evictions = 0
+        self._load = load
+        self._size = size
+        self._unload = unload
+        # bytes of an index before loading it, which are made room for
+        self._estimate = estimate
+        # name -> (loaded value, bytes) in least recently used order
+        self._loaded: 'OrderedDict[str, Tuple[T, int]]' = OrderedDict()
+        # name -> estimated bytes of indexes being loaded
+        self._loading: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        # each index is loaded under its own lock, so that an index
+        # requested by concurrent calls is loaded only once, while other
+        # indexes are served or loaded
+        self._load_locks: Dict[str, threading.Lock] = {}
+
+    @property
+    def memory_bytes(self) -> int:
+        return sum(size for _, size in self._loaded.values())
+
+    def get(self, name: str) -> T:
+        value = self._get_loaded(name)
+        if value is not None:
+            return value
+
+        with self._load_lock(name):
+            value = self._get_loaded(name)
+            if value is not None:
+                return value
+            entry = self.entries.get(name)
+            if entry is None:
+                raise KeyError(name)
+            # least recently used indexes are evicted before loading, so
+            # that memory of them and the new one do not exceed budget
+            estimated = self._estimate(entry) if self._estimate else 0
+            with self._lock:
+                self._loading[name] = estimated
+                evicted = self._evict(keep_recent=False)
+            self._release(evicted)
+            try:
+                value = self._load(entry)
+                size = self._size(entry, value)
+            finally:
+                with self._lock:
+                    del self._loading[name]
+            logger.info('loaded index %s of %d bytes', name, size)
+            with self._lock:
+                self._loaded[name] = (value, size)
+                self.loads += 1
+                evicted = self._evict()
+
+        self._release(evicted)
+        return value
+
+    def _load_lock(self, name: str) -> threading.Lock:
+        with self._lock:
+            return self._load_locks.setdefault(name, threading.Lock())
+
+    def _get_loaded(self, name: str) -> Optional[T]:
+        with self._lock:
+            loaded = self._loaded.get(name)
+            if loaded is None:
+                return None
+            self._loaded.move_to_end(name)
+            return loaded[0]
+
+    def items(self) -> List[Tuple[str, T]]:
+        with self._lock:
+            return [(name, value) for name, (value, _) in self._loaded.items()]
+
+    def resize(self, name: str, size: int) -> None:
+        with self._lock:
+            if name not in self._loaded:
+                return
+            self._loaded[name] = (self._loaded[name][0], size)
+            evicted = self._evict()
+        self._release(evicted)
+
+    def update(self, entries: Dict[str, IndexEntry]) -> None:
+        # indexes removed from entries or given another path or config are
+        # evicted, and loaded again from new entry on next use. loading
+        # indexes are waited for, locking them in order of names.
+        with contextlib.ExitStack() as stack:
+            for name in sorted(set(self.entries) | set(entries)):
+                stack.enter_context(self._load_lock(name))
+            with self._lock:
+                changed = [
+                    name
+                    for name in self._loaded
+                    if entries.get(name) != self.entries.get(name)
+                ]
+                evicted = [self._loaded.pop(name)[0] for name in changed]
+                self.evictions += len(evicted)
+                self.entries = entries
+        for name in changed:
+            logger.info('evicted index %s which was changed', name)
+        self._release(evicted)
+
+    def _evict(self, keep_recent: bool = True) -> List[T]:
+        # least recently used indexes are evicted until the rest and indexes
+        # being loaded fit in budget. the most recent one is kept even if it
+        # alone exceeds, unless room is made for loading another one.
+        evicted: List[T] = []
+        if self.memory_budget is None:
+            return evicted
+        kept = 1 if keep_recent else 0
+        while (
+            len(self._loaded) > kept
+            and self.memory_bytes + sum(self._loading.values())
+            > self.memory_budget
+        ):
+            name, (value, size) = self._loaded.popitem(last=False)
+            logger.info('evicted index %s of %d bytes', name, size)
+            evicted.append(value)
+            self.evictions += 1
+        return evicted
+
+    def _release(self, evicted: List[T]) -> None:
+        # searches running on evicted values are finished on them, and
+        # their memory is freed when the last one has finished
+        if self._unload is None:
+            return
+        for value in evicted:
+            self._unload(value)
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            values = {
+                'indexes_total': len(self.entries),
+                'indexes_loaded': len(self._loaded),
+                'index_memory_bytes': self.memory_bytes,
+                'index_loads': self.loads,
+                'index_evictions': self.evictions,
+            }
+        if self.memory_budget is not None:
+            values['index_memory_budget_bytes'] = self.memory_budget
+        return values
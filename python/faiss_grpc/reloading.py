@@ -0,0 +1,72 @@
+import logging
+import signal
+import threading
+from typing import Any, Callable, Optional, Tuple
+
+from faiss_grpc.index_io import FileState, file_state, index_files
+
+logger = logging.getLogger(__name__)
+
+RELOAD_SIGNAL = signal.SIGHUP
+
+
+def reload_in_background(reload: Callable[[], Any]) -> None:
+    # signal handlers and event loop must not be blocked by loading index
+    threading.Thread(
+        target=_reload, args=(reload,), name='faiss-grpc-reload', daemon=True
+    ).start()
+
+
+def _reload(reload: Callable[[], Any]) -> None:
+    try:
+        reload()
+    except Exception:
+        logger.exception('failed to reload index')
+
+
+class IndexFileWatcher:
+    def __init__(
+        self, index_path: str, interval: float, reload: Callable[[], Any]
+    ) -> None:
+        if interval <= 0:
+            raise ValueError('interval must be positive')
+        self.index_path = index_path
+        self.interval = interval
+        self.reload = reload
+        # state of the file which is being served
+        self._loaded = self._state()
+        self._closed = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name='faiss-grpc-watcher', daemon=True
+        )
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def close(self) -> None:
+        self._closed.set()
+        if self._thread.is_alive():
+            self._thread.join()
+
+    def _run(self) -> None:
+        previous = self._loaded
+        while not self._closed.wait(self.interval):
+            current = self._state()
+            # file is reloaded after it stopped changing for an interval, so
+            # a file being written in place is not loaded half way
+            if (
+                current is not None
+                and current == previous
+                and current != self._loaded
+            ):
+                logger.info('%s was changed, reloading', self.index_path)
+                self._loaded = current
+                _reload(self.reload)
+            previous = current
+
+    def _state(self) -> Optional[Tuple[FileState, ...]]:
+        # sharded index is reloaded when any of its files was changed
+        states = [file_state(path) for path in index_files(self.index_path)]
+        if None in states:
+            return None
+        return tuple(states)
@@ -0,0 +1,145 @@
+from typing import List, Optional, Sequence, Tuple
+
+import faiss
+import numpy as np
+from faiss import Index
+
+from faiss_grpc.proto.faiss_pb2 import (
+    COLUMNAR,
+    Neighbor,
+    SearchByIdResponse,
+    SearchResponse,
+)
+
+# offsets of each query in distances and ids, like lims of faiss
+RangeResult = Tuple[np.ndarray, np.ndarray, np.ndarray]
+
+
+def is_similarity(index: Index) -> bool:
+    # larger scores are nearer for inner product, smaller for L2
+    return faiss.is_similarity_metric(index.metric_type)
+
+
+def sort_range_result(
+    lims: np.ndarray,
+    distances: np.ndarray,
+    ids: np.ndarray,
+    descending: bool,
+    max_results: Optional[int] = None,
+) -> RangeResult:
+    # faiss returns neighbors of each query in arbitrary order. they are
+    # sorted by (query, score) at once, then ranks in each query are
+    # compared with max_results.
+    lims = lims.astype(np.int64)
+    counts = np.diff(lims)
+    queries = np.repeat(np.arange(counts.size), counts)
+    order = np.lexsort((-distances if descending else distances, queries))
+    distances, ids = distances[order], ids[order]
+    if max_results is None or distances.size == 0:
+        return lims, distances, ids
+
+    ranks = np.arange(distances.size) - np.repeat(lims[:-1], counts)
+    keep = ranks < max_results
+    lims = np.concatenate(([0], np.cumsum(np.minimum(counts, max_results))))
+    return lims, distances[keep], ids[keep]
+
+
+def split_range_result(
+    lims: np.ndarray, distances: np.ndarray, ids: np.ndarray
+) -> List[Tuple[np.ndarray, np.ndarray]]:
+    # views of each query, without copying neighbors
+    bounds = lims[1:-1]
+    return list(zip(np.split(distances, bounds), np.split(ids, bounds)))
+
+
+def merge_topk(
+    distances: Sequence[np.ndarray],
+    ids: Sequence[np.ndarray],
+    k: int,
+    descending: bool,
+) -> Tuple[np.ndarray, np.ndarray]:
+    # results of each part are (n, k) arrays of the same queries. best k of
+    # all parts are selected for every query at once by argpartition, then
+    # only the selected ones are sorted.
+    distances = np.hstack(distances)
+    ids = np.hstack(ids)
+    # missing results (-1) are placed last regardless of their distance
+    scores = np.where(
+        ids == -1, np.inf, -distances if descending else distances
+    )
+    if k < scores.shape[1]:
+        top = np.argpartition(scores, k - 1, axis=1)[:, :k]
+    else:
+        top = np.broadcast_to(np.arange(scores.shape[1]), scores.shape)
+    order = np.take_along_axis(
+        top,
+        np.argsort(
+            np.take_along_axis(scores, top, axis=1), axis=1, kind='stable'
+        ),
+        axis=1,
+    )
+    return (
+        np.take_along_axis(distances, order, axis=1),
+        np.take_along_axis(ids, order, axis=1),
+    )
+
+
+def merge_range_results(results: Sequence[RangeResult]) -> RangeResult:
+    # neighbors of each query are gathered from all parts, and left unsorted
+    # like a range search of faiss
+    counts = np.stack(
+        [np.diff(lims.astype(np.int64)) for lims, _, _ in results]
+    )
+    queries = np.concatenate(
+        [np.repeat(np.arange(counts.shape[1]), c) for c in counts]
+    )
+    order = np.argsort(queries, kind='stable')
+    lims = np.concatenate(([0], np.cumsum(counts.sum(axis=0))))
+    distances = np.concatenate([d for _, d, _ in results])[order]
+    ids = np.concatenate([i for _, _, i in results])[order]
+    return lims, distances, ids
+
+
+def to_neighbors(distances: np.ndarray, ids: np.ndarray) -> List[Neighbor]:
+    return [Neighbor(id=i, score=d) for d, i in zip(distances, ids) if i != -1]
+
+
+def to_search_response(
+    distances: np.ndarray, ids: np.ndarray, response_format: int
+) -> SearchResponse:
+    if response_format == COLUMNAR:
+        # build packed columns straight from faiss outputs, dropping
+        # missing results (-1) without per-neighbor python objects
+        found = ids != -1
+        return SearchResponse(
+            ids=ids[found].tolist(), scores=distances[found].tolist()
+        )
+    return SearchResponse(neighbors=to_neighbors(distances, ids))
+
+
+def to_search_by_id_response(
+    request_id: int,
+    distances: np.ndarray,
+    ids: np.ndarray,
+    response_format: int,
+) -> SearchByIdResponse:
+    response = to_search_response(distances, ids, response_format)
+    return SearchByIdResponse(
+        request_id=request_id,
+        neighbors=response.neighbors,
+        ids=response.ids,
+        scores=response.scores,
+    )
+
+
+def to_range_result(responses: Sequence[SearchResponse]) -> RangeResult:
+    # columnar responses of each query are concatenated like lims of faiss
+    counts = [len(response.ids) for response in responses]
+    lims = np.concatenate(([0], np.cumsum(counts))).astype(np.int64)
+    distances = np.concatenate(
+        [np.asarray(r.scores, dtype=np.float32) for r in responses]
+    )
+    ids = np.concatenate(
+        [np.asarray(r.ids, dtype=np.int64) for r in responses]
+    )
+    return lims, distances, ids
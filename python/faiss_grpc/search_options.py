@@ -0,0 +1,9 @@
+from dataclasses import dataclass
+from typing import Optional
+
+
+# options of a search, which are imported by client without faiss
+@dataclass(eq=True, frozen=True)
+class SearchOptions:
+    nprobe: Optional[int] = None
+    ef_search: Optional[int] = None
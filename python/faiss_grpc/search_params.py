@@ -0,0 +1,117 @@
+from typing import Dict, Optional
+
+import faiss
+from faiss import Index
+
+from faiss_grpc.proto.faiss_pb2 import SearchParameters
+from faiss_grpc.search_options import SearchOptions
+from faiss_grpc.sharding import ShardedIndex
+
+# keys of parameter string, which are same as faiss.ParameterSpace
+PARAMETER_NAMES = {'nprobe': 'nprobe', 'efSearch': 'ef_search'}
+
+
+def parse_search_options(
+    params: SearchParameters,
+    max_nprobe: Optional[int] = None,
+    max_ef_search: Optional[int] = None,
+) -> Optional[SearchOptions]:
+    values = parse_parameter_string(params.parameters)
+    if params.nprobe:
+        values['nprobe'] = params.nprobe
+    if params.ef_search:
+        values['ef_search'] = params.ef_search
+    if not values:
+        return None
+
+    # requests can not make searches slower than server allows
+    if max_nprobe and 'nprobe' in values:
+        values['nprobe'] = min(values['nprobe'], max_nprobe)
+    if max_ef_search and 'ef_search' in values:
+        values['ef_search'] = min(values['ef_search'], max_ef_search)
+    return SearchOptions(**values)
+
+
+def parse_parameter_string(parameters: str) -> Dict[str, int]:
+    values: Dict[str, int] = {}
+    for item in filter(None, parameters.replace(' ', '').split(',')):
+        key, _, value = item.partition('=')
+        if key not in PARAMETER_NAMES:
+            raise ValueError(f'unknown search parameter {key}')
+        if not value.isdigit() or int(value) < 1:
+            raise ValueError(
+                f'search parameter {key} must be positive integer'
+            )
+        values[PARAMETER_NAMES[key]] = int(value)
+    return values
+
+
+def set_nprobe(index: Index, nprobe: int) -> bool:
+    # only IVF index has nprobe, which is set on the index inside wrappers
+    # like IndexPreTransform. newer faiss refuses unknown attributes.
+    if isinstance(index, ShardedIndex):
+        return all([set_nprobe(shard, nprobe) for shard in index.shards])
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is None:
+        return False
+    ivf.nprobe = nprobe
+    return True
+
+
+def to_search_parameters(
+    index: Index,
+    options: SearchOptions,
+    selector: Optional[faiss.IDSelector] = None,
+) -> faiss.SearchParameters:
+    # parameters are given to each search, instead of changing attributes of
+    # shared index, so that concurrent searches do not affect each other.
+    # selector of ids is set to parameters of the innermost index.
+    if isinstance(index, ShardedIndex):
+        # shards are the same type of index prepared with the same config
+        return to_search_parameters(index.shards[0], options, selector)
+    index = faiss.downcast_index(index)
+    if isinstance(index, faiss.IndexPreTransform):
+        params = faiss.SearchParametersPreTransform()
+        params.index_params = index_params = to_search_parameters(
+            index.index, options, selector
+        )
+        # swig does not keep python objects referenced from parameters
+        params.referenced_objects = [index_params]
+        return params
+
+    if isinstance(index, faiss.IndexIVF):
+        params = faiss.SearchParametersIVF()
+        # unset parameters must be same as index, not default of faiss
+        params.nprobe = options.nprobe or index.nprobe
+        if selector is not None:
+            params.sel = selector
+        if options.ef_search:
+            if not isinstance(
+                faiss.downcast_index(index.quantizer), faiss.IndexHNSW
+            ):
+                raise ValueError(
+                    'efSearch is not supported by quantizer of '
+                    f'{type(index).__name__}'
+                )
+            quantizer_params = to_search_parameters(
+                index.quantizer, SearchOptions(ef_search=options.ef_search)
+            )
+            params.quantizer_params = quantizer_params
+            params.referenced_objects = [quantizer_params]
+        return params
+
+    if isinstance(index, faiss.IndexHNSW) and not options.nprobe:
+        params = faiss.SearchParametersHNSW()
+        params.efSearch = options.ef_search or index.hnsw.efSearch
+        if selector is not None:
+            params.sel = selector
+        return params
+
+    if selector is not None and options == SearchOptions():
+        params = faiss.SearchParameters()
+        params.sel = selector
+        return params
+
+    raise ValueError(
+        f'search parameters are not supported by {type(index).__name__}'
+    )
@@ -0,0 +1,148 @@
+from concurrent import futures
+from typing import Any, Callable, List, Optional, Sequence, Tuple, TypeVar
+
+import faiss
+import numpy as np
+from faiss import Index
+
+from faiss_grpc.results import (
+    RangeResult,
+    is_similarity,
+    merge_range_results,
+    merge_topk,
+)
+
+# concurrent searches on each shard, same as default gRPC workers
+DEFAULT_MAX_SEARCHES = 10
+
+T = TypeVar('T')
+
+
+class ShardedIndex:
+    def __init__(
+        self,
+        shards: Sequence[Index],
+        successive_ids: bool = True,
+        max_searches: int = DEFAULT_MAX_SEARCHES,
+    ) -> None:
+        if not shards:
+            raise ValueError('sharded index needs at least one shard')
+        for shard in shards:
+            if shard.d != shards[0].d:
+                raise ValueError(
+                    'shard dimension mismatch expected '
+                    f'{shards[0].d} but loaded {shard.d}'
+                )
+            if shard.metric_type != shards[0].metric_type:
+                raise ValueError('shards must have the same metric type')
+        self.shards = list(shards)
+        self.d = shards[0].d
+        self.metric_type = shards[0].metric_type
+        # ids of each shard start from 0, and are shifted by number of
+        # vectors in previous shards. otherwise shards were given global ids
+        # by add_with_ids.
+        self.successive_ids = successive_ids
+        self.offsets = np.cumsum([0] + [s.ntotal for s in shards[:-1]])
+        self._executor = futures.ThreadPoolExecutor(
+            max_workers=len(shards) * max_searches,
+            thread_name_prefix='faiss-grpc-shard',
+        )
+
+    @property
+    def ntotal(self) -> int:
+        return sum(shard.ntotal for shard in self.shards)
+
+    @property
+    def nprobe(self) -> Optional[int]:
+        return getattr(self.shards[0], 'nprobe', None)
+
+    @nprobe.setter
+    def nprobe(self, nprobe: int) -> None:
+        for shard in self.shards:
+            shard.nprobe = nprobe
+
+    def search(
+        self,
+        x: np.ndarray,
+        k: int,
+        *,
+        params: Optional[faiss.SearchParameters] = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        results = self._map(lambda shard: shard.search(x, k, params=params))
+        return merge_topk(
+            [distances for distances, _ in results],
+            [self.global_ids(i, ids) for i, (_, ids) in enumerate(results)],
+            k,
+            is_similarity(self),
+        )
+
+    def range_search(
+        self,
+        x: np.ndarray,
+        thresh: float,
+        *,
+        params: Optional[faiss.SearchParameters] = None,
+    ) -> RangeResult:
+        results = self._map(
+            lambda shard: shard.range_search(x, thresh, params=params)
+        )
+        return merge_range_results(
+            [
+                (lims, distances, self.global_ids(i, ids))
+                for i, (lims, distances, ids) in enumerate(results)
+            ]
+        )
+
+    def reconstruct(self, key: int) -> np.ndarray:
+        if self.successive_ids:
+            if not (0 <= key < self.ntotal):
+                raise RuntimeError(f'id {key} is out of range')
+            shard = int(np.searchsorted(self.offsets, key, side='right')) - 1
+            return self.shards[shard].reconstruct(
+                key - int(self.offsets[shard])
+            )
+        # global id is found by the shard having it in its direct map
+        for shard in self.shards:
+            try:
+                return shard.reconstruct(key)
+            except RuntimeError:
+                continue
+        raise RuntimeError(f'id {key} is not found in shards')
+
+    def reconstruct_batch(self, keys: np.ndarray) -> np.ndarray:
+        keys = np.asarray(keys, dtype=np.int64)
+        if not self.successive_ids:
+            return np.vstack([self.reconstruct(int(key)) for key in keys])
+        shards = np.searchsorted(self.offsets, keys, side='right') - 1
+        vectors = np.empty((keys.size, self.d), dtype=np.float32)
+        for shard in np.unique(shards):
+            found = shards == shard
+            vectors[found] = self.shards[shard].reconstruct_batch(
+                keys[found] - self.offsets[shard]
+            )
+        return vectors
+
+    def global_ids(self, shard: int, ids: np.ndarray) -> np.ndarray:
+        if not self.successive_ids or self.offsets[shard] == 0:
+            return ids
+        return np.where(ids == -1, ids, ids + self.offsets[shard])
+
+    def _map(self, search: Callable[[Index], T]) -> List[T]:
+        # shards are searched concurrently, and OpenMP threads given to the
+        # calling thread (e.g. by ThreadPolicy) are divided among them
+        threads = max(1, faiss.omp_get_max_threads() // len(self.shards))
+
+        def run(shard: Index) -> Any:
+            faiss.omp_set_num_threads(threads)
+            return search(shard)
+
+        try:
+            return list(self._executor.map(run, self.shards))
+        except RuntimeError:
+            # index was released by reloading or evicting it meanwhile
+            return [search(shard) for shard in self.shards]
+
+    def close(self) -> None:
+        # searches running on shards are finished, and threads exit when
+        # they are idle
+        self._executor.shutdown(wait=False)
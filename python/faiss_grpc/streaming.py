@@ -0,0 +1,165 @@
+import queue
+import threading
+from concurrent import futures
+from dataclasses import dataclass
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    Iterator,
+    Optional,
+    Tuple,
+    Union,
+)
+
+import grpc
+
+from faiss_grpc.batching import SearchBatcher, SearchResult
+from faiss_grpc.metrics import Metrics, time_stage
+from faiss_grpc.proto.faiss_pb2 import (
+    SearchRequest,
+    SearchStreamRequest,
+    SearchStreamResponse,
+)
+from faiss_grpc.results import to_search_response
+
+if TYPE_CHECKING:
+    from faiss_grpc.faiss_server import FaissServiceServicer
+
+STREAM_MAX_BATCH_SIZE = 64
+
+
+@dataclass(frozen=True)
+class StreamEnd:
+    total: int
+
+
+STREAM_CANCELLED = object()
+
+
+class StreamSearcher:
+    # queries of a stream are searched in batches on the servicer of each
+    # request, so that a stream can search multiple indexes
+    def __init__(
+        self,
+        resolve: Callable[[SearchRequest], 'FaissServiceServicer'],
+        metrics: Optional[Metrics] = None,
+    ) -> None:
+        self.resolve = resolve
+        self.metrics = metrics
+        # id of servicer -> (servicer, batcher used by the stream)
+        self.batchers: Dict[
+            int, Tuple['FaissServiceServicer', SearchBatcher]
+        ] = {}
+
+    def submit(
+        self,
+        sequence_id: int,
+        request: SearchRequest,
+        put: Callable[[Any], None],
+    ) -> None:
+        try:
+            servicer = self.resolve(request)
+            query = servicer.to_queries([request.query])
+            options = servicer.to_search_options(request)
+            batcher = self.batcher_for(servicer)
+            future = batcher.submit(query, request.k, options)
+        except (ValueError, RuntimeError) as e:
+            put((sequence_id, request, e))
+            return
+        future.add_done_callback(self.callback(sequence_id, request, put))
+
+    def batcher_for(self, servicer: 'FaissServiceServicer') -> SearchBatcher:
+        # unary Search batcher is shared if it is enabled, otherwise the
+        # stream has its own batcher which only batches queries already
+        # waiting
+        key = id(servicer)
+        if key not in self.batchers:
+            batcher = servicer.batcher or SearchBatcher(
+                servicer.search_index, STREAM_MAX_BATCH_SIZE, 0
+            )
+            self.batchers[key] = (servicer, batcher)
+        return self.batchers[key][1]
+
+    @staticmethod
+    def callback(
+        sequence_id: int, request: SearchRequest, put: Callable[[Any], None]
+    ) -> Callable[['futures.Future[SearchResult]'], None]:
+        # only passes the result, because responses should be built on gRPC
+        # worker thread, not on batcher thread
+        def callback(future: 'futures.Future[SearchResult]') -> None:
+            put((sequence_id, request, future.exception() or future.result()))
+
+        return callback
+
+    def to_response(
+        self,
+        sequence_id: int,
+        request: SearchRequest,
+        result: Union[SearchResult, BaseException],
+    ) -> SearchStreamResponse:
+        if isinstance(result, BaseException):
+            return SearchStreamResponse(
+                sequence_id=sequence_id, error=str(result)
+            )
+        distances, ids = result
+        with time_stage(self.metrics, 'response'):
+            response = to_search_response(
+                distances[0], ids[0], request.response_format
+            )
+        return SearchStreamResponse(sequence_id=sequence_id, response=response)
+
+    def close(self) -> None:
+        for servicer, batcher in list(self.batchers.values()):
+            if batcher is not servicer.batcher:
+                batcher.close()
+
+
+def serve_search_stream(
+    searcher: StreamSearcher, request_iterator: Any, context: Any
+) -> Iterator[SearchStreamResponse]:
+    results: 'queue.Queue[Any]' = queue.Queue()
+    context.add_callback(lambda: results.put(STREAM_CANCELLED))
+    reader = threading.Thread(
+        target=read_search_stream,
+        args=(request_iterator, searcher, results),
+        daemon=True,
+    )
+    reader.start()
+
+    try:
+        sent = 0
+        total: Optional[int] = None
+        while total is None or sent < total:
+            result = results.get()
+            if result is STREAM_CANCELLED:
+                break
+            if isinstance(result, StreamEnd):
+                total = result.total
+                continue
+            yield searcher.to_response(*result)
+            sent += 1
+    finally:
+        searcher.close()
+
+
+def read_search_stream(
+    request_iterator: Iterator[SearchStreamRequest],
+    searcher: StreamSearcher,
+    results: 'queue.Queue[Any]',
+) -> None:
+    total = 0
+    try:
+        for stream_request in request_iterator:
+            searcher.submit(
+                stream_request.sequence_id,
+                stream_request.request,
+                results.put,
+            )
+            total += 1
+    except (grpc.RpcError, RuntimeError):
+        # stream was cancelled by client or finished on server side
+        pass
+    finally:
+        results.put(StreamEnd(total))
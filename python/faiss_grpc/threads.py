@@ -0,0 +1,133 @@
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+
+import faiss
+
+
+class ThreadPolicy:
+    def __init__(
+        self,
+        search_threads: Optional[int] = None,
+        batch_search_threads: Optional[int] = None,
+    ) -> None:
+        if search_threads is not None and search_threads < 1:
+            raise ValueError('search_threads must be positive')
+        if batch_search_threads is not None and batch_search_threads < 1:
+            raise ValueError('batch_search_threads must be positive')
+        self.search_threads = search_threads
+        self.batch_search_threads = batch_search_threads
+        # number of threads used by faiss when it is not set
+        # (OMP_NUM_THREADS or number of cores)
+        self.default_threads = faiss.omp_get_max_threads()
+        self.searches = 0
+        self.threads = 0
+        self.batches = 0
+        self.waiting_batches = 0
+        self._available = batch_search_threads or 0
+        self._condition = threading.Condition()
+
+    @property
+    def enabled(self) -> bool:
+        return (
+            self.search_threads is not None
+            or self.batch_search_threads is not None
+        )
+
+    @contextmanager
+    def limit(self, queries: int) -> Iterator[int]:
+        threads = self._acquire(queries)
+        try:
+            if self.enabled:
+                # number of OpenMP threads is a setting of the calling
+                # thread, so it is set on every search of every gRPC worker
+                faiss.omp_set_num_threads(threads)
+            yield threads
+        finally:
+            self._release(queries, threads)
+
+    def _acquire(self, queries: int) -> int:
+        with self._condition:
+            if queries > 1 and self.batch_search_threads:
+                threads = self._acquire_batch(queries)
+            elif queries == 1 and self.search_threads:
+                threads = self.search_threads
+            else:
+                threads = self.default_threads
+            self.searches += 1
+            self.threads += threads
+        return threads
+
+    def _acquire_batch(self, queries: int) -> int:
+        # concurrent batches get an even share of the budget, and no more
+        # threads than queries searched in parallel. a batch arriving when
+        # the budget is used up waits for threads of a finished one, so
+        # that batches never run more threads than the budget.
+        self.waiting_batches += 1
+        self._condition.wait_for(lambda: self._available > 0)
+        self.waiting_batches -= 1
+        share = self.batch_search_threads // (self.batches + 1)
+        threads = max(1, min(self._available, share, queries))
+        self._available -= threads
+        self.batches += 1
+        return threads
+
+    def _release(self, queries: int, threads: int) -> None:
+        with self._condition:
+            if queries > 1 and self.batch_search_threads:
+                self._available += threads
+                self.batches -= 1
+                self._condition.notify_all()
+            self.searches -= 1
+            self.threads -= threads
+
+    def stats(self) -> Dict[str, float]:
+        with self._condition:
+            return {
+                'searches_running': self.searches,
+                'search_threads_running': self.threads,
+                'batch_search_threads_available': self._available,
+                'batch_searches_waiting': self.waiting_batches,
+            }
+
+
+class ReadWriteLock:
+    # searches read index concurrently, and adding vectors waits for them.
+    # waiting writer blocks new readers, so that it is not starved by
+    # continuous searches.
+    def __init__(self) -> None:
+        self._condition = threading.Condition()
+        self._readers = 0
+        self._writing = False
+        self._waiting_writers = 0
+
+    @contextmanager
+    def read(self) -> Iterator[None]:
+        with self._condition:
+            self._condition.wait_for(
+                lambda: not self._writing and not self._waiting_writers
+            )
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._readers -= 1
+                if self._readers == 0:
+                    self._condition.notify_all()
+
+    @contextmanager
+    def write(self) -> Iterator[None]:
+        with self._condition:
+            self._waiting_writers += 1
+            self._condition.wait_for(
+                lambda: not self._writing and self._readers == 0
+            )
+            self._waiting_writers -= 1
+            self._writing = True
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._writing = False
+                self._condition.notify_all()
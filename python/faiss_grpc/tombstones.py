@@ -0,0 +1,165 @@
+from typing import Optional, Sequence, Tuple, Union
+
+import faiss
+import numpy as np
+from faiss import Index
+
+from faiss_grpc.results import RangeResult
+from faiss_grpc.search_params import SearchOptions, to_search_parameters
+
+
+class Tombstones:
+    # ids removed from index, which are skipped by searches until they are
+    # removed from index by compaction. the object is not changed once
+    # built, so that searches can read it while ids are being removed.
+    def __init__(
+        self,
+        ids: Union[np.ndarray, Sequence[int]] = (),
+        dense: bool = True,
+        selectable: bool = True,
+    ) -> None:
+        self.ids = np.unique(np.asarray(ids, dtype=np.int64))
+        # ids given by server are dense, so they are skipped by a bitmap of
+        # all ids up to the largest removed one, and ids given by
+        # add_with_ids by a hash set
+        self.dense = dense
+        # index types which do not take IDSelector in search parameters
+        # have removed ids masked from results instead
+        self.selectable = selectable
+        self.selector: Optional[faiss.IDSelector] = None
+        if self.ids.size and selectable:
+            self.selector = self.build_selector()
+
+    def __len__(self) -> int:
+        return int(self.ids.size)
+
+    def __contains__(self, request_id: int) -> bool:
+        position = int(np.searchsorted(self.ids, request_id))
+        return position < self.ids.size and self.ids[position] == request_id
+
+    def add(self, ids: np.ndarray) -> 'Tombstones':
+        return Tombstones(
+            np.concatenate((self.ids, ids)), self.dense, self.selectable
+        )
+
+    def discard(self, ids: np.ndarray) -> 'Tombstones':
+        if ids.size == 0:
+            return self
+        return Tombstones(
+            np.setdiff1d(self.ids, ids), self.dense, self.selectable
+        )
+
+    def contains(self, ids: np.ndarray) -> np.ndarray:
+        if self.ids.size == 0:
+            return np.zeros(ids.shape, dtype=bool)
+        positions = np.searchsorted(self.ids, ids).clip(max=self.ids.size - 1)
+        return self.ids[positions] == ids
+
+    def mask(
+        self, distances: np.ndarray, ids: np.ndarray, k: int, descending: bool
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        # removed neighbors are dropped from results of more than k
+        # neighbors, keeping order of the others. missing results are padded
+        # like faiss.
+        removed = self.contains(ids)
+        order = np.argsort(removed, axis=1, kind='stable')[:, :k]
+        missing = np.take_along_axis(removed, order, axis=1)
+        padding = np.finfo(np.float32).max * (-1 if descending else 1)
+        return (
+            np.where(
+                missing, padding, np.take_along_axis(distances, order, axis=1)
+            ),
+            np.where(missing, -1, np.take_along_axis(ids, order, axis=1)),
+        )
+
+    def mask_range(
+        self, lims: np.ndarray, distances: np.ndarray, ids: np.ndarray
+    ) -> RangeResult:
+        kept = ~self.contains(ids)
+        offsets = np.concatenate(([0], np.cumsum(kept)))
+        return offsets[lims.astype(np.int64)], distances[kept], ids[kept]
+
+    def build_selector(self) -> faiss.IDSelector:
+        referenced = []
+        if self.dense:
+            bits = np.zeros(int(self.ids[-1]) + 1, dtype=bool)
+            bits[self.ids] = True
+            bitmap = np.packbits(bits, bitorder='little')
+            removed = faiss.IDSelectorBitmap(
+                bitmap.size, faiss.swig_ptr(bitmap)
+            )
+            referenced.append(bitmap)
+        else:
+            # ids are copied to the hash set
+            removed = faiss.IDSelectorBatch(
+                self.ids.size, faiss.swig_ptr(self.ids)
+            )
+        selector = faiss.IDSelectorNot(removed)
+        # swig does not keep python objects referenced from selectors
+        selector.referenced_objects = referenced + [removed]
+        return selector
+
+
+def supports_selector(index: Index) -> bool:
+    # e.g. IndexIDMap and IndexPQ of older faiss refuse IDSelector in search
+    # parameters
+    selector = faiss.IDSelectorAll()
+    params = to_search_parameters(index, SearchOptions(), selector)
+    try:
+        index.search(
+            np.zeros((1, index.d), dtype=np.float32), 1, params=params
+        )
+    except RuntimeError:
+        return False
+    return True
+
+
+def remove_from_index(index: Index, ids: np.ndarray) -> int:
+    ids = np.ascontiguousarray(ids, dtype=np.int64)
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None and ivf.direct_map.type == faiss.DirectMap.Hashtable:
+        # hashtable direct map only looks up ids listed in an array
+        selector = faiss.IDSelectorArray(ids.size, faiss.swig_ptr(ids))
+    else:
+        selector = faiss.IDSelectorBatch(ids.size, faiss.swig_ptr(ids))
+    return index.remove_ids(selector)
+
+
+def can_remove(index: Index) -> bool:
+    # inverted lists and flat codes can remove vectors, but graphs like HNSW
+    # can not
+    index = faiss.downcast_index(index)
+    if isinstance(index, (faiss.IndexIDMap, faiss.IndexPreTransform)):
+        return can_remove(index.index)
+    return isinstance(index, (faiss.IndexIVF, faiss.IndexFlatCodes))
+
+
+def removable_copy(index: Index) -> Index:
+    # copy of index which keeps ids of the other vectors when some are
+    # removed from it
+    copy = faiss.clone_index(index)
+    ivf = faiss.try_extract_index_ivf(copy)
+    if ivf is not None:
+        # inverted lists have ids, and hashtable direct map finds them after
+        # removing, unlike array direct map
+        if ivf.direct_map.type != faiss.DirectMap.Hashtable:
+            ivf.set_direct_map_type(faiss.DirectMap.Hashtable)
+        return copy
+    if isinstance(faiss.downcast_index(copy), faiss.IndexIDMap):
+        return copy
+    # flat codes renumber vectors after removed ones, so they are mapped to
+    # their ids by IndexIDMap2, which can still reconstruct them
+    return map_ids(copy, np.arange(copy.ntotal, dtype=np.int64))
+
+
+def map_ids(index: Index, ids: np.ndarray) -> Index:
+    # IndexIDMap2 can only be built on an empty index, so it is built on a
+    # placeholder which is replaced by the index
+    mapped = faiss.IndexIDMap2(faiss.IndexFlat(index.d, index.metric_type))
+    index.this.disown()
+    mapped.index = index
+    mapped.own_fields = True
+    mapped.ntotal = index.ntotal
+    faiss.copy_array_to_vector(ids, mapped.id_map)
+    mapped.construct_rev_map()
+    return mapped
@@ -0,0 +1,560 @@
+import dataclasses
+import functools
+import json
+import logging
+import os
+import shutil
+import struct
+import threading
+import time
+import zlib
+from dataclasses import dataclass
+from enum import Enum, unique
+from typing import (
+    Callable,
+    ContextManager,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
+
+import faiss
+import numpy as np
+from faiss import Index
+
+from faiss_grpc.index_io import contains_ids, has_sequential_ids, read_index
+from faiss_grpc.threads import ReadWriteLock
+from faiss_grpc.tombstones import (
+    Tombstones,
+    can_remove,
+    removable_copy,
+    remove_from_index,
+    supports_selector,
+)
+
+logger = logging.getLogger(__name__)
+
+WAL_FILE = 'wal.log'
+CHECKPOINT_FILE = 'checkpoint.json'
+# first bytes of log file, which has format version at the end
+WAL_MAGIC = b'FGWAL\x00\x00\x01'
+# sequence number, kind, number of vectors (or ids) and dimension of a
+# record, followed by crc32 of them and payload
+RECORD_HEADER = struct.Struct('<QBII')
+RECORD_CRC = struct.Struct('<I')
+
+
+@unique
+class RecordKind(Enum):
+    add = 1
+    add_with_ids = 2
+    # ids without vectors, whose dimension is 0
+    remove = 3
+
+
+RECORDS_WITH_IDS = (RecordKind.add_with_ids.value, RecordKind.remove.value)
+
+Record = Tuple[int, RecordKind, np.ndarray, Optional[np.ndarray]]
+
+
+@dataclass(eq=True, frozen=True)
+class Checkpoint:
+    # sequence number of the last record in snapshot, file names of the
+    # snapshot and of ids removed until then, and next id given by server
+    lsn: int = 0
+    snapshot: Optional[str] = None
+    removed: Optional[str] = None
+    next_id: Optional[int] = None
+
+
+class WriteAheadLog:
+    # records are appended with their checksum, so that a record written
+    # halfway by a crash is found and dropped on replay
+    def __init__(self, path: str, sync: bool = True) -> None:
+        self.path = path
+        self.sync = sync
+        self._file = open(path, 'a+b')
+        if self.size == 0:
+            self._file.write(WAL_MAGIC)
+            self._flush()
+        else:
+            self._file.seek(0)
+            if self._file.read(len(WAL_MAGIC)) != WAL_MAGIC:
+                self._file.close()
+                raise ValueError(f'{path} is not a write-ahead log')
+
+    @property
+    def size(self) -> int:
+        return os.path.getsize(self.path)
+
+    def append(
+        self,
+        lsn: int,
+        kind: RecordKind,
+        vectors: np.ndarray,
+        ids: Optional[np.ndarray] = None,
+    ) -> int:
+        # returns offset of the record, which is passed to rollback
+        payload = np.ascontiguousarray(vectors, dtype='<f4').tobytes()
+        if ids is not None:
+            payload += np.ascontiguousarray(ids, dtype='<i8').tobytes()
+        header = RECORD_HEADER.pack(lsn, kind.value, *vectors.shape)
+        crc = zlib.crc32(payload, zlib.crc32(header))
+        offset = self.size
+        self._file.write(header + RECORD_CRC.pack(crc) + payload)
+        self._flush()
+        return offset
+
+    def rollback(self, offset: int) -> None:
+        self._file.truncate(offset)
+        self._flush()
+
+    def drop_before(self, offset: int) -> None:
+        # records before offset are dropped, and records appended after them
+        # are kept. the log is replaced by a copy of them, so that a crash
+        # leaves either of them.
+        with open(self.path + '.tmp', 'wb') as f:
+            f.write(WAL_MAGIC)
+            self._file.seek(offset)
+            shutil.copyfileobj(self._file, f)
+            f.flush()
+            os.fsync(f.fileno())
+        self._file.close()
+        os.replace(self.path + '.tmp', self.path)
+        sync_directory(os.path.dirname(self.path))
+        self._file = open(self.path, 'a+b')
+
+    def replay(self) -> Iterator[Record]:
+        offset = len(WAL_MAGIC)
+        size = self.size
+        self._file.seek(offset)
+        while offset < size:
+            record = self._read_record()
+            if record is None:
+                logger.warning(
+                    'dropped incomplete record at %d of %d bytes of %s',
+                    offset,
+                    size,
+                    self.path,
+                )
+                self.rollback(offset)
+                return
+            yield record
+            offset = self._file.tell()
+
+    def close(self) -> None:
+        self._file.close()
+
+    def _read_record(self) -> Optional[Record]:
+        header = self._file.read(RECORD_HEADER.size + RECORD_CRC.size)
+        if len(header) < RECORD_HEADER.size + RECORD_CRC.size:
+            return None
+        lsn, kind, n, d = RECORD_HEADER.unpack_from(header)
+        (crc,) = RECORD_CRC.unpack_from(header, RECORD_HEADER.size)
+        has_ids = kind in RECORDS_WITH_IDS
+        size = n * d * 4 + (n * 8 if has_ids else 0)
+        payload = self._file.read(size)
+        if len(payload) < size or crc != zlib.crc32(
+            payload, zlib.crc32(header[: RECORD_HEADER.size])
+        ):
+            return None
+        vectors = np.frombuffer(payload, dtype='<f4', count=n * d)
+        ids = None
+        if has_ids:
+            ids = np.frombuffer(
+                payload, dtype='<i8', count=n, offset=n * d * 4
+            )
+        return lsn, RecordKind(kind), vectors.reshape(n, d), ids
+
+    def _flush(self) -> None:
+        self._file.flush()
+        if self.sync:
+            os.fsync(self._file.fileno())
+
+
+class IndexWriter:
+    # vectors are written to log before they are added to index, and index
+    # is written to a snapshot from time to time. checkpoint pointing to the
+    # snapshot is written atomically, then records in it are dropped from
+    # the log. removed ids are logged too, and filtered from searches until
+    # compaction removes them from a copy of index which is swapped in.
+    def __init__(
+        self,
+        directory: str,
+        snapshot_interval: float = 60.0,
+        sync: bool = True,
+        compaction_threshold: int = 1000,
+    ) -> None:
+        if snapshot_interval <= 0:
+            raise ValueError('snapshot_interval must be positive')
+        if compaction_threshold < 1:
+            raise ValueError('compaction_threshold must be positive')
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.snapshot_interval = snapshot_interval
+        self.compaction_threshold = compaction_threshold
+        self.checkpoint = read_checkpoint(directory)
+        # sequence number of the last record added to index
+        self.lsn = self.checkpoint.lsn
+        self.wal = WriteAheadLog(os.path.join(directory, WAL_FILE), sync)
+        self.lock = ReadWriteLock()
+        self.index: Optional[Index] = None
+        # id given to the next vector added without ids, which is None if
+        # ids are given by add_with_ids
+        self.next_id: Optional[int] = None
+        self.tombstones = Tombstones()
+        self.removable = False
+        self.snapshots = 0
+        self.compactions = 0
+        # vectors are added one request at a time, and searches only wait
+        # for vectors being added to index. snapshot takes the mutex to read
+        # the last record, and clones index while searches and removes go
+        # on. vectors are added after the clone, without blocking searches
+        # by waiting for the write lock meanwhile.
+        self._mutex = threading.Lock()
+        self._cloning = threading.Lock()
+        self._compacting = threading.Lock()
+        self._snapshotting = threading.Lock()
+        # vectors added while a copy of index is being compacted
+        self._pending: Optional[List[Tuple[np.ndarray, np.ndarray]]] = None
+        # ids removed by the last compaction, which are still filtered while
+        # searches on the previous index may be running
+        self._compacted = np.empty(0, dtype=np.int64)
+        self._on_swap: Optional[Callable[[Index], None]] = None
+        self._closed = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name='faiss-grpc-snapshot', daemon=True
+        )
+
+    @property
+    def snapshot_lsn(self) -> int:
+        return self.checkpoint.lsn
+
+    def loader(self, load: Callable[[], Index]) -> Callable[[], Index]:
+        # the last snapshot is served instead of the index file
+        if self.checkpoint.snapshot is None:
+            return load
+        return functools.partial(
+            read_index, os.path.join(self.directory, self.checkpoint.snapshot)
+        )
+
+    def recover(
+        self, index: Index, on_swap: Optional[Callable[[Index], None]] = None
+    ) -> None:
+        # records written after the snapshot are added again. records in the
+        # snapshot are left if they were not dropped before a crash.
+        # on_swap is called with compacted index.
+        removed = []
+        if self.checkpoint.removed is not None:
+            removed.append(
+                np.load(os.path.join(self.directory, self.checkpoint.removed))
+            )
+        # ids given by server follow the last one, which is ntotal until
+        # vectors are removed from index
+        self.next_id = self.checkpoint.next_id
+        if self.next_id is None and has_sequential_ids(index):
+            self.next_id = index.ntotal
+        replayed = 0
+        for lsn, kind, vectors, ids in self.wal.replay():
+            if lsn <= self.checkpoint.lsn:
+                continue
+            if kind is RecordKind.remove:
+                removed.append(ids)
+            else:
+                self.apply(index, kind, vectors, ids)
+                replayed += len(vectors)
+            self.lsn = lsn
+        self.index = index
+        self.removable = can_remove(index)
+        self.tombstones = self.tombstones_for(
+            index, np.concatenate(removed) if removed else ()
+        )
+        self._on_swap = on_swap
+        if replayed or removed:
+            logger.info(
+                'replayed %d vectors from %s, ntotal=%d, removed=%d',
+                replayed,
+                self.wal.path,
+                index.ntotal,
+                len(self.tombstones),
+            )
+
+    def reading(self) -> ContextManager[None]:
+        return self.lock.read()
+
+    def add(
+        self, vectors: np.ndarray, ids: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        with self._mutex:
+            index = self.index
+            assert index is not None, 'index must be recovered before adding'
+            kind = self.record_kind(ids)
+            lsn = self.lsn + 1
+            offset = self.wal.append(lsn, kind, vectors, ids)
+            try:
+                with self._cloning, self.lock.write():
+                    ids = self.apply(index, kind, vectors, ids)
+            except RuntimeError:
+                # log must not have vectors refused by index
+                self.wal.rollback(offset)
+                raise
+            if self._pending is not None:
+                self._pending.append((vectors, ids))
+            self.lsn = lsn
+        return ids
+
+    def record_kind(self, ids: Optional[np.ndarray]) -> RecordKind:
+        if ids is None:
+            if self.next_id is None:
+                raise RuntimeError(
+                    'index has ids given by add_with_ids, so vectors must be '
+                    'added with ids'
+                )
+            return RecordKind.add
+        if self.next_id is not None:
+            raise RuntimeError(
+                'index has ids given by server, so vectors must be added '
+                'without ids'
+            )
+        removed = ids[self.tombstones.contains(ids)]
+        if removed.size:
+            # removed vectors are still in index until compaction
+            raise RuntimeError(
+                f'id {removed[0]} was removed, and can be added again after '
+                'compaction'
+            )
+        return RecordKind.add_with_ids
+
+    def apply(
+        self,
+        index: Index,
+        kind: RecordKind,
+        vectors: np.ndarray,
+        ids: Optional[np.ndarray],
+    ) -> np.ndarray:
+        # returns ids of added vectors, which are given by server for add
+        if kind is RecordKind.add:
+            assert self.next_id is not None
+            ids = np.arange(
+                self.next_id, self.next_id + len(vectors), dtype=np.int64
+            )
+        add_to_index(index, vectors, ids)
+        if kind is RecordKind.add:
+            self.next_id += len(vectors)
+        return ids
+
+    def remove(self, ids: np.ndarray) -> int:
+        # ids are only logged and filtered from searches, so that removing
+        # does not wait for index. returns number of newly removed ids.
+        with self._mutex:
+            index = self.index
+            assert index is not None, 'index must be recovered before removing'
+            if not self.removable:
+                raise RuntimeError(
+                    'vectors can not be removed from '
+                    f'{type(faiss.downcast_index(index)).__name__}, index '
+                    'must be rebuilt without them'
+                )
+            if self.next_id is not None:
+                invalid = (ids < 0) | (ids >= self.next_id)
+                if invalid.any():
+                    raise ValueError(
+                        f'request id must be 0 <= id <= {self.next_id - 1}'
+                    )
+            tombstones = self.tombstones
+            ids = np.setdiff1d(ids, tombstones.ids)
+            if self.next_id is None:
+                # ids given by add_with_ids are not in a range, so unknown
+                # ones are skipped instead of counted as removed
+                ids = ids[contains_ids(index, ids)]
+            if ids.size == 0:
+                return 0
+            lsn = self.lsn + 1
+            self.wal.append(
+                lsn,
+                RecordKind.remove,
+                np.empty((ids.size, 0), dtype=np.float32),
+                ids,
+            )
+            self.tombstones = tombstones.add(ids)
+            self.lsn = lsn
+        return int(ids.size)
+
+    def compact(self) -> bool:
+        # removed ids are removed from a copy of index, while searches and
+        # adds go on with the current one. vectors added meanwhile are added
+        # to the copy too, then it is swapped in.
+        with self._compacting:
+            with self._mutex:
+                self.tombstones = self.tombstones.discard(self._compacted)
+                self._compacted = np.empty(0, dtype=np.int64)
+                removed = self.tombstones.ids
+                if removed.size < self.compaction_threshold:
+                    return False
+                start = time.monotonic()
+                index = removable_copy(self.index)
+                self._pending = []
+            try:
+                remove_from_index(index, removed)
+                with self._mutex:
+                    for vectors, ids in self._pending:
+                        add_to_index(index, vectors, ids)
+                    self.swap(index, removed)
+            finally:
+                self._pending = None
+        logger.info(
+            'compacted %d removed ids in %.3f seconds, ntotal=%d',
+            removed.size,
+            time.monotonic() - start,
+            index.ntotal,
+        )
+        return True
+
+    def swap(self, index: Index, removed: np.ndarray) -> None:
+        self.index = index
+        # compacted index may be another type, which decides how removed ids
+        # are skipped. searches which started before swapping may return
+        # removed ids from the previous index, so they are discarded at next
+        # compaction.
+        self.tombstones = self.tombstones_for(index, self.tombstones.ids)
+        self._compacted = removed
+        self.compactions += 1
+        if self._on_swap is not None:
+            self._on_swap(index)
+
+    def tombstones_for(
+        self, index: Index, ids: Union[np.ndarray, Sequence[int]]
+    ) -> Tombstones:
+        # ids given by server are below next_id, so a bitmap of them is small
+        return Tombstones(
+            ids, self.next_id is not None, supports_selector(index)
+        )
+
+    def snapshot(self) -> bool:
+        # index is cloned at the last record, and written while vectors are
+        # added to the index. records added meanwhile are kept in the log.
+        with self._snapshotting:
+            with self._mutex:
+                lsn = self.lsn
+                if lsn == self.checkpoint.lsn:
+                    return False
+                start = time.monotonic()
+                offset = self.wal.size
+                index = self.index
+                removed_ids = self.tombstones.ids
+                next_id = self.next_id
+                self._cloning.acquire()
+            try:
+                index = faiss.clone_index(index)
+            finally:
+                self._cloning.release()
+            snapshot = f'snapshot-{lsn:020d}.faiss'
+            write_index(index, os.path.join(self.directory, snapshot))
+            del index
+            removed = None
+            if removed_ids.size:
+                removed = f'removed-{lsn:020d}.npy'
+                write_ids(removed_ids, os.path.join(self.directory, removed))
+            with self._mutex:
+                previous = self.checkpoint
+                self.checkpoint = Checkpoint(lsn, snapshot, removed, next_id)
+                write_checkpoint(self.directory, self.checkpoint)
+                self.wal.drop_before(offset)
+                self.snapshots += 1
+            for name in (previous.snapshot, previous.removed):
+                if name is not None:
+                    os.remove(os.path.join(self.directory, name))
+        logger.info(
+            'wrote snapshot %s in %.3f seconds',
+            snapshot,
+            time.monotonic() - start,
+        )
+        return True
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            'wal_records': self.lsn - self.checkpoint.lsn,
+            'wal_bytes': self.wal.size,
+            'snapshots_total': self.snapshots,
+            'removed_ids': len(self.tombstones),
+            'compactions_total': self.compactions,
+        }
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def close(self) -> None:
+        self._closed.set()
+        if self._thread.is_alive():
+            self._thread.join()
+        with self._mutex:
+            self.wal.close()
+
+    def _run(self) -> None:
+        # snapshot is written after compaction, so that it has fewer vectors
+        while not self._closed.wait(self.snapshot_interval):
+            try:
+                self.compact()
+            except Exception:
+                logger.exception('failed to compact index')
+            try:
+                self.snapshot()
+            except Exception:
+                logger.exception('failed to write snapshot')
+
+
+def add_to_index(index: Index, vectors: np.ndarray, ids: np.ndarray) -> None:
+    # ids given by server are positions in index with sequential ids
+    if has_sequential_ids(index):
+        index.add(vectors)
+    else:
+        index.add_with_ids(vectors, ids)
+
+
+def read_checkpoint(directory: str) -> Checkpoint:
+    path = os.path.join(directory, CHECKPOINT_FILE)
+    if not os.path.exists(path):
+        return Checkpoint()
+    with open(path) as f:
+        return Checkpoint(**json.load(f))
+
+
+def write_checkpoint(directory: str, checkpoint: Checkpoint) -> None:
+    path = os.path.join(directory, CHECKPOINT_FILE)
+    with open(path + '.tmp', 'w') as f:
+        json.dump(dataclasses.asdict(checkpoint), f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(path + '.tmp', path)
+    sync_directory(directory)
+
+
+def write_index(index: Index, path: str) -> None:
+    # file is renamed after it was written completely, so that a crash does
+    # not leave a broken snapshot
+    faiss.write_index(index, path + '.tmp')
+    with open(path + '.tmp', 'rb') as f:
+        os.fsync(f.fileno())
+    os.replace(path + '.tmp', path)
+    sync_directory(os.path.dirname(path))
+
+
+def write_ids(ids: np.ndarray, path: str) -> None:
+    with open(path + '.tmp', 'wb') as f:
+        np.save(f, ids)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(path + '.tmp', path)
+    sync_directory(os.path.dirname(path))
+
+
+def sync_directory(directory: str) -> None:
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
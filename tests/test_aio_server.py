@@ -0,0 +1,254 @@
+import asyncio
+import os
+import tempfile
+import threading
+import unittest
+from typing import Any, List
+from unittest import mock
+
+import faiss
+import grpc
+import numpy as np
+from google.protobuf.empty_pb2 import Empty
+
+from faiss_grpc.aio_server import AsyncServer, ExecutorContext
+from faiss_grpc.faiss_server import (
+    FaissServiceConfig,
+    ServerConfig,
+    StreamSearcher,
+)
+from faiss_grpc.proto import faiss_pb2_grpc
+from faiss_grpc.proto.faiss_pb2 import (
+    AddRequest,
+    HeatbeatResponse,
+    SearchByIdRequest,
+    SearchRequest,
+    SearchResponse,
+    SearchStreamRequest,
+    Vector,
+)
+
+
+async def read_all(call: Any) -> List[Any]:
+    return [response async for response in call]
+
+
+class TestAsyncServer(unittest.TestCase):
+    # IsolatedAsyncioTestCase is not available on python 3.7, so coroutines
+    # are run by an event loop of each test
+    DIM = 64
+    DB_SIZE = 10000
+    PORT = 50052
+
+    def setUp(self) -> None:
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.run = self.loop.run_until_complete
+        np.random.seed(1234)
+        xb = np.random.random((self.DB_SIZE, self.DIM)).astype('float32')
+        self.index = faiss.IndexFlatL2(self.DIM)
+        self.index.add(xb)
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            index_path = os.path.join(temp_dir, 'index.faiss')
+            faiss.write_index(self.index, index_path)
+            self.server = AsyncServer(
+                index_path=index_path,
+                server_config=ServerConfig(
+                    port=self.PORT, max_workers=2, metrics_port=0
+                ),
+                service_config=FaissServiceConfig(),
+            )
+        self.run(self.server.start())
+
+        self.channel = grpc.aio.insecure_channel(f'localhost:{self.PORT}')
+        self.stub = faiss_pb2_grpc.FaissServiceStub(self.channel)
+
+    def tearDown(self) -> None:
+        self.run(self.channel.close())
+        self.run(self.server.stop(None))
+        self.loop.close()
+        asyncio.set_event_loop(None)
+
+    def test_serve_search(self) -> None:
+        k = 10
+        val = np.ones(self.DIM, dtype=np.float32)
+        response = self.run(
+            self.stub.Search(SearchRequest(query=Vector(val=val), k=k))
+        )
+
+        _, ids = self.index.search(np.atleast_2d(val), k)
+        self.assertEqual([n.id for n in response.neighbors], list(ids[0]))
+
+    def test_failed_illegal_query_dimension_search(self) -> None:
+        val = np.ones(self.DIM * 2, dtype=np.float32)
+        with self.assertRaises(grpc.aio.AioRpcError) as cm:
+            self.run(
+                self.stub.Search(SearchRequest(query=Vector(val=val), k=10))
+            )
+
+        self.assertIs(cm.exception.code(), grpc.StatusCode.INVALID_ARGUMENT)
+        self.assertRegex(
+            cm.exception.details(), 'query vector dimension mismatch'
+        )
+
+    def test_set_status_of_executor_context(self) -> None:
+        contexts: List[Any] = []
+
+        def search(request: Any, context: Any) -> Any:
+            # aio context is not given to executor threads
+            contexts.append(context)
+            self.assertIsNotNone(context.time_remaining())
+            context.set_code(grpc.StatusCode.UNAVAILABLE)
+            context.set_details('unavailable')
+            context.set_trailing_metadata((('faiss-grpc-test', 'value'),))
+            return SearchResponse()
+
+        val = np.ones(self.DIM, dtype=np.float32)
+        with mock.patch.object(
+            self.server.servicer.servicer, 'Search', search
+        ):
+            call = self.stub.Search(
+                SearchRequest(query=Vector(val=val), k=10), timeout=10
+            )
+            with self.assertRaises(grpc.aio.AioRpcError) as cm:
+                self.run(call)
+
+        self.assertIsInstance(contexts[0], ExecutorContext)
+        self.assertIs(cm.exception.code(), grpc.StatusCode.UNAVAILABLE)
+        self.assertEqual(cm.exception.details(), 'unavailable')
+        self.assertIn(
+            ('faiss-grpc-test', 'value'),
+            tuple(cm.exception.trailing_metadata()),
+        )
+
+    def test_failed_not_writable_add(self) -> None:
+        val = np.ones(self.DIM, dtype=np.float32)
+        with self.assertRaises(grpc.aio.AioRpcError) as cm:
+            self.run(self.stub.Add(AddRequest(vectors=[Vector(val=val)])))
+
+        self.assertIs(cm.exception.code(), grpc.StatusCode.FAILED_PRECONDITION)
+
+    def test_serve_search_by_id(self) -> None:
+        k = 10
+        response = self.run(self.stub.SearchById(SearchByIdRequest(id=0, k=k)))
+        self.assertEqual(response.request_id, 0)
+        self.assertEqual(len(response.neighbors), k)
+
+    def test_serve_search_stream(self) -> None:
+        k = 10
+        vals = np.random.random((20, self.DIM)).astype('float32')
+        call = self.stub.SearchStream()
+        for i, val in enumerate(vals):
+            self.run(
+                call.write(
+                    SearchStreamRequest(
+                        sequence_id=i,
+                        request=SearchRequest(query=Vector(val=val), k=k),
+                    )
+                )
+            )
+        self.run(call.done_writing())
+        responses = self.run(read_all(call))
+
+        self.assertEqual(
+            sorted(r.sequence_id for r in responses), list(range(len(vals)))
+        )
+        for response in responses:
+            _, ids = self.index.search(
+                np.atleast_2d(vals[response.sequence_id]), k
+            )
+            self.assertEqual(
+                [n.id for n in response.response.neighbors], list(ids[0])
+            )
+
+    def test_submit_search_stream_on_executor(self) -> None:
+        # index of a request may be loaded on submitting, which must not
+        # block event loop
+        threads: List[str] = []
+        submit = StreamSearcher.submit
+
+        def record(searcher: StreamSearcher, *args: Any) -> None:
+            threads.append(threading.current_thread().name)
+            submit(searcher, *args)
+
+        val = np.ones(self.DIM, dtype=np.float32)
+        with mock.patch.object(StreamSearcher, 'submit', record):
+            call = self.stub.SearchStream()
+            self.run(
+                call.write(
+                    SearchStreamRequest(
+                        request=SearchRequest(query=Vector(val=val), k=10)
+                    )
+                )
+            )
+            self.run(call.done_writing())
+            self.assertEqual(len(self.run(read_all(call))), 1)
+
+        self.assertEqual(len(threads), 1)
+        self.assertTrue(threads[0].startswith('faiss-grpc-search'))
+
+    def test_build_search_stream_response_on_executor(self) -> None:
+        threads: List[str] = []
+        to_response = StreamSearcher.to_response
+
+        def record(searcher: StreamSearcher, *args: Any) -> Any:
+            threads.append(threading.current_thread().name)
+            return to_response(searcher, *args)
+
+        val = np.ones(self.DIM, dtype=np.float32)
+        with mock.patch.object(StreamSearcher, 'to_response', record):
+            call = self.stub.SearchStream()
+            self.run(
+                call.write(
+                    SearchStreamRequest(
+                        request=SearchRequest(query=Vector(val=val), k=10)
+                    )
+                )
+            )
+            self.run(call.done_writing())
+            self.assertEqual(len(self.run(read_all(call))), 1)
+
+        self.assertEqual(len(threads), 1)
+        self.assertTrue(threads[0].startswith('faiss-grpc-search'))
+
+    def test_serve_metrics(self) -> None:
+        val = np.ones(self.DIM, dtype=np.float32)
+        self.run(self.stub.Search(SearchRequest(query=Vector(val=val), k=10)))
+        with self.assertRaises(grpc.aio.AioRpcError):
+            self.run(
+                self.stub.Search(SearchRequest(query=Vector(val=[1.0]), k=10))
+            )
+        call = self.stub.SearchStream()
+        self.run(
+            call.write(
+                SearchStreamRequest(
+                    request=SearchRequest(query=Vector(val=val), k=10)
+                )
+            )
+        )
+        self.run(call.done_writing())
+        self.assertEqual(len(self.run(read_all(call))), 1)
+
+        assert self.server.metrics
+        text = self.server.metrics.render()
+
+        for line in [
+            'faiss_grpc_requests_total{method="Search",code="OK"} 1',
+            'faiss_grpc_requests_total'
+            '{method="Search",code="INVALID_ARGUMENT"} 1',
+            'faiss_grpc_requests_total{method="SearchStream",code="OK"} 1',
+            'faiss_grpc_rpc_seconds_count{method="Search"} 2',
+            'faiss_grpc_request_k_count{method="Search"} 2',
+            'faiss_grpc_stage_seconds_count{stage="search"} 2',
+            'faiss_grpc_worker_tasks_queued 0',
+        ]:
+            self.assertIn(line, text)
+
+    def test_serve_heatbeat(self) -> None:
+        response = self.run(self.stub.Heatbeat(Empty()))
+        self.assertEqual(response, HeatbeatResponse(message='OK'))
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
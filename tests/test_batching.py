@@ -0,0 +1,108 @@
+import threading
+import unittest
+from concurrent import futures
+from typing import List, Optional, Tuple
+
+import faiss
+import numpy as np
+
+from faiss_grpc.batching import SearchBatcher, SearchResult
+from faiss_grpc.search_options import SearchOptions
+
+
+class TestSearchBatcher(unittest.TestCase):
+    DIM = 16
+
+    def setUp(self) -> None:
+        np.random.seed(1234)
+        self.index = faiss.IndexFlatL2(self.DIM)
+        self.index.add(np.random.random((1000, self.DIM)).astype('float32'))
+        self.batch_sizes: List[int] = []
+        self.batch_options: List[Tuple[int, Optional[SearchOptions]]] = []
+        self.lock = threading.Lock()
+
+    def search(
+        self, queries: np.ndarray, k: int, options: Optional[SearchOptions]
+    ) -> SearchResult:
+        with self.lock:
+            self.batch_sizes.append(queries.shape[0])
+            self.batch_options.append((k, options))
+        return self.index.search(queries, k)
+
+    def test_search_returns_own_row(self) -> None:
+        batcher = SearchBatcher(self.search, 8, 10000)
+        self.addCleanup(batcher.close)
+        queries = np.random.random((32, self.DIM)).astype('float32')
+
+        with futures.ThreadPoolExecutor(max_workers=32) as executor:
+            results = list(
+                executor.map(
+                    lambda q: batcher.search(np.atleast_2d(q), 10), queries
+                )
+            )
+
+        for query, (distances, ids) in zip(queries, results):
+            expected_distances, expected_ids = self.index.search(
+                np.atleast_2d(query), 10
+            )
+            np.testing.assert_array_equal(ids, expected_ids)
+            np.testing.assert_allclose(distances, expected_distances)
+        self.assertLessEqual(max(self.batch_sizes), 8)
+        self.assertLess(len(self.batch_sizes), len(queries))
+
+    def test_groups_queries_by_k(self) -> None:
+        batcher = SearchBatcher(self.search, 64, 50000)
+        self.addCleanup(batcher.close)
+        query = np.random.random((1, self.DIM)).astype('float32')
+
+        small = batcher.submit(query, 5)
+        large = batcher.submit(query, 20)
+
+        self.assertEqual(small.result()[1].shape, (1, 5))
+        self.assertEqual(large.result()[1].shape, (1, 20))
+
+    def test_groups_queries_by_options(self) -> None:
+        batcher = SearchBatcher(self.search, 64, 50000)
+        self.addCleanup(batcher.close)
+        query = np.random.random((1, self.DIM)).astype('float32')
+        options = SearchOptions(nprobe=4)
+
+        futures.wait(
+            [
+                batcher.submit(query, 5),
+                batcher.submit(query, 5, options),
+                batcher.submit(query, 5, SearchOptions(nprobe=4)),
+            ]
+        )
+
+        self.assertEqual(sorted(self.batch_sizes), [1, 2])
+        self.assertEqual(set(self.batch_options), {(5, None), (5, options)})
+
+    def test_propagates_search_error(self) -> None:
+        def failing_search(
+            queries: np.ndarray, k: int, options: Optional[SearchOptions]
+        ) -> SearchResult:
+            raise RuntimeError('search failed')
+
+        batcher = SearchBatcher(failing_search, 8, 0)
+        self.addCleanup(batcher.close)
+        query = np.random.random((1, self.DIM)).astype('float32')
+
+        with self.assertRaisesRegex(RuntimeError, 'search failed'):
+            batcher.search(query, 5)
+
+    def test_failed_submit_after_close(self) -> None:
+        batcher = SearchBatcher(self.search, 8, 0)
+        batcher.close()
+        query = np.random.random((1, self.DIM)).astype('float32')
+
+        with self.assertRaisesRegex(RuntimeError, 'already closed'):
+            batcher.submit(query, 5)
+
+    def test_failed_invalid_batch_size(self) -> None:
+        with self.assertRaisesRegex(ValueError, 'max_batch_size'):
+            SearchBatcher(self.search, 0, 0)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
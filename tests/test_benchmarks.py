@@ -0,0 +1,143 @@
+import tempfile
+import time
+import unittest
+from concurrent import futures
+from typing import Any
+
+import faiss
+import numpy as np
+
+from benchmarks.indexes import INDEX_TYPES, build_index, pq_size
+from benchmarks.load import LoadResult, closed_loop, make_requests, open_loop
+from benchmarks.micro import build_cases, compare, measure
+from faiss_grpc.proto.faiss_pb2 import BatchSearchRequest, SearchByIdRequest
+
+
+class FutureMethod:
+    # stands in for grpc multi callable, completing requests on a thread
+    def __init__(self, latency: float) -> None:
+        self.latency = latency
+        self.executor = futures.ThreadPoolExecutor(max_workers=4)
+
+    def __call__(self, request: Any) -> Any:
+        time.sleep(self.latency)
+        return request
+
+    def future(self, request: Any) -> 'futures.Future[Any]':
+        return self.executor.submit(self, request)
+
+
+class TestIndexes(unittest.TestCase):
+    def test_build_index(self) -> None:
+        for index_type in INDEX_TYPES:
+            index = build_index(index_type, 16, 2000)
+
+            self.assertEqual(index.ntotal, 2000, index_type)
+            self.assertEqual(index.d, 16, index_type)
+            _, ids = index.search(np.ones((1, 16), dtype=np.float32), 5)
+            self.assertEqual(ids.shape, (1, 5), index_type)
+
+    def test_build_ivf_index(self) -> None:
+        index = build_index('ivfpq', 64, 5000)
+
+        self.assertIsInstance(index, faiss.IndexIVFPQ)
+        self.assertEqual(index.nlist, 5000 // 39)
+        self.assertEqual(index.pq.M, 16)
+
+    def test_pq_size(self) -> None:
+        self.assertEqual(pq_size(64), 16)
+        self.assertEqual(pq_size(100), 25)
+        self.assertEqual(pq_size(7), 1)
+        self.assertEqual(pq_size(2), 1)
+
+    def test_failed_unknown_index_type(self) -> None:
+        with self.assertRaises(ValueError):
+            build_index('lsh', 16, 100)
+
+
+class TestLoad(unittest.TestCase):
+    def test_summary(self) -> None:
+        result = LoadResult(
+            latencies=[i / 1000 for i in range(1, 101)], duration=2.0
+        )
+
+        summary = result.summary()
+
+        self.assertEqual(summary['requests'], 100)
+        self.assertEqual(summary['qps'], 50)
+        self.assertAlmostEqual(summary['p50_ms'], 50.5)
+        self.assertAlmostEqual(summary['p99_ms'], 99.01)
+        self.assertAlmostEqual(summary['max_ms'], 100)
+
+    def test_make_requests(self) -> None:
+        requests = make_requests('batch_search', 8, 100, 10, 4, False)
+        self.assertIsInstance(requests[0], BatchSearchRequest)
+        self.assertEqual(len(requests[0].queries), 4)
+
+        requests = make_requests('search_by_id', 8, 100, 10, 4, False)
+        self.assertIsInstance(requests[0], SearchByIdRequest)
+        self.assertTrue(all(r.id < 100 for r in requests))
+
+    def test_closed_loop(self) -> None:
+        result = closed_loop(FutureMethod(0.01), [1, 2], 2, 0.2)
+
+        self.assertGreater(len(result.latencies), 10)
+        self.assertEqual(result.errors, 0)
+        self.assertGreaterEqual(min(result.latencies), 0.01)
+
+    def test_open_loop(self) -> None:
+        method = FutureMethod(0.01)
+        self.addCleanup(method.executor.shutdown)
+
+        result = open_loop(method, [1, 2], 100, 0.2)
+
+        self.assertEqual(len(result.latencies), 20)
+        self.assertGreaterEqual(result.duration, 0.19)
+        self.assertGreaterEqual(min(result.latencies), 0.01)
+
+
+class TestMicro(unittest.TestCase):
+    def test_build_cases(self) -> None:
+        with tempfile.TemporaryDirectory() as index_dir:
+            cases = build_cases(['flat', 'hnsw'], index_dir, 8, 200)
+
+        names = [case.name for case in cases]
+        self.assertEqual(len(names), len(set(names)))
+        for name in [
+            'decode/packed/batch=16',
+            'normalize/batch=1',
+            'search/hnsw/batch=16',
+            'response/neighbors/k=10000',
+            'serialize/columnar/k=10',
+            'rpc/Search/k=10',
+        ]:
+            self.assertIn(name, names)
+        for case in cases:
+            case.run()
+
+    def test_measure(self) -> None:
+        result = measure(lambda: time.sleep(0.001), 2)
+
+        self.assertGreaterEqual(result['min_us'], 1000)
+        self.assertGreaterEqual(result['median_us'], result['min_us'])
+
+    def test_compare(self) -> None:
+        baseline = {
+            'decode': {'median_us': 10.0},
+            'search': {'median_us': 100.0},
+            'removed': {'median_us': 1.0},
+        }
+        results = {
+            'decode': {'median_us': 20.0},
+            'search': {'median_us': 110.0},
+            'added': {'median_us': 1.0},
+        }
+
+        regressions = compare(results, baseline, 0.2)
+
+        self.assertEqual(regressions, ['decode: 10.00 us -> 20.00 us (2.00x)'])
+        self.assertEqual(compare(results, baseline, 1.0), [])
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,119 @@
+import threading
+import time
+import unittest
+
+import numpy as np
+
+from faiss_grpc.batching import SearchResult
+from faiss_grpc.cache import LRUCache, result_bytes
+
+
+def result(value: int) -> SearchResult:
+    return np.array([[float(value)]]), np.array([[value]])
+
+
+class TestLRUCache(unittest.TestCase):
+    def test_hit(self) -> None:
+        cache = LRUCache(max_entries=2)
+        first = cache.get_or_compute('a', lambda: result(1))
+        second = cache.get_or_compute('a', lambda: result(2))
+
+        self.assertIs(first, second)
+        self.assertEqual(cache.hits, 1)
+        self.assertEqual(cache.misses, 1)
+
+    def test_evict_least_recently_used(self) -> None:
+        cache = LRUCache(max_entries=2)
+        cache.get_or_compute('a', lambda: result(1))
+        cache.get_or_compute('b', lambda: result(2))
+        # a is used more recently than b
+        cache.get_or_compute('a', lambda: result(1))
+        cache.get_or_compute('c', lambda: result(3))
+
+        self.assertEqual(cache.size, 2)
+        _, ids = cache.get_or_compute('b', lambda: result(4))
+        self.assertEqual(ids[0][0], 4)
+        _, ids = cache.get_or_compute('c', lambda: result(5))
+        self.assertEqual(ids[0][0], 3)
+
+    def test_evict_over_max_bytes(self) -> None:
+        # each result has 16 bytes of distances and ids
+        cache = LRUCache(max_entries=10, max_bytes=40, weigh=result_bytes)
+        for key in 'abc':
+            cache.get_or_compute(key, lambda: result(1))
+
+        self.assertEqual(cache.size, 2)
+        self.assertEqual(cache.bytes, 32)
+        _, ids = cache.get_or_compute('a', lambda: result(2))
+        self.assertEqual(ids[0][0], 2)
+
+    def test_not_cache_value_over_max_bytes(self) -> None:
+        cache = LRUCache(max_entries=10, max_bytes=40, weigh=result_bytes)
+        cache.get_or_compute('a', lambda: result(1))
+
+        large = (np.zeros((1, 10)), np.zeros((1, 10), dtype=np.int64))
+        cache.get_or_compute('b', lambda: large)
+
+        # large result does not evict the others
+        self.assertEqual(cache.size, 1)
+        self.assertEqual(cache.bytes, 16)
+
+    def test_expire(self) -> None:
+        cache = LRUCache(max_entries=2, ttl=0.01)
+        cache.get_or_compute('a', lambda: result(1))
+        time.sleep(0.02)
+        _, ids = cache.get_or_compute('a', lambda: result(2))
+
+        self.assertEqual(ids[0][0], 2)
+        self.assertEqual(cache.misses, 2)
+
+    def test_clear(self) -> None:
+        cache = LRUCache(max_entries=2)
+        cache.get_or_compute('a', lambda: result(1))
+        cache.clear()
+        _, ids = cache.get_or_compute('a', lambda: result(2))
+
+        self.assertEqual(ids[0][0], 2)
+        self.assertEqual(cache.bytes, 0)
+
+    def test_not_cache_result_searched_before_clear(self) -> None:
+        cache = LRUCache(max_entries=2)
+        searching = threading.Event()
+        cleared = threading.Event()
+
+        def search() -> SearchResult:
+            searching.set()
+            cleared.wait(timeout=10)
+            return result(1)
+
+        thread = threading.Thread(
+            target=cache.get_or_compute, args=('a', search)
+        )
+        thread.start()
+        searching.wait(timeout=10)
+        cache.clear()
+        cleared.set()
+        thread.join()
+
+        self.assertEqual(cache.size, 0)
+
+    def test_query_key(self) -> None:
+        query = np.ones((1, 4), dtype=np.float32)
+        self.assertEqual(
+            LRUCache.query_key(query), LRUCache.query_key(query.copy())
+        )
+        self.assertNotEqual(
+            LRUCache.query_key(query), LRUCache.query_key(query * 2)
+        )
+
+    def test_failed_illegal_config(self) -> None:
+        with self.assertRaises(ValueError):
+            LRUCache(max_entries=0)
+        with self.assertRaises(ValueError):
+            LRUCache(max_entries=1, ttl=0)
+        with self.assertRaises(ValueError):
+            LRUCache(max_entries=1, max_bytes=0)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
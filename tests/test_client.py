@@ -0,0 +1,465 @@
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from concurrent import futures
+from typing import Any, List
+
+import faiss
+import grpc
+import numpy as np
+
+from faiss_grpc.client import (
+    AsyncFaissClient,
+    Balancing,
+    ChannelPool,
+    ClientConfig,
+    FaissClient,
+    to_range_result,
+)
+from faiss_grpc.faiss_server import (
+    FaissServiceConfig,
+    FaissServiceServicer,
+    ServerConfig,
+    create_servicer,
+)
+from faiss_grpc.proto.faiss_pb2 import FLOAT16, SearchResponse
+from faiss_grpc.proto.faiss_pb2_grpc import add_FaissServiceServicer_to_server
+
+IMPORT_SCRIPT = '''
+import sys
+sys.modules['faiss'] = None
+import faiss_grpc.client
+'''
+
+
+class RecordingServicer(FaissServiceServicer):
+    # replica which records called methods, and can be made slow
+    def __init__(self, index: faiss.Index, delay: float = 0) -> None:
+        super().__init__(index, FaissServiceConfig())
+        self.delay = delay
+        self.methods: List[str] = []
+        self.lock = threading.Lock()
+
+    def record(self, method: str) -> None:
+        with self.lock:
+            self.methods.append(method)
+        time.sleep(self.delay)
+
+    def Search(self, request, context):
+        self.record('Search')
+        return super().Search(request, context)
+
+    def BatchSearch(self, request, context):
+        self.record('BatchSearch')
+        return super().BatchSearch(request, context)
+
+
+class TestFaissClient(unittest.TestCase):
+    DIM = 16
+    DB_SIZE = 1000
+    PORTS = (50071, 50072)
+    INDEX: faiss.Index
+    XB: np.ndarray
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        np.random.seed(1234)
+        cls.XB = np.random.random((cls.DB_SIZE, cls.DIM)).astype('float32')
+        cls.INDEX = faiss.IndexFlatL2(cls.DIM)
+        cls.INDEX.add(cls.XB)
+
+    def setUp(self) -> None:
+        # the first replica is slow only for hedging tests
+        self.servicers = [
+            RecordingServicer(self.INDEX) for _ in range(len(self.PORTS))
+        ]
+        for port, servicer in zip(self.PORTS, self.servicers):
+            server = grpc.server(futures.ThreadPoolExecutor(max_workers=8))
+            add_FaissServiceServicer_to_server(servicer, server)
+            server.add_insecure_port(f'localhost:{port}')
+            server.start()
+            self.addCleanup(lambda s=server: s.stop(None).wait())
+
+    def config(self, **kwargs) -> ClientConfig:
+        addresses = tuple(f'localhost:{port}' for port in self.PORTS)
+        return ClientConfig(addresses=addresses, **kwargs)
+
+    def client(self, **kwargs) -> FaissClient:
+        client = FaissClient(self.config(**kwargs))
+        self.addCleanup(client.close)
+        return client
+
+    def test_search(self) -> None:
+        client = self.client()
+
+        scores, ids = client.search(self.XB[0], 10)
+
+        expected_scores, expected_ids = self.INDEX.search(self.XB[:1], 10)
+        np.testing.assert_array_equal(ids, expected_ids[0])
+        np.testing.assert_allclose(scores, expected_scores[0], rtol=1e-5)
+        self.assertEqual(ids.dtype, np.int64)
+        self.assertEqual(scores.dtype, np.float32)
+
+    def test_float16_search(self) -> None:
+        client = self.client(dtype=FLOAT16)
+
+        _, ids = client.search(self.XB[0], 1)
+
+        self.assertEqual(ids.tolist(), [0])
+
+    def test_batch_search(self) -> None:
+        client = self.client()
+
+        scores, ids = client.batch_search(self.XB[:5], 10)
+
+        expected_scores, expected_ids = self.INDEX.search(self.XB[:5], 10)
+        np.testing.assert_array_equal(ids, expected_ids)
+        np.testing.assert_allclose(scores, expected_scores, rtol=1e-5)
+
+    def test_search_by_id(self) -> None:
+        client = self.client()
+
+        _, ids = client.search_by_id(0, 10)
+
+        _, expected_ids = self.INDEX.search(self.XB[:1], 11)
+        np.testing.assert_array_equal(ids, expected_ids[0, 1:])
+
+    def test_search_by_ids(self) -> None:
+        client = self.client()
+
+        scores, ids = client.search_by_ids([0, self.DB_SIZE], 10)
+
+        # invalid id has no neighbors
+        self.assertEqual(ids.shape, (2, 10))
+        self.assertTrue((ids[0] != -1).all())
+        self.assertTrue((ids[1] == -1).all())
+        self.assertTrue(np.isnan(scores[1]).all())
+
+    def test_range_search(self) -> None:
+        client = self.client()
+        radius = float(self.INDEX.search(self.XB[:2], 5)[0][:, 4].max())
+
+        lims, scores, ids = client.range_search(self.XB[:2], radius, 3)
+
+        np.testing.assert_array_equal(lims, [0, 3, 6])
+        self.assertEqual(ids[0], 0)
+        self.assertEqual(ids[3], 1)
+        self.assertTrue((scores < radius).all())
+
+    def test_failed_illegal_query_dimension_search(self) -> None:
+        client = self.client()
+
+        with self.assertRaises(grpc.RpcError) as cm:
+            client.search(np.ones(3), 10)
+
+        self.assertIs(cm.exception.code(), grpc.StatusCode.INVALID_ARGUMENT)
+
+    def test_failed_not_writable(self) -> None:
+        client = FaissClient(
+            ClientConfig(addresses=(f'localhost:{self.PORTS[0]}',))
+        )
+        self.addCleanup(client.close)
+
+        with self.assertRaises(grpc.RpcError) as cm:
+            client.add(self.XB[:2])
+
+        self.assertIs(cm.exception.code(), grpc.StatusCode.FAILED_PRECONDITION)
+        with self.assertRaises(grpc.RpcError) as cm:
+            client.remove([0])
+
+        self.assertIs(cm.exception.code(), grpc.StatusCode.FAILED_PRECONDITION)
+
+    def test_failed_write_to_replicas(self) -> None:
+        client = self.client()
+
+        # replicas would diverge if a write reached only one of them
+        for write in (
+            lambda: client.add(self.XB[:2]),
+            lambda: client.add_with_ids(self.XB[:2], [0, 1]),
+            lambda: client.remove([0]),
+        ):
+            with self.assertRaisesRegex(RuntimeError, 'client of replicas'):
+                write()
+
+        self.assertEqual([s.methods for s in self.servicers], [[], []])
+
+    def test_round_robin(self) -> None:
+        client = self.client()
+
+        for _ in range(4):
+            client.search(self.XB[0], 1)
+
+        self.assertEqual([len(s.methods) for s in self.servicers], [2, 2])
+
+    def test_hedged_search(self) -> None:
+        self.servicers[0].delay = 1.0
+        client = self.client(hedge_percentile=90)
+        for _ in range(20):
+            client.latencies['Search'].observe(0.001)
+
+        start = time.monotonic()
+        _, ids = client.search(self.XB[0], 1)
+
+        # slow replica is called first, and the hedged call to the other
+        # replica returns earlier. the first call may be cancelled before
+        # it arrives.
+        self.assertLess(time.monotonic() - start, 0.5)
+        self.assertEqual(ids.tolist(), [0])
+        self.assertEqual(client.hedged, 1)
+        self.assertEqual(self.servicers[1].methods, ['Search'])
+
+    def test_hedge_delay_of_each_method(self) -> None:
+        client = self.client(hedge_percentile=50)
+        for _ in range(20):
+            client.observe('Search', 0.002)
+            client.observe('BatchSearch', 0.5)
+            client.observe('Stats', 0.0001)
+
+        # slow batches and cheap stats do not change delay of searches
+        self.assertAlmostEqual(client.hedge_delay('Search'), 0.002)
+        self.assertAlmostEqual(client.hedge_delay('BatchSearch'), 0.5)
+        self.assertIsNone(client.hedge_delay('SearchById'))
+        self.assertIsNone(client.hedge_delay('Stats'))
+
+    def test_not_hedged_before_latency_samples(self) -> None:
+        client = self.client(hedge_percentile=90)
+
+        client.search(self.XB[0], 1)
+
+        self.assertEqual(client.hedged, 0)
+
+    def test_batched_search(self) -> None:
+        client = self.client(max_batch_size=8, max_batch_wait_us=100000)
+        queries = self.XB[:16]
+
+        with futures.ThreadPoolExecutor(max_workers=16) as executor:
+            results = list(
+                executor.map(lambda q: client.search(q, 10), queries)
+            )
+
+        _, expected_ids = self.INDEX.search(queries, 10)
+        for (_, ids), expected in zip(results, expected_ids):
+            np.testing.assert_array_equal(ids, expected)
+        methods = sum((s.methods for s in self.servicers), [])
+        self.assertEqual(set(methods), {'BatchSearch'})
+        self.assertLess(len(methods), 16)
+
+    def test_failed_illegal_config(self) -> None:
+        with self.assertRaises(ValueError):
+            FaissClient(ClientConfig(hedge_percentile=100))
+        with self.assertRaises(ValueError):
+            FaissClient(ClientConfig(addresses=()))
+
+
+class TestChannelPool(unittest.TestCase):
+    def pool(self, balancing: Balancing) -> ChannelPool:
+        pool = ChannelPool(('a:1', 'b:1'), 2, balancing)
+        self.addCleanup(pool.close)
+        return pool
+
+    def test_round_robin(self) -> None:
+        pool = self.pool(Balancing.round_robin)
+
+        slots = [pool.acquire() for _ in range(4)]
+
+        # replicas are used in turn
+        self.assertEqual(slots, [0, 1, 2, 3])
+        self.assertEqual(
+            [pool.addresses[s] for s in slots], ['a:1', 'b:1', 'a:1', 'b:1']
+        )
+
+    def test_least_outstanding(self) -> None:
+        pool = self.pool(Balancing.least_outstanding)
+        first = pool.acquire()
+        second = pool.acquire()
+        pool.release(first)
+
+        # released channel has no outstanding call
+        self.assertNotEqual(pool.acquire(), second)
+        self.assertEqual(sum(pool.outstanding), 2)
+
+    def test_exclude(self) -> None:
+        pool = self.pool(Balancing.round_robin)
+
+        slots = [pool.acquire(exclude='a:1') for _ in range(4)]
+
+        self.assertEqual({pool.addresses[s] for s in slots}, {'b:1'})
+
+
+class TestRangeResult(unittest.TestCase):
+    def test_to_range_result(self) -> None:
+        lims, scores, ids = to_range_result(
+            [
+                SearchResponse(ids=[3, 1], scores=[0.1, 0.2]),
+                SearchResponse(),
+                SearchResponse(ids=[7], scores=[0.5]),
+            ]
+        )
+
+        np.testing.assert_array_equal(lims, [0, 2, 2, 3])
+        np.testing.assert_array_equal(ids, [3, 1, 7])
+        np.testing.assert_allclose(scores, [0.1, 0.2, 0.5])
+        self.assertEqual(scores.dtype, np.float32)
+        self.assertEqual(ids.dtype, np.int64)
+
+    def test_to_empty_range_result(self) -> None:
+        lims, scores, ids = to_range_result([])
+
+        np.testing.assert_array_equal(lims, [0])
+        self.assertEqual(scores.shape, (0,))
+        self.assertEqual(ids.shape, (0,))
+
+
+class TestWritableFaissClient(unittest.TestCase):
+    DIM = 16
+    PORT = 50074
+
+    def setUp(self) -> None:
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        np.random.seed(1234)
+        self.xb = np.random.random((10, self.DIM)).astype('float32')
+        index = faiss.IndexIDMap2(faiss.IndexFlatL2(self.DIM))
+        index.add_with_ids(self.xb[:5], np.arange(5) + 1000)
+        index_path = os.path.join(temp_dir.name, 'index.faiss')
+        faiss.write_index(index, index_path)
+        servicer = create_servicer(
+            index_path,
+            ServerConfig(
+                wal_dir=os.path.join(temp_dir.name, 'wal'), wal_sync=False
+            ),
+            FaissServiceConfig(),
+        )
+        assert servicer.writer is not None
+        self.addCleanup(servicer.writer.close)
+        server = grpc.server(futures.ThreadPoolExecutor(max_workers=2))
+        add_FaissServiceServicer_to_server(servicer, server)
+        server.add_insecure_port(f'localhost:{self.PORT}')
+        server.start()
+        self.addCleanup(lambda: server.stop(None).wait())
+        self.client = FaissClient(
+            ClientConfig(addresses=(f'localhost:{self.PORT}',))
+        )
+        self.addCleanup(self.client.close)
+
+    def test_add_with_ids(self) -> None:
+        ids = self.client.add_with_ids(self.xb[5:7], [2000, 2001])
+
+        # ids of added vectors are returned like add
+        self.assertEqual(ids.tolist(), [2000, 2001])
+        self.assertEqual(ids.dtype, np.int64)
+        self.assertEqual(self.client.search(self.xb[6], 1)[1].tolist(), [2001])
+        self.assertEqual(self.client.remove([2000]), 1)
+
+
+class TestClientImport(unittest.TestCase):
+    def test_import_without_faiss(self) -> None:
+        # client is used by applications which do not install faiss
+        subprocess.run(
+            [sys.executable, '-c', IMPORT_SCRIPT], check=True, timeout=60
+        )
+
+
+class TestAsyncFaissClient(unittest.TestCase):
+    # IsolatedAsyncioTestCase is not available on python 3.7, so coroutines
+    # are run by an event loop of each test
+    DIM = 16
+    DB_SIZE = 1000
+    PORT = 50073
+
+    def setUp(self) -> None:
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.run = self.loop.run_until_complete
+        np.random.seed(1234)
+        self.xb = np.random.random((self.DB_SIZE, self.DIM)).astype('float32')
+        self.index = faiss.IndexFlatL2(self.DIM)
+        self.index.add(self.xb)
+        self.servicer = RecordingServicer(self.index)
+        self.server = grpc.server(futures.ThreadPoolExecutor(max_workers=8))
+        add_FaissServiceServicer_to_server(self.servicer, self.server)
+        self.server.add_insecure_port(f'localhost:{self.PORT}')
+        self.server.start()
+
+    def tearDown(self) -> None:
+        self.server.stop(None).wait()
+        self.loop.close()
+        asyncio.set_event_loop(None)
+
+    def config(self, **kwargs) -> ClientConfig:
+        return ClientConfig(addresses=(f'localhost:{self.PORT}',), **kwargs)
+
+    def test_search(self) -> None:
+        async def search() -> Any:
+            async with AsyncFaissClient(self.config()) as client:
+                _, ids = await client.search(self.xb[0], 10)
+                return ids, await client.stats()
+
+        ids, stats = self.run(search())
+
+        _, expected_ids = self.index.search(self.xb[:1], 10)
+        np.testing.assert_array_equal(ids, expected_ids[0])
+        self.assertEqual(stats['index_ntotal'], self.DB_SIZE)
+
+    def test_batch_search(self) -> None:
+        async def batch_search() -> Any:
+            async with AsyncFaissClient(self.config()) as client:
+                return await client.batch_search(self.xb[:3], 5)
+
+        _, ids = self.run(batch_search())
+
+        _, expected_ids = self.index.search(self.xb[:3], 5)
+        np.testing.assert_array_equal(ids, expected_ids)
+
+    def test_hedged_search(self) -> None:
+        # both calls go to the same slow replica, so hedging does not help
+        # but the first response is used once
+        self.servicer.delay = 0.05
+        config = self.config(channels_per_address=2, hedge_percentile=50)
+        client = AsyncFaissClient(config)
+
+        async def search() -> Any:
+            async with client:
+                for _ in range(20):
+                    client.latencies['Search'].observe(0.001)
+                return await client.search(self.xb[0], 1)
+
+        _, ids = self.run(search())
+
+        self.assertEqual(ids.tolist(), [0])
+        self.assertEqual(client.hedged, 1)
+
+    def test_batched_search(self) -> None:
+        config = self.config(max_batch_size=8, max_batch_wait_us=100000)
+
+        async def search() -> Any:
+            async with AsyncFaissClient(config) as client:
+                return await asyncio.gather(
+                    *(client.search(q, 10) for q in self.xb[:16])
+                )
+
+        results = self.run(search())
+
+        _, expected_ids = self.index.search(self.xb[:16], 10)
+        for (_, ids), expected in zip(results, expected_ids):
+            np.testing.assert_array_equal(ids, expected)
+        self.assertEqual(self.servicer.methods, ['BatchSearch'] * 2)
+
+    def test_failed_illegal_query_dimension_search(self) -> None:
+        async def search() -> Any:
+            async with AsyncFaissClient(self.config()) as client:
+                return await client.search(np.ones(3), 10)
+
+        with self.assertRaises(grpc.RpcError) as cm:
+            self.run(search())
+
+        self.assertIs(cm.exception.code(), grpc.StatusCode.INVALID_ARGUMENT)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
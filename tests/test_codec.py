@@ -0,0 +1,56 @@
+import unittest
+
+import numpy as np
+
+from faiss_grpc.codec import decode_vector, encode_vector
+from faiss_grpc.proto.faiss_pb2 import FLOAT16, FLOAT32, Vector
+
+
+class TestCodec(unittest.TestCase):
+    def test_decode_val(self) -> None:
+        val = np.arange(8, dtype=np.float32)
+        decoded = decode_vector(Vector(val=val))
+        self.assertEqual(decoded.dtype, np.float32)
+        np.testing.assert_array_equal(decoded, val)
+
+    def test_decode_float32_data(self) -> None:
+        val = np.random.random(8).astype('<f4')
+        vector = Vector(data=val.tobytes(), dtype=FLOAT32)
+        decoded = decode_vector(vector)
+        self.assertEqual(decoded.dtype, np.float32)
+        np.testing.assert_array_equal(decoded, val)
+
+    def test_decode_float16_data(self) -> None:
+        val = np.random.random(8).astype('<f2')
+        vector = Vector(data=val.tobytes(), dtype=FLOAT16)
+        decoded = decode_vector(vector)
+        self.assertEqual(decoded.dtype, np.float32)
+        np.testing.assert_array_equal(decoded, val.astype(np.float32))
+
+    def test_data_takes_priority_over_val(self) -> None:
+        val = np.ones(4, dtype='<f4')
+        vector = Vector(val=np.zeros(4), data=val.tobytes())
+        np.testing.assert_array_equal(decode_vector(vector), val)
+
+    def test_failed_illegal_data_size(self) -> None:
+        vector = Vector(data=b'\x00' * 6, dtype=FLOAT32)
+        with self.assertRaisesRegex(ValueError, 'not a multiple of 4 bytes'):
+            decode_vector(vector)
+
+    def test_failed_unknown_dtype(self) -> None:
+        vector = Vector(data=b'\x00' * 8, dtype=100)
+        with self.assertRaisesRegex(ValueError, 'unsupported vector dtype'):
+            decode_vector(vector)
+
+    def test_encode_round_trip(self) -> None:
+        val = np.random.random(16).astype(np.float32)
+        for dtype in (FLOAT32, FLOAT16):
+            vector = encode_vector(val, dtype)
+            self.assertEqual(vector.dtype, dtype)
+            np.testing.assert_allclose(
+                decode_vector(vector), val, rtol=1e-3, atol=1e-3
+            )
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
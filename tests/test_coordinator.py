@@ -0,0 +1,410 @@
+import asyncio
+import os
+import tempfile
+import threading
+import time
+import unittest
+from concurrent import futures
+from typing import List
+
+import faiss
+import grpc
+import numpy as np
+from google.protobuf.empty_pb2 import Empty
+
+from faiss_grpc.aio_server import AsyncServer
+from faiss_grpc.codec import decode_vector
+from faiss_grpc.coordinator import (
+    FAILED_BACKENDS_KEY,
+    BackendMetric,
+    CoordinatorConfig,
+    CoordinatorServicer,
+)
+from faiss_grpc.faiss_server import FaissServiceConfig, Server, ServerConfig
+from faiss_grpc.proto import faiss_pb2_grpc
+from faiss_grpc.proto.faiss_pb2 import (
+    COLUMNAR,
+    BatchSearchRequest,
+    RangeSearchRequest,
+    SearchByIdRequest,
+    SearchByIdResponse,
+    SearchByIdsRequest,
+    SearchRequest,
+    SearchResponse,
+    SearchStreamRequest,
+    Vector,
+)
+
+
+class HangingBackend(faiss_pb2_grpc.FaissServiceServicer):
+    # backend which accepts searches and never answers them until released,
+    # and does not have any ID after delay
+    def __init__(self, delay: float = 0) -> None:
+        self.delay = delay
+        self.released = threading.Event()
+
+    def Search(self, request, context) -> SearchResponse:
+        self.released.wait()
+        return SearchResponse()
+
+    def SearchById(self, request, context) -> SearchByIdResponse:
+        time.sleep(self.delay)
+        context.set_code(grpc.StatusCode.INVALID_ARGUMENT)
+        context.set_details(f'request id {request.id} is not found')
+        return SearchByIdResponse()
+
+
+class TestCoordinator(unittest.TestCase):
+    DIM = 16
+    DB_SIZE = 3000
+    NLIST = 8
+    BACKEND_PORTS = (50061, 50062, 50063)
+    # nothing listens on this port, like a backend which is down
+    DOWN_BACKEND = 'localhost:50069'
+    HANGING_BACKEND_PORT = 50068
+    TEMP_DIR: tempfile.TemporaryDirectory
+    BACKENDS: List[Server]
+    XB: np.ndarray
+    INDEX: faiss.Index
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        # vectors are split into backends, each having global ids of its
+        # vectors given by add_with_ids
+        np.random.seed(1234)
+        cls.XB = np.random.random((cls.DB_SIZE, cls.DIM)).astype('float32')
+        cls.INDEX = faiss.IndexFlatL2(cls.DIM)
+        cls.INDEX.add(cls.XB)
+        quantizer = faiss.IndexFlatL2(cls.DIM)
+        ivf = faiss.IndexIVFFlat(quantizer, cls.DIM, cls.NLIST)
+        ivf.train(cls.XB)
+
+        cls.TEMP_DIR = tempfile.TemporaryDirectory()
+        cls.BACKENDS = []
+        ids = np.array_split(np.arange(cls.DB_SIZE), len(cls.BACKEND_PORTS))
+        for port, shard_ids in zip(cls.BACKEND_PORTS, ids):
+            shard = faiss.clone_index(ivf)
+            shard.add_with_ids(cls.XB[shard_ids], shard_ids)
+            path = os.path.join(cls.TEMP_DIR.name, f'{port}.faiss')
+            faiss.write_index(shard, path)
+            # all lists are visited, so backends search exhaustively
+            server = Server(
+                path,
+                ServerConfig(host='localhost', port=port),
+                FaissServiceConfig(nprobe=cls.NLIST),
+            )
+            server.server.start()
+            cls.BACKENDS.append(server)
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        for server in cls.BACKENDS:
+            server.server.stop(None)
+        cls.TEMP_DIR.cleanup()
+
+    def coordinator(self, **kwargs) -> faiss_pb2_grpc.FaissServiceStub:
+        backends = kwargs.pop(
+            'backends',
+            tuple(f'localhost:{port}' for port in self.BACKEND_PORTS),
+        )
+        server = Server(
+            '',
+            ServerConfig(
+                host='localhost',
+                port=50060,
+                coordinator=CoordinatorConfig(backends, **kwargs),
+            ),
+            FaissServiceConfig(),
+        )
+        server.server.start()
+        # port is reused by next test, so server must be stopped completely
+        self.addCleanup(lambda: server.server.stop(None).wait())
+        self.servicer = server.servicer
+        self.addCleanup(self.servicer.close)
+        channel = grpc.insecure_channel('localhost:50060')
+        self.addCleanup(channel.close)
+        return faiss_pb2_grpc.FaissServiceStub(channel)
+
+    def hanging_backend(self, delay: float = 0) -> str:
+        backend = HangingBackend(delay)
+        server = grpc.server(futures.ThreadPoolExecutor(max_workers=4))
+        faiss_pb2_grpc.add_FaissServiceServicer_to_server(backend, server)
+        server.add_insecure_port(f'localhost:{self.HANGING_BACKEND_PORT}')
+        server.start()
+        self.addCleanup(lambda: server.stop(None).wait())
+        self.addCleanup(backend.released.set)
+        return f'localhost:{self.HANGING_BACKEND_PORT}'
+
+    def test_successful_Search(self) -> None:
+        stub = self.coordinator()
+        query = self.XB[[10]] + 0.01
+
+        response = stub.Search(SearchRequest(query=Vector(val=query[0]), k=20))
+
+        distances, ids = self.INDEX.search(query, 20)
+        self.assertEqual([n.id for n in response.neighbors], list(ids[0]))
+        np.testing.assert_allclose(
+            [n.score for n in response.neighbors], distances[0], rtol=1e-5
+        )
+
+    def test_successful_columnar_BatchSearch(self) -> None:
+        stub = self.coordinator()
+        queries = self.XB[[1, 1500, 2999]] + 0.01
+
+        response = stub.BatchSearch(
+            BatchSearchRequest(
+                queries=[Vector(val=q) for q in queries],
+                k=10,
+                response_format=COLUMNAR,
+            )
+        )
+
+        _, ids = self.INDEX.search(queries, 10)
+        self.assertEqual(
+            [list(result.ids) for result in response.results], ids.tolist()
+        )
+
+    def test_successful_SearchById(self) -> None:
+        stub = self.coordinator()
+
+        response = stub.SearchById(SearchByIdRequest(id=1500, k=10))
+
+        # neighbors are found on all backends, not only on the one having id
+        _, ids = self.INDEX.search(self.XB[[1500]], 11)
+        self.assertEqual(response.request_id, 1500)
+        self.assertEqual([n.id for n in response.neighbors], list(ids[0, 1:]))
+        self.assertGreater(len({int(i) // 1000 for i in ids[0, 1:]}), 1)
+
+    def test_failed_unknown_id_SearchById(self) -> None:
+        stub = self.coordinator()
+
+        with self.assertRaises(grpc.RpcError) as cm:
+            stub.SearchById(SearchByIdRequest(id=self.DB_SIZE, k=10))
+
+        self.assertIs(cm.exception.code(), grpc.StatusCode.INVALID_ARGUMENT)
+        self.assertRegex(cm.exception.details(), 'not found in backends')
+
+    def test_successful_SearchByIds(self) -> None:
+        stub = self.coordinator()
+        request_ids = [1500, 0, self.DB_SIZE, 2999]
+
+        response = stub.SearchByIds(
+            SearchByIdsRequest(ids=request_ids, k=10, include_query=True)
+        )
+
+        # each id is searched on all backends by its vector
+        _, ids = self.INDEX.search(self.XB[[1500, 0, 2999]], 11)
+        results = [response.results[i] for i in (0, 1, 3)]
+        for result, request_id, expected in zip(
+            results, [1500, 0, 2999], ids[:, 1:]
+        ):
+            self.assertEqual(result.request_id, request_id)
+            self.assertEqual([n.id for n in result.neighbors], list(expected))
+            np.testing.assert_array_equal(
+                decode_vector(result.query), self.XB[request_id]
+            )
+        self.assertGreater(len({int(i) // 1000 for i in ids[0, 1:]}), 1)
+        self.assertEqual(response.results[2].request_id, self.DB_SIZE)
+        self.assertRegex(response.results[2].error, 'not found in backends')
+
+    def test_degrade_down_backend_SearchByIds(self) -> None:
+        stub = self.coordinator(
+            backends=('localhost:50061', 'localhost:50062', self.DOWN_BACKEND)
+        )
+
+        response, call = stub.SearchByIds.with_call(
+            SearchByIdsRequest(ids=[1500, 2500], k=10)
+        )
+
+        # id of the backend which is down is not found
+        self.assertEqual(len(response.results[0].neighbors), 10)
+        self.assertRegex(response.results[1].error, 'not found in backends')
+        self.assertIn(
+            (FAILED_BACKENDS_KEY, self.DOWN_BACKEND), call.trailing_metadata()
+        )
+
+    def test_successful_RangeSearch(self) -> None:
+        stub = self.coordinator()
+        queries = self.XB[[10, 2999]]
+        # about 20 neighbors of each query are within radius
+        radius = float(self.INDEX.search(queries, 20)[0][0, -1])
+
+        response = stub.RangeSearch(
+            RangeSearchRequest(
+                queries=[Vector(val=q) for q in queries], radius=radius
+            )
+        )
+        capped = stub.RangeSearch(
+            RangeSearchRequest(
+                queries=[Vector(val=q) for q in queries],
+                radius=radius,
+                max_results=3,
+            )
+        )
+
+        lims, distances, ids = self.INDEX.range_search(queries, radius)
+        for i, (result, top) in enumerate(
+            zip(response.results, capped.results)
+        ):
+            order = np.argsort(distances[lims[i] : lims[i + 1]])
+            expected = ids[lims[i] : lims[i + 1]][order]
+            self.assertEqual([n.id for n in result.neighbors], list(expected))
+            self.assertEqual([n.id for n in top.neighbors], list(expected[:3]))
+        self.assertGreater(len(response.results[0].neighbors), 3)
+
+    def test_failed_illegal_query_dimension_Search(self) -> None:
+        stub = self.coordinator()
+
+        with self.assertRaises(grpc.RpcError) as cm:
+            stub.Search(SearchRequest(query=Vector(val=[0.0] * 3), k=10))
+
+        self.assertIs(cm.exception.code(), grpc.StatusCode.INVALID_ARGUMENT)
+        self.assertRegex(cm.exception.details(), 'dimension mismatch')
+
+    def test_degrade_down_backend_Search(self) -> None:
+        stub = self.coordinator(
+            backends=('localhost:50061', 'localhost:50062', self.DOWN_BACKEND)
+        )
+        query = self.XB[[2999]]
+
+        response, call = stub.Search.with_call(
+            SearchRequest(query=Vector(val=query[0]), k=10)
+        )
+
+        # neighbors are merged from the rest of backends
+        ids = [n.id for n in response.neighbors]
+        self.assertEqual(len(ids), 10)
+        self.assertTrue(all(i < 2000 for i in ids))
+        self.assertIn(
+            (FAILED_BACKENDS_KEY, self.DOWN_BACKEND), call.trailing_metadata()
+        )
+        stats = self.servicer.stats()
+        self.assertEqual(stats['degraded_responses'], 1)
+        self.assertEqual(stats['backend_failures'], 1)
+
+    def test_degrade_down_backend_SearchById(self) -> None:
+        stub = self.coordinator(
+            backends=(self.DOWN_BACKEND, 'localhost:50061', 'localhost:50062')
+        )
+
+        response = stub.SearchById(SearchByIdRequest(id=1500, k=10))
+
+        self.assertEqual(len(response.neighbors), 10)
+
+    def test_failed_not_enough_backends_Search(self) -> None:
+        stub = self.coordinator(
+            backends=('localhost:50061', self.DOWN_BACKEND),
+            min_backends=2,
+        )
+
+        with self.assertRaises(grpc.RpcError) as cm:
+            stub.Search(SearchRequest(query=Vector(val=self.XB[0]), k=10))
+
+        self.assertIs(cm.exception.code(), grpc.StatusCode.UNAVAILABLE)
+
+    def test_failed_timeout_Search(self) -> None:
+        stub = self.coordinator(
+            backends=(self.hanging_backend(),), backend_timeout=0.2
+        )
+
+        with self.assertRaises(grpc.RpcError) as cm:
+            stub.Search(SearchRequest(query=Vector(val=self.XB[0]), k=10))
+
+        self.assertIs(cm.exception.code(), grpc.StatusCode.DEADLINE_EXCEEDED)
+
+    def test_deadline_of_SearchById(self) -> None:
+        # the second fan-out only has the time left by the first one
+        hanging = self.hanging_backend(delay=0.6)
+        stub = self.coordinator(
+            backends=(f'localhost:{self.BACKEND_PORTS[0]}', hanging),
+            backend_timeout=1.0,
+        )
+        start = time.monotonic()
+
+        response, call = stub.SearchById.with_call(
+            SearchByIdRequest(id=0, k=5)
+        )
+
+        self.assertLess(time.monotonic() - start, 1.4)
+        self.assertEqual(response.request_id, 0)
+        self.assertIn((FAILED_BACKENDS_KEY, hanging), call.trailing_metadata())
+
+    def test_async_coordinator(self) -> None:
+        loop = asyncio.new_event_loop()
+        self.addCleanup(loop.close)
+        server = AsyncServer(
+            '',
+            ServerConfig(
+                host='localhost',
+                port=50060,
+                coordinator=CoordinatorConfig(
+                    tuple(f'localhost:{port}' for port in self.BACKEND_PORTS)
+                ),
+            ),
+            FaissServiceConfig(),
+        )
+        loop.run_until_complete(server.start())
+        self.addCleanup(server.servicer.servicer.close)
+        self.addCleanup(loop.run_until_complete, server.stop(None))
+        query = Vector(val=self.XB[10])
+
+        async def call() -> None:
+            async with grpc.aio.insecure_channel('localhost:50060') as channel:
+                stub = faiss_pb2_grpc.FaissServiceStub(channel)
+                response = await stub.Search(SearchRequest(query=query, k=5))
+                self.assertEqual(response.neighbors[0].id, 10)
+
+                # streams are not forwarded to backends
+                stream = stub.SearchStream()
+                await stream.write(
+                    SearchStreamRequest(
+                        request=SearchRequest(query=query, k=5)
+                    )
+                )
+                await stream.done_writing()
+                with self.assertRaises(grpc.aio.AioRpcError) as cm:
+                    await stream.read()
+                self.assertIs(
+                    cm.exception.code(), grpc.StatusCode.UNIMPLEMENTED
+                )
+
+        loop.run_until_complete(call())
+
+    def test_successful_Reload(self) -> None:
+        stub = self.coordinator(backend_channels=2)
+
+        response = stub.Reload(Empty())
+
+        self.assertEqual(response.ntotal, self.DB_SIZE)
+
+
+class TestCoordinatorServicer(unittest.TestCase):
+    def test_merge(self) -> None:
+        responses = [
+            SearchResponse(ids=[1, 2], scores=[0.9, 0.5]),
+            SearchResponse(ids=[11, 12], scores=[0.7, 0.6]),
+        ]
+        for metric, expected in [
+            (BackendMetric.l2, [2, 12, 11]),
+            (BackendMetric.inner_product, [1, 11, 12]),
+        ]:
+            servicer = CoordinatorServicer(
+                CoordinatorConfig(('localhost:50069',), metric=metric)
+            )
+            self.addCleanup(servicer.close)
+
+            _, ids = servicer.merge(responses, 3)
+
+            self.assertEqual(ids.tolist(), [expected])
+
+    def test_failed_illegal_config(self) -> None:
+        with self.assertRaises(ValueError):
+            CoordinatorServicer(CoordinatorConfig(()))
+        with self.assertRaises(ValueError):
+            CoordinatorServicer(
+                CoordinatorConfig(('localhost:50069',), min_backends=2)
+            )
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
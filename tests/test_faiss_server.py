@@ -1,9 +1,12 @@
+import dataclasses
 import os
 import tempfile
 import unittest
+import weakref
 from dataclasses import dataclass
 from enum import Enum, unique
-from typing import Any, List, Union
+from typing import Any, Dict, List, Union
+from unittest import mock
 
 import faiss
 import grpc
@@ -14,22 +17,42 @@ from google.protobuf.empty_pb2 import Empty
 from google.protobuf.pyext._message import MethodDescriptor
 from grpc_testing._server._server import _Server
 
+from faiss_grpc.codec import decode_vector, encode_vector
 from faiss_grpc.faiss_server import (
     FaissServiceConfig,
     FaissServiceServicer,
     Server,
     ServerConfig,
+    create_servicer,
 )
+from faiss_grpc.index_io import IndexLoadMode
+from faiss_grpc.knn_table import IDS_FILE, SCORES_FILE, build_knn_table
 from faiss_grpc.proto import faiss_pb2, faiss_pb2_grpc
 from faiss_grpc.proto.faiss_pb2 import (
+    COLUMNAR,
+    AddRequest,
+    AddWithIdsRequest,
+    BatchSearchRequest,
+    BatchSearchResponse,
     HeatbeatResponse,
     Neighbor,
+    RangeSearchRequest,
+    RangeSearchResponse,
+    ReloadResponse,
+    RemoveRequest,
     SearchByIdRequest,
     SearchByIdResponse,
+    SearchByIdsRequest,
+    SearchByIdsResponse,
+    SearchParameters,
     SearchRequest,
     SearchResponse,
+    SearchStreamRequest,
+    SearchStreamResponse,
+    StatsResponse,
     Vector,
 )
+from faiss_grpc.sharding import ShardedIndex
 
 VectorLike = Union[List[float], np.ndarray]
 
@@ -45,6 +68,12 @@ class FaissConfig:
 class ServiceMethodDescriptor(Enum):
     search = 'Search'
     search_by_id = 'SearchById'
+    search_by_ids = 'SearchByIds'
+    batch_search = 'BatchSearch'
+    range_search = 'RangeSearch'
+    search_stream = 'SearchStream'
+    reload = 'Reload'
+    stats = 'Stats'
     heatbeat = 'Heatbeat'
 
 
@@ -66,6 +95,46 @@ class GrpcClientForTesting:
         req = faiss_pb2.SearchByIdRequest(id=request_id, k=k)
         return self.stub.SearchById(req)
 
+    def search_by_ids(
+        self, request_ids: List[int], k: int
+    ) -> SearchByIdsResponse:
+        req = faiss_pb2.SearchByIdsRequest(ids=request_ids, k=k)
+        return self.stub.SearchByIds(req)
+
+    def batch_search(
+        self, queries: List[VectorLike], k: int
+    ) -> BatchSearchResponse:
+        vecs = [faiss_pb2.Vector(val=query) for query in queries]
+        req = faiss_pb2.BatchSearchRequest(queries=vecs, k=k)
+        return self.stub.BatchSearch(req)
+
+    def range_search(
+        self, queries: List[VectorLike], radius: float
+    ) -> RangeSearchResponse:
+        vecs = [faiss_pb2.Vector(val=query) for query in queries]
+        req = faiss_pb2.RangeSearchRequest(queries=vecs, radius=radius)
+        return self.stub.RangeSearch(req)
+
+    def search_stream(
+        self, queries: List[VectorLike], k: int
+    ) -> List[SearchStreamResponse]:
+        reqs = (
+            faiss_pb2.SearchStreamRequest(
+                sequence_id=i,
+                request=faiss_pb2.SearchRequest(
+                    query=faiss_pb2.Vector(val=query), k=k
+                ),
+            )
+            for i, query in enumerate(queries)
+        )
+        return list(self.stub.SearchStream(reqs))
+
+    def reload(self) -> ReloadResponse:
+        return self.stub.Reload(Empty())
+
+    def stats(self) -> StatsResponse:
+        return self.stub.Stats(Empty())
+
     def heatbeat(self) -> HeatbeatResponse:
         return self.stub.Heatbeat(Empty())
 
@@ -97,10 +166,12 @@ class TestFaissServiceServicer(BaseTestCase):
     # FAISS_CONFIG is defined in BaseTestCase
     CONFIG: FaissServiceConfig
     CONFIG_NORM: FaissServiceConfig
+    CONFIG_BATCH: FaissServiceConfig
     INDEX: Index
     SERVICE: Any
     SERVER: _Server
     SERVER_NORM: _Server
+    SERVER_BATCH: _Server
 
     @classmethod
     def setUpClass(cls) -> None:
@@ -109,6 +180,9 @@ class TestFaissServiceServicer(BaseTestCase):
         cls.CONFIG_NORM = FaissServiceConfig(
             nprobe=nprobe, normalize_query=True
         )
+        cls.CONFIG_BATCH = FaissServiceConfig(
+            nprobe=nprobe, max_batch_size=16, max_batch_wait_us=1000
+        )
         cls.FAISS_CONFIG = FaissConfig(dim=64, db_size=100000, nlist=100)
         cls.INDEX = cls.create_index()
         cls.SERVICE = faiss_pb2.DESCRIPTOR.services_by_name['FaissService']
@@ -131,6 +205,15 @@ class TestFaissServiceServicer(BaseTestCase):
             },
             grpc_testing.strict_real_time(),
         )
+        # server for batching concurrent Search requests
+        cls.SERVER_BATCH = grpc_testing.server_from_dictionary(
+            {
+                cls.SERVICE: FaissServiceServicer(
+                    faiss.clone_index(cls.INDEX), cls.CONFIG_BATCH
+                )
+            },
+            grpc_testing.strict_real_time(),
+        )
         # set nprobe, after complete cloning index
         cls.INDEX.nprobe = nprobe
 
@@ -200,6 +283,86 @@ class TestFaissServiceServicer(BaseTestCase):
         self.assertNotEqual(response, unexpected)
         self.assertIs(code, grpc.StatusCode.OK)
 
+    def test_successful_params_Search(self) -> None:
+        k = 1000
+        val = np.ones(self.FAISS_CONFIG.dim, dtype=np.float32)
+        for params in [
+            SearchParameters(nprobe=1),
+            SearchParameters(parameters='nprobe=1'),
+        ]:
+            request = SearchRequest(query=Vector(val=val), k=k, params=params)
+            rpc = self.SERVER.invoke_unary_unary(
+                self.method_descriptor_by_name(ServiceMethodDescriptor.search),
+                (),
+                request,
+                None,
+            )
+
+            index = faiss.clone_index(self.INDEX)
+            index.nprobe = 1
+            distances, ids = index.search(np.atleast_2d(val), k)
+            expected = SearchResponse(
+                neighbors=self.to_neighbors(distances, ids)
+            )
+
+            response, _, code, _ = rpc.termination()
+
+            self.assertEqual(response, expected)
+            self.assertIs(code, grpc.StatusCode.OK)
+
+    def test_successful_limited_params_Search(self) -> None:
+        k = 1000
+        servicer = FaissServiceServicer(
+            faiss.clone_index(self.INDEX),
+            FaissServiceConfig(nprobe=10, max_nprobe=2, max_batch_size=4),
+        )
+        server = grpc_testing.server_from_dictionary(
+            {self.SERVICE: servicer}, grpc_testing.strict_real_time()
+        )
+        val = np.ones(self.FAISS_CONFIG.dim, dtype=np.float32)
+        request = SearchRequest(
+            query=Vector(val=val), k=k, params=SearchParameters(nprobe=100)
+        )
+        rpc = server.invoke_unary_unary(
+            self.method_descriptor_by_name(ServiceMethodDescriptor.search),
+            (),
+            request,
+            None,
+        )
+
+        index = faiss.clone_index(self.INDEX)
+        index.nprobe = 2
+        distances, ids = index.search(np.atleast_2d(val), k)
+        expected = SearchResponse(neighbors=self.to_neighbors(distances, ids))
+
+        response, _, code, _ = rpc.termination()
+
+        self.assertEqual(response, expected)
+        self.assertIs(code, grpc.StatusCode.OK)
+
+    def test_failed_illegal_params_Search(self) -> None:
+        val = np.ones(self.FAISS_CONFIG.dim, dtype=np.float32)
+        for params, msg in [
+            (SearchParameters(parameters='foo=1'), 'unknown search parameter'),
+            (
+                SearchParameters(ef_search=10),
+                'efSearch is not supported by quantizer of IndexIVFFlat',
+            ),
+        ]:
+            request = SearchRequest(query=Vector(val=val), k=10, params=params)
+            rpc = self.SERVER.invoke_unary_unary(
+                self.method_descriptor_by_name(ServiceMethodDescriptor.search),
+                (),
+                request,
+                None,
+            )
+
+            response, _, code, details = rpc.termination()
+
+            self.assertEqual(response, SearchResponse())
+            self.assertIs(code, grpc.StatusCode.INVALID_ARGUMENT)
+            self.assertRegex(details, msg)
+
     def test_successful_normalize_query_Search(self) -> None:
         # k must be set large value,
         # becauseof avoiding to miss error case came from small nprobe value.
@@ -227,6 +390,93 @@ class TestFaissServiceServicer(BaseTestCase):
         self.assertEqual(response, expected)
         self.assertIs(code, grpc.StatusCode.OK)
 
+    def test_successful_batched_Search(self) -> None:
+        k = 100
+        np.random.seed(1234)
+        vals = np.random.random((8, self.FAISS_CONFIG.dim)).astype('float32')
+        rpcs = [
+            self.SERVER_BATCH.invoke_unary_unary(
+                self.method_descriptor_by_name(ServiceMethodDescriptor.search),
+                (),
+                SearchRequest(query=Vector(val=val), k=k),
+                None,
+            )
+            for val in vals
+        ]
+
+        for val, rpc in zip(vals, rpcs):
+            distances, ids = self.INDEX.search(np.atleast_2d(val), k)
+            expected = SearchResponse(
+                neighbors=self.to_neighbors(distances, ids)
+            )
+
+            response, _, code, _ = rpc.termination()
+
+            self.assertEqual(response, expected)
+            self.assertIs(code, grpc.StatusCode.OK)
+
+    def test_successful_packed_query_Search(self) -> None:
+        k = 1000
+        val = np.ones(self.FAISS_CONFIG.dim, dtype=np.float32)
+        request = SearchRequest(query=encode_vector(val), k=k)
+        rpc = self.SERVER.invoke_unary_unary(
+            self.method_descriptor_by_name(ServiceMethodDescriptor.search),
+            (),
+            request,
+            None,
+        )
+
+        distances, ids = self.INDEX.search(np.atleast_2d(val), k)
+        expected = SearchResponse(neighbors=self.to_neighbors(distances, ids))
+
+        response, _, code, _ = rpc.termination()
+
+        self.assertEqual(response, expected)
+        self.assertIs(code, grpc.StatusCode.OK)
+
+    def test_failed_illegal_packed_query_Search(self) -> None:
+        k = 10
+        vector = Vector(data=b'\x00' * (self.FAISS_CONFIG.dim * 4 + 1))
+        request = SearchRequest(query=vector, k=k)
+        rpc = self.SERVER.invoke_unary_unary(
+            self.method_descriptor_by_name(ServiceMethodDescriptor.search),
+            (),
+            request,
+            None,
+        )
+
+        response, _, code, details = rpc.termination()
+
+        self.assertRegex(details, 'is not a multiple of 4 bytes')
+        # exptected empty SearchResponse
+        self.assertEqual(response, SearchResponse())
+        self.assertIs(code, grpc.StatusCode.INVALID_ARGUMENT)
+
+    def test_successful_columnar_Search(self) -> None:
+        k = 1000
+        val = np.ones(self.FAISS_CONFIG.dim, dtype=np.float32)
+        request = SearchRequest(
+            query=Vector(val=val), k=k, response_format=COLUMNAR
+        )
+        rpc = self.SERVER.invoke_unary_unary(
+            self.method_descriptor_by_name(ServiceMethodDescriptor.search),
+            (),
+            request,
+            None,
+        )
+
+        distances, ids = self.INDEX.search(np.atleast_2d(val), k)
+        found = ids[0] != -1
+        expected = SearchResponse(
+            ids=ids[0][found], scores=distances[0][found]
+        )
+
+        response, _, code, _ = rpc.termination()
+
+        self.assertEqual(response, expected)
+        self.assertEqual(len(response.neighbors), 0)
+        self.assertIs(code, grpc.StatusCode.OK)
+
     def test_failed_illegal_query_dimension_Search(self) -> None:
         k = 10
         val = np.ones(self.FAISS_CONFIG.dim * 2, dtype=np.float32)
@@ -282,6 +532,86 @@ class TestFaissServiceServicer(BaseTestCase):
         self.assertEqual(response, expected)
         self.assertIs(code, grpc.StatusCode.OK)
 
+    def test_successful_include_query_SearchById(self) -> None:
+        request = SearchByIdRequest(id=10, k=10, include_query=True)
+        rpc = self.SERVER.invoke_unary_unary(
+            self.method_descriptor_by_name(
+                ServiceMethodDescriptor.search_by_id
+            ),
+            (),
+            request,
+            None,
+        )
+
+        response, _, code, _ = rpc.termination()
+
+        self.assertIs(code, grpc.StatusCode.OK)
+        self.assertEqual(len(response.neighbors), 10)
+        np.testing.assert_array_equal(
+            decode_vector(response.query), self.INDEX.reconstruct_n(10, 1)[0]
+        )
+
+    def test_successful_columnar_SearchById(self) -> None:
+        request_id = 0
+        k = 1000
+        request = SearchByIdRequest(
+            id=request_id, k=k, response_format=COLUMNAR
+        )
+        rpc = self.SERVER.invoke_unary_unary(
+            self.method_descriptor_by_name(
+                ServiceMethodDescriptor.search_by_id
+            ),
+            (),
+            request,
+            None,
+        )
+
+        query = self.INDEX.reconstruct_n(request_id, 1)
+        # search k + 1 considering remove request_id itself
+        distances, ids = self.INDEX.search(query, k + 1)
+        neighbors = [
+            n for n in self.to_neighbors(distances, ids) if n.id != request_id
+        ]
+        expected = SearchByIdResponse(
+            request_id=request_id,
+            ids=[n.id for n in neighbors],
+            scores=[n.score for n in neighbors],
+        )
+
+        response, _, code, _ = rpc.termination()
+
+        self.assertEqual(response, expected)
+        self.assertIs(code, grpc.StatusCode.OK)
+
+    def test_successful_params_SearchById(self) -> None:
+        k = 1000
+        request_id = 0
+        request = SearchByIdRequest(
+            id=request_id, k=k, params=SearchParameters(nprobe=1)
+        )
+        rpc = self.SERVER.invoke_unary_unary(
+            self.method_descriptor_by_name(
+                ServiceMethodDescriptor.search_by_id
+            ),
+            (),
+            request,
+            None,
+        )
+
+        index = faiss.clone_index(self.INDEX)
+        index.nprobe = 1
+        distances, ids = index.search(
+            index.reconstruct_n(request_id, 1), k + 1
+        )
+
+        response, _, code, _ = rpc.termination()
+
+        self.assertEqual(
+            [n.id for n in response.neighbors],
+            [i for i in ids[0] if i not in [request_id, -1]],
+        )
+        self.assertIs(code, grpc.StatusCode.OK)
+
     def test_failed_unknown_id_SearchById(self) -> None:
         # set unknown id
         request_id = self.FAISS_CONFIG.db_size * 2
@@ -306,65 +636,1484 @@ class TestFaissServiceServicer(BaseTestCase):
         self.assertEqual(response, SearchByIdResponse())
         self.assertIs(code, grpc.StatusCode.INVALID_ARGUMENT)
 
-    def test_successful_Heatbeat(self) -> None:
-        request = Empty()
+    def test_successful_add_with_ids_index_SearchById(self) -> None:
+        k = 10
+        nb = 1000
+        xb = self.INDEX.reconstruct_n(0, nb)
+        index = faiss.IndexIVFFlat(
+            faiss.IndexFlatL2(self.FAISS_CONFIG.dim), self.FAISS_CONFIG.dim, 4
+        )
+        index.train(xb)
+        index.add_with_ids(xb, np.arange(nb) * 10)
+        servicer = FaissServiceServicer(
+            index, FaissServiceConfig(nprobe=4, reconstruct_cache_size=16)
+        )
+        server = grpc_testing.server_from_dictionary(
+            {self.SERVICE: servicer}, grpc_testing.strict_real_time()
+        )
+
+        for _ in range(2):
+            rpc = server.invoke_unary_unary(
+                self.method_descriptor_by_name(
+                    ServiceMethodDescriptor.search_by_id
+                ),
+                (),
+                SearchByIdRequest(id=50, k=k),
+                None,
+            )
+            response, _, code, _ = rpc.termination()
+
+            distances, ids = index.search(xb[5:6], k + 1)
+            self.assertEqual(
+                [n.id for n in response.neighbors],
+                [i for i in ids[0] if i != 50],
+            )
+            self.assertIs(code, grpc.StatusCode.OK)
+
+        assert servicer.vector_cache
+        self.assertEqual(servicer.vector_cache.hits, 3)
+
+        rpc = server.invoke_unary_unary(
+            self.method_descriptor_by_name(
+                ServiceMethodDescriptor.search_by_id
+            ),
+            (),
+            SearchByIdRequest(id=51, k=k),
+            None,
+        )
+        response, _, code, details = rpc.termination()
+
+        self.assertEqual(response, SearchByIdResponse())
+        self.assertIs(code, grpc.StatusCode.INVALID_ARGUMENT)
+        self.assertEqual(details, 'request id 51 is not found in index')
+
+    def test_successful_SearchByIds(self) -> None:
+        k = 10
+        request_ids = [0, 1, 500, 2]
+        request = SearchByIdsRequest(ids=request_ids, k=k)
         rpc = self.SERVER.invoke_unary_unary(
-            self.method_descriptor_by_name(ServiceMethodDescriptor.heatbeat),
+            self.method_descriptor_by_name(
+                ServiceMethodDescriptor.search_by_ids
+            ),
             (),
             request,
             None,
         )
 
+        expected = []
+        for request_id in request_ids:
+            distances, ids = self.INDEX.search(
+                self.INDEX.reconstruct_n(request_id, 1), k + 1
+            )
+            found = ids[0] != request_id
+            expected.append(
+                SearchByIdResponse(
+                    request_id=request_id,
+                    neighbors=self.to_neighbors(
+                        distances[:, found][:, :k], ids[:, found][:, :k]
+                    ),
+                )
+            )
+
         response, _, code, _ = rpc.termination()
 
-        self.assertEqual(HeatbeatResponse(message='OK'), response)
+        self.assertEqual(response, SearchByIdsResponse(results=expected))
         self.assertIs(code, grpc.StatusCode.OK)
 
+    def test_successful_columnar_SearchByIds(self) -> None:
+        k = 10
+        request_ids = [3, 4]
+        request = SearchByIdsRequest(
+            ids=request_ids, k=k, response_format=COLUMNAR
+        )
+        rpc = self.SERVER.invoke_unary_unary(
+            self.method_descriptor_by_name(
+                ServiceMethodDescriptor.search_by_ids
+            ),
+            (),
+            request,
+            None,
+        )
 
-class TestServer(BaseTestCase):
-    # FAISS_CONFIG is defined in BaseTestCase
-    SERVER_CONFIG: ServerConfig
-    SERVICE_CONFIG: FaissServiceConfig
-    CLIENT: GrpcClientForTesting
-    SERVER: Server
+        response, _, code, _ = rpc.termination()
 
-    @classmethod
-    def setUpClass(cls) -> None:
-        cls.SERVER_CONFIG = ServerConfig()
-        cls.SERVICE_CONFIG = FaissServiceConfig(nprobe=10)
-        cls.FAISS_CONFIG = FaissConfig(dim=64, db_size=100000, nlist=100)
-        cls.CLIENT = GrpcClientForTesting()
+        self.assertIs(code, grpc.StatusCode.OK)
+        for request_id, result in zip(request_ids, response.results):
+            self.assertEqual(result.request_id, request_id)
+            self.assertEqual(len(result.ids), k)
+            self.assertEqual(len(result.scores), k)
+            self.assertNotIn(request_id, result.ids)
+            self.assertEqual(len(result.neighbors), 0)
 
-        index = cls.create_index()
-        with tempfile.TemporaryDirectory() as temp_dir:
-            index_path = os.path.join(temp_dir, 'index.faiss')
-            faiss.write_index(index, index_path)
-            cls.SERVER = Server(
-                index_path=index_path,
-                server_config=cls.SERVER_CONFIG,
-                service_config=cls.SERVICE_CONFIG,
-            )
+    def test_successful_include_query_SearchByIds(self) -> None:
+        request = SearchByIdsRequest(
+            ids=[5, self.FAISS_CONFIG.db_size], k=10, include_query=True
+        )
+        rpc = self.SERVER.invoke_unary_unary(
+            self.method_descriptor_by_name(
+                ServiceMethodDescriptor.search_by_ids
+            ),
+            (),
+            request,
+            None,
+        )
 
-        cls.SERVER.server.start()
+        response, _, code, _ = rpc.termination()
 
-    @classmethod
-    def tearDownClass(cls) -> None:
-        cls.SERVER.server.stop(None)
+        self.assertIs(code, grpc.StatusCode.OK)
+        np.testing.assert_array_equal(
+            decode_vector(response.results[0].query),
+            self.INDEX.reconstruct_n(5, 1)[0],
+        )
+        self.assertEqual(len(response.results[0].neighbors), 10)
+        self.assertFalse(response.results[1].HasField('query'))
 
-    def test_serve_search(self) -> None:
+    def test_failed_unknown_id_SearchByIds(self) -> None:
         k = 10
-        response = self.CLIENT.search(
-            np.ones(self.FAISS_CONFIG.dim, dtype=np.float32), k=k
+        unknown_id = self.FAISS_CONFIG.db_size * 2
+        request = SearchByIdsRequest(ids=[unknown_id, 0, 2**64 - 1], k=k)
+        rpc = self.SERVER.invoke_unary_unary(
+            self.method_descriptor_by_name(
+                ServiceMethodDescriptor.search_by_ids
+            ),
+            (),
+            request,
+            None,
         )
-        self.assertEqual(len(response.neighbors), k)
 
-    def test_serve_search_by_id(self) -> None:
-        request_id = 0
-        k = 10
-        response = self.CLIENT.search_by_id(request_id=request_id, k=k)
-        self.assertEqual(response.request_id, request_id)
+        response, _, code, _ = rpc.termination()
+
+        # the call succeeds, and only results of unknown ids have error
+        self.assertIs(code, grpc.StatusCode.OK)
+        error = f'request id must be 0 <= id <= {self.FAISS_CONFIG.db_size-1}'
+        self.assertEqual(
+            response.results[0],
+            SearchByIdResponse(request_id=unknown_id, error=error),
+        )
+        self.assertEqual(response.results[1].error, '')
+        self.assertEqual(len(response.results[1].neighbors), k)
+        self.assertEqual(response.results[2].error, error)
+
+    def test_successful_add_with_ids_index_SearchByIds(self) -> None:
+        k = 10
+        nb = 1000
+        xb = self.INDEX.reconstruct_n(0, nb)
+        index = faiss.IndexIVFFlat(
+            faiss.IndexFlatL2(self.FAISS_CONFIG.dim), self.FAISS_CONFIG.dim, 4
+        )
+        index.train(xb)
+        index.add_with_ids(xb, np.arange(nb) * 10)
+        server = grpc_testing.server_from_dictionary(
+            {
+                self.SERVICE: FaissServiceServicer(
+                    index, FaissServiceConfig(nprobe=4)
+                )
+            },
+            grpc_testing.strict_real_time(),
+        )
+        rpc = server.invoke_unary_unary(
+            self.method_descriptor_by_name(
+                ServiceMethodDescriptor.search_by_ids
+            ),
+            (),
+            SearchByIdsRequest(ids=[50, 51, 2**64 - 1], k=k),
+            None,
+        )
+
+        response, _, code, _ = rpc.termination()
+
+        self.assertIs(code, grpc.StatusCode.OK)
+        _, ids = index.search(xb[5:6], k + 1)
+        self.assertEqual(
+            [n.id for n in response.results[0].neighbors],
+            [i for i in ids[0] if i != 50],
+        )
+        self.assertEqual(
+            response.results[1].error, 'request id 51 is not found in index'
+        )
+        self.assertEqual(
+            response.results[2].error,
+            f'request id {2**64 - 1} is not found in index',
+        )
+
+    def test_successful_empty_SearchByIds(self) -> None:
+        rpc = self.SERVER.invoke_unary_unary(
+            self.method_descriptor_by_name(
+                ServiceMethodDescriptor.search_by_ids
+            ),
+            (),
+            SearchByIdsRequest(k=10),
+            None,
+        )
+
+        response, _, code, _ = rpc.termination()
+
+        self.assertEqual(response, SearchByIdsResponse())
+        self.assertIs(code, grpc.StatusCode.OK)
+
+    def test_successful_BatchSearch(self) -> None:
+        k = 1000
+        np.random.seed(1234)
+        vals = np.random.random((5, self.FAISS_CONFIG.dim)).astype('float32')
+        request = BatchSearchRequest(
+            queries=[Vector(val=val) for val in vals], k=k
+        )
+        rpc = self.SERVER.invoke_unary_unary(
+            self.method_descriptor_by_name(
+                ServiceMethodDescriptor.batch_search
+            ),
+            (),
+            request,
+            None,
+        )
+
+        distances, ids = self.INDEX.search(vals, k)
+        expected = BatchSearchResponse(
+            results=[
+                SearchResponse(neighbors=self.to_neighbors(d[None], i[None]))
+                for d, i in zip(distances, ids)
+            ]
+        )
+
+        response, _, code, _ = rpc.termination()
+
+        self.assertEqual(response, expected)
+        self.assertIs(code, grpc.StatusCode.OK)
+
+    def test_successful_normalize_query_BatchSearch(self) -> None:
+        k = 1000
+        np.random.seed(1234)
+        vals = np.random.random((5, self.FAISS_CONFIG.dim)).astype('float32')
+        request = BatchSearchRequest(
+            queries=[Vector(val=val) for val in vals], k=k
+        )
+        rpc = self.SERVER_NORM.invoke_unary_unary(
+            self.method_descriptor_by_name(
+                ServiceMethodDescriptor.batch_search
+            ),
+            (),
+            request,
+            None,
+        )
+
+        norm_vals = vals / np.linalg.norm(vals, axis=1, keepdims=True)
+        distances, ids = self.INDEX.search(norm_vals, k)
+        expected = BatchSearchResponse(
+            results=[
+                SearchResponse(neighbors=self.to_neighbors(d[None], i[None]))
+                for d, i in zip(distances, ids)
+            ]
+        )
+
+        response, _, code, _ = rpc.termination()
+
+        self.assertEqual(response, expected)
+        self.assertIs(code, grpc.StatusCode.OK)
+
+    def test_successful_packed_query_BatchSearch(self) -> None:
+        k = 1000
+        np.random.seed(1234)
+        vals = np.random.random((5, self.FAISS_CONFIG.dim)).astype('float32')
+        request = BatchSearchRequest(
+            queries=[encode_vector(val) for val in vals], k=k
+        )
+        rpc = self.SERVER.invoke_unary_unary(
+            self.method_descriptor_by_name(
+                ServiceMethodDescriptor.batch_search
+            ),
+            (),
+            request,
+            None,
+        )
+
+        distances, ids = self.INDEX.search(vals, k)
+        expected = BatchSearchResponse(
+            results=[
+                SearchResponse(neighbors=self.to_neighbors(d[None], i[None]))
+                for d, i in zip(distances, ids)
+            ]
+        )
+
+        response, _, code, _ = rpc.termination()
+
+        self.assertEqual(response, expected)
+        self.assertIs(code, grpc.StatusCode.OK)
+
+    def test_successful_columnar_BatchSearch(self) -> None:
+        k = 1000
+        np.random.seed(1234)
+        vals = np.random.random((5, self.FAISS_CONFIG.dim)).astype('float32')
+        request = BatchSearchRequest(
+            queries=[Vector(val=val) for val in vals],
+            k=k,
+            response_format=COLUMNAR,
+        )
+        rpc = self.SERVER.invoke_unary_unary(
+            self.method_descriptor_by_name(
+                ServiceMethodDescriptor.batch_search
+            ),
+            (),
+            request,
+            None,
+        )
+
+        distances, ids = self.INDEX.search(vals, k)
+        expected = BatchSearchResponse(
+            results=[
+                SearchResponse(ids=i[i != -1], scores=d[i != -1])
+                for d, i in zip(distances, ids)
+            ]
+        )
+
+        response, _, code, _ = rpc.termination()
+
+        self.assertEqual(response, expected)
+        self.assertIs(code, grpc.StatusCode.OK)
+
+    def test_failed_illegal_query_dimension_BatchSearch(self) -> None:
+        k = 10
+        vals = [
+            np.ones(self.FAISS_CONFIG.dim, dtype=np.float32),
+            np.ones(self.FAISS_CONFIG.dim * 2, dtype=np.float32),
+        ]
+        request = BatchSearchRequest(
+            queries=[Vector(val=val) for val in vals], k=k
+        )
+        rpc = self.SERVER.invoke_unary_unary(
+            self.method_descriptor_by_name(
+                ServiceMethodDescriptor.batch_search
+            ),
+            (),
+            request,
+            None,
+        )
+
+        response, _, code, details = rpc.termination()
+
+        self.assertRegex(
+            details,
+            f'query vector dimension mismatch expected '
+            f'{self.FAISS_CONFIG.dim} but passed {self.FAISS_CONFIG.dim*2} '
+            r'at queries\[1\]',
+        )
+        # exptected empty BatchSearchResponse
+        self.assertEqual(response, BatchSearchResponse())
+        self.assertIs(code, grpc.StatusCode.INVALID_ARGUMENT)
+
+    def test_successful_empty_BatchSearch(self) -> None:
+        request = BatchSearchRequest(queries=[], k=10)
+        rpc = self.SERVER.invoke_unary_unary(
+            self.method_descriptor_by_name(
+                ServiceMethodDescriptor.batch_search
+            ),
+            (),
+            request,
+            None,
+        )
+
+        response, _, code, _ = rpc.termination()
+
+        self.assertEqual(response, BatchSearchResponse())
+        self.assertIs(code, grpc.StatusCode.OK)
+
+    def range_search_queries(self) -> Any:
+        # radius is chosen so that each query has from 100 to less than
+        # 1000 neighbors, which are all found by search of k=1000
+        np.random.seed(1234)
+        vals = np.random.random((5, self.FAISS_CONFIG.dim)).astype('float32')
+        distances, ids = self.INDEX.search(vals, 1000)
+        radius = distances[:, 99].max() + 1e-3
+        self.assertTrue((distances[:, -1] > radius).all())
+        return vals, radius, distances, ids
+
+    def test_successful_RangeSearch(self) -> None:
+        vals, radius, distances, ids = self.range_search_queries()
+        request = RangeSearchRequest(
+            queries=[Vector(val=val) for val in vals], radius=radius
+        )
+        rpc = self.SERVER.invoke_unary_unary(
+            self.method_descriptor_by_name(
+                ServiceMethodDescriptor.range_search
+            ),
+            (),
+            request,
+            None,
+        )
+
+        found = distances < radius
+        expected = RangeSearchResponse(
+            results=[
+                SearchResponse(
+                    neighbors=self.to_neighbors(d[f][None], i[f][None])
+                )
+                for d, i, f in zip(distances, ids, found)
+            ]
+        )
+
+        response, _, code, _ = rpc.termination()
+
+        self.assertEqual(response, expected)
+        self.assertIs(code, grpc.StatusCode.OK)
+
+    def test_successful_max_results_RangeSearch(self) -> None:
+        max_results = 10
+        vals, radius, distances, ids = self.range_search_queries()
+        request = RangeSearchRequest(
+            queries=[encode_vector(val) for val in vals],
+            radius=radius,
+            max_results=max_results,
+            response_format=COLUMNAR,
+        )
+        rpc = self.SERVER.invoke_unary_unary(
+            self.method_descriptor_by_name(
+                ServiceMethodDescriptor.range_search
+            ),
+            (),
+            request,
+            None,
+        )
+
+        expected = RangeSearchResponse(
+            results=[
+                SearchResponse(ids=i[:max_results], scores=d[:max_results])
+                for d, i in zip(distances, ids)
+            ]
+        )
+
+        response, _, code, _ = rpc.termination()
+
+        self.assertEqual(response, expected)
+        self.assertIs(code, grpc.StatusCode.OK)
+
+    def test_successful_limited_max_results_RangeSearch(self) -> None:
+        vals, radius, _, _ = self.range_search_queries()
+        servicer = FaissServiceServicer(
+            faiss.clone_index(self.INDEX),
+            FaissServiceConfig(nprobe=10, max_range_results=5),
+        )
+        server = grpc_testing.server_from_dictionary(
+            {self.SERVICE: servicer}, grpc_testing.strict_real_time()
+        )
+        method = self.method_descriptor_by_name(
+            ServiceMethodDescriptor.range_search
+        )
+        queries = [Vector(val=val) for val in vals]
+
+        for max_results, expected in [(0, 5), (3, 3), (10, 5)]:
+            request = RangeSearchRequest(
+                queries=queries, radius=radius, max_results=max_results
+            )
+            rpc = server.invoke_unary_unary(method, (), request, None)
+
+            response, _, code, _ = rpc.termination()
+
+            self.assertIs(code, grpc.StatusCode.OK)
+            for result in response.results:
+                self.assertEqual(len(result.neighbors), expected)
+
+    def test_successful_no_neighbors_RangeSearch(self) -> None:
+        request = RangeSearchRequest(
+            queries=[Vector(val=np.ones(self.FAISS_CONFIG.dim))] * 2,
+            radius=0.0,
+        )
+        rpc = self.SERVER.invoke_unary_unary(
+            self.method_descriptor_by_name(
+                ServiceMethodDescriptor.range_search
+            ),
+            (),
+            request,
+            None,
+        )
+
+        response, _, code, _ = rpc.termination()
+
+        self.assertEqual(
+            response,
+            RangeSearchResponse(results=[SearchResponse(), SearchResponse()]),
+        )
+        self.assertIs(code, grpc.StatusCode.OK)
+
+    def test_failed_illegal_query_dimension_RangeSearch(self) -> None:
+        request = RangeSearchRequest(
+            queries=[Vector(val=np.ones(self.FAISS_CONFIG.dim * 2))],
+            radius=1.0,
+        )
+        rpc = self.SERVER.invoke_unary_unary(
+            self.method_descriptor_by_name(
+                ServiceMethodDescriptor.range_search
+            ),
+            (),
+            request,
+            None,
+        )
+
+        response, _, code, details = rpc.termination()
+
+        self.assertRegex(
+            details,
+            f'query vector dimension mismatch expected '
+            f'{self.FAISS_CONFIG.dim} but passed {self.FAISS_CONFIG.dim*2}',
+        )
+        self.assertEqual(response, RangeSearchResponse())
+        self.assertIs(code, grpc.StatusCode.INVALID_ARGUMENT)
+
+    def test_failed_not_supported_index_RangeSearch(self) -> None:
+        # faiss raises for index types without range search (e.g. HNSW of
+        # older faiss)
+        index = faiss.IndexFlatL2(self.FAISS_CONFIG.dim)
+        index.add(np.ones((10, self.FAISS_CONFIG.dim), dtype=np.float32))
+        index.range_search = mock.Mock(
+            side_effect=RuntimeError('range search not implemented')
+        )
+        server = grpc_testing.server_from_dictionary(
+            {self.SERVICE: FaissServiceServicer(index, FaissServiceConfig())},
+            grpc_testing.strict_real_time(),
+        )
+        request = RangeSearchRequest(
+            queries=[Vector(val=np.ones(self.FAISS_CONFIG.dim))], radius=1.0
+        )
+        rpc = server.invoke_unary_unary(
+            self.method_descriptor_by_name(
+                ServiceMethodDescriptor.range_search
+            ),
+            (),
+            request,
+            None,
+        )
+
+        response, _, code, details = rpc.termination()
+
+        self.assertRegex(details, 'range search not implemented')
+        self.assertEqual(response, RangeSearchResponse())
+        self.assertIs(code, grpc.StatusCode.UNIMPLEMENTED)
+
+    def test_successful_empty_RangeSearch(self) -> None:
+        request = RangeSearchRequest(queries=[], radius=1.0)
+        rpc = self.SERVER.invoke_unary_unary(
+            self.method_descriptor_by_name(
+                ServiceMethodDescriptor.range_search
+            ),
+            (),
+            request,
+            None,
+        )
+
+        response, _, code, _ = rpc.termination()
+
+        self.assertEqual(response, RangeSearchResponse())
+        self.assertIs(code, grpc.StatusCode.OK)
+
+    def test_successful_SearchStream(self) -> None:
+        k = 100
+        np.random.seed(1234)
+        vals = np.random.random((10, self.FAISS_CONFIG.dim)).astype('float32')
+        for server in (self.SERVER, self.SERVER_BATCH):
+            rpc = server.invoke_stream_stream(
+                self.method_descriptor_by_name(
+                    ServiceMethodDescriptor.search_stream
+                ),
+                (),
+                None,
+            )
+            for i, val in enumerate(vals):
+                rpc.send_request(
+                    SearchStreamRequest(
+                        sequence_id=i,
+                        request=SearchRequest(query=Vector(val=val), k=k),
+                    )
+                )
+            rpc.requests_closed()
+            responses = [rpc.take_response() for _ in vals]
+
+            _, code, _ = rpc.termination()
+
+            self.assertIs(code, grpc.StatusCode.OK)
+            # responses may be returned out of order
+            responses.sort(key=lambda r: r.sequence_id)
+            for i, (val, response) in enumerate(zip(vals, responses)):
+                distances, ids = self.INDEX.search(np.atleast_2d(val), k)
+                expected = SearchStreamResponse(
+                    sequence_id=i,
+                    response=SearchResponse(
+                        neighbors=self.to_neighbors(distances, ids)
+                    ),
+                )
+                self.assertEqual(response, expected)
+
+    def test_failed_illegal_query_dimension_SearchStream(self) -> None:
+        k = 10
+        vals = [
+            np.ones(self.FAISS_CONFIG.dim * 2, dtype=np.float32),
+            np.ones(self.FAISS_CONFIG.dim, dtype=np.float32),
+        ]
+        rpc = self.SERVER.invoke_stream_stream(
+            self.method_descriptor_by_name(
+                ServiceMethodDescriptor.search_stream
+            ),
+            (),
+            None,
+        )
+        for i, val in enumerate(vals):
+            rpc.send_request(
+                SearchStreamRequest(
+                    sequence_id=i,
+                    request=SearchRequest(query=Vector(val=val), k=k),
+                )
+            )
+        rpc.requests_closed()
+        responses: Dict[int, SearchStreamResponse] = {}
+        for _ in vals:
+            response = rpc.take_response()
+            responses[response.sequence_id] = response
+
+        _, code, _ = rpc.termination()
+
+        # stream is kept open even if one of requests failed
+        self.assertIs(code, grpc.StatusCode.OK)
+        self.assertRegex(
+            responses[0].error,
+            f'query vector dimension mismatch expected '
+            f'{self.FAISS_CONFIG.dim} but passed {self.FAISS_CONFIG.dim*2}',
+        )
+        self.assertEqual(len(responses[1].response.neighbors), k)
+        self.assertEqual(responses[1].error, '')
+
+    def test_successful_cached_Search(self) -> None:
+        k = 10
+        servicer = FaissServiceServicer(
+            faiss.clone_index(self.INDEX),
+            FaissServiceConfig(nprobe=10, cache_size=16),
+        )
+        server = grpc_testing.server_from_dictionary(
+            {self.SERVICE: servicer}, grpc_testing.strict_real_time()
+        )
+        val = np.ones(self.FAISS_CONFIG.dim, dtype=np.float32)
+        distances, ids = self.INDEX.search(np.atleast_2d(val), k)
+        expected = SearchResponse(neighbors=self.to_neighbors(distances, ids))
+
+        for _ in range(3):
+            rpc = server.invoke_unary_unary(
+                self.method_descriptor_by_name(ServiceMethodDescriptor.search),
+                (),
+                SearchRequest(query=Vector(val=val), k=k),
+                None,
+            )
+            response, _, code, _ = rpc.termination()
+
+            self.assertEqual(response, expected)
+            self.assertIs(code, grpc.StatusCode.OK)
+
+        assert servicer.cache
+        self.assertEqual(servicer.cache.misses, 1)
+        self.assertEqual(servicer.cache.hits, 2)
+
+    def test_successful_cached_SearchById(self) -> None:
+        k = 10
+        request_id = 0
+        servicer = FaissServiceServicer(
+            faiss.clone_index(self.INDEX),
+            FaissServiceConfig(nprobe=10, cache_size=16),
+        )
+        server = grpc_testing.server_from_dictionary(
+            {self.SERVICE: servicer}, grpc_testing.strict_real_time()
+        )
+
+        responses = []
+        for response_format in [0, COLUMNAR]:
+            rpc = server.invoke_unary_unary(
+                self.method_descriptor_by_name(
+                    ServiceMethodDescriptor.search_by_id
+                ),
+                (),
+                SearchByIdRequest(
+                    id=request_id, k=k, response_format=response_format
+                ),
+                None,
+            )
+            response, _, code, _ = rpc.termination()
+            self.assertIs(code, grpc.StatusCode.OK)
+            responses.append(response)
+
+        self.assertEqual(
+            [n.id for n in responses[0].neighbors], list(responses[1].ids)
+        )
+        assert servicer.cache
+        self.assertEqual(servicer.cache.misses, 1)
+        self.assertEqual(servicer.cache.hits, 1)
+
+    def test_clear_cache_on_Reload(self) -> None:
+        servicer = FaissServiceServicer(
+            faiss.clone_index(self.INDEX),
+            FaissServiceConfig(nprobe=10, cache_size=16),
+            lambda: faiss.clone_index(self.INDEX),
+        )
+        assert servicer.cache
+        val = np.ones((1, self.FAISS_CONFIG.dim), dtype=np.float32)
+        servicer.cache.get_or_compute(
+            ('query', servicer.cache.query_key(val), 10),
+            lambda: self.INDEX.search(val, 10),
+        )
+
+        servicer.reload()
+
+        self.assertEqual(servicer.cache.size, 0)
+
+    def test_successful_knn_table_SearchById(self) -> None:
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        # table has fake neighbors to make sure they are served from table
+        ids = np.full((self.FAISS_CONFIG.db_size, 10), -1, dtype=np.int64)
+        ids[0] = np.arange(1, 11)
+        np.save(os.path.join(temp_dir.name, IDS_FILE), ids)
+        np.save(
+            os.path.join(temp_dir.name, SCORES_FILE),
+            np.zeros(ids.shape, dtype=np.float32),
+        )
+        servicer = FaissServiceServicer(
+            faiss.clone_index(self.INDEX),
+            FaissServiceConfig(nprobe=10, knn_table_path=temp_dir.name),
+        )
+        server = grpc_testing.server_from_dictionary(
+            {self.SERVICE: servicer}, grpc_testing.strict_real_time()
+        )
+
+        for k, expected in [(5, list(range(1, 6))), (10, list(range(1, 11)))]:
+            rpc = server.invoke_unary_unary(
+                self.method_descriptor_by_name(
+                    ServiceMethodDescriptor.search_by_id
+                ),
+                (),
+                SearchByIdRequest(id=0, k=k),
+                None,
+            )
+            response, _, code, _ = rpc.termination()
+
+            self.assertEqual([n.id for n in response.neighbors], expected)
+            self.assertIs(code, grpc.StatusCode.OK)
+
+        # falls back to search if k is larger than table
+        k = 20
+        rpc = server.invoke_unary_unary(
+            self.method_descriptor_by_name(
+                ServiceMethodDescriptor.search_by_id
+            ),
+            (),
+            SearchByIdRequest(id=0, k=k),
+            None,
+        )
+        distances, ids = self.INDEX.search(
+            self.INDEX.reconstruct_n(0, 1), k + 1
+        )
+        response, _, code, _ = rpc.termination()
+
+        self.assertEqual(
+            [n.id for n in response.neighbors], [i for i in ids[0] if i != 0]
+        )
+        self.assertIs(code, grpc.StatusCode.OK)
+
+    def test_not_use_mismatched_knn_table(self) -> None:
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        index = faiss.IndexFlatL2(self.FAISS_CONFIG.dim)
+        index.add(np.ones((10, self.FAISS_CONFIG.dim), dtype=np.float32))
+        build_knn_table(index, temp_dir.name, 5)
+
+        with self.assertLogs('faiss_grpc.faiss_server', 'WARNING'):
+            servicer = FaissServiceServicer(
+                faiss.clone_index(self.INDEX),
+                FaissServiceConfig(knn_table_path=temp_dir.name),
+            )
+
+        self.assertIsNone(servicer.knn_table)
+
+    def test_successful_Reload(self) -> None:
+        k = 10
+        np.random.seed(4321)
+        xb = np.random.random((100, self.FAISS_CONFIG.dim)).astype('float32')
+        reloaded = faiss.IndexFlatL2(self.FAISS_CONFIG.dim)
+        reloaded.add(xb)
+        servicer = FaissServiceServicer(
+            faiss.clone_index(self.INDEX),
+            self.CONFIG,
+            lambda: faiss.clone_index(reloaded),
+        )
+        previous = weakref.ref(servicer.index)
+        server = grpc_testing.server_from_dictionary(
+            {self.SERVICE: servicer}, grpc_testing.strict_real_time()
+        )
+        rpc = server.invoke_unary_unary(
+            self.method_descriptor_by_name(ServiceMethodDescriptor.reload),
+            (),
+            Empty(),
+            None,
+        )
+
+        response, _, code, _ = rpc.termination()
+
+        self.assertEqual(response, ReloadResponse(ntotal=100))
+        self.assertIs(code, grpc.StatusCode.OK)
+        # previous index is released, because no search is running on it
+        self.assertIsNone(previous())
+
+        val = np.ones(self.FAISS_CONFIG.dim, dtype=np.float32)
+        rpc = server.invoke_unary_unary(
+            self.method_descriptor_by_name(ServiceMethodDescriptor.search),
+            (),
+            SearchRequest(query=Vector(val=val), k=k),
+            None,
+        )
+        distances, ids = reloaded.search(np.atleast_2d(val), k)
+        expected = SearchResponse(neighbors=self.to_neighbors(distances, ids))
+
+        response, _, code, _ = rpc.termination()
+
+        self.assertEqual(response, expected)
+        self.assertIs(code, grpc.StatusCode.OK)
+
+    def test_failed_illegal_dimension_Reload(self) -> None:
+        servicer = FaissServiceServicer(
+            faiss.clone_index(self.INDEX),
+            self.CONFIG,
+            lambda: faiss.IndexFlatL2(self.FAISS_CONFIG.dim * 2),
+        )
+        server = grpc_testing.server_from_dictionary(
+            {self.SERVICE: servicer}, grpc_testing.strict_real_time()
+        )
+        rpc = server.invoke_unary_unary(
+            self.method_descriptor_by_name(ServiceMethodDescriptor.reload),
+            (),
+            Empty(),
+            None,
+        )
+
+        response, _, code, details = rpc.termination()
+
+        self.assertEqual(response, ReloadResponse())
+        self.assertIs(code, grpc.StatusCode.FAILED_PRECONDITION)
+        self.assertRegex(
+            details,
+            f'reloaded index dimension mismatch expected '
+            f'{self.FAISS_CONFIG.dim} but loaded {self.FAISS_CONFIG.dim*2}',
+        )
+        self.assertEqual(servicer.index.ntotal, self.FAISS_CONFIG.db_size)
+
+    def test_failed_attribute_Reload(self) -> None:
+        def load() -> Index:
+            raise AttributeError('index has no attribute')
+
+        servicer = FaissServiceServicer(
+            faiss.clone_index(self.INDEX), self.CONFIG, load
+        )
+        server = grpc_testing.server_from_dictionary(
+            {self.SERVICE: servicer}, grpc_testing.strict_real_time()
+        )
+        rpc = server.invoke_unary_unary(
+            self.method_descriptor_by_name(ServiceMethodDescriptor.reload),
+            (),
+            Empty(),
+            None,
+        )
+
+        response, _, code, details = rpc.termination()
+
+        self.assertEqual(response, ReloadResponse())
+        self.assertIs(code, grpc.StatusCode.FAILED_PRECONDITION)
+        self.assertEqual(servicer.index.ntotal, self.FAISS_CONFIG.db_size)
+
+    def test_reload_index_without_nprobe(self) -> None:
+        reloaded = faiss.IndexHNSWFlat(self.FAISS_CONFIG.dim, 8)
+        servicer = FaissServiceServicer(
+            faiss.clone_index(self.INDEX), self.CONFIG, lambda: reloaded
+        )
+
+        # nprobe of config is only set on IVF index
+        with self.assertLogs('faiss_grpc.faiss_server', 'WARNING'):
+            servicer.reload()
+
+        self.assertIs(servicer.index, reloaded)
+        self.assertFalse(hasattr(reloaded, 'nprobe'))
+
+    def test_failed_not_supported_Reload(self) -> None:
+        rpc = self.SERVER.invoke_unary_unary(
+            self.method_descriptor_by_name(ServiceMethodDescriptor.reload),
+            (),
+            Empty(),
+            None,
+        )
+
+        response, _, code, details = rpc.termination()
+
+        self.assertEqual(response, ReloadResponse())
+        self.assertIs(code, grpc.StatusCode.FAILED_PRECONDITION)
+        self.assertRegex(details, 'index reloading is not supported')
+
+    def test_successful_Stats(self) -> None:
+        servicer = FaissServiceServicer(
+            faiss.clone_index(self.INDEX),
+            FaissServiceConfig(
+                nprobe=10,
+                cache_size=16,
+                search_threads=1,
+                batch_search_threads=2,
+            ),
+        )
+        server = grpc_testing.server_from_dictionary(
+            {self.SERVICE: servicer}, grpc_testing.strict_real_time()
+        )
+        val = np.ones(self.FAISS_CONFIG.dim, dtype=np.float32)
+        servicer.search_query(val[np.newaxis], 10, None)
+
+        with servicer.thread_policy.limit(4):
+            rpc = server.invoke_unary_unary(
+                self.method_descriptor_by_name(ServiceMethodDescriptor.stats),
+                (),
+                Empty(),
+                None,
+            )
+            response, _, code, _ = rpc.termination()
+
+        self.assertIs(code, grpc.StatusCode.OK)
+        self.assertEqual(response.values['searches_running'], 1)
+        self.assertEqual(response.values['search_threads_running'], 2)
+        self.assertEqual(response.values['batch_search_threads_available'], 0)
+        self.assertEqual(
+            response.values['index_ntotal'], self.FAISS_CONFIG.db_size
+        )
+        self.assertEqual(response.values['cache_size'], 0)
+        self.assertEqual(response.values['cache_bytes'], 0)
+        self.assertNotIn('reconstruct_cache_size', response.values)
+        self.assertGreater(response.values['process_cpu_seconds'], 0)
+
+    def test_successful_Heatbeat(self) -> None:
+        request = Empty()
+        rpc = self.SERVER.invoke_unary_unary(
+            self.method_descriptor_by_name(ServiceMethodDescriptor.heatbeat),
+            (),
+            request,
+            None,
+        )
+
+        response, _, code, _ = rpc.termination()
+
+        self.assertEqual(HeatbeatResponse(message='OK'), response)
+        self.assertIs(code, grpc.StatusCode.OK)
+
+
+class TestShardedServicer(unittest.TestCase):
+    DIM = 16
+    DB_SIZE = 3000
+
+    def setUp(self) -> None:
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        np.random.seed(1234)
+        self.xb = np.random.random((self.DB_SIZE, self.DIM)).astype('float32')
+        self.index = faiss.IndexFlatL2(self.DIM)
+        self.index.add(self.xb)
+        paths = []
+        for i, xb in enumerate(np.array_split(self.xb, 3)):
+            shard = faiss.IndexFlatL2(self.DIM)
+            shard.add(xb)
+            paths.append(os.path.join(temp_dir.name, f'shard-{i}.faiss'))
+            faiss.write_index(shard, paths[-1])
+        self.servicer = create_servicer(
+            ','.join(paths), ServerConfig(), FaissServiceConfig()
+        )
+        self.service = faiss_pb2.DESCRIPTOR.services_by_name['FaissService']
+        self.server = grpc_testing.server_from_dictionary(
+            {self.service: self.servicer}, grpc_testing.strict_real_time()
+        )
+
+    def invoke(self, method: str, request: Any) -> Any:
+        rpc = self.server.invoke_unary_unary(
+            self.service.methods_by_name[method], (), request, None
+        )
+        response, _, code, _ = rpc.termination()
+        self.assertIs(code, grpc.StatusCode.OK)
+        return response
+
+    def test_successful_Search(self) -> None:
+        query = self.xb[[1500]] + 0.01
+
+        response = self.invoke(
+            'Search', SearchRequest(query=Vector(val=query[0]), k=20)
+        )
+
+        _, ids = self.index.search(query, 20)
+        self.assertEqual([n.id for n in response.neighbors], list(ids[0]))
+
+    def test_successful_SearchById(self) -> None:
+        response = self.invoke('SearchById', SearchByIdRequest(id=2999, k=5))
+
+        # id is reconstructed from the last shard, and removed from results
+        _, ids = self.index.search(self.xb[[2999]], 6)
+        self.assertEqual([n.id for n in response.neighbors], list(ids[0, 1:]))
+
+    def test_successful_RangeSearch(self) -> None:
+        query = self.xb[[10]]
+        distances, ids = self.index.search(query, 50)
+        radius = float(distances[0, 19] + distances[0, 20]) / 2
+
+        response = self.invoke(
+            'RangeSearch',
+            RangeSearchRequest(queries=[Vector(val=query[0])], radius=radius),
+        )
+
+        self.assertEqual(
+            [n.id for n in response.results[0].neighbors], list(ids[0, :20])
+        )
+
+    def test_successful_Reload(self) -> None:
+        previous = self.servicer.index
+
+        with mock.patch.object(ShardedIndex, 'close', autospec=True) as close:
+            response = self.invoke('Reload', Empty())
+
+        self.assertEqual(response.ntotal, self.DB_SIZE)
+        self.assertIsInstance(self.servicer.index, ShardedIndex)
+        # threads of previous index are stopped
+        close.assert_called_once_with(previous)
+
+    def test_close(self) -> None:
+        # evicted servicer stops threads of its index
+        with mock.patch.object(ShardedIndex, 'close', autospec=True) as close:
+            self.servicer.close()
+
+        close.assert_called_once_with(self.servicer.index)
+
+
+class TestWritableServicer(unittest.TestCase):
+    DIM = 16
+    DB_SIZE = 1000
+
+    def setUp(self) -> None:
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        np.random.seed(1234)
+        self.xb = np.random.random((self.DB_SIZE, self.DIM)).astype('float32')
+        index = faiss.IndexFlatL2(self.DIM)
+        index.add(self.xb[:500])
+        self.index_path = os.path.join(temp_dir.name, 'index.faiss')
+        faiss.write_index(index, self.index_path)
+        self.server_config = ServerConfig(
+            wal_dir=os.path.join(temp_dir.name, 'wal'), wal_sync=False
+        )
+        self.service = faiss_pb2.DESCRIPTOR.services_by_name['FaissService']
+        self.start()
+
+    def start(self) -> None:
+        # servicer is created again like restarted server
+        self.servicer = create_servicer(
+            self.index_path, self.server_config, FaissServiceConfig()
+        )
+        assert self.servicer.writer is not None
+        self.addCleanup(self.servicer.writer.close)
+        self.server = grpc_testing.server_from_dictionary(
+            {self.service: self.servicer}, grpc_testing.strict_real_time()
+        )
+
+    def invoke(
+        self,
+        method: str,
+        request: Any,
+        expected_code: grpc.StatusCode = grpc.StatusCode.OK,
+    ) -> Any:
+        rpc = self.server.invoke_unary_unary(
+            self.service.methods_by_name[method], (), request, None
+        )
+        response, _, code, details = rpc.termination()
+        self.assertIs(code, expected_code, details)
+        self.details = details
+        return response
+
+    def add(
+        self,
+        xb: np.ndarray,
+        expected_code: grpc.StatusCode = grpc.StatusCode.OK,
+    ) -> Any:
+        return self.invoke(
+            'Add',
+            AddRequest(vectors=[encode_vector(x) for x in xb]),
+            expected_code,
+        )
+
+    def write_index(self, index: Index) -> None:
+        faiss.write_index(index, self.index_path)
+        self.servicer.writer.close()
+        self.start()
+
+    def search_ids(
+        self, query: np.ndarray, k: int, nprobe: int = 0
+    ) -> List[int]:
+        response = self.invoke(
+            'Search',
+            SearchRequest(
+                query=Vector(val=query),
+                k=k,
+                response_format=COLUMNAR,
+                params=SearchParameters(nprobe=nprobe),
+            ),
+        )
+        return list(response.ids)
+
+    def test_successful_Add(self) -> None:
+        response = self.add(self.xb[500:510])
+
+        # added vectors are found without reloading
+        self.assertEqual(list(response.ids), list(range(500, 510)))
+        self.assertEqual(response.ntotal, 510)
+        search = self.invoke(
+            'Search', SearchRequest(query=Vector(val=self.xb[505]), k=1)
+        )
+        self.assertEqual(search.neighbors[0].id, 505)
+
+    def test_recover_added_vectors(self) -> None:
+        self.add(self.xb[500:510])
+        self.servicer.writer.snapshot()
+        self.add(self.xb[510:520])
+        self.servicer.writer.close()
+
+        self.start()
+
+        response = self.invoke('SearchById', SearchByIdRequest(id=515, k=1))
+        self.assertEqual(self.servicer.index.ntotal, 520)
+        self.assertEqual(response.request_id, 515)
+        stats = self.servicer.stats()
+        self.assertEqual(stats['wal_records'], 1)
+
+    def test_successful_AddWithIds(self) -> None:
+        quantizer = faiss.IndexFlatL2(self.DIM)
+        ivf = faiss.IndexIVFFlat(quantizer, self.DIM, 4)
+        ivf.train(self.xb)
+        ivf.add_with_ids(self.xb[:500], np.arange(500) * 2)
+        faiss.write_index(ivf, self.index_path)
+        self.servicer.writer.close()
+        self.start()
+
+        response = self.invoke(
+            'AddWithIds',
+            AddWithIdsRequest(
+                vectors=[encode_vector(x) for x in self.xb[500:502]],
+                ids=[1001, 1003],
+            ),
+        )
+
+        self.assertEqual(list(response.ids), [1001, 1003])
+        search = self.invoke(
+            'Search',
+            SearchRequest(
+                query=Vector(val=self.xb[501]),
+                k=1,
+                params=SearchParameters(nprobe=4),
+            ),
+        )
+        self.assertEqual(search.neighbors[0].id, 1003)
+        self.add(self.xb[502:503], grpc.StatusCode.FAILED_PRECONDITION)
+        self.assertRegex(self.details, 'must be added with ids')
+
+    def test_successful_Remove(self) -> None:
+        _, expected = self.servicer.index.search(self.xb[:1], 6)
+
+        response = self.invoke('Remove', RemoveRequest(ids=[0, 3, 3]))
+
+        # removed ids are skipped without changing index
+        self.assertEqual(response.removed, 2)
+        self.assertEqual(
+            self.search_ids(self.xb[0], 5),
+            [i for i in expected[0].tolist() if i not in (0, 3)][:5],
+        )
+        self.assertEqual(self.servicer.index.ntotal, 500)
+        response = self.invoke('Remove', RemoveRequest(ids=[3]))
+        self.assertEqual(response.removed, 0)
+        self.invoke(
+            'SearchById',
+            SearchByIdRequest(id=3, k=1),
+            grpc.StatusCode.INVALID_ARGUMENT,
+        )
+        self.assertEqual(self.details, 'request id 3 is removed from index')
+        response = self.invoke(
+            'SearchByIds', SearchByIdsRequest(ids=[0, 1], k=1)
+        )
+        self.assertEqual(
+            response.results[0].error, 'request id 0 is removed from index'
+        )
+        self.assertEqual(response.results[1].error, '')
+
+    def test_recover_removed_ids(self) -> None:
+        self.invoke('Remove', RemoveRequest(ids=[0]))
+        self.servicer.writer.snapshot()
+        self.invoke('Remove', RemoveRequest(ids=[1]))
+        self.servicer.writer.close()
+
+        self.start()
+
+        self.assertEqual(self.servicer.stats()['removed_ids'], 2)
+        self.assertNotIn(0, self.search_ids(self.xb[0], 10))
+        self.assertNotIn(1, self.search_ids(self.xb[1], 10))
+
+    def test_failed_illegal_Remove(self) -> None:
+        self.invoke(
+            'Remove',
+            RemoveRequest(ids=[1, 500]),
+            grpc.StatusCode.INVALID_ARGUMENT,
+        )
+
+        self.assertEqual(self.details, 'request id must be 0 <= id <= 499')
+        self.assertEqual(self.servicer.stats()['removed_ids'], 0)
+
+    def test_compact_removed_ids(self) -> None:
+        quantizer = faiss.IndexFlatL2(self.DIM)
+        ivf = faiss.IndexIVFFlat(quantizer, self.DIM, 4)
+        ivf.train(self.xb)
+        ivf.add_with_ids(self.xb[:500], np.arange(500) * 2)
+        self.server_config = dataclasses.replace(
+            self.server_config, compaction_threshold=2
+        )
+        self.write_index(ivf)
+        self.invoke('Remove', RemoveRequest(ids=[0, 2]))
+        previous = self.servicer.index
+
+        self.assertTrue(self.servicer.writer.compact())
+
+        # compacted index is swapped in, and removed ids are still skipped
+        # while searches on the previous index may be running
+        self.assertIsNot(self.servicer.index, previous)
+        self.assertEqual(self.servicer.index.ntotal, 498)
+        self.assertNotIn(2, self.search_ids(self.xb[1], 10, nprobe=4))
+        self.assertEqual(self.servicer.stats()['removed_ids'], 2)
+        self.assertFalse(self.servicer.writer.compact())
+        self.assertEqual(self.servicer.stats()['removed_ids'], 0)
+        self.invoke(
+            'AddWithIds',
+            AddWithIdsRequest(vectors=[encode_vector(self.xb[1])], ids=[2]),
+        )
+        self.assertEqual(self.search_ids(self.xb[1], 1, nprobe=4), [2])
+
+    def test_compact_sequential_ids(self) -> None:
+        self.server_config = dataclasses.replace(
+            self.server_config, compaction_threshold=2
+        )
+        self.servicer.writer.close()
+        self.start()
+        self.invoke('Remove', RemoveRequest(ids=[0, 1]))
+
+        self.assertTrue(self.servicer.writer.compact())
+
+        # ids of the others are kept, and can still be searched by
+        self.assertEqual(self.servicer.index.ntotal, 498)
+        response = self.invoke(
+            'SearchById',
+            SearchByIdRequest(id=499, k=1, response_format=COLUMNAR),
+        )
+        self.assertEqual(len(response.ids), 1)
+        self.assertEqual(self.search_ids(self.xb[499], 1), [499])
+        self.assertEqual(list(self.add(self.xb[500:501]).ids), [500])
+        self.invoke(
+            'SearchById',
+            SearchByIdRequest(id=0, k=1),
+            grpc.StatusCode.INVALID_ARGUMENT,
+        )
+
+    def test_failed_not_removable_Remove(self) -> None:
+        index = faiss.IndexHNSWFlat(self.DIM, 8)
+        index.add(self.xb[:500])
+        self.write_index(index)
+
+        self.invoke(
+            'Remove',
+            RemoveRequest(ids=[0]),
+            grpc.StatusCode.FAILED_PRECONDITION,
+        )
+
+        self.assertEqual(self.servicer.stats()['removed_ids'], 0)
+
+    def test_mask_removed_ids(self) -> None:
+        # index types which do not take id selector (depending on faiss
+        # version) have more neighbors searched and removed ones dropped
+        index = faiss.IndexIDMap(faiss.IndexFlatL2(self.DIM))
+        index.add_with_ids(self.xb[:500], np.arange(500) + 1000)
+        with mock.patch(
+            'faiss_grpc.wal.supports_selector', return_value=False
+        ):
+            self.write_index(index)
+        _, expected = index.search(self.xb[:1], 5)
+
+        self.invoke('Remove', RemoveRequest(ids=expected[0, :2].tolist()))
+
+        ids = self.search_ids(self.xb[0], 5)
+        self.assertEqual(ids[:3], expected[0, 2:].tolist())
+        self.assertEqual(len(ids), 5)
+        self.assertFalse(self.servicer.writer.tombstones.selectable)
+
+    def test_failed_not_supported_AddWithIds(self) -> None:
+        self.invoke(
+            'AddWithIds',
+            AddWithIdsRequest(vectors=[encode_vector(self.xb[0])], ids=[1]),
+            grpc.StatusCode.FAILED_PRECONDITION,
+        )
+
+        # refused vectors are not written to log
+        self.assertEqual(self.servicer.stats()['wal_records'], 0)
+
+    def test_failed_illegal_AddWithIds(self) -> None:
+        self.invoke(
+            'AddWithIds',
+            AddWithIdsRequest(vectors=[encode_vector(self.xb[0])], ids=[]),
+            grpc.StatusCode.INVALID_ARGUMENT,
+        )
+
+        self.assertEqual(
+            self.details,
+            'number of ids 0 does not match number of vectors 1',
+        )
+
+    def test_failed_illegal_dimension_Add(self) -> None:
+        self.invoke(
+            'Add',
+            AddRequest(vectors=[Vector(val=[0.0] * 16), Vector(val=[0.0])]),
+            grpc.StatusCode.INVALID_ARGUMENT,
+        )
+
+        self.assertEqual(
+            self.details,
+            'added vector dimension mismatch expected 16 but passed 1 '
+            'at vectors[1]',
+        )
+
+    def test_failed_Reload(self) -> None:
+        self.invoke('Reload', Empty(), grpc.StatusCode.FAILED_PRECONDITION)
+
+    def test_failed_not_writable_Add(self) -> None:
+        self.servicer = create_servicer(
+            self.index_path, ServerConfig(), FaissServiceConfig()
+        )
+        self.server = grpc_testing.server_from_dictionary(
+            {self.service: self.servicer}, grpc_testing.strict_real_time()
+        )
+
+        self.add(self.xb[:1], grpc.StatusCode.FAILED_PRECONDITION)
+
+        self.assertRegex(self.details, 'index is not writable')
+        self.invoke(
+            'Remove',
+            RemoveRequest(ids=[0]),
+            grpc.StatusCode.FAILED_PRECONDITION,
+        )
+
+    def test_failed_illegal_config(self) -> None:
+        for index_path, config in [
+            (f'{self.index_path},{self.index_path}', self.server_config),
+            (
+                self.index_path,
+                dataclasses.replace(self.server_config, reload_interval=1),
+            ),
+            (
+                self.index_path,
+                dataclasses.replace(
+                    self.server_config, index_load_mode=IndexLoadMode.mmap
+                ),
+            ),
+        ]:
+            with self.assertRaises(ValueError):
+                create_servicer(index_path, config, FaissServiceConfig())
+
+
+class TestServer(BaseTestCase):
+    # FAISS_CONFIG is defined in BaseTestCase
+    SERVER_CONFIG: ServerConfig
+    SERVICE_CONFIG: FaissServiceConfig
+    CLIENT: GrpcClientForTesting
+    SERVER: Server
+    TEMP_DIR: tempfile.TemporaryDirectory
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.SERVER_CONFIG = ServerConfig()
+        cls.SERVICE_CONFIG = FaissServiceConfig(nprobe=10)
+        cls.FAISS_CONFIG = FaissConfig(dim=64, db_size=100000, nlist=100)
+        cls.CLIENT = GrpcClientForTesting()
+
+        index = cls.create_index()
+        # index file is kept while serving, because it is read on reloading
+        cls.TEMP_DIR = tempfile.TemporaryDirectory()
+        index_path = os.path.join(cls.TEMP_DIR.name, 'index.faiss')
+        faiss.write_index(index, index_path)
+        cls.SERVER = Server(
+            index_path=index_path,
+            server_config=cls.SERVER_CONFIG,
+            service_config=cls.SERVICE_CONFIG,
+        )
+
+        cls.SERVER.server.start()
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        cls.SERVER.server.stop(None)
+        cls.TEMP_DIR.cleanup()
+
+    def test_serve_search(self) -> None:
+        k = 10
+        response = self.CLIENT.search(
+            np.ones(self.FAISS_CONFIG.dim, dtype=np.float32), k=k
+        )
+        self.assertEqual(len(response.neighbors), k)
+
+    def test_serve_search_by_id(self) -> None:
+        request_id = 0
+        k = 10
+        response = self.CLIENT.search_by_id(request_id=request_id, k=k)
+        self.assertEqual(response.request_id, request_id)
         self.assertEqual(len(response.neighbors), k)
 
+    def test_serve_search_by_ids(self) -> None:
+        k = 10
+        response = self.CLIENT.search_by_ids(request_ids=[0, 1], k=k)
+        self.assertEqual([r.request_id for r in response.results], [0, 1])
+        for result in response.results:
+            self.assertEqual(len(result.neighbors), k)
+
+    def test_serve_batch_search(self) -> None:
+        k = 10
+        queries = [
+            np.ones(self.FAISS_CONFIG.dim, dtype=np.float32),
+            np.zeros(self.FAISS_CONFIG.dim, dtype=np.float32),
+        ]
+        response = self.CLIENT.batch_search(queries, k=k)
+        self.assertEqual(len(response.results), len(queries))
+        for result in response.results:
+            self.assertEqual(len(result.neighbors), k)
+
+    def test_serve_range_search(self) -> None:
+        queries = [np.ones(self.FAISS_CONFIG.dim, dtype=np.float32)]
+        response = self.CLIENT.range_search(queries, radius=1e9)
+        self.assertEqual(len(response.results), len(queries))
+        self.assertGreater(len(response.results[0].neighbors), 0)
+        scores = [n.score for n in response.results[0].neighbors]
+        self.assertEqual(scores, sorted(scores))
+
+    def test_serve_search_stream(self) -> None:
+        k = 10
+        queries = [
+            np.ones(self.FAISS_CONFIG.dim, dtype=np.float32) * i
+            for i in range(20)
+        ]
+        responses = self.CLIENT.search_stream(queries, k=k)
+        self.assertEqual(
+            sorted(r.sequence_id for r in responses), list(range(20))
+        )
+        for response in responses:
+            self.assertEqual(len(response.response.neighbors), k)
+
+    def test_serve_reload(self) -> None:
+        response = self.CLIENT.reload()
+        self.assertEqual(response.ntotal, self.FAISS_CONFIG.db_size)
+
+    def test_serve_stats(self) -> None:
+        response = self.CLIENT.stats()
+        self.assertEqual(
+            response.values['index_ntotal'], self.FAISS_CONFIG.db_size
+        )
+
     def test_serve_heatbeat(self) -> None:
         response = self.CLIENT.heatbeat()
         self.assertEqual(response, HeatbeatResponse(message='OK'))
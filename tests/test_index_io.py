@@ -0,0 +1,228 @@
+import json
+import os
+import tempfile
+import unittest
+
+import faiss
+import numpy as np
+
+from faiss_grpc.faiss_server import ServerConfig
+from faiss_grpc.index_io import (
+    IndexLoadMode,
+    ShardedIndexLoader,
+    contains_ids,
+    has_sequential_ids,
+    index_files,
+    index_loader,
+    is_sharded,
+    make_direct_map,
+    mapped_bytes,
+    read_index,
+)
+from faiss_grpc.sharding import ShardedIndex
+
+
+class TestReadIndex(unittest.TestCase):
+    DIM = 64
+    DB_SIZE = 1000
+
+    def setUp(self) -> None:
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        np.random.seed(1234)
+        self.xb = np.random.random((self.DB_SIZE, self.DIM)).astype('float32')
+
+        self.flat_path = os.path.join(temp_dir.name, 'flat.faiss')
+        flat = faiss.IndexFlatL2(self.DIM)
+        flat.add(self.xb)
+        faiss.write_index(flat, self.flat_path)
+
+        self.ivf_path = os.path.join(temp_dir.name, 'ivf.faiss')
+        self.ivf = faiss.IndexIVFFlat(faiss.IndexFlatL2(self.DIM), self.DIM, 4)
+        self.ivf.train(self.xb)
+        self.ivf.add(self.xb)
+        faiss.write_index(self.ivf, self.ivf_path)
+
+    def test_read(self) -> None:
+        with self.assertLogs('faiss_grpc.index_io', 'INFO') as cm:
+            index = read_index(self.ivf_path, IndexLoadMode.read)
+
+        self.assertEqual(index.ntotal, self.DB_SIZE)
+        self.assertEqual(mapped_bytes(index), 0)
+        self.assertRegex(cm.output[0], 'with read mode')
+
+    def test_mmap(self) -> None:
+        with self.assertLogs('faiss_grpc.index_io', 'INFO') as cm:
+            index = read_index(self.ivf_path, IndexLoadMode.mmap)
+
+        self.assertGreater(mapped_bytes(index), 0)
+        self.assertEqual(len(cm.output), 2)
+        self.assertRegex(cm.output[1], 'bytes of inverted lists are mapped')
+
+        index.nprobe = 4
+        self.ivf.nprobe = 4
+        expected = self.ivf.search(self.xb[:10], 10)
+        actual = index.search(self.xb[:10], 10)
+        np.testing.assert_array_equal(actual[1], expected[1])
+
+    def test_mmap_unsupported_index(self) -> None:
+        with self.assertLogs('faiss_grpc.index_io', 'WARNING') as cm:
+            index = read_index(self.flat_path, IndexLoadMode.mmap)
+
+        self.assertEqual(index.ntotal, self.DB_SIZE)
+        self.assertRegex(cm.output[0], 'does not support mmap')
+
+    def test_make_array_direct_map(self) -> None:
+        make_direct_map(self.ivf)
+
+        self.assertEqual(self.ivf.direct_map.type, faiss.DirectMap.Array)
+        self.assertTrue(has_sequential_ids(self.ivf))
+        np.testing.assert_array_equal(self.ivf.reconstruct(10), self.xb[10])
+
+    def test_make_hashtable_direct_map(self) -> None:
+        index = faiss.IndexIVFFlat(faiss.IndexFlatL2(self.DIM), self.DIM, 4)
+        index.train(self.xb)
+        index.add_with_ids(self.xb, np.arange(self.DB_SIZE) * 2 + 1)
+
+        make_direct_map(index)
+
+        self.assertEqual(index.direct_map.type, faiss.DirectMap.Hashtable)
+        self.assertFalse(has_sequential_ids(index))
+        np.testing.assert_array_equal(index.reconstruct(21), self.xb[10])
+
+    def test_id_map_has_not_sequential_ids(self) -> None:
+        index = faiss.IndexIDMap2(faiss.IndexFlatL2(self.DIM))
+
+        self.assertFalse(has_sequential_ids(index))
+
+    def test_contains_ids(self) -> None:
+        ids = np.array([-1, 0, 21, 22, 5000])
+        ivf = faiss.IndexIVFFlat(faiss.IndexFlatL2(self.DIM), self.DIM, 4)
+        ivf.train(self.xb)
+        ivf.add_with_ids(self.xb, np.arange(self.DB_SIZE) * 2 + 1)
+        make_direct_map(ivf)
+        id_map = faiss.IndexIDMap2(faiss.IndexFlatL2(self.DIM))
+        id_map.add_with_ids(self.xb, np.arange(self.DB_SIZE) * 2 + 1)
+        flat = faiss.IndexFlatL2(self.DIM)
+        flat.add(self.xb)
+
+        for index, expected in (
+            (ivf, [False, False, True, False, False]),
+            (id_map, [False, False, True, False, False]),
+            (flat, [False, True, True, True, False]),
+        ):
+            with self.subTest(index=type(index).__name__):
+                self.assertEqual(contains_ids(index, ids).tolist(), expected)
+
+    def test_make_direct_map_mapped_index(self) -> None:
+        index = read_index(self.ivf_path, IndexLoadMode.mmap)
+
+        make_direct_map(index)
+
+        np.testing.assert_array_equal(index.reconstruct(10), self.xb[10])
+
+    def test_failed_unresolved_auto(self) -> None:
+        with self.assertRaises(ValueError):
+            read_index(self.flat_path, IndexLoadMode.auto)
+
+    def test_resolve_index_load_mode(self) -> None:
+        self.assertIs(
+            ServerConfig().resolve_index_load_mode(), IndexLoadMode.read
+        )
+        self.assertIs(
+            ServerConfig(processes=2).resolve_index_load_mode(),
+            IndexLoadMode.mmap,
+        )
+        self.assertIs(
+            ServerConfig(
+                processes=2, index_load_mode=IndexLoadMode.read
+            ).resolve_index_load_mode(),
+            IndexLoadMode.read,
+        )
+
+
+class TestShardedIndexLoader(unittest.TestCase):
+    DIM = 16
+    DB_SIZE = 900
+
+    def setUp(self) -> None:
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.dir = temp_dir.name
+        np.random.seed(1234)
+        self.xb = np.random.random((self.DB_SIZE, self.DIM)).astype('float32')
+        quantizer = faiss.IndexFlatL2(self.DIM)
+        self.ivf = faiss.IndexIVFFlat(quantizer, self.DIM, 4)
+        self.ivf.train(self.xb)
+        self.paths = []
+        for i, xb in enumerate(np.array_split(self.xb, 3)):
+            self.paths.append(self.write_shard(f'shard-{i}.faiss', xb))
+        self.manifest_path = os.path.join(self.dir, 'shards.json')
+        with open(self.manifest_path, 'w') as f:
+            json.dump({'shards': [os.path.basename(p) for p in self.paths]}, f)
+
+    def write_shard(self, filename: str, xb: np.ndarray) -> str:
+        shard = faiss.clone_index(self.ivf)
+        shard.add(xb)
+        path = os.path.join(self.dir, filename)
+        faiss.write_index(shard, path)
+        return path
+
+    def test_is_sharded(self) -> None:
+        self.assertTrue(is_sharded(','.join(self.paths)))
+        self.assertTrue(is_sharded(self.manifest_path))
+        self.assertFalse(is_sharded(self.paths[0]))
+
+    def test_index_files(self) -> None:
+        self.assertEqual(index_files(','.join(self.paths)), self.paths)
+        self.assertEqual(
+            index_files(self.manifest_path), [self.manifest_path] + self.paths
+        )
+        self.assertEqual(index_files(self.paths[0]), [self.paths[0]])
+
+    def test_load(self) -> None:
+        for path in [','.join(self.paths), self.manifest_path]:
+            index = index_loader(path, IndexLoadMode.mmap)()
+
+            self.assertIsInstance(index, ShardedIndex)
+            self.assertEqual(index.ntotal, self.DB_SIZE)
+            self.assertGreater(mapped_bytes(index), 0)
+            make_direct_map(index)
+            self.assertTrue(has_sequential_ids(index))
+            np.testing.assert_array_equal(
+                index.reconstruct(self.DB_SIZE - 1), self.xb[-1]
+            )
+
+    def test_reload_changed_shard(self) -> None:
+        loader = ShardedIndexLoader(self.manifest_path)
+        index = loader()
+        self.write_shard('new.faiss', self.xb[:100])
+        os.replace(os.path.join(self.dir, 'new.faiss'), self.paths[1])
+
+        reloaded = loader()
+
+        # unchanged shards are reused without reading their files
+        self.assertIs(reloaded.shards[0], index.shards[0])
+        self.assertIsNot(reloaded.shards[1], index.shards[1])
+        self.assertIs(reloaded.shards[2], index.shards[2])
+        self.assertEqual(reloaded.ntotal, 700)
+
+    def test_load_global_ids_manifest(self) -> None:
+        with open(self.manifest_path, 'w') as f:
+            json.dump({'shards': self.paths, 'successive_ids': False}, f)
+
+        index = index_loader(self.manifest_path)()
+
+        self.assertFalse(index.successive_ids)
+        self.assertFalse(has_sequential_ids(index))
+
+    def test_failed_illegal_manifest(self) -> None:
+        with open(self.manifest_path, 'w') as f:
+            json.dump({'shards': []}, f)
+
+        with self.assertRaises(ValueError):
+            index_loader(self.manifest_path)()
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,97 @@
+import os
+import tempfile
+import unittest
+
+import faiss
+import numpy as np
+
+from faiss_grpc.knn_table import KnnTable, build_knn_table, exclude_self, main
+
+
+class TestKnnTable(unittest.TestCase):
+    DIM = 16
+    DB_SIZE = 1000
+
+    def setUp(self) -> None:
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.temp_dir = temp_dir.name
+        np.random.seed(1234)
+        self.index = faiss.IndexFlatL2(self.DIM)
+        self.index.add(
+            np.random.random((self.DB_SIZE, self.DIM)).astype('float32')
+        )
+
+    def test_build(self) -> None:
+        k = 10
+        path = os.path.join(self.temp_dir, 'table')
+        build_knn_table(self.index, path, k, batch_size=300)
+        table = KnnTable.load(path)
+
+        self.assertEqual(table.ntotal, self.DB_SIZE)
+        self.assertEqual(table.k, k)
+        for request_id in [0, 299, 300, self.DB_SIZE - 1]:
+            distances, ids = self.index.search(
+                self.index.reconstruct_n(request_id, 1), k + 1
+            )
+            expected_ids = ids[0][ids[0] != request_id][:k]
+            scores, ids = table.lookup(request_id, k)
+            np.testing.assert_array_equal(ids, expected_ids)
+            np.testing.assert_allclose(
+                scores, distances[0][distances[0] > 0][:k], rtol=1e-5
+            )
+
+    def test_lookup_less_neighbors(self) -> None:
+        table = KnnTable(
+            np.array([[1, 2, -1], [0, -1, -1]]),
+            np.array([[0.1, 0.2, 0.0], [0.1, 0.0, 0.0]], dtype=np.float32),
+        )
+
+        scores, ids = table.lookup(0, 3)
+        np.testing.assert_array_equal(ids, [1, 2])
+        scores, ids = table.lookup(1, 1)
+        np.testing.assert_array_equal(ids, [0])
+
+    def test_lookup_rows(self) -> None:
+        table = KnnTable(
+            np.array([[1, 2, -1], [0, -1, -1]]),
+            np.array([[0.1, 0.2, 0.0], [0.1, 0.0, 0.0]], dtype=np.float32),
+        )
+
+        scores, ids = table.lookup_rows(np.array([1, 0]), 2)
+        np.testing.assert_array_equal(ids, [[0, -1], [1, 2]])
+        np.testing.assert_allclose(scores, [[0.1, 0.0], [0.1, 0.2]])
+
+    def test_exclude_self(self) -> None:
+        distances = np.array(
+            [[0.0, 0.1, 0.2], [0.1, 0.2, 0.3], [0.0, 0.0, 0.1]],
+            dtype=np.float32,
+        )
+        ids = np.array([[0, 5, 6], [3, 4, 5], [7, 2, -1]])
+
+        distances, ids = exclude_self(distances, ids, np.array([0, 1, 2]), 2)
+
+        # requested id is removed wherever it is found, otherwise the last
+        # neighbor is dropped
+        np.testing.assert_array_equal(ids, [[5, 6], [3, 4], [7, -1]])
+        np.testing.assert_allclose(
+            distances, [[0.1, 0.2], [0.1, 0.2], [0.0, 0.1]]
+        )
+
+    def test_main(self) -> None:
+        index_path = os.path.join(self.temp_dir, 'index.faiss')
+        table_path = os.path.join(self.temp_dir, 'table')
+        faiss.write_index(self.index, index_path)
+
+        main([index_path, table_path, '5', '--batch-size', '128'])
+
+        table = KnnTable.load(table_path)
+        self.assertEqual((table.ntotal, table.k), (self.DB_SIZE, 5))
+
+    def test_failed_illegal_k(self) -> None:
+        with self.assertRaises(ValueError):
+            build_knn_table(self.index, self.temp_dir, 0)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
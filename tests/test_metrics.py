@@ -0,0 +1,186 @@
+import os
+import tempfile
+import threading
+import unittest
+import urllib.error
+import urllib.request
+
+import faiss
+import grpc
+import numpy as np
+
+from faiss_grpc.faiss_server import FaissServiceConfig, Server, ServerConfig
+from faiss_grpc.metrics import (
+    Metrics,
+    MetricsServer,
+    MonitoredThreadPoolExecutor,
+)
+from faiss_grpc.proto import faiss_pb2_grpc
+from faiss_grpc.proto.faiss_pb2 import SearchRequest, Vector
+
+
+class TestMetrics(unittest.TestCase):
+    def test_render_counter(self) -> None:
+        metrics = Metrics()
+        metrics.inc('requests_total', (('method', 'Search'),))
+        metrics.inc('requests_total', (('method', 'Search'),), 2)
+
+        self.assertEqual(
+            metrics.render(),
+            '# TYPE requests_total counter\n'
+            'requests_total{method="Search"} 3\n',
+        )
+
+    def test_render_histogram(self) -> None:
+        metrics = Metrics()
+        for value in [1, 2, 2, 5]:
+            metrics.observe('k', value, (), buckets=(1, 2))
+
+        self.assertEqual(
+            metrics.render(),
+            '# TYPE k histogram\n'
+            'k_bucket{le="1.0"} 1\n'
+            'k_bucket{le="2.0"} 3\n'
+            'k_bucket{le="+Inf"} 4\n'
+            'k_sum 10.0\n'
+            'k_count 4\n',
+        )
+
+    def test_render_collected_gauge(self) -> None:
+        metrics = Metrics()
+        metrics.add_collector(lambda: {'searches_running': 2})
+
+        self.assertEqual(
+            metrics.render(),
+            '# TYPE faiss_grpc_searches_running gauge\n'
+            'faiss_grpc_searches_running 2\n',
+        )
+
+    def test_escape_label(self) -> None:
+        metrics = Metrics()
+        metrics.inc('errors', (('details', 'a "b"\n'),))
+
+        self.assertIn('errors{details="a \\"b\\"\\n"} 1', metrics.render())
+
+    def test_time(self) -> None:
+        metrics = Metrics()
+        with metrics.time('seconds', (('stage', 'search'),)):
+            pass
+
+        self.assertIn(
+            'seconds_count{stage="search"} 1', metrics.render().splitlines()
+        )
+
+
+class TestMetricsServer(unittest.TestCase):
+    def setUp(self) -> None:
+        metrics = Metrics()
+        metrics.inc('requests_total')
+        self.server = MetricsServer(metrics, 0)
+        self.server.start()
+        self.addCleanup(self.server.close)
+
+    def test_serve_metrics(self) -> None:
+        url = f'http://localhost:{self.server.port}/metrics'
+        with urllib.request.urlopen(url, timeout=10) as response:
+            body = response.read().decode()
+
+        self.assertIn('requests_total 1', body)
+
+    def test_failed_not_found(self) -> None:
+        url = f'http://localhost:{self.server.port}/'
+        with self.assertRaises(urllib.error.HTTPError) as cm:
+            urllib.request.urlopen(url, timeout=10)
+
+        self.assertEqual(cm.exception.code, 404)
+
+
+class TestMonitoredThreadPoolExecutor(unittest.TestCase):
+    def test_stats(self) -> None:
+        executor = MonitoredThreadPoolExecutor(max_workers=1)
+        self.addCleanup(executor.shutdown)
+        started = threading.Event()
+        release = threading.Event()
+
+        def block() -> None:
+            started.set()
+            release.wait(10)
+
+        running = executor.submit(block)
+        started.wait(10)
+        queued = executor.submit(lambda: 1)
+
+        self.assertEqual(
+            executor.stats(),
+            {'worker_tasks_queued': 1, 'worker_tasks_running': 1},
+        )
+        release.set()
+        running.result(10)
+        self.assertEqual(queued.result(10), 1)
+        self.assertEqual(
+            executor.stats(),
+            {'worker_tasks_queued': 0, 'worker_tasks_running': 0},
+        )
+
+
+class TestServerMetrics(unittest.TestCase):
+    DIM = 64
+    PORT = 50054
+
+    def setUp(self) -> None:
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        index_path = os.path.join(temp_dir.name, 'index.faiss')
+        index = faiss.IndexFlatL2(self.DIM)
+        index.add(np.random.random((100, self.DIM)).astype('float32'))
+        faiss.write_index(index, index_path)
+
+        self.server = Server(
+            index_path,
+            ServerConfig(port=self.PORT, max_workers=2, metrics_port=0),
+            FaissServiceConfig(normalize_query=True),
+        )
+        self.server.server.start()
+        self.addCleanup(self.server.server.stop, None)
+        channel = grpc.insecure_channel(f'localhost:{self.PORT}')
+        self.addCleanup(channel.close)
+        self.stub = faiss_pb2_grpc.FaissServiceStub(channel)
+
+    def test_record_rpc(self) -> None:
+        val = np.ones(self.DIM, dtype=np.float32)
+        self.stub.Search(SearchRequest(query=Vector(val=val), k=10))
+        with self.assertRaises(grpc.RpcError):
+            self.stub.Search(SearchRequest(query=Vector(val=[1.0]), k=5))
+
+        assert self.server.metrics
+        lines = self.server.metrics.render().splitlines()
+
+        for line in [
+            'faiss_grpc_requests_total{method="Search",code="OK"} 1',
+            'faiss_grpc_requests_total'
+            '{method="Search",code="INVALID_ARGUMENT"} 1',
+            'faiss_grpc_rpc_seconds_count{method="Search"} 2',
+            'faiss_grpc_request_k_bucket{method="Search",le="5.0"} 1',
+            'faiss_grpc_request_k_bucket{method="Search",le="10.0"} 2',
+            'faiss_grpc_search_batch_size_count 1',
+            'faiss_grpc_index_ntotal 100',
+            'faiss_grpc_worker_tasks_queued 0',
+        ]:
+            self.assertIn(line, lines)
+        # query of illegal dimension is not normalized and searched
+        for stage, count in [
+            ('deserialize', 2),
+            ('decode', 2),
+            ('normalize', 1),
+            ('search', 1),
+            ('response', 1),
+            ('serialize', 2),
+        ]:
+            self.assertIn(
+                f'faiss_grpc_stage_seconds_count{{stage="{stage}"}} {count}',
+                lines,
+            )
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,243 @@
+import json
+import os
+import tempfile
+import unittest
+from typing import Dict, Tuple
+
+import faiss
+import grpc
+import grpc_testing
+import numpy as np
+from faiss import Index
+from grpc_testing._server._server import _Server
+
+from faiss_grpc.faiss_server import (
+    FaissServiceConfig,
+    FaissServiceServicer,
+    ServerConfig,
+    create_servicer,
+)
+from faiss_grpc.multi_index import MultiIndexServicer
+from faiss_grpc.proto import faiss_pb2
+from faiss_grpc.proto.faiss_pb2 import (
+    SearchRequest,
+    SearchResponse,
+    SearchStreamRequest,
+    SearchStreamResponse,
+    Vector,
+)
+from faiss_grpc.results import to_neighbors
+
+
+class TestMultiIndexServicer(unittest.TestCase):
+    # small indexes of different dimension are served by their names
+    DIMS = {'small': 8, 'large': 16}
+    DB_SIZE = 1000
+
+    def setUp(self) -> None:
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.dir = temp_dir.name
+        self.indexes: Dict[str, Index] = {}
+        for name, d in self.DIMS.items():
+            self.indexes[name] = self.write_index(name, d)
+        self.service = faiss_pb2.DESCRIPTOR.services_by_name['FaissService']
+
+    def write_index(self, name: str, d: int) -> Index:
+        np.random.seed(d)
+        index = faiss.IndexFlatL2(d)
+        index.add(np.random.random((self.DB_SIZE, d)).astype('float32'))
+        faiss.write_index(index, os.path.join(self.dir, f'{name}.faiss'))
+        return index
+
+    def create_server(self, servicer: MultiIndexServicer) -> _Server:
+        return grpc_testing.server_from_dictionary(
+            {self.service: servicer}, grpc_testing.strict_real_time()
+        )
+
+    def search(
+        self, server: _Server, request: SearchRequest
+    ) -> Tuple[SearchResponse, grpc.StatusCode, str]:
+        rpc = server.invoke_unary_unary(
+            self.service.methods_by_name['Search'], (), request, None
+        )
+        response, _, code, details = rpc.termination()
+        return response, code, details
+
+    def test_successful_Search(self) -> None:
+        servicer = MultiIndexServicer(self.dir, FaissServiceConfig())
+        server = self.create_server(servicer)
+
+        # indexes are loaded on their first request
+        self.assertEqual(servicer.stats()['indexes_loaded'], 0)
+        for name, index in self.indexes.items():
+            query = np.ones((1, index.d), dtype=np.float32)
+            response, code, _ = self.search(
+                server,
+                SearchRequest(query=Vector(val=query[0]), k=10, index=name),
+            )
+
+            distances, ids = index.search(query, 10)
+            self.assertIs(code, grpc.StatusCode.OK)
+            self.assertEqual(
+                response,
+                SearchResponse(neighbors=to_neighbors(distances[0], ids[0])),
+            )
+
+        stats = servicer.stats()
+        self.assertEqual(stats['indexes_total'], 2)
+        self.assertEqual(stats['indexes_loaded'], 2)
+        self.assertEqual(stats['index_ntotal'], self.DB_SIZE * 2)
+
+    def test_failed_unknown_index_Search(self) -> None:
+        server = self.create_server(
+            MultiIndexServicer(self.dir, FaissServiceConfig())
+        )
+        query = Vector(val=np.ones(8))
+
+        response, code, details = self.search(
+            server, SearchRequest(query=query, k=10, index='unknown')
+        )
+        self.assertEqual(response, SearchResponse())
+        self.assertIs(code, grpc.StatusCode.NOT_FOUND)
+        self.assertEqual(details, 'index unknown is not found')
+
+        response, code, details = self.search(
+            server, SearchRequest(query=query, k=10)
+        )
+        self.assertEqual(response, SearchResponse())
+        self.assertIs(code, grpc.StatusCode.INVALID_ARGUMENT)
+        self.assertEqual(details, 'index name is required')
+
+    def test_failed_broken_index_Search(self) -> None:
+        with open(os.path.join(self.dir, 'broken.faiss'), 'w') as f:
+            f.write('not an index')
+        server = self.create_server(
+            MultiIndexServicer(self.dir, FaissServiceConfig())
+        )
+
+        response, code, details = self.search(
+            server,
+            SearchRequest(query=Vector(val=np.ones(8)), k=1, index='broken'),
+        )
+
+        self.assertEqual(response, SearchResponse())
+        self.assertIs(code, grpc.StatusCode.FAILED_PRECONDITION)
+        self.assertRegex(details, 'failed to load index broken')
+
+    def test_evict_over_memory_budget(self) -> None:
+        size = os.path.getsize(os.path.join(self.dir, 'large.faiss'))
+        servicer = MultiIndexServicer(
+            self.dir, FaissServiceConfig(), memory_budget=size
+        )
+        server = self.create_server(servicer)
+
+        for name in ['small', 'large', 'small']:
+            _, code, _ = self.search(
+                server,
+                SearchRequest(
+                    query=Vector(val=np.ones(self.DIMS[name])),
+                    k=1,
+                    index=name,
+                ),
+            )
+            self.assertIs(code, grpc.StatusCode.OK)
+
+        # both indexes do not fit in budget, so each request loaded one
+        stats = servicer.stats()
+        self.assertEqual(stats['indexes_loaded'], 1)
+        self.assertEqual(stats['index_loads'], 3)
+        self.assertEqual(stats['index_evictions'], 2)
+        self.assertLessEqual(stats['index_memory_bytes'], size)
+
+    def test_manifest_config_overrides(self) -> None:
+        manifest = os.path.join(self.dir, 'indexes.json')
+        with open(manifest, 'w') as f:
+            json.dump(
+                {
+                    'small': 'small.faiss',
+                    'large': {
+                        'path': 'large.faiss',
+                        'config': {'normalize_query': True},
+                    },
+                },
+                f,
+            )
+        servicer = MultiIndexServicer(manifest, FaissServiceConfig())
+
+        self.assertFalse(servicer.servicer('small').config.normalize_query)
+        self.assertTrue(servicer.servicer('large').config.normalize_query)
+        # OpenMP threads are limited by the policy shared by all indexes
+        self.assertIs(
+            servicer.servicer('large').thread_policy, servicer.thread_policy
+        )
+
+    def test_failed_illegal_manifest_config(self) -> None:
+        manifest = os.path.join(self.dir, 'indexes.json')
+        for config in [{'search_threads': 1}, {'unknown': 1}]:
+            with open(manifest, 'w') as f:
+                json.dump(
+                    {'small': {'path': 'small.faiss', 'config': config}}, f
+                )
+            with self.assertRaises(ValueError):
+                MultiIndexServicer(manifest, FaissServiceConfig())
+
+    def test_successful_SearchStream(self) -> None:
+        server = self.create_server(
+            MultiIndexServicer(self.dir, FaissServiceConfig())
+        )
+        names = ['small', 'large', 'unknown']
+        rpc = server.invoke_stream_stream(
+            self.service.methods_by_name['SearchStream'], (), None
+        )
+        for i, name in enumerate(names):
+            val = np.ones(self.DIMS.get(name, 8))
+            rpc.send_request(
+                SearchStreamRequest(
+                    sequence_id=i,
+                    request=SearchRequest(
+                        query=Vector(val=val), k=10, index=name
+                    ),
+                )
+            )
+        rpc.requests_closed()
+        responses: Dict[int, SearchStreamResponse] = {}
+        for _ in names:
+            response = rpc.take_response()
+            responses[response.sequence_id] = response
+
+        _, code, _ = rpc.termination()
+
+        self.assertIs(code, grpc.StatusCode.OK)
+        self.assertEqual(len(responses[0].response.neighbors), 10)
+        self.assertEqual(len(responses[1].response.neighbors), 10)
+        self.assertEqual(responses[2].error, 'index unknown is not found')
+
+    def test_successful_Reload(self) -> None:
+        servicer = MultiIndexServicer(self.dir, FaissServiceConfig())
+        servicer.servicer('small')
+        self.write_index('added', 4)
+
+        ntotal = servicer.reload()
+
+        # only loaded indexes are reloaded, and added one is found
+        self.assertEqual(ntotal, self.DB_SIZE)
+        self.assertEqual(servicer.stats()['indexes_total'], 3)
+        self.assertEqual(servicer.servicer('added').index.d, 4)
+
+    def test_create_servicer(self) -> None:
+        servicer = create_servicer(
+            self.dir, ServerConfig(), FaissServiceConfig()
+        )
+        self.assertIsInstance(servicer, MultiIndexServicer)
+
+        servicer = create_servicer(
+            os.path.join(self.dir, 'small.faiss'),
+            ServerConfig(),
+            FaissServiceConfig(),
+        )
+        self.assertIsInstance(servicer, FaissServiceServicer)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,143 @@
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+from typing import Callable, Set
+
+import faiss
+import grpc
+import numpy as np
+from google.protobuf.empty_pb2 import Empty
+
+from faiss_grpc.faiss_server import FaissServiceConfig, ServerConfig
+from faiss_grpc.prefork import PreforkServer
+from faiss_grpc.proto import faiss_pb2_grpc
+from faiss_grpc.proto.faiss_pb2 import HeatbeatResponse, SearchRequest, Vector
+
+SERVE_SCRIPT = '''
+import sys
+from faiss_grpc.faiss_server import FaissServiceConfig, ServerConfig
+from faiss_grpc.prefork import PreforkServer
+
+PreforkServer(
+    sys.argv[1],
+    ServerConfig(port=int(sys.argv[2]), max_workers=2, processes=2),
+    FaissServiceConfig(),
+).serve()
+'''
+
+
+def children(pid: int) -> Set[int]:
+    with open(f'/proc/{pid}/task/{pid}/children') as f:
+        return {int(p) for p in f.read().split()}
+
+
+def wait_until(condition: Callable[[], bool], timeout: float = 30) -> None:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise TimeoutError('condition was not satisfied')
+        time.sleep(0.1)
+
+
+@unittest.skipUnless(
+    os.path.exists(f'/proc/{os.getpid()}/task/{os.getpid()}/children'),
+    'requires linux procfs',
+)
+class TestPreforkServer(unittest.TestCase):
+    DIM = 64
+    PORT = 50053
+
+    def setUp(self) -> None:
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        index_path = os.path.join(temp_dir.name, 'index.faiss')
+        np.random.seed(1234)
+        xb = np.random.random((10000, self.DIM)).astype('float32')
+        quantizer = faiss.IndexFlatL2(self.DIM)
+        index = faiss.IndexIVFFlat(quantizer, self.DIM, 10)
+        index.train(xb)
+        index.add(xb)
+        faiss.write_index(index, index_path)
+
+        self.process = subprocess.Popen(
+            [sys.executable, '-c', SERVE_SCRIPT, index_path, str(self.PORT)]
+        )
+        self.addCleanup(self.stop_server)
+        channel = grpc.insecure_channel(f'localhost:{self.PORT}')
+        self.addCleanup(channel.close)
+        grpc.channel_ready_future(channel).result(timeout=30)
+        self.stub = faiss_pb2_grpc.FaissServiceStub(channel)
+
+    def stop_server(self) -> None:
+        if self.process.poll() is None:
+            self.process.send_signal(signal.SIGTERM)
+            self.process.wait(timeout=30)
+
+    def test_serve_by_workers(self) -> None:
+        wait_until(lambda: len(children(self.process.pid)) == 2)
+
+        response = self.stub.Heatbeat(Empty())
+        self.assertEqual(response, HeatbeatResponse(message='OK'))
+        query = Vector(val=np.ones(self.DIM, dtype=np.float32))
+        response = self.stub.Search(SearchRequest(query=query, k=10))
+        self.assertEqual(len(response.neighbors), 10)
+
+    def test_restart_crashed_worker(self) -> None:
+        wait_until(lambda: len(children(self.process.pid)) == 2)
+        workers = children(self.process.pid)
+        crashed = workers.pop()
+
+        os.kill(crashed, signal.SIGKILL)
+
+        wait_until(
+            lambda: len(children(self.process.pid)) == 2
+            and crashed not in children(self.process.pid)
+        )
+        self.assertTrue(workers <= children(self.process.pid))
+
+    def test_reload_workers_by_sighup(self) -> None:
+        wait_until(lambda: len(children(self.process.pid)) == 2)
+        workers = children(self.process.pid)
+
+        self.process.send_signal(signal.SIGHUP)
+
+        query = Vector(val=np.ones(self.DIM, dtype=np.float32))
+        for _ in range(10):
+            response = self.stub.Search(SearchRequest(query=query, k=10))
+            self.assertEqual(len(response.neighbors), 10)
+        self.assertIsNone(self.process.poll())
+        self.assertEqual(children(self.process.pid), workers)
+
+    def test_stop_workers_by_sigterm(self) -> None:
+        wait_until(lambda: len(children(self.process.pid)) == 2)
+
+        self.process.send_signal(signal.SIGTERM)
+
+        self.assertEqual(self.process.wait(timeout=30), 0)
+
+
+class TestWorkerConfig(unittest.TestCase):
+    def test_metrics_port_of_workers(self) -> None:
+        server = PreforkServer(
+            'index.faiss',
+            ServerConfig(processes=2, metrics_port=9100),
+            FaissServiceConfig(),
+        )
+
+        self.assertEqual(server.worker_config(0).metrics_port, 9100)
+        self.assertEqual(server.worker_config(1).metrics_port, 9101)
+        self.assertEqual(server.worker_config(1).port, 50051)
+
+    def test_metrics_disabled(self) -> None:
+        config = ServerConfig(processes=2)
+        server = PreforkServer('index.faiss', config, FaissServiceConfig())
+
+        self.assertIs(server.worker_config(1), config)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,249 @@
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+from typing import Callable, Dict, List, Optional
+
+from faiss_grpc.registry import (
+    IndexEntry,
+    IndexRegistry,
+    discover_indexes,
+    is_index_catalog,
+)
+
+
+def wait_until(condition: Callable[[], bool], timeout: float = 10) -> None:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise TimeoutError('condition was not satisfied')
+        time.sleep(0.01)
+
+
+class TestDiscovery(unittest.TestCase):
+    def setUp(self) -> None:
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.dir = temp_dir.name
+
+    def write(self, filename: str, content: str = '') -> str:
+        path = os.path.join(self.dir, filename)
+        with open(path, 'w') as f:
+            f.write(content)
+        return path
+
+    def test_is_index_catalog(self) -> None:
+        self.assertTrue(is_index_catalog(self.dir))
+        self.assertTrue(is_index_catalog(self.write('indexes.json')))
+        self.assertFalse(is_index_catalog(self.write('index.faiss')))
+
+    def test_scan_directory(self) -> None:
+        self.write('a.faiss')
+        self.write('b.index')
+        self.write('c.txt')
+
+        entries = discover_indexes(self.dir)
+
+        self.assertEqual(
+            entries,
+            {
+                'a': IndexEntry('a', os.path.join(self.dir, 'a.faiss')),
+                'b': IndexEntry('b', os.path.join(self.dir, 'b.index')),
+            },
+        )
+
+    def test_read_manifest(self) -> None:
+        path = self.write(
+            'indexes.json',
+            json.dumps(
+                {
+                    'a': 'a.faiss',
+                    'b': {
+                        'path': '/data/b.faiss',
+                        'config': {'nprobe': 32, 'cache_size': 100},
+                    },
+                }
+            ),
+        )
+
+        entries = discover_indexes(path)
+
+        self.assertEqual(
+            entries,
+            {
+                'a': IndexEntry('a', os.path.join(self.dir, 'a.faiss')),
+                'b': IndexEntry(
+                    'b',
+                    '/data/b.faiss',
+                    (('cache_size', 100), ('nprobe', 32)),
+                ),
+            },
+        )
+
+    def test_failed_illegal_manifest(self) -> None:
+        for manifest in [[], {'a': {'config': {}}}, {'a': 1}]:
+            path = self.write('indexes.json', json.dumps(manifest))
+            with self.assertRaises(ValueError):
+                discover_indexes(path)
+
+
+class TestIndexRegistry(unittest.TestCase):
+    def setUp(self) -> None:
+        self.entries = {
+            name: IndexEntry(name, f'{name}.faiss') for name in 'abc'
+        }
+        self.sizes = {'a': 40, 'b': 50, 'c': 60}
+        self.loaded: List[str] = []
+        self.unloaded: List[str] = []
+        # loads wait for these events if they are set for the index
+        self.loading: Dict[str, threading.Event] = {}
+
+    def registry(
+        self, memory_budget: Optional[int] = None
+    ) -> IndexRegistry[str]:
+        def load(entry: IndexEntry) -> str:
+            if entry.name in self.loading:
+                self.loading[entry.name].wait(10)
+            self.loaded.append(entry.name)
+            return entry.name
+
+        return IndexRegistry(
+            self.entries,
+            load,
+            lambda entry, value: self.sizes[value],
+            memory_budget,
+            self.unloaded.append,
+            lambda entry: self.sizes[entry.name],
+        )
+
+    def test_get(self) -> None:
+        registry = self.registry()
+
+        self.assertEqual(registry.get('a'), 'a')
+        self.assertEqual(registry.get('a'), 'a')
+        self.assertEqual(registry.get('b'), 'b')
+
+        # each index is loaded once on its first use
+        self.assertEqual(self.loaded, ['a', 'b'])
+        self.assertEqual(registry.memory_bytes, 90)
+
+    def test_failed_unknown_get(self) -> None:
+        registry = self.registry()
+
+        with self.assertRaises(KeyError):
+            registry.get('d')
+
+    def test_evict_least_recently_used(self) -> None:
+        registry = self.registry(memory_budget=100)
+        registry.get('a')
+        registry.get('b')
+        registry.get('a')
+
+        registry.get('c')
+
+        # b was used before a, and a and c fit in budget
+        self.assertEqual(self.unloaded, ['b'])
+        self.assertEqual([name for name, _ in registry.items()], ['a', 'c'])
+        self.assertEqual(registry.evictions, 1)
+
+    def test_evict_before_load(self) -> None:
+        registry = self.registry(memory_budget=120)
+        registry.get('a')
+        registry.get('b')
+        self.loading['c'] = threading.Event()
+        loader = threading.Thread(target=registry.get, args=('c',))
+        loader.start()
+        self.addCleanup(loader.join)
+
+        # room of c is made before it is loaded
+        wait_until(lambda: bool(self.unloaded))
+        self.assertEqual(self.unloaded, ['a'])
+        self.assertEqual(self.loaded, ['a', 'b'])
+        self.loading['c'].set()
+        loader.join()
+        self.assertEqual([name for name, _ in registry.items()], ['b', 'c'])
+
+    def test_load_concurrently(self) -> None:
+        registry = self.registry()
+        self.loading['a'] = threading.Event()
+        loaders = [
+            threading.Thread(target=registry.get, args=('a',))
+            for _ in range(2)
+        ]
+        for loader in loaders:
+            loader.start()
+            self.addCleanup(loader.join)
+
+        # another index is loaded while a is being loaded
+        self.assertEqual(registry.get('b'), 'b')
+        self.loading['a'].set()
+        for loader in loaders:
+            loader.join()
+        self.assertEqual(self.loaded, ['b', 'a'])
+
+    def test_keep_index_over_budget(self) -> None:
+        registry = self.registry(memory_budget=10)
+        registry.get('a')
+
+        registry.get('b')
+
+        self.assertEqual(self.unloaded, ['a'])
+        self.assertEqual([name for name, _ in registry.items()], ['b'])
+
+    def test_resize(self) -> None:
+        registry = self.registry(memory_budget=100)
+        registry.get('a')
+        registry.get('b')
+
+        registry.resize('b', 70)
+
+        self.assertEqual(self.unloaded, ['a'])
+        self.assertEqual(registry.memory_bytes, 70)
+
+    def test_update(self) -> None:
+        registry = self.registry()
+        registry.get('a')
+        registry.get('b')
+        entries: Dict[str, IndexEntry] = {
+            'a': self.entries['a'],
+            'b': IndexEntry('b', 'b.faiss', (('nprobe', 10),)),
+            'd': IndexEntry('d', 'd.faiss'),
+        }
+
+        registry.update(entries)
+
+        # b was changed, and is loaded from new entry on next use
+        self.assertEqual(self.unloaded, ['b'])
+        self.assertEqual([name for name, _ in registry.items()], ['a'])
+        registry.get('b')
+        self.assertEqual(self.loaded, ['a', 'b', 'b'])
+        with self.assertRaises(KeyError):
+            registry.get('c')
+
+    def test_stats(self) -> None:
+        registry = self.registry(memory_budget=100)
+        registry.get('a')
+        registry.get('b')
+        registry.get('c')
+
+        self.assertEqual(
+            registry.stats(),
+            {
+                'indexes_total': 3,
+                'indexes_loaded': 1,
+                'index_memory_bytes': 60,
+                'index_loads': 3,
+                'index_evictions': 2,
+                'index_memory_budget_bytes': 100,
+            },
+        )
+
+    def test_failed_illegal_memory_budget(self) -> None:
+        with self.assertRaises(ValueError):
+            self.registry(memory_budget=0)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
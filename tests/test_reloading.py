@@ -0,0 +1,86 @@
+import os
+import tempfile
+import threading
+import unittest
+
+from faiss_grpc.reloading import IndexFileWatcher, reload_in_background
+
+
+class TestIndexFileWatcher(unittest.TestCase):
+    INTERVAL = 0.05
+
+    def setUp(self) -> None:
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.temp_dir = temp_dir.name
+        self.index_path = os.path.join(self.temp_dir, 'index.faiss')
+        self.write(self.index_path, b'index')
+
+        self.reloaded = threading.Event()
+        self.watcher = IndexFileWatcher(
+            self.index_path, self.INTERVAL, self.reloaded.set
+        )
+        self.watcher.start()
+        self.addCleanup(self.watcher.close)
+
+    @staticmethod
+    def write(path: str, data: bytes) -> None:
+        with open(path, 'wb') as f:
+            f.write(data)
+
+    def test_reload_replaced_file(self) -> None:
+        new_path = os.path.join(self.temp_dir, 'new.faiss')
+        self.write(new_path, b'new index')
+        os.replace(new_path, self.index_path)
+
+        self.assertTrue(self.reloaded.wait(timeout=10))
+
+    def test_not_reload_unchanged_file(self) -> None:
+        self.assertFalse(self.reloaded.wait(timeout=self.INTERVAL * 5))
+
+    def test_not_reload_removed_file(self) -> None:
+        os.remove(self.index_path)
+
+        self.assertFalse(self.reloaded.wait(timeout=self.INTERVAL * 5))
+
+    def test_reload_changed_shard(self) -> None:
+        shard_path = os.path.join(self.temp_dir, 'shard.faiss')
+        self.write(shard_path, b'shard')
+        reloaded = threading.Event()
+        watcher = IndexFileWatcher(
+            f'{self.index_path},{shard_path}', self.INTERVAL, reloaded.set
+        )
+        watcher.start()
+        self.addCleanup(watcher.close)
+
+        # state is taken by the first check, before shard is changed
+        self.assertFalse(reloaded.wait(timeout=self.INTERVAL * 3))
+        self.write(shard_path, b'changed shard')
+
+        self.assertTrue(reloaded.wait(timeout=10))
+
+    def test_failed_illegal_interval(self) -> None:
+        with self.assertRaises(ValueError):
+            IndexFileWatcher(self.index_path, 0, self.reloaded.set)
+
+
+class TestReloadInBackground(unittest.TestCase):
+    def test_log_failure(self) -> None:
+        done = threading.Event()
+
+        def reload() -> None:
+            done.set()
+            raise RuntimeError('broken index')
+
+        with self.assertLogs('faiss_grpc.reloading', 'ERROR') as cm:
+            reload_in_background(reload)
+            self.assertTrue(done.wait(timeout=10))
+            for thread in threading.enumerate():
+                if thread.name == 'faiss-grpc-reload':
+                    thread.join()
+
+        self.assertRegex(cm.output[0], 'failed to reload index')
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
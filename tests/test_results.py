@@ -0,0 +1,144 @@
+import unittest
+
+import faiss
+import numpy as np
+
+from faiss_grpc.results import (
+    is_similarity,
+    merge_range_results,
+    merge_topk,
+    sort_range_result,
+    split_range_result,
+)
+
+
+class TestResults(unittest.TestCase):
+    def setUp(self) -> None:
+        # 3 queries with 3, 0 and 2 neighbors in arbitrary order
+        self.lims = np.array([0, 3, 3, 5], dtype=np.uint64)
+        self.distances = np.array([0.3, 0.1, 0.2, 0.5, 0.4], dtype=np.float32)
+        self.ids = np.array([3, 1, 2, 5, 4], dtype=np.int64)
+
+    def test_is_similarity(self) -> None:
+        self.assertFalse(is_similarity(faiss.IndexFlatL2(4)))
+        self.assertTrue(is_similarity(faiss.IndexFlatIP(4)))
+
+    def test_sort_range_result(self) -> None:
+        lims, distances, ids = sort_range_result(
+            self.lims, self.distances, self.ids, False
+        )
+
+        np.testing.assert_array_equal(lims, [0, 3, 3, 5])
+        np.testing.assert_allclose(distances, [0.1, 0.2, 0.3, 0.4, 0.5])
+        np.testing.assert_array_equal(ids, [1, 2, 3, 4, 5])
+
+    def test_sort_descending_range_result(self) -> None:
+        lims, distances, ids = sort_range_result(
+            self.lims, self.distances, self.ids, True
+        )
+
+        np.testing.assert_array_equal(lims, [0, 3, 3, 5])
+        np.testing.assert_allclose(distances, [0.3, 0.2, 0.1, 0.5, 0.4])
+        np.testing.assert_array_equal(ids, [3, 2, 1, 5, 4])
+
+    def test_sort_max_results_range_result(self) -> None:
+        lims, distances, ids = sort_range_result(
+            self.lims, self.distances, self.ids, False, 1
+        )
+
+        np.testing.assert_array_equal(lims, [0, 1, 1, 2])
+        np.testing.assert_allclose(distances, [0.1, 0.4])
+        np.testing.assert_array_equal(ids, [1, 4])
+
+    def test_sort_empty_range_result(self) -> None:
+        lims, distances, ids = sort_range_result(
+            np.zeros(3, dtype=np.uint64),
+            np.empty(0, dtype=np.float32),
+            np.empty(0, dtype=np.int64),
+            False,
+            10,
+        )
+
+        np.testing.assert_array_equal(lims, [0, 0, 0])
+        self.assertEqual(distances.size, 0)
+        self.assertEqual(ids.size, 0)
+
+    def test_split_range_result(self) -> None:
+        results = split_range_result(self.lims, self.distances, self.ids)
+
+        self.assertEqual(len(results), 3)
+        np.testing.assert_array_equal(results[0][1], [3, 1, 2])
+        self.assertEqual(results[1][1].size, 0)
+        np.testing.assert_allclose(results[2][0], [0.5, 0.4])
+
+    def test_split_single_query_range_result(self) -> None:
+        results = split_range_result(
+            np.array([0, 5]), self.distances, self.ids
+        )
+
+        self.assertEqual(len(results), 1)
+        np.testing.assert_array_equal(results[0][1], self.ids)
+
+    def test_merge_topk(self) -> None:
+        distances, ids = merge_topk(
+            [
+                np.array([[0.1, 0.4], [0.2, 0.3]], dtype=np.float32),
+                np.array([[0.2, 0.3], [0.5, 0.0]], dtype=np.float32),
+            ],
+            [np.array([[1, 4], [2, 3]]), np.array([[12, 13], [15, -1]])],
+            3,
+            False,
+        )
+
+        # missing result is not selected even though its distance is smaller
+        np.testing.assert_allclose(
+            distances, [[0.1, 0.2, 0.3], [0.2, 0.3, 0.5]]
+        )
+        np.testing.assert_array_equal(ids, [[1, 12, 13], [2, 3, 15]])
+
+    def test_merge_descending_topk(self) -> None:
+        distances, ids = merge_topk(
+            [
+                np.array([[0.9, 0.5]], dtype=np.float32),
+                np.array([[0.7, 0.6]], dtype=np.float32),
+            ],
+            [np.array([[1, 2]]), np.array([[11, 12]])],
+            2,
+            True,
+        )
+
+        np.testing.assert_allclose(distances, [[0.9, 0.7]])
+        np.testing.assert_array_equal(ids, [[1, 11]])
+
+    def test_merge_insufficient_topk(self) -> None:
+        distances, ids = merge_topk(
+            [np.array([[0.2]], dtype=np.float32)] * 2,
+            [np.array([[-1]]), np.array([[5]])],
+            4,
+            False,
+        )
+
+        # k larger than results of all parts keeps missing ones at the end
+        np.testing.assert_array_equal(ids, [[5, -1]])
+
+    def test_merge_range_results(self) -> None:
+        lims, distances, ids = merge_range_results(
+            [
+                (self.lims, self.distances, self.ids),
+                (
+                    np.array([0, 1, 2, 2], dtype=np.uint64),
+                    np.array([0.6, 0.7], dtype=np.float32),
+                    np.array([16, 17]),
+                ),
+            ]
+        )
+
+        np.testing.assert_array_equal(lims, [0, 4, 5, 7])
+        np.testing.assert_allclose(
+            distances, [0.3, 0.1, 0.2, 0.6, 0.7, 0.5, 0.4]
+        )
+        np.testing.assert_array_equal(ids, [3, 1, 2, 16, 17, 5, 4])
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
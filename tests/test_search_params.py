@@ -0,0 +1,133 @@
+import unittest
+
+import faiss
+import numpy as np
+
+from faiss_grpc.proto.faiss_pb2 import SearchParameters
+from faiss_grpc.search_params import (
+    SearchOptions,
+    parse_search_options,
+    set_nprobe,
+    to_search_parameters,
+)
+
+
+class TestParseSearchOptions(unittest.TestCase):
+    def test_parse(self) -> None:
+        options = parse_search_options(SearchParameters(nprobe=8))
+        self.assertEqual(options, SearchOptions(nprobe=8))
+
+    def test_parse_parameter_string(self) -> None:
+        options = parse_search_options(
+            SearchParameters(parameters='nprobe=8, efSearch=64')
+        )
+        self.assertEqual(options, SearchOptions(nprobe=8, ef_search=64))
+
+    def test_fields_take_precedence(self) -> None:
+        options = parse_search_options(
+            SearchParameters(ef_search=32, parameters='efSearch=64')
+        )
+        self.assertEqual(options, SearchOptions(ef_search=32))
+
+    def test_parse_empty(self) -> None:
+        self.assertIsNone(parse_search_options(SearchParameters()))
+
+    def test_clamp(self) -> None:
+        options = parse_search_options(
+            SearchParameters(nprobe=1000, ef_search=16),
+            max_nprobe=64,
+            max_ef_search=128,
+        )
+        self.assertEqual(options, SearchOptions(nprobe=64, ef_search=16))
+
+    def test_failed_unknown_parameter(self) -> None:
+        with self.assertRaisesRegex(ValueError, 'unknown search parameter'):
+            parse_search_options(SearchParameters(parameters='k_factor=4'))
+
+    def test_failed_illegal_value(self) -> None:
+        for parameters in ['nprobe=0', 'nprobe=-1', 'nprobe=a', 'nprobe']:
+            with self.assertRaisesRegex(ValueError, 'positive integer'):
+                parse_search_options(SearchParameters(parameters=parameters))
+
+
+class TestToSearchParameters(unittest.TestCase):
+    DIM = 16
+
+    def setUp(self) -> None:
+        np.random.seed(1234)
+        self.xb = np.random.random((2000, self.DIM)).astype('float32')
+
+    def test_ivf(self) -> None:
+        index = faiss.index_factory(self.DIM, 'IVF32,Flat')
+        index.train(self.xb)
+        index.add(self.xb)
+
+        params = to_search_parameters(index, SearchOptions(nprobe=32))
+        _, ids = index.search(self.xb[:10], 10, params=params)
+
+        index.nprobe = 32
+        _, expected = index.search(self.xb[:10], 10)
+        np.testing.assert_array_equal(ids, expected)
+
+    def test_ivf_hnsw_quantizer(self) -> None:
+        index = faiss.index_factory(self.DIM, 'IVF32_HNSW8,Flat')
+        index.train(self.xb)
+        index.nprobe = 4
+
+        params = to_search_parameters(index, SearchOptions(ef_search=40))
+
+        # nprobe of index is kept if it is not given
+        self.assertEqual(params.nprobe, 4)
+        (quantizer_params,) = params.referenced_objects
+        self.assertEqual(quantizer_params.efSearch, 40)
+        index.add(self.xb)
+        index.search(self.xb[:10], 10, params=params)
+
+    def test_hnsw(self) -> None:
+        index = faiss.IndexHNSWFlat(self.DIM, 8)
+        index.add(self.xb)
+        index.hnsw.efSearch = 24
+
+        params = to_search_parameters(index, SearchOptions(ef_search=100))
+        self.assertEqual(params.efSearch, 100)
+        index.search(self.xb[:10], 10, params=params)
+        # index attribute is not changed
+        self.assertEqual(index.hnsw.efSearch, 24)
+
+    def test_pre_transform(self) -> None:
+        index = faiss.index_factory(self.DIM, 'PCA8,IVF32,Flat')
+        index.train(self.xb)
+        index.add(self.xb)
+
+        params = to_search_parameters(index, SearchOptions(nprobe=8))
+
+        self.assertIsInstance(params, faiss.SearchParametersPreTransform)
+        (index_params,) = params.referenced_objects
+        self.assertEqual(index_params.nprobe, 8)
+        index.search(self.xb[:10], 10, params=params)
+
+    def test_set_nprobe(self) -> None:
+        index = faiss.index_factory(self.DIM, 'PCA8,IVF32,Flat')
+
+        self.assertTrue(set_nprobe(index, 8))
+        self.assertEqual(faiss.extract_index_ivf(index).nprobe, 8)
+        # flat and HNSW index do not have nprobe
+        self.assertFalse(set_nprobe(faiss.IndexFlatL2(self.DIM), 8))
+        self.assertFalse(set_nprobe(faiss.IndexHNSWFlat(self.DIM, 8), 8))
+
+    def test_failed_not_supported(self) -> None:
+        hnsw = faiss.IndexHNSWFlat(self.DIM, 8)
+        for index, options in [
+            (faiss.IndexFlatL2(self.DIM), SearchOptions(nprobe=8)),
+            (hnsw, SearchOptions(nprobe=8)),
+            (
+                faiss.index_factory(self.DIM, 'IVF32,Flat'),
+                SearchOptions(ef_search=8),
+            ),
+        ]:
+            with self.assertRaisesRegex(ValueError, 'not supported by'):
+                to_search_parameters(index, options)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
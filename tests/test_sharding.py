@@ -0,0 +1,142 @@
+import unittest
+
+import faiss
+import numpy as np
+
+from faiss_grpc.index_io import make_direct_map
+from faiss_grpc.sharding import ShardedIndex
+
+
+class TestShardedIndex(unittest.TestCase):
+    DIM = 16
+    DB_SIZE = 1000
+    SHARDS = 3
+
+    def setUp(self) -> None:
+        np.random.seed(1234)
+        self.xb = np.random.random((self.DB_SIZE, self.DIM)).astype('float32')
+        self.xq = np.random.random((5, self.DIM)).astype('float32')
+
+    def split(self, metric: int = faiss.METRIC_L2) -> ShardedIndex:
+        # vectors are split in order, so that ids of shards are successive
+        shards = []
+        for xb in np.array_split(self.xb, self.SHARDS):
+            shard = faiss.IndexFlat(self.DIM, metric)
+            shard.add(xb)
+            shards.append(shard)
+        return ShardedIndex(shards)
+
+    def flat(self, metric: int = faiss.METRIC_L2) -> faiss.Index:
+        index = faiss.IndexFlat(self.DIM, metric)
+        index.add(self.xb)
+        return index
+
+    def test_search(self) -> None:
+        index = self.split()
+
+        distances, ids = index.search(self.xq, 10)
+
+        expected_distances, expected_ids = self.flat().search(self.xq, 10)
+        self.assertEqual(index.ntotal, self.DB_SIZE)
+        np.testing.assert_array_equal(ids, expected_ids)
+        np.testing.assert_allclose(distances, expected_distances, rtol=1e-5)
+
+    def test_search_after_close(self) -> None:
+        index = self.split()
+        index.close()
+
+        # search which got the index before it was released still runs
+        _, ids = index.search(self.xq, 10)
+
+        _, expected_ids = self.flat().search(self.xq, 10)
+        np.testing.assert_array_equal(ids, expected_ids)
+
+    def test_inner_product_search(self) -> None:
+        distances, ids = self.split(faiss.METRIC_INNER_PRODUCT).search(
+            self.xq, 10
+        )
+
+        expected_distances, expected_ids = self.flat(
+            faiss.METRIC_INNER_PRODUCT
+        ).search(self.xq, 10)
+        np.testing.assert_array_equal(ids, expected_ids)
+        np.testing.assert_allclose(distances, expected_distances, rtol=1e-5)
+
+    def test_search_more_than_shard(self) -> None:
+        distances, ids = self.split().search(self.xq[:1], self.DB_SIZE + 5)
+
+        self.assertEqual(ids.shape, (1, self.DB_SIZE + 5))
+        self.assertEqual(sorted(ids[0, : self.DB_SIZE]), list(range(1000)))
+        np.testing.assert_array_equal(ids[0, self.DB_SIZE :], [-1] * 5)
+
+    def test_search_params(self) -> None:
+        quantizer = faiss.IndexFlatL2(self.DIM)
+        ivf = faiss.IndexIVFFlat(quantizer, self.DIM, 8)
+        ivf.train(self.xb)
+        shards = [faiss.clone_index(ivf) for _ in range(2)]
+        shards[0].add(self.xb[:500])
+        shards[1].add(self.xb[500:])
+        index = ShardedIndex(shards)
+
+        params = faiss.SearchParametersIVF()
+        params.nprobe = 8
+        _, ids = index.search(self.xq, 10, params=params)
+
+        # exhaustive nprobe finds the same neighbors as flat index
+        _, expected_ids = self.flat().search(self.xq, 10)
+        np.testing.assert_array_equal(ids, expected_ids)
+        index.nprobe = 4
+        self.assertEqual([shard.nprobe for shard in shards], [4, 4])
+
+    def test_range_search(self) -> None:
+        lims, distances, ids = self.split().range_search(self.xq, 1.5)
+
+        expected_lims, _, expected_ids = self.flat().range_search(self.xq, 1.5)
+        np.testing.assert_array_equal(lims, expected_lims)
+        for i in range(len(self.xq)):
+            self.assertEqual(
+                sorted(ids[lims[i] : lims[i + 1]]),
+                sorted(expected_ids[expected_lims[i] : expected_lims[i + 1]]),
+            )
+
+    def test_reconstruct(self) -> None:
+        index = self.split()
+
+        np.testing.assert_array_equal(index.reconstruct(500), self.xb[500])
+        np.testing.assert_array_equal(
+            index.reconstruct_batch(np.array([999, 0, 334])),
+            self.xb[[999, 0, 334]],
+        )
+        with self.assertRaises(RuntimeError):
+            index.reconstruct(self.DB_SIZE)
+
+    def test_global_ids(self) -> None:
+        # shards built by add_with_ids keep their ids
+        shards = []
+        for i, xb in enumerate(np.array_split(self.xb, 2)):
+            ivf = faiss.IndexIVFFlat(faiss.IndexFlatL2(self.DIM), self.DIM, 4)
+            ivf.train(self.xb)
+            ivf.add_with_ids(xb, np.arange(len(xb)) * 2 + i)
+            make_direct_map(ivf)
+            ivf.nprobe = 4
+            shards.append(ivf)
+        index = ShardedIndex(shards, successive_ids=False)
+
+        _, ids = index.search(self.xb[[3]], 1)
+
+        self.assertEqual(ids[0, 0], 6)
+        np.testing.assert_array_equal(index.reconstruct(501), self.xb[750])
+        with self.assertRaises(RuntimeError):
+            index.reconstruct(self.DB_SIZE + 1)
+
+    def test_failed_mismatched_shards(self) -> None:
+        with self.assertRaises(ValueError):
+            ShardedIndex([faiss.IndexFlatL2(4), faiss.IndexFlatL2(8)])
+        with self.assertRaises(ValueError):
+            ShardedIndex([faiss.IndexFlatL2(4), faiss.IndexFlatIP(4)])
+        with self.assertRaises(ValueError):
+            ShardedIndex([])
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
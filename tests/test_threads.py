@@ -0,0 +1,170 @@
+import threading
+import unittest
+
+import faiss
+
+from faiss_grpc.threads import ReadWriteLock, ThreadPolicy
+
+
+class TestThreadPolicy(unittest.TestCase):
+    def setUp(self) -> None:
+        default_threads = faiss.omp_get_max_threads()
+        self.addCleanup(faiss.omp_set_num_threads, default_threads)
+
+    def test_search_threads(self) -> None:
+        policy = ThreadPolicy(search_threads=3)
+
+        with policy.limit(1) as threads:
+            self.assertEqual(threads, 3)
+            self.assertEqual(faiss.omp_get_max_threads(), 3)
+            self.assertEqual(policy.stats()['searches_running'], 1)
+            self.assertEqual(policy.stats()['search_threads_running'], 3)
+
+        self.assertEqual(policy.stats()['searches_running'], 0)
+        self.assertEqual(policy.stats()['search_threads_running'], 0)
+
+    def test_share_batch_search_threads(self) -> None:
+        policy = ThreadPolicy(search_threads=1, batch_search_threads=16)
+
+        with policy.limit(8) as first:
+            with policy.limit(100) as second:
+                self.assertEqual(faiss.omp_get_max_threads(), second)
+                self.assertEqual(
+                    policy.stats()['batch_search_threads_available'], 0
+                )
+                self.assertEqual(policy.stats()['search_threads_running'], 16)
+            self.assertEqual(faiss.omp_get_max_threads(), second)
+
+        # first batch gets a thread per query, and second the rest
+        self.assertEqual(first, 8)
+        self.assertEqual(second, 8)
+        self.assertEqual(policy.stats()['batch_search_threads_available'], 16)
+        with policy.limit(100) as threads:
+            self.assertEqual(threads, 16)
+
+    def test_split_batch_search_threads(self) -> None:
+        policy = ThreadPolicy(batch_search_threads=16)
+
+        with policy.limit(4) as first:
+            with policy.limit(100) as second:
+                with policy.limit(100) as third:
+                    self.assertEqual(
+                        policy.stats()['search_threads_running'], 16
+                    )
+
+        # second batch gets half of the budget while first is running,
+        # and third the rest
+        self.assertEqual((first, second, third), (4, 8, 4))
+
+    def test_wait_batch_search_threads(self) -> None:
+        policy = ThreadPolicy(batch_search_threads=4)
+        threads = []
+
+        def search() -> None:
+            with policy.limit(8) as second:
+                threads.append(second)
+                self.assertLessEqual(
+                    policy.stats()['search_threads_running'], 4
+                )
+
+        with policy.limit(8) as first:
+            thread = threading.Thread(target=search)
+            thread.start()
+            thread.join(0.05)
+            # budget is used up, so second batch waits for first
+            self.assertEqual(threads, [])
+            self.assertEqual(policy.stats()['batch_searches_waiting'], 1)
+        thread.join()
+
+        self.assertEqual(first, 4)
+        self.assertEqual(threads, [4])
+        self.assertEqual(policy.stats()['batch_searches_waiting'], 0)
+
+    def test_reset_threads_of_each_search(self) -> None:
+        policy = ThreadPolicy(search_threads=1, batch_search_threads=2)
+
+        with policy.limit(8):
+            pass
+        with policy.limit(1):
+            # setting of previous batch on the same thread is not kept
+            self.assertEqual(faiss.omp_get_max_threads(), 1)
+
+    def test_threads_of_other_thread(self) -> None:
+        policy = ThreadPolicy(search_threads=2)
+        threads = []
+
+        def search() -> None:
+            with policy.limit(1):
+                threads.append(faiss.omp_get_max_threads())
+
+        thread = threading.Thread(target=search)
+        thread.start()
+        thread.join()
+
+        self.assertEqual(threads, [2])
+
+    def test_disabled(self) -> None:
+        policy = ThreadPolicy()
+        faiss.omp_set_num_threads(2)
+
+        with policy.limit(1) as threads:
+            self.assertEqual(threads, policy.default_threads)
+            # faiss setting is left as it is
+            self.assertEqual(faiss.omp_get_max_threads(), 2)
+
+        self.assertFalse(policy.enabled)
+
+    def test_failed_illegal_threads(self) -> None:
+        with self.assertRaises(ValueError):
+            ThreadPolicy(search_threads=0)
+        with self.assertRaises(ValueError):
+            ThreadPolicy(batch_search_threads=0)
+
+
+class TestReadWriteLock(unittest.TestCase):
+    def test_writer_waits_readers(self) -> None:
+        lock = ReadWriteLock()
+        events = []
+
+        def write() -> None:
+            with lock.write():
+                events.append('write')
+
+        with lock.read(), lock.read():
+            writer = threading.Thread(target=write)
+            writer.start()
+            writer.join(0.05)
+            events.append('read')
+        writer.join()
+
+        self.assertEqual(events, ['read', 'write'])
+
+    def test_waiting_writer_blocks_readers(self) -> None:
+        lock = ReadWriteLock()
+        events = []
+
+        def write() -> None:
+            with lock.write():
+                events.append('write')
+
+        def read() -> None:
+            with lock.read():
+                events.append('read')
+
+        with lock.read():
+            writer = threading.Thread(target=write)
+            writer.start()
+            writer.join(0.05)
+            # reader arriving after writer is not run before it
+            reader = threading.Thread(target=read)
+            reader.start()
+            reader.join(0.05)
+            self.assertEqual(events, [])
+        writer.join()
+        reader.join()
+
+        self.assertEqual(events, ['write', 'read'])
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
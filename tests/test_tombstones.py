@@ -0,0 +1,159 @@
+import unittest
+from unittest import mock
+
+import faiss
+import numpy as np
+
+from faiss_grpc.search_params import SearchOptions, to_search_parameters
+from faiss_grpc.tombstones import (
+    Tombstones,
+    can_remove,
+    removable_copy,
+    remove_from_index,
+    supports_selector,
+)
+
+
+class TestTombstones(unittest.TestCase):
+    DIM = 8
+    DB_SIZE = 100
+
+    def setUp(self) -> None:
+        np.random.seed(1234)
+        self.xb = np.random.random((self.DB_SIZE, self.DIM)).astype('float32')
+
+    def search(
+        self, index: faiss.Index, tombstones: Tombstones, k: int
+    ) -> np.ndarray:
+        params = to_search_parameters(
+            index, SearchOptions(), tombstones.selector
+        )
+        return index.search(self.xb[:2], k, params=params)[1]
+
+    def test_bitmap_selector(self) -> None:
+        index = faiss.IndexFlatL2(self.DIM)
+        index.add(self.xb)
+        _, expected = index.search(self.xb[:2], 10)
+        removed = expected[:, :3].ravel()
+
+        ids = self.search(index, Tombstones(removed), 5)
+
+        self.assertFalse(np.isin(ids, removed).any())
+        np.testing.assert_array_equal(ids[0], expected[0, 3:8])
+
+    def test_batch_selector(self) -> None:
+        quantizer = faiss.IndexFlatL2(self.DIM)
+        index = faiss.IndexIVFFlat(quantizer, self.DIM, 2)
+        index.train(self.xb)
+        index.nprobe = 2
+        index.add_with_ids(self.xb, np.arange(self.DB_SIZE) + 1000)
+        _, expected = index.search(self.xb[:2], 10)
+        removed = expected[:, :3].ravel()
+
+        ids = self.search(index, Tombstones(removed, dense=False), 5)
+
+        self.assertFalse(np.isin(ids, removed).any())
+        np.testing.assert_array_equal(ids[0], expected[0, 3:8])
+
+    def test_mask(self) -> None:
+        tombstones = Tombstones([1, 3], selectable=False)
+        distances = np.array([[0.1, 0.2, 0.3, 0.4], [0.1, 0.2, 0.3, 0.4]])
+        ids = np.array([[0, 1, 2, 3], [1, 3, 4, -1]])
+
+        distances, ids = tombstones.mask(distances, ids, 3, False)
+
+        # missing results are padded like faiss
+        np.testing.assert_array_equal(ids, [[0, 2, -1], [4, -1, -1]])
+        np.testing.assert_allclose(distances[0, :2], [0.1, 0.3])
+        self.assertEqual(distances[1, 2], np.finfo(np.float32).max)
+        self.assertIsNone(tombstones.selector)
+
+    def test_mask_range(self) -> None:
+        tombstones = Tombstones([1, 3])
+
+        lims, distances, ids = tombstones.mask_range(
+            np.array([0, 3, 4]),
+            np.array([0.1, 0.2, 0.3, 0.4]),
+            np.array([0, 1, 2, 3]),
+        )
+
+        np.testing.assert_array_equal(lims, [0, 2, 2])
+        np.testing.assert_array_equal(ids, [0, 2])
+        np.testing.assert_allclose(distances, [0.1, 0.3])
+
+    def test_add_and_discard(self) -> None:
+        tombstones = Tombstones([5, 1])
+
+        added = tombstones.add(np.array([3, 5]))
+        discarded = added.discard(np.array([1]))
+
+        self.assertEqual(tombstones.ids.tolist(), [1, 5])
+        self.assertEqual(added.ids.tolist(), [1, 3, 5])
+        self.assertEqual(discarded.ids.tolist(), [3, 5])
+        self.assertIn(3, discarded)
+        self.assertNotIn(1, discarded)
+        self.assertNotIn(2**64 - 1, discarded)
+
+    def test_supports_selector(self) -> None:
+        flat = faiss.IndexFlatL2(self.DIM)
+        refusing = faiss.IndexFlatL2(self.DIM)
+        # faiss raises for search parameters which index type does not take
+        refusing.search = mock.Mock(side_effect=RuntimeError('not supported'))
+
+        self.assertTrue(supports_selector(flat))
+        self.assertFalse(supports_selector(refusing))
+
+    def test_remove_from_index(self) -> None:
+        quantizer = faiss.IndexFlatL2(self.DIM)
+        index = faiss.IndexIVFFlat(quantizer, self.DIM, 2)
+        index.train(self.xb)
+        index.set_direct_map_type(faiss.DirectMap.Hashtable)
+        index.add_with_ids(self.xb, np.arange(self.DB_SIZE) + 1000)
+        id_map = faiss.IndexIDMap(faiss.IndexFlatL2(self.DIM))
+        id_map.add_with_ids(self.xb, np.arange(self.DB_SIZE) + 1000)
+
+        for index in (index, id_map):
+            removed = remove_from_index(index, np.array([1000, 1001, 5]))
+
+            self.assertEqual(removed, 2)
+            self.assertEqual(index.ntotal, self.DB_SIZE - 2)
+
+    def test_can_remove(self) -> None:
+        flat = faiss.IndexFlatL2(self.DIM)
+
+        self.assertTrue(can_remove(flat))
+        self.assertTrue(can_remove(faiss.IndexIDMap2(flat)))
+        self.assertFalse(can_remove(faiss.IndexHNSWFlat(self.DIM, 8)))
+
+    def test_removable_copy(self) -> None:
+        index = faiss.IndexFlatL2(self.DIM)
+        index.add(self.xb)
+
+        copy = removable_copy(index)
+        remove_from_index(copy, np.array([0, 1]))
+
+        # ids after the removed ones are not renumbered
+        self.assertEqual(index.ntotal, self.DB_SIZE)
+        self.assertEqual(copy.ntotal, self.DB_SIZE - 2)
+        np.testing.assert_array_equal(copy.reconstruct(99), self.xb[99])
+        self.assertEqual(copy.search(self.xb[50:51], 1)[1].tolist(), [[50]])
+
+    def test_removable_copy_ivf(self) -> None:
+        quantizer = faiss.IndexFlatL2(self.DIM)
+        index = faiss.IndexIVFFlat(quantizer, self.DIM, 2)
+        index.train(self.xb)
+        index.add(self.xb)
+        index.make_direct_map()
+
+        copy = removable_copy(index)
+        remove_from_index(copy, np.array([0, 1]))
+
+        self.assertEqual(
+            faiss.extract_index_ivf(copy).direct_map.type,
+            faiss.DirectMap.Hashtable,
+        )
+        np.testing.assert_array_equal(copy.reconstruct(99), self.xb[99])
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
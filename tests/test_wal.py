@@ -0,0 +1,472 @@
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+import faiss
+import numpy as np
+
+from faiss_grpc.tombstones import remove_from_index
+from faiss_grpc.wal import (
+    CHECKPOINT_FILE,
+    WAL_FILE,
+    WAL_MAGIC,
+    IndexWriter,
+    RecordKind,
+    WriteAheadLog,
+    write_index,
+)
+
+
+class TestWriteAheadLog(unittest.TestCase):
+    def setUp(self) -> None:
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.path = os.path.join(temp_dir.name, WAL_FILE)
+
+    def open(self) -> WriteAheadLog:
+        wal = WriteAheadLog(self.path, sync=False)
+        self.addCleanup(wal.close)
+        return wal
+
+    def test_replay(self) -> None:
+        wal = self.open()
+        vectors = np.random.random((3, 4)).astype('float32')
+        ids = np.array([10, 20, 30])
+        wal.append(1, RecordKind.add, vectors)
+        wal.append(2, RecordKind.add_with_ids, vectors, ids)
+        wal.close()
+
+        records = list(self.open().replay())
+
+        self.assertEqual(
+            [(lsn, kind) for lsn, kind, _, _ in records],
+            [(1, RecordKind.add), (2, RecordKind.add_with_ids)],
+        )
+        np.testing.assert_array_equal(records[0][2], vectors)
+        self.assertIsNone(records[0][3])
+        np.testing.assert_array_equal(records[1][3], ids)
+
+    def test_replay_removed_ids(self) -> None:
+        wal = self.open()
+        wal.append(1, RecordKind.remove, np.empty((2, 0)), np.array([3, 5]))
+        wal.close()
+
+        ((lsn, kind, vectors, ids),) = list(self.open().replay())
+
+        self.assertIs(kind, RecordKind.remove)
+        self.assertEqual(vectors.shape, (2, 0))
+        self.assertEqual(ids.tolist(), [3, 5])
+
+    def test_drop_incomplete_record(self) -> None:
+        wal = self.open()
+        wal.append(1, RecordKind.add, np.ones((2, 4)))
+        size = wal.size
+        wal.append(2, RecordKind.add, np.ones((2, 4)))
+        wal.close()
+        # crash while writing the last record
+        with open(self.path, 'r+b') as f:
+            f.truncate(size + 10)
+
+        wal = self.open()
+        records = list(wal.replay())
+
+        self.assertEqual([lsn for lsn, _, _, _ in records], [1])
+        self.assertEqual(wal.size, size)
+
+    def test_drop_corrupted_record(self) -> None:
+        wal = self.open()
+        size = wal.size
+        wal.append(1, RecordKind.add, np.ones((2, 4)))
+        wal.close()
+        with open(self.path, 'r+b') as f:
+            f.seek(-1, os.SEEK_END)
+            f.write(b'\xff')
+
+        wal = self.open()
+
+        self.assertEqual(list(wal.replay()), [])
+        self.assertEqual(wal.size, size)
+
+    def test_rollback(self) -> None:
+        wal = self.open()
+        wal.append(1, RecordKind.add, np.ones((2, 4)))
+        offset = wal.append(2, RecordKind.add, np.ones((2, 4)))
+
+        wal.rollback(offset)
+
+        self.assertEqual([lsn for lsn, _, _, _ in wal.replay()], [1])
+
+    def test_drop_before(self) -> None:
+        wal = self.open()
+        wal.append(1, RecordKind.add, np.ones((2, 4)))
+        offset = wal.size
+        wal.append(2, RecordKind.add, np.ones((2, 4)))
+
+        wal.drop_before(offset)
+        wal.append(3, RecordKind.add, np.ones((2, 4)))
+        wal.close()
+
+        # records after offset are kept, and new ones are appended to them
+        records = list(self.open().replay())
+        self.assertEqual([lsn for lsn, _, _, _ in records], [2, 3])
+
+    def test_failed_not_log_file(self) -> None:
+        with open(self.path, 'wb') as f:
+            f.write(b'not a log')
+
+        with self.assertRaises(ValueError):
+            WriteAheadLog(self.path)
+
+
+class TestIndexWriter(unittest.TestCase):
+    DIM = 8
+
+    def setUp(self) -> None:
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.directory = os.path.join(temp_dir.name, 'wal')
+        np.random.seed(1234)
+        self.xb = np.random.random((30, self.DIM)).astype('float32')
+
+    def writer(
+        self, base: faiss.Index, compaction_threshold: int = 1
+    ) -> IndexWriter:
+        # index is loaded like server, from the last snapshot if any
+        writer = IndexWriter(
+            self.directory,
+            sync=False,
+            compaction_threshold=compaction_threshold,
+        )
+        self.addCleanup(writer.close)
+        writer.recover(writer.loader(lambda: faiss.clone_index(base))())
+        return writer
+
+    def test_recover(self) -> None:
+        base = faiss.IndexFlatL2(self.DIM)
+        base.add(self.xb[:10])
+        writer = self.writer(base)
+
+        ids = writer.add(self.xb[10:15])
+        writer.add(self.xb[15:20])
+        writer.close()
+        recovered = self.writer(base)
+
+        self.assertEqual(ids.tolist(), list(range(10, 15)))
+        assert recovered.index is not None
+        self.assertEqual(recovered.index.ntotal, 20)
+        np.testing.assert_array_equal(
+            recovered.index.reconstruct_n(0, 20), self.xb[:20]
+        )
+        self.assertEqual(recovered.stats()['wal_records'], 2)
+
+    def test_snapshot(self) -> None:
+        base = faiss.IndexFlatL2(self.DIM)
+        writer = self.writer(base)
+        self.assertFalse(writer.snapshot())
+
+        writer.add(self.xb[:10])
+        self.assertTrue(writer.snapshot())
+        writer.add(self.xb[10:15])
+        self.assertTrue(writer.snapshot())
+        writer.add(self.xb[15:20])
+        writer.close()
+        recovered = self.writer(base)
+
+        # only the last snapshot is kept, and the log has records after it
+        snapshots = [
+            name
+            for name in os.listdir(self.directory)
+            if name.startswith('snapshot-')
+        ]
+        self.assertEqual(snapshots, ['snapshot-00000000000000000002.faiss'])
+        assert recovered.index is not None
+        self.assertEqual(recovered.index.ntotal, 20)
+        self.assertEqual(recovered.stats()['wal_records'], 1)
+        self.assertEqual(recovered.lsn, 3)
+
+    def test_add_while_writing_snapshot(self) -> None:
+        base = faiss.IndexFlatL2(self.DIM)
+        writer = self.writer(base)
+        writer.add(self.xb[:10])
+
+        # index is written without the mutex, so vectors can be added
+        def add_while_writing(index: faiss.Index, path: str) -> None:
+            writer.add(self.xb[10:15])
+            write_index(index, path)
+
+        with mock.patch('faiss_grpc.wal.write_index', add_while_writing):
+            self.assertTrue(writer.snapshot())
+        writer.close()
+        recovered = self.writer(base)
+
+        # snapshot has vectors until its record, and the log has the rest
+        self.assertEqual(recovered.snapshot_lsn, 1)
+        self.assertEqual(recovered.stats()['wal_records'], 1)
+        assert recovered.index is not None
+        np.testing.assert_array_equal(
+            recovered.index.reconstruct_n(0, 15), self.xb[:15]
+        )
+
+    def test_search_and_remove_while_cloning_snapshot(self) -> None:
+        base = faiss.IndexFlatL2(self.DIM)
+        writer = self.writer(base)
+        writer.add(self.xb[:10])
+        clone_index = faiss.clone_index
+        adder = threading.Thread(target=writer.add, args=(self.xb[10:15],))
+
+        def clone_while_writing(index: faiss.Index) -> faiss.Index:
+            self.assertEqual(writer.remove(np.array([0])), 1)
+            adder.start()
+            adder.join(0.05)
+            # vectors are added after the clone, and searches go on while
+            # they wait for it
+            self.assertTrue(adder.is_alive())
+            with writer.reading():
+                pass
+            return clone_index(index)
+
+        with mock.patch.object(faiss, 'clone_index', clone_while_writing):
+            self.assertTrue(writer.snapshot())
+        adder.join()
+        writer.close()
+        recovered = self.writer(base)
+
+        # snapshot has the record read before cloning, and the log the rest
+        self.assertEqual(recovered.snapshot_lsn, 1)
+        self.assertEqual(recovered.stats()['wal_records'], 2)
+        self.assertEqual(recovered.tombstones.ids.tolist(), [0])
+        assert recovered.index is not None
+        np.testing.assert_array_equal(
+            recovered.index.reconstruct_n(0, 15), self.xb[:15]
+        )
+
+    def test_recover_log_not_truncated(self) -> None:
+        base = faiss.IndexFlatL2(self.DIM)
+        writer = self.writer(base)
+        writer.add(self.xb[:10])
+        wal_path = os.path.join(self.directory, WAL_FILE)
+        shutil.copy(wal_path, wal_path + '.copy')
+
+        # crash after checkpoint was written, before records in snapshot were
+        # dropped from log
+        writer.snapshot()
+        writer.close()
+        os.replace(wal_path + '.copy', wal_path)
+        recovered = self.writer(base)
+
+        assert recovered.index is not None
+        self.assertEqual(recovered.index.ntotal, 10)
+        self.assertTrue(
+            os.path.exists(os.path.join(self.directory, CHECKPOINT_FILE))
+        )
+
+    def test_add_with_ids(self) -> None:
+        quantizer = faiss.IndexFlatL2(self.DIM)
+        base = faiss.IndexIVFFlat(quantizer, self.DIM, 2)
+        base.train(self.xb)
+        base.set_direct_map_type(faiss.DirectMap.Hashtable)
+        writer = self.writer(base)
+
+        writer.add(self.xb[:5], np.arange(100, 105))
+        with self.assertRaises(RuntimeError):
+            writer.add(self.xb[5:10])
+        writer.close()
+        recovered = self.writer(base)
+
+        assert recovered.index is not None
+        np.testing.assert_array_equal(
+            recovered.index.reconstruct(104), self.xb[4]
+        )
+
+    def ivf(self) -> faiss.Index:
+        quantizer = faiss.IndexFlatL2(self.DIM)
+        ivf = faiss.IndexIVFFlat(quantizer, self.DIM, 2)
+        ivf.train(self.xb)
+        ivf.set_direct_map_type(faiss.DirectMap.Hashtable)
+        ivf.add_with_ids(self.xb[:10], np.arange(100, 110))
+        return ivf
+
+    def id_map(self) -> faiss.Index:
+        id_map = faiss.IndexIDMap(faiss.IndexFlatL2(self.DIM))
+        id_map.add_with_ids(self.xb[:10], np.arange(100, 110))
+        return id_map
+
+    def test_remove(self) -> None:
+        base = faiss.IndexFlatL2(self.DIM)
+        base.add(self.xb[:10])
+        writer = self.writer(base)
+
+        self.assertEqual(writer.remove(np.array([1, 2])), 2)
+        writer.snapshot()
+        self.assertEqual(writer.remove(np.array([2, 3])), 1)
+        with self.assertRaises(ValueError):
+            writer.remove(np.array([10]))
+        writer.close()
+        recovered = self.writer(base)
+
+        self.assertEqual(recovered.tombstones.ids.tolist(), [1, 2, 3])
+        self.assertTrue(recovered.tombstones.dense)
+        assert recovered.index is not None
+        self.assertEqual(recovered.index.ntotal, 10)
+
+    def test_remove_unknown_ids(self) -> None:
+        for base in (self.ivf(), self.id_map()):
+            with self.subTest(index=type(base).__name__):
+                shutil.rmtree(self.directory, ignore_errors=True)
+                writer = self.writer(base, compaction_threshold=2)
+
+                # ids given by add_with_ids are only removed if they exist
+                self.assertEqual(writer.remove(np.array([5, 105, 200])), 1)
+                self.assertEqual(writer.remove(np.array([5, 200])), 0)
+
+                self.assertEqual(writer.tombstones.ids.tolist(), [105])
+                self.assertEqual(writer.stats()['wal_records'], 1)
+                # unknown ids do not count towards compaction
+                self.assertFalse(writer.compact())
+                writer.close()
+
+    def test_compact_sequential_ids(self) -> None:
+        base = faiss.IndexFlatL2(self.DIM)
+        base.add(self.xb[:10])
+        writer = self.writer(base)
+        writer.remove(np.array([1, 2]))
+
+        self.assertTrue(writer.compact())
+
+        # ids after removed ones are kept by mapping them
+        assert writer.index is not None
+        self.assertEqual(writer.index.ntotal, 8)
+        np.testing.assert_array_equal(writer.index.reconstruct(9), self.xb[9])
+        self.assertEqual(writer.add(self.xb[10:12]).tolist(), [10, 11])
+        with self.assertRaises(RuntimeError):
+            writer.add(self.xb[12:13], np.array([12]))
+        writer.snapshot()
+        self.assertEqual(writer.add(self.xb[12:13]).tolist(), [12])
+        writer.close()
+        recovered = self.writer(base)
+
+        assert recovered.index is not None
+        self.assertEqual(recovered.index.ntotal, 11)
+        self.assertEqual(recovered.next_id, 13)
+        np.testing.assert_array_equal(
+            recovered.index.reconstruct(12), self.xb[12]
+        )
+
+    def test_recover_compacted_ids_from_log(self) -> None:
+        # vectors added after compaction get the same ids from log replayed
+        # over the index before compaction
+        base = faiss.IndexFlatL2(self.DIM)
+        base.add(self.xb[:10])
+        writer = self.writer(base)
+        writer.remove(np.array([0]))
+        writer.compact()
+        writer.add(self.xb[10:12])
+        writer.close()
+
+        recovered = self.writer(base)
+
+        assert recovered.index is not None
+        self.assertEqual(recovered.tombstones.ids.tolist(), [0])
+        np.testing.assert_array_equal(
+            recovered.index.reconstruct(11), self.xb[11]
+        )
+        self.assertTrue(recovered.compact())
+        np.testing.assert_array_equal(
+            recovered.index.reconstruct(11), self.xb[11]
+        )
+
+    def test_failed_not_removable(self) -> None:
+        base = faiss.IndexHNSWFlat(self.DIM, 8)
+        base.add(self.xb[:10])
+        writer = self.writer(base)
+
+        with self.assertRaises(RuntimeError):
+            writer.remove(np.array([1]))
+
+    def test_compact(self) -> None:
+        writer = self.writer(self.ivf(), compaction_threshold=2)
+        swapped = []
+        assert writer.index is not None
+        writer.recover(writer.index, swapped.append)
+
+        writer.remove(np.array([100]))
+        self.assertFalse(writer.compact())
+        writer.remove(np.array([101]))
+        self.assertTrue(writer.compact())
+
+        self.assertEqual(len(swapped), 1)
+        self.assertIs(writer.index, swapped[0])
+        self.assertEqual(swapped[0].ntotal, 8)
+        with self.assertRaises(RuntimeError):
+            writer.add(self.xb[:1], np.array([100]))
+        # compacted ids are forgotten by the next compaction
+        self.assertFalse(writer.compact())
+        self.assertEqual(len(writer.tombstones), 0)
+        writer.add(self.xb[:1], np.array([100]))
+        self.assertEqual(writer.stats()['compactions_total'], 1)
+
+    def test_compact_with_added_vectors(self) -> None:
+        writer = self.writer(self.ivf())
+        writer.remove(np.array([100]))
+
+        # vectors are added while removed ids are deleted from copy of index
+        def add_while_removing(index: faiss.Index, ids: np.ndarray) -> int:
+            writer.add(self.xb[10:12], np.array([200, 201]))
+            return remove_from_index(index, ids)
+
+        with mock.patch(
+            'faiss_grpc.wal.remove_from_index', add_while_removing
+        ):
+            self.assertTrue(writer.compact())
+
+        assert writer.index is not None
+        self.assertEqual(writer.index.ntotal, 11)
+        np.testing.assert_array_equal(
+            writer.index.reconstruct(201), self.xb[11]
+        )
+
+    def test_snapshot_removed_ids(self) -> None:
+        writer = self.writer(self.ivf())
+        writer.remove(np.array([100]))
+        writer.snapshot()
+        writer.remove(np.array([101]))
+        writer.snapshot()
+        writer.close()
+
+        recovered = self.writer(self.ivf())
+
+        # only the last file of removed ids is kept
+        removed = [
+            name
+            for name in os.listdir(self.directory)
+            if name.startswith('removed-')
+        ]
+        self.assertEqual(removed, ['removed-00000000000000000002.npy'])
+        self.assertEqual(recovered.tombstones.ids.tolist(), [100, 101])
+        self.assertFalse(recovered.tombstones.dense)
+
+    def test_rollback_refused_vectors(self) -> None:
+        # vectors can not be added to untrained index
+        quantizer = faiss.IndexFlatL2(self.DIM)
+        base = faiss.IndexIVFFlat(quantizer, self.DIM, 2)
+        base.set_direct_map_type(faiss.DirectMap.Hashtable)
+        writer = self.writer(base)
+
+        with self.assertRaises(RuntimeError):
+            writer.add(self.xb[:5], np.arange(5))
+
+        self.assertEqual(writer.stats()['wal_records'], 0)
+        self.assertEqual(writer.wal.size, len(WAL_MAGIC))
+
+    def test_failed_illegal_snapshot_interval(self) -> None:
+        with self.assertRaises(ValueError):
+            IndexWriter(self.directory, snapshot_interval=0)
+        with self.assertRaises(ValueError):
+            IndexWriter(self.directory, compaction_threshold=0)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)